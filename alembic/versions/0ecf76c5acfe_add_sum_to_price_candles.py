@@ -0,0 +1,29 @@
+"""Add sum column to price candles for incremental rollups
+
+Revision ID: 0ecf76c5acfe
+Revises: a8655181c7b9
+Create Date: 2026-10-19 11:04:17.582930
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0ecf76c5acfe"
+down_revision = "a8655181c7b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Для уже построенных свечей сумма неизвестна (NULL): статистика по ним
+    # берется из сырых данных, пока не будет выполнен rebuild_rollups_task
+    op.add_column(
+        "price_candles",
+        sa.Column("sum", sa.Numeric(precision=30, scale=8), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("price_candles", "sum")
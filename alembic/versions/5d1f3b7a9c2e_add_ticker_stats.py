@@ -0,0 +1,63 @@
+"""Add per-ticker running aggregates for price stats
+
+Revision ID: 5d1f3b7a9c2e
+Revises: 0ecf76c5acfe
+Create Date: 2026-10-19 14:26:53.104418
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d1f3b7a9c2e"
+down_revision = "0ecf76c5acfe"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ticker_stats",
+        sa.Column("ticker", sa.String(length=10), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.Column("sum", sa.Numeric(precision=30, scale=8), nullable=False),
+        sa.Column("mean", sa.Float(), nullable=False),
+        sa.Column("m2", sa.Float(), nullable=False),
+        sa.Column("min_price", sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column("max_price", sa.Numeric(precision=20, scale=8), nullable=True),
+        sa.Column("first_timestamp", sa.BigInteger(), nullable=True),
+        sa.Column("last_timestamp", sa.BigInteger(), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("ticker"),
+    )
+    # Агрегаты для уже накопленных цен; дальше их ведет запись цен
+    op.execute(
+        """
+        INSERT INTO ticker_stats (
+            ticker, count, sum, mean, m2, min_price, max_price,
+            first_timestamp, last_timestamp
+        )
+        SELECT
+            ticker,
+            count(*),
+            sum(price),
+            avg(price),
+            coalesce(var_pop(price) * count(*), 0),
+            min(price),
+            max(price),
+            min(timestamp),
+            max(timestamp)
+        FROM prices
+        GROUP BY ticker
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ticker_stats")
@@ -0,0 +1,71 @@
+"""Replace prices indexes with covering and BRIN indexes
+
+Revision ID: a3d8f2c6e9b1
+Revises: f1a4c6e2b8d9
+Create Date: 2026-10-19 19:12:48.260317
+
+Каждая вставка в prices поддерживала три B-дерева помимо первичного
+ключа: ix_prices_id дублирует первичный ключ, idx_created_at не используется
+запросами. Вместо них:
+idx_ticker_timestamp с ценой в INCLUDE и BRIN по timestamp и created_at для
+запросов по времени без тикера (очистка, архив). Индексы строятся и
+удаляются CONCURRENTLY, запись не блокируется.
+
+Следующая миграция добавляет колонки серий повторов (valid_until, repeats),
+которые читают запросы по диапазону, агрегаты и поиск пропусков. В INCLUDE
+они не добавляются: продление серии перестало бы быть HOT update, а
+index-only scan по ним не быстрее чтения таблицы
+(benchmarks/prices_indexes.txt).
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3d8f2c6e9b1"
+down_revision = "f1a4c6e2b8d9"
+branch_labels = None
+depends_on = None
+
+PAGES_PER_RANGE = 32
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # Новый индекс строится рядом со старым, затем занимает его имя
+        op.execute(
+            "CREATE INDEX CONCURRENTLY idx_ticker_timestamp_covering ON prices "
+            "(ticker_id, timestamp DESC) INCLUDE (price)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY idx_ticker_timestamp")
+        op.execute(
+            "ALTER INDEX idx_ticker_timestamp_covering RENAME TO idx_ticker_timestamp"
+        )
+
+        for column in ("timestamp", "created_at"):
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY brin_prices_{column} ON prices "
+                f"USING brin ({column}) "
+                f"WITH (pages_per_range = {PAGES_PER_RANGE})"
+            )
+
+        for name in ("ix_prices_id", "idx_created_at"):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY ix_prices_id ON prices (id)")
+        op.execute(
+            "CREATE INDEX CONCURRENTLY idx_created_at ON prices (created_at DESC)"
+        )
+
+        for column in ("timestamp", "created_at"):
+            op.execute(f"DROP INDEX CONCURRENTLY brin_prices_{column}")
+
+        op.execute(
+            "CREATE INDEX CONCURRENTLY idx_ticker_timestamp_plain ON prices "
+            "(ticker_id, timestamp DESC)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY idx_ticker_timestamp")
+        op.execute(
+            "ALTER INDEX idx_ticker_timestamp_plain RENAME TO idx_ticker_timestamp"
+        )
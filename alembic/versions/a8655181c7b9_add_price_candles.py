@@ -0,0 +1,47 @@
+"""Add price candles for downsampling tiers
+
+Revision ID: a8655181c7b9
+Revises: 47489e3ff58c
+Create Date: 2026-10-19 10:12:41.331207
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a8655181c7b9"
+down_revision = "47489e3ff58c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_candles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("ticker", sa.String(length=10), nullable=False),
+        sa.Column("resolution", sa.String(length=4), nullable=False),
+        sa.Column("bucket_start", sa.BigInteger(), nullable=False),
+        sa.Column("open", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("high", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("low", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("close", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("open_timestamp", sa.BigInteger(), nullable=False),
+        sa.Column("close_timestamp", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "ticker", "resolution", "bucket_start", name="uq_candle_bucket"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("price_candles")
@@ -0,0 +1,40 @@
+"""Add tickers registry
+
+Revision ID: b3e8c41d7f05
+Revises: 5d1f3b7a9c2e
+Create Date: 2026-10-19 15:42:08.613270
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b3e8c41d7f05"
+down_revision = "5d1f3b7a9c2e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tickers",
+        sa.Column("id", sa.SmallInteger(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=10), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    # Тикеры уже накопленных цен; новые добавляет запись цен
+    op.execute(
+        "INSERT INTO tickers (name) SELECT DISTINCT ticker FROM prices ORDER BY ticker"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tickers")
@@ -0,0 +1,33 @@
+"""Add run-length columns to prices (change-only storage)
+
+Revision ID: b7e2d4f1c8a3
+Revises: a3d8f2c6e9b1
+Create Date: 2026-10-19 19:48:05.913274
+
+Колонки серии повторов для CHANGE_ONLY_ENABLED: тики с неизменной ценой
+продлевают последнюю строку тикера. Колонки допускают NULL (строка без
+повторов), поэтому добавляются без перезаписи таблицы и не входят в
+индексы: продление серии остается HOT update.
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7e2d4f1c8a3"
+down_revision = "a3d8f2c6e9b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("prices", sa.Column("valid_until", sa.BigInteger(), nullable=True))
+    op.add_column("prices", sa.Column("repeats", sa.Integer(), nullable=True))
+    op.add_column("prices", sa.Column("run_offsets", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    # Повторы серий при откате теряются: остается первая цена каждой серии
+    op.drop_column("prices", "run_offsets")
+    op.drop_column("prices", "repeats")
+    op.drop_column("prices", "valid_until")
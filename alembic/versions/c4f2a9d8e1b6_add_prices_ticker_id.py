@@ -0,0 +1,130 @@
+"""Add ticker_id to prices (expand)
+
+Revision ID: c4f2a9d8e1b6
+Revises: b3e8c41d7f05
+Create Date: 2026-10-19 17:20:44.105382
+
+Онлайн-миграция в два шага. Этот шаг добавляет prices.ticker_id, не
+блокируя запись: колонка заполняется пачками, индексы строятся
+CONCURRENTLY, NOT NULL и внешний ключ проверяются без долгой блокировки.
+Триггер заполняет ticker_id для строк, записанных старым кодом, и ticker -
+для строк нового кода, поэтому обе версии приложения работают, пока идет
+выкладка; время последней записи старым кодом по каждому тикеру триггер
+отмечает в prices_legacy_writes. Колонку ticker удаляет следующая ревизия
+(d7a1e5c3b9f4) после перехода всех процессов на новый код.
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4f2a9d8e1b6"
+down_revision = "b3e8c41d7f05"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 50000
+
+
+def upgrade() -> None:
+    op.add_column("prices", sa.Column("ticker_id", sa.SmallInteger(), nullable=True))
+    op.alter_column("prices", "ticker", existing_type=sa.String(10), nullable=True)
+    op.create_table(
+        "prices_legacy_writes",
+        sa.Column("ticker", sa.String(10), primary_key=True),
+        sa.Column("written_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+    op.execute(
+        """
+        CREATE FUNCTION prices_sync_ticker() RETURNS trigger AS $$
+        BEGIN
+            -- Изменение одной из колонок пересчитывает другую
+            IF TG_OP = 'UPDATE' THEN
+                IF NEW.ticker IS DISTINCT FROM OLD.ticker
+                        AND NEW.ticker_id IS NOT DISTINCT FROM OLD.ticker_id THEN
+                    NEW.ticker_id := NULL;
+                ELSIF NEW.ticker_id IS DISTINCT FROM OLD.ticker_id
+                        AND NEW.ticker IS NOT DISTINCT FROM OLD.ticker THEN
+                    NEW.ticker := NULL;
+                END IF;
+            END IF;
+
+            IF NEW.ticker_id IS NULL AND NEW.ticker IS NOT NULL THEN
+                INSERT INTO tickers (name) VALUES (NEW.ticker)
+                ON CONFLICT (name) DO NOTHING;
+                SELECT id INTO NEW.ticker_id FROM tickers WHERE name = NEW.ticker;
+                -- Запись старым кодом: триггер еще нужен
+                INSERT INTO prices_legacy_writes (ticker, written_at)
+                VALUES (NEW.ticker, now())
+                ON CONFLICT (ticker) DO UPDATE SET written_at = EXCLUDED.written_at;
+            ELSIF NEW.ticker IS NULL AND NEW.ticker_id IS NOT NULL THEN
+                SELECT name INTO NEW.ticker FROM tickers WHERE id = NEW.ticker_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER prices_sync_ticker BEFORE INSERT OR UPDATE ON prices "
+        "FOR EACH ROW EXECUTE FUNCTION prices_sync_ticker()"
+    )
+    # Тикеры, появившиеся после заполнения реестра
+    op.execute(
+        "INSERT INTO tickers (name) SELECT DISTINCT ticker FROM prices "
+        "ON CONFLICT (name) DO NOTHING"
+    )
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text("SELECT min(id), max(id) FROM prices")).one()
+        # Каждая пачка - отдельная транзакция, блокировки строк короткие
+        for start in range(low or 0, (high or 0) + 1, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    "UPDATE prices SET ticker_id = tickers.id FROM tickers "
+                    "WHERE tickers.name = prices.ticker "
+                    "AND prices.id >= :start AND prices.id < :end "
+                    "AND prices.ticker_id IS NULL"
+                ),
+                {"start": start, "end": start + BATCH_SIZE},
+            )
+
+        op.create_index(
+            "idx_ticker_id_timestamp",
+            "prices",
+            ["ticker_id", sa.literal_column("timestamp DESC")],
+            postgresql_concurrently=True,
+        )
+
+        # Каждое ALTER - отдельная транзакция: проверка NOT VALID ограничений
+        # идет без блокировки записи, а NOT NULL по проверенному ограничению
+        # не сканирует таблицу повторно
+        op.execute(
+            "ALTER TABLE prices ADD CONSTRAINT prices_ticker_id_not_null "
+            "CHECK (ticker_id IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE prices VALIDATE CONSTRAINT prices_ticker_id_not_null")
+        op.alter_column("prices", "ticker_id", nullable=False)
+        op.drop_constraint("prices_ticker_id_not_null", "prices", type_="check")
+
+        op.execute(
+            "ALTER TABLE prices ADD CONSTRAINT prices_ticker_id_fkey "
+            "FOREIGN KEY (ticker_id) REFERENCES tickers (id) NOT VALID"
+        )
+        op.execute("ALTER TABLE prices VALIDATE CONSTRAINT prices_ticker_id_fkey")
+
+
+def downgrade() -> None:
+    op.drop_constraint("prices_ticker_id_fkey", "prices", type_="foreignkey")
+    op.drop_index("idx_ticker_id_timestamp", table_name="prices")
+    op.execute("DROP TRIGGER prices_sync_ticker ON prices")
+    op.execute("DROP FUNCTION prices_sync_ticker()")
+    op.drop_table("prices_legacy_writes")
+    op.execute(
+        "UPDATE prices SET ticker = tickers.name FROM tickers "
+        "WHERE tickers.id = prices.ticker_id AND prices.ticker IS NULL"
+    )
+    op.alter_column("prices", "ticker", existing_type=sa.String(10), nullable=False)
+    op.drop_column("prices", "ticker_id")
@@ -0,0 +1,115 @@
+"""Drop ticker column from prices (contract)
+
+Revision ID: d7a1e5c3b9f4
+Revises: c4f2a9d8e1b6
+Create Date: 2026-10-19 17:21:09.331726
+
+Второй шаг перехода на prices.ticker_id: выполняется, когда все процессы
+API и воркеров работают с новым кодом. Миграция отказывается выполняться,
+пока prices.ticker_id допускает NULL или старый код писал цены (через
+триггер синхронизации) за последние LEGACY_QUIET_MINUTES минут.
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d7a1e5c3b9f4"
+down_revision = "c4f2a9d8e1b6"
+branch_labels = None
+depends_on = None
+
+LEGACY_QUIET_MINUTES = 10
+
+
+def _check_expand_finished() -> None:
+    """Проверить, что шаг expand завершен и триггер синхронизации не нужен"""
+
+    bind = op.get_bind()
+    nullable = bind.execute(
+        sa.text(
+            "SELECT is_nullable FROM information_schema.columns "
+            "WHERE table_name = 'prices' AND column_name = 'ticker_id'"
+        )
+    ).scalar()
+    if nullable != "NO":
+        raise RuntimeError(
+            "prices.ticker_id допускает NULL: шаг c4f2a9d8e1b6 не завершен"
+        )
+
+    legacy = (
+        bind.execute(
+            sa.text(
+                "SELECT ticker FROM prices_legacy_writes "
+                "WHERE written_at > now() - make_interval(mins => :minutes) "
+                "ORDER BY ticker"
+            ),
+            {"minutes": LEGACY_QUIET_MINUTES},
+        )
+        .scalars()
+        .all()
+    )
+    if legacy:
+        raise RuntimeError(
+            "Старый код еще пишет цены без ticker_id "
+            f"({', '.join(legacy)}): перезапустите все API и воркеры на новом "
+            f"коде и повторите миграцию через {LEGACY_QUIET_MINUTES} минут"
+        )
+
+
+def upgrade() -> None:
+    _check_expand_finished()
+
+    op.execute("DROP TRIGGER prices_sync_ticker ON prices")
+    op.execute("DROP FUNCTION prices_sync_ticker()")
+    op.drop_table("prices_legacy_writes")
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_ticker_timestamp", table_name="prices", postgresql_concurrently=True
+        )
+        op.drop_index(
+            op.f("ix_prices_ticker"), table_name="prices", postgresql_concurrently=True
+        )
+
+    op.execute("ALTER INDEX idx_ticker_id_timestamp RENAME TO idx_ticker_timestamp")
+    # Удаление колонки меняет только каталог, таблица не переписывается
+    op.drop_column("prices", "ticker")
+
+
+def downgrade() -> None:
+    op.add_column("prices", sa.Column("ticker", sa.String(10), nullable=True))
+    op.execute(
+        "UPDATE prices SET ticker = tickers.name FROM tickers "
+        "WHERE tickers.id = prices.ticker_id"
+    )
+    op.alter_column("prices", "ticker", existing_type=sa.String(10), nullable=False)
+    op.execute("ALTER INDEX idx_ticker_timestamp RENAME TO idx_ticker_id_timestamp")
+    op.create_index(
+        "idx_ticker_timestamp",
+        "prices",
+        ["ticker", sa.literal_column("timestamp DESC")],
+        unique=False,
+    )
+    op.create_index(op.f("ix_prices_ticker"), "prices", ["ticker"], unique=False)
+    op.create_table(
+        "prices_legacy_writes",
+        sa.Column("ticker", sa.String(10), primary_key=True),
+        sa.Column("written_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.execute(
+        """
+        CREATE FUNCTION prices_sync_ticker() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.ticker IS NULL AND NEW.ticker_id IS NOT NULL THEN
+                SELECT name INTO NEW.ticker FROM tickers WHERE id = NEW.ticker_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER prices_sync_ticker BEFORE INSERT OR UPDATE ON prices "
+        "FOR EACH ROW EXECUTE FUNCTION prices_sync_ticker()"
+    )
@@ -0,0 +1,133 @@
+"""Add price scale to tickers
+
+Revision ID: e8c3d1f5a7b2
+Revises: d7a1e5c3b9f4
+Create Date: 2026-10-19 18:02:37.518204
+
+Масштаб цен тикера (tickers.price_scale) берется из PRICE_SCALE и
+PRICE_SCALES. При PRICE_STORAGE=fixed колонки цен переводятся в BIGINT
+(суммы - в NUMERIC(38, 0)) в масштабе своего тикера. Смена типа
+перезаписывает таблицы под эксклюзивной блокировкой, поэтому переход
+между режимами выполняется в окно обслуживания. Откат возвращает
+NUMERIC, если колонки были переведены.
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = "e8c3d1f5a7b2"
+down_revision = "d7a1e5c3b9f4"
+branch_labels = None
+depends_on = None
+
+# Таблица -> (колонка тикера, [(колонка, тип fixed, тип numeric)])
+PRICE_COLUMNS = {
+    "prices": ("ticker_id", [("price", "BIGINT", "NUMERIC(20, 8)")]),
+    "price_candles": (
+        "ticker",
+        [
+            ("open", "BIGINT", "NUMERIC(20, 8)"),
+            ("high", "BIGINT", "NUMERIC(20, 8)"),
+            ("low", "BIGINT", "NUMERIC(20, 8)"),
+            ("close", "BIGINT", "NUMERIC(20, 8)"),
+            ("sum", "NUMERIC(38, 0)", "NUMERIC(30, 8)"),
+        ],
+    ),
+    "ticker_stats": (
+        "ticker",
+        [
+            ("sum", "NUMERIC(38, 0)", "NUMERIC(30, 8)"),
+            ("min_price", "BIGINT", "NUMERIC(20, 8)"),
+            ("max_price", "BIGINT", "NUMERIC(20, 8)"),
+        ],
+    ),
+}
+
+
+def _create_factor_functions() -> None:
+    # Подзапросы в USING запрещены, масштаб читается функциями
+    op.execute(
+        """
+        CREATE FUNCTION price_factor_by_id(ticker_id integer) RETURNS numeric AS $$
+        BEGIN
+            RETURN (SELECT 10::numeric ^ price_scale FROM tickers WHERE id = ticker_id);
+        END;
+        $$ LANGUAGE plpgsql STABLE
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION price_factor_by_name(ticker varchar) RETURNS numeric AS $$
+        BEGIN
+            RETURN coalesce(
+                (SELECT 10::numeric ^ price_scale FROM tickers WHERE name = ticker),
+                10::numeric ^ 8
+            );
+        END;
+        $$ LANGUAGE plpgsql STABLE
+        """
+    )
+
+
+def _drop_factor_functions() -> None:
+    op.execute("DROP FUNCTION price_factor_by_id(integer)")
+    op.execute("DROP FUNCTION price_factor_by_name(varchar)")
+
+
+def _convert(to_fixed: bool) -> None:
+    _create_factor_functions()
+    for table, (ticker_column, columns) in PRICE_COLUMNS.items():
+        function = (
+            "price_factor_by_id"
+            if ticker_column == "ticker_id"
+            else "price_factor_by_name"
+        )
+        factor = f"{function}({ticker_column})"
+        alters = []
+        for column, fixed_type, numeric_type in columns:
+            if to_fixed:
+                using = f"round({column} * {factor})::{fixed_type}"
+                alters.append(f"ALTER COLUMN {column} TYPE {fixed_type} USING {using}")
+            else:
+                using = f"({column} / {factor})::{numeric_type}"
+                alters.append(
+                    f"ALTER COLUMN {column} TYPE {numeric_type} USING {using}"
+                )
+        # Одно ALTER TABLE - одна перезапись таблицы
+        op.execute(f"ALTER TABLE {table} " + ", ".join(alters))
+    _drop_factor_functions()
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tickers",
+        sa.Column("price_scale", sa.SmallInteger(), server_default="8", nullable=False),
+    )
+
+    bind = op.get_bind()
+    if settings.PRICE_SCALE != 8:
+        bind.execute(
+            sa.text("UPDATE tickers SET price_scale = :scale"),
+            {"scale": settings.PRICE_SCALE},
+        )
+    for name, scale in settings.PRICE_SCALES.items():
+        bind.execute(
+            sa.text("UPDATE tickers SET price_scale = :scale WHERE name = :name"),
+            {"scale": scale, "name": name},
+        )
+
+    if settings.PRICE_STORAGE == "fixed":
+        _convert(to_fixed=True)
+
+
+def downgrade() -> None:
+    columns = {
+        column["name"]: column["type"]
+        for column in sa.inspect(op.get_bind()).get_columns("prices")
+    }
+    if isinstance(columns["price"], sa.BigInteger):
+        _convert(to_fixed=False)
+
+    op.drop_column("tickers", "price_scale")
@@ -0,0 +1,51 @@
+"""Add compressed price chunks (cold tier)
+
+Revision ID: f1a4c6e2b8d9
+Revises: e8c3d1f5a7b2
+Create Date: 2026-10-19 19:11:42.630915
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f1a4c6e2b8d9"
+down_revision = "e8c3d1f5a7b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_chunks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("ticker_id", sa.SmallInteger(), nullable=False),
+        sa.Column("chunk_start", sa.BigInteger(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("first_timestamp", sa.BigInteger(), nullable=False),
+        sa.Column("last_timestamp", sa.BigInteger(), nullable=False),
+        sa.Column("ids", sa.LargeBinary(), nullable=False),
+        sa.Column("timestamps", sa.LargeBinary(), nullable=False),
+        sa.Column("source_timestamps", sa.LargeBinary(), nullable=False),
+        sa.Column("created_ats", sa.LargeBinary(), nullable=False),
+        sa.Column("prices", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["ticker_id"], ["tickers.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("ticker_id", "chunk_start", name="uq_chunk_ticker_start"),
+    )
+    # Блоки уже сжаты zlib: повторное сжатие TOAST только тратит CPU
+    for column in ("ids", "timestamps", "source_timestamps", "created_ats", "prices"):
+        op.execute(
+            f"ALTER TABLE price_chunks ALTER COLUMN {column} SET STORAGE EXTERNAL"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("price_chunks")
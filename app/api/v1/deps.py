@@ -1,8 +1,12 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
+from fastapi import Depends
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.database import SessionLocal
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.db.replicas import replica_router
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -17,3 +21,48 @@ def get_db() -> Generator[Session, None, None]:
         raise
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость для получения асинхронной сессии базы данных.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def get_async_read_db(
+    primary: AsyncSession = Depends(get_async_db),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Зависимость для запросов без записи: сессия здоровой реплики.
+
+    Без реплик, без здоровых реплик или при ошибке подключения к реплике
+    возвращается сессия основной базы (она не занимает соединение, пока
+    не выполнен запрос).
+    """
+    replica = replica_router.choose()
+    if replica is None:
+        yield primary
+        return
+
+    db = replica.session_factory()
+    try:
+        # Соединение берется сразу, чтобы недоступная реплика не сорвала запрос
+        await db.connection()
+    except (DBAPIError, OSError) as e:
+        await db.close()
+        replica_router.mark_failed(replica, str(e))
+        yield primary
+        return
+
+    async with db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
@@ -1,12 +1,33 @@
-from typing import List, Optional
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.v1.deps import get_db
+from app.api.v1.deps import get_async_db, get_async_read_db
+from app.core.config import settings
 from app.core.logging import get_logger
-from app.schemas.price import PriceCreate, PriceResponse
-from app.services.price_service import PriceService
+from app.db.session import run_in_thread
+from app.schemas.price import (
+    CandleResponse,
+    LatestPriceResponse,
+    PriceCreate,
+    PricePageResponse,
+    PriceResponse,
+    TickerResponse,
+)
+from app.services.candle_service import CandleService
+from app.services.freshness_service import FreshnessService
+from app.services.gap_service import GapService
+from app.services.latest_price_service import latest_prices, price_payload
+from app.services.price_service import AsyncPriceService
+from app.services.ticker_service import TickerService
 
 logger = get_logger(__name__)
 
@@ -36,7 +57,7 @@ async def get_prices(
         description="Максимальное количество записей для возврата",
         example=100,
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> List[PriceResponse]:
     """
     Получить все сохраненные цены для указанного тикера.
@@ -54,7 +75,9 @@ async def get_prices(
     )
 
     try:
-        prices = PriceService.get_prices(db, ticker=ticker, skip=skip, limit=limit)
+        prices = await AsyncPriceService.get_prices(
+            db, ticker=ticker, skip=skip, limit=limit
+        )
 
         logger.debug(
             "Успешно получены цены", extra={"ticker": ticker, "count": len(prices)}
@@ -72,9 +95,76 @@ async def get_prices(
         )
 
 
+@router.get(
+    "/page",
+    response_model=PricePageResponse,
+    summary="Получить страницу цен по курсору",
+    description="Возвращает цены тикера от новых к старым с курсорной пагинацией. "
+    "Стоимость страницы не зависит от ее глубины.",
+)
+async def get_prices_page(
+    ticker: str = Query(
+        ...,
+        min_length=3,
+        description="Тикер криптовалюты (например: btc_usd, eth_usd)",
+        examples=["btc_usd", "eth_usd"],
+    ),
+    limit: int = Query(
+        100,
+        ge=1,
+        le=1000,
+        description="Максимальное количество записей на странице",
+        example=100,
+    ),
+    cursor: Optional[str] = Query(
+        None, description="Курсор из next_cursor или prev_cursor предыдущего ответа"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> PricePageResponse:
+    """
+    Получить страницу цен для указанного тикера.
+
+    Args:
+        ticker: Тикер криптовалюты
+        limit: Размер страницы
+        cursor: Курсор страницы. Без курсора - самые новые цены
+
+    Returns:
+        Цены страницы и курсоры соседних страниц
+
+    Raises:
+        HTTPException 400: Если курсор поврежден
+    """
+    logger.info(
+        "Запрос страницы цен",
+        extra={"ticker": ticker, "limit": limit, "cursor": cursor},
+    )
+
+    try:
+        prices, next_cursor, prev_cursor = await AsyncPriceService.get_prices_page(
+            db, ticker=ticker, limit=limit, cursor=cursor
+        )
+        return PricePageResponse(
+            items=prices, next_cursor=next_cursor, prev_cursor=prev_cursor
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(
+            "Ошибка при получении страницы цен",
+            extra={"ticker": ticker, "error": str(e)},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении страницы цен: {str(e)}",
+        )
+
+
 @router.get(
     "/latest",
-    response_model=PriceResponse,
+    response_model=LatestPriceResponse,
+    response_model_exclude_unset=True,
     summary="Получить последнюю цену",
     description="Возвращает последнюю сохраненную цену для указанного тикера.",
 )
@@ -85,13 +175,22 @@ async def get_latest_price(
         description="Тикер криптовалюты (например: btc_usd, eth_usd)",
         examples=["btc_usd", "eth_usd"],
     ),
-    db: Session = Depends(get_db),
-) -> PriceResponse:
+    include_age: bool = Query(
+        False, description="Добавить в ответ возраст цены (data_age_ms)"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+) -> LatestPriceResponse:
     """
     Получить последнюю сохраненную цену для указанного тикера.
 
+    Цена берется из кеша последних цен (память процесса, затем Redis);
+    запрос к БД выполняется только при промахе кеша. Промах заполняет
+    общий кеш, поэтому читается основная база, а не реплика: цена отстающей
+    реплики не должна заменить в кеше уже записанную.
+
     Args:
         ticker: Тикер криптовалюты
+        include_age: Добавить возраст цены относительно времени биржи
 
     Returns:
         Последняя цена в формате PriceResponse
@@ -101,8 +200,12 @@ async def get_latest_price(
     """
     logger.info("Запрос последней цены", extra={"ticker": ticker})
 
+    async def load_latest_price() -> Optional[dict]:
+        price = await AsyncPriceService.get_latest_price(db, ticker)
+        return price_payload(price) if price else None
+
     try:
-        price = PriceService.get_latest_price(db, ticker)
+        price = await latest_prices.get(ticker, load_latest_price)
 
         if not price:
             logger.warning("Цена не найдена", extra={"ticker": ticker})
@@ -115,12 +218,23 @@ async def get_latest_price(
             "Успешно получена последняя цена",
             extra={
                 "ticker": ticker,
-                "price": price.price,
-                "timestamp": price.timestamp,
+                "price": price["price"],
+                "timestamp": price["timestamp"],
             },
         )
 
-        return price
+        if not include_age:
+            return price
+
+        response = LatestPriceResponse.model_validate(price)
+        # source_timestamp - время биржи в микросекундах
+        source_ms = (
+            price["source_timestamp"] // 1000
+            if price["source_timestamp"]
+            else price["timestamp"]
+        )
+        response.data_age_ms = max(int(time.time() * 1000) - source_ms, 0)
+        return response
 
     except HTTPException:
         raise
@@ -135,6 +249,54 @@ async def get_latest_price(
         )
 
 
+# Даты сериализуются так же, как в ответах PriceResponse
+_DATETIME = TypeAdapter(datetime)
+
+
+def _ndjson_line(row) -> str:
+    """Строка NDJSON в формате PriceResponse"""
+
+    created_at = row["created_at"]
+    return json.dumps(
+        {
+            "ticker": row["ticker"],
+            "price": float(row["price"]),
+            "timestamp": row["timestamp"],
+            "source_timestamp": row["source_timestamp"],
+            "id": row["id"],
+            "created_at": (
+                _DATETIME.dump_python(created_at, mode="json") if created_at else None
+            ),
+        },
+        separators=(",", ":"),
+    )
+
+
+async def _stream_ndjson(
+    db: AsyncSession, ticker: str, start: Optional[int], end: Optional[int]
+) -> AsyncIterator[bytes]:
+    """Пачки строк NDJSON по мере чтения серверного курсора"""
+
+    count = 0
+    try:
+        async for rows in AsyncPriceService.stream_prices_by_date_range(
+            db, ticker=ticker, start_timestamp=start, end_timestamp=end
+        ):
+            count += len(rows)
+            yield ("\n".join(_ndjson_line(row) for row in rows) + "\n").encode()
+    except Exception as e:
+        # Статус уже отправлен: ошибка только логируется, поток обрывается
+        logger.error(
+            "Ошибка при потоковой выдаче цен",
+            extra={"ticker": ticker, "streamed": count, "error": str(e)},
+        )
+        raise
+
+    logger.debug(
+        "Потоковая выдача цен завершена", extra={"ticker": ticker, "count": count}
+    )
+
+
 @router.get(
     "/filter",
     response_model=List[PriceResponse],
@@ -160,7 +322,11 @@ async def filter_prices_by_date(
         description="Конечный timestamp в миллисекундах",
         example=1675123199000,
     ),
-    db: Session = Depends(get_db),
+    stream: bool = Query(
+        False,
+        description="Потоковая выдача в формате NDJSON (одна цена на строку)",
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> List[PriceResponse]:
     """
     Получить цены для указанного тикера в заданном временном диапазоне.
@@ -169,9 +335,10 @@ async def filter_prices_by_date(
         ticker: Тикер криптовалюты
         start: Начальный timestamp (миллисекунды). Если не указан - с начала данных
         end: Конечный timestamp (миллисекунды). Если не указан - до текущего времени
+        stream: Отдавать цены потоком NDJSON по мере чтения из БД
 
     Returns:
-        Список цен в заданном диапазоне
+        Список цен в заданном диапазоне (или поток NDJSON при stream=true)
 
     Raises:
         HTTPException 400: Если start > end
@@ -191,8 +358,13 @@ async def filter_prices_by_date(
             detail="Начальный timestamp не может быть больше конечного",
         )
 
+    if stream:
+        return StreamingResponse(
+            _stream_ndjson(db, ticker, start, end), media_type="application/x-ndjson"
+        )
+
     try:
-        prices = PriceService.get_prices_by_date_range(
+        prices = await AsyncPriceService.get_prices_by_date_range(
             db, ticker=ticker, start_timestamp=start, end_timestamp=end
         )
 
@@ -214,6 +386,188 @@ async def filter_prices_by_date(
         )
 
 
+@router.get(
+    "/candles",
+    response_model=List[CandleResponse],
+    summary="Получить OHLC свечи",
+    description="Возвращает OHLC свечи заданного разрешения для тикера. "
+    "Данные читаются из самого крупного подходящего уровня хранения.",
+)
+async def get_candles(
+    ticker: str = Query(
+        ...,
+        min_length=3,
+        description="Тикер криптовалюты (например: btc_usd, eth_usd)",
+        examples=["btc_usd", "eth_usd"],
+    ),
+    resolution: str = Query(
+        "5m",
+        description="Разрешение свечей: <число><m|h|d>",
+        examples=["5m", "1h", "1d"],
+    ),
+    start: Optional[int] = Query(
+        None, ge=0, description="Начальный timestamp в миллисекундах"
+    ),
+    end: Optional[int] = Query(
+        None, ge=0, description="Конечный timestamp в миллисекундах"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> List[CandleResponse]:
+    """
+    Получить OHLC свечи для указанного тикера.
+
+    Args:
+        ticker: Тикер криптовалюты
+        resolution: Разрешение свечей (например, 5m, 15m, 1h, 1d)
+        start: Начальный timestamp (миллисекунды)
+        end: Конечный timestamp (миллисекунды)
+
+    Returns:
+        Список свечей в порядке возрастания времени
+
+    Raises:
+        HTTPException 400: Если разрешение некорректно или start > end
+    """
+    logger.info(
+        "Запрос OHLC свечей",
+        extra={"ticker": ticker, "resolution": resolution, "start": start, "end": end},
+    )
+
+    if start is not None and end is not None and start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начальный timestamp не может быть больше конечного",
+        )
+
+    try:
+        return await run_in_thread(
+            db,
+            CandleService.get_candles,
+            ticker=ticker,
+            resolution=resolution,
+            start_timestamp=start,
+            end_timestamp=end,
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(
+            "Ошибка при получении свечей", extra={"ticker": ticker, "error": str(e)}
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении свечей: {str(e)}",
+        )
+
+
+@router.get(
+    "/freshness",
+    response_model=dict,
+    summary="Получить свежесть данных",
+    description="Возвращает возраст последней цены, перцентили задержки сбора "
+    "и скорость расходования бюджета ошибок SLO свежести по тикерам.",
+)
+async def get_freshness(
+    ticker: Optional[str] = Query(
+        None,
+        min_length=3,
+        description="Тикер криптовалюты. По умолчанию - все отслеживаемые",
+        examples=["btc_usd", "eth_usd"],
+    ),
+) -> dict:
+    """
+    Получить отчет о свежести данных.
+
+    Args:
+        ticker: Тикер криптовалюты. По умолчанию - TRACKED_TICKERS
+
+    Returns:
+        Словарь с параметрами SLO и отчетом по каждому тикеру
+    """
+    tickers = [ticker] if ticker else list(settings.TRACKED_TICKERS)
+
+    try:
+        return await asyncio.to_thread(FreshnessService().report, tickers)
+
+    except Exception as e:
+        logger.error("Ошибка при оценке свежести данных", extra={"error": str(e)})
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Ошибка при оценке свежести данных: {str(e)}",
+        )
+
+
+def _completeness_report(db: Session, ticker: str, start: int, end: int) -> dict:
+    """Отчет о полноте данных (выполняется в потоке через run_in_thread)"""
+
+    report = GapService.get_completeness(db, ticker, start, end)
+    report["gaps"] = [
+        {"start": gap_start, "end": gap_end}
+        for gap_start, gap_end in GapService.find_gaps(db, ticker, start, end)
+    ]
+    return report
+
+
+@router.get(
+    "/completeness",
+    response_model=dict,
+    summary="Получить полноту данных",
+    description="Возвращает долю заполненных минут и список пропусков для тикера.",
+)
+async def get_completeness(
+    ticker: str = Query(
+        ...,
+        min_length=3,
+        description="Тикер криптовалюты (например: btc_usd, eth_usd)",
+        examples=["btc_usd", "eth_usd"],
+    ),
+    start: Optional[int] = Query(
+        None, ge=0, description="Начальный timestamp в миллисекундах"
+    ),
+    end: Optional[int] = Query(
+        None, ge=0, description="Конечный timestamp в миллисекундах"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> dict:
+    """
+    Получить отчет о полноте данных для указанного тикера.
+
+    Args:
+        ticker: Тикер криптовалюты
+        start: Начальный timestamp. По умолчанию - GAP_LOOKBACK_HOURS назад
+        end: Конечный timestamp. По умолчанию - текущее время
+
+    Returns:
+        Словарь с количеством ожидаемых и найденных минут и пропусками
+    """
+    end = end if end is not None else int(time.time() * 1000)
+    start = (
+        start
+        if start is not None
+        else end - settings.GAP_LOOKBACK_HOURS * 60 * 60 * 1000
+    )
+
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начальный timestamp не может быть больше конечного",
+        )
+
+    try:
+        return await run_in_thread(db, _completeness_report, ticker, start, end)
+
+    except Exception as e:
+        logger.error(
+            "Ошибка при оценке полноты данных",
+            extra={"ticker": ticker, "error": str(e)},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при оценке полноты данных: {str(e)}",
+        )
+
+
 @router.get(
     "/stats",
     response_model=dict,
@@ -227,7 +581,7 @@ async def get_price_stats(
         description="Тикер криптовалюты (например: btc_usd, eth_usd)",
         examples=["btc_usd", "eth_usd"],
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> dict:
     """
     Получить статистику по ценам для указанного тикера.
@@ -237,6 +591,7 @@ async def get_price_stats(
     - min_price: минимальная цена
     - max_price: максимальная цена
     - avg_price: средняя цена
+    - stddev_price: выборочное стандартное отклонение цены
     - first_timestamp: timestamp первой записи
     - last_timestamp: timestamp последней записи
 
@@ -249,7 +604,7 @@ async def get_price_stats(
     logger.info("Запрос статистики по ценам", extra={"ticker": ticker})
 
     try:
-        stats = PriceService.get_stats(db, ticker)
+        stats = await AsyncPriceService.get_stats(db, ticker)
 
         logger.debug(
             "Успешно получена статистика",
@@ -278,7 +633,7 @@ async def get_price_stats(
 )
 async def create_price(
     price_data: PriceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> PriceResponse:
     """
     Создать новую запись о цене.
@@ -298,7 +653,7 @@ async def create_price(
     )
 
     try:
-        price = PriceService.create_price(db, price_data)
+        price = await AsyncPriceService.create_price(db, price_data)
 
         logger.debug(
             "Успешно создана запись о цене",
@@ -325,23 +680,21 @@ async def create_price(
     description="Возвращает список тикеров, для которых есть данные в базе.",
 )
 async def get_available_tickers(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ) -> List[str]:
     """
     Получить список уникальных тикеров, для которых есть данные в базе.
 
+    Список читается из реестра тикеров (и кешируется в памяти процесса),
+    а не из таблицы цен.
+
     Returns:
         Список уникальных тикеров
     """
     logger.info("Запрос списка доступных тикеров")
 
     try:
-        from sqlalchemy import distinct
-
-        from app.db.models import Price
-
-        tickers = db.query(distinct(Price.ticker)).order_by(Price.ticker).all()
-        result = [ticker[0] for ticker in tickers]
+        result = await AsyncPriceService.get_available_tickers(db)
 
         logger.debug(
             "Успешно получен список тикеров",
@@ -356,3 +709,34 @@ async def get_available_tickers(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении списка тикеров: {str(e)}",
         )
+
+
+@router.get(
+    "/tickers",
+    response_model=List[TickerResponse],
+    summary="Получить реестр тикеров",
+    description="Возвращает тикеры с количеством цен и границами по времени.",
+)
+async def get_tickers(
+    db: AsyncSession = Depends(get_async_read_db),
+) -> List[TickerResponse]:
+    """
+    Получить тикеры реестра с метаданными.
+
+    Количество цен и границы по времени берутся из агрегатов тикеров,
+    таблица цен не читается.
+
+    Returns:
+        Список тикеров в формате TickerResponse
+    """
+    logger.info("Запрос реестра тикеров")
+
+    try:
+        return await TickerService.get_tickers(db)
+
+    except Exception as e:
+        logger.error("Ошибка при получении реестра тикеров", extra={"error": str(e)})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении реестра тикеров: {str(e)}",
+        )
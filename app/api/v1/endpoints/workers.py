@@ -4,6 +4,10 @@ from typing import Any, Dict, Optional
 from fastapi import APIRouter, BackgroundTasks, HTTPException
 from pydantic import BaseModel
 
+from app.core.cache import AsyncTTLCache
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.services.queue_service import QueueService
 from app.workers.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
@@ -43,6 +47,14 @@ class QueueInfoResponse(BaseModel):
     queues: Dict[str, Dict[str, Any]]
     workers: Dict[str, Any]
     redis: Dict[str, Any]
+    queue_wait: Dict[str, Dict[str, Any]] = {}
+    cached: bool = False
+
+
+queue_info_cache = AsyncTTLCache(
+    lambda: QueueService.collect(celery_app, get_async_redis()),
+    lambda: settings.QUEUE_INFO_CACHE_TTL_SECONDS,
+)
 
 
 @router.post("/trigger-fetch-prices", response_model=TriggerTaskResponse)
@@ -111,46 +123,15 @@ async def check_celery_health():
 
 @router.get("/queues", response_model=QueueInfoResponse)
 async def get_queue_info():
-    """Получение информации об очередях и воркерах"""
+    """
+    Получение информации об очередях и воркерах
+
+    Результат кешируется на QUEUE_INFO_CACHE_TTL_SECONDS секунд.
+    """
 
     try:
-        try:
-            from redis import Redis
-
-            redis_client = Redis.from_url(celery_app.conf.broker_url)
-            redis_connected = redis_client.ping()
-        except ImportError:
-            redis_connected = False
-        except Exception:
-            redis_connected = False
-
-        inspector = celery_app.control.inspect()
-
-        active_workers = {}
-        registered_tasks = {}
-
-        if inspector:
-            active_workers = inspector.active() or {}
-            registered_tasks = inspector.registered() or {}
-
-        queues_info = {
-            "celery": {"length": 0},
-            "prices": {"length": 2},
-            "monitoring": {"length": 1},
-        }
-
-        return QueueInfoResponse(
-            queues=queues_info,
-            workers={
-                "count": len(active_workers),
-                "active": list(active_workers.keys()),
-                "registered": registered_tasks,
-            },
-            redis={
-                "connected": redis_connected,
-                "broker_url": celery_app.conf.broker_url,
-            },
-        )
+        info, cached = await queue_info_cache.get()
+        return QueueInfoResponse(**info, cached=cached)
     except Exception as e:
         logger.error(f"Ошибка при получении информации об очередях: {e}")
         raise HTTPException(
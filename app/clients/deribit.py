@@ -99,7 +99,12 @@ class DeribitClient:
                     error_message = error_data.get("message", "Unknown error")
                     raise DeribitAPIError(error_message, error_code)
 
-                return data.get("result", {})
+                result = data.get("result", {})
+                # Время отправки ответа биржей (микросекунды) - точка отсчета
+                # задержки сбора
+                if isinstance(result, dict) and "usOut" in data:
+                    result = {**result, "us_out": data["usOut"]}
+                return result
 
         except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
             error_type = (
@@ -124,15 +129,41 @@ class DeribitClient:
         Получить индексную цену для указанного индекса
         """
 
+        self._validate_index_name(index_name)
+
+        params = {"index_name": index_name}
+        return await self._make_request("public/get_index_price", params)
+
+    async def get_index_chart_data(
+        self, index_name: str, time_range: str = "1d"
+    ) -> List[List[float]]:
+        """
+        Получить историю индексной цены в виде пар [timestamp, price]
+
+        time_range: глубина истории (1h, 1d, 2d, 1m, 1y, all)
+        """
+
+        self._validate_index_name(index_name)
+
+        valid_ranges = ["1h", "1d", "2d", "1m", "1y", "all"]
+        if time_range not in valid_ranges:
+            raise ValueError(
+                f"Недопустимый диапазон. Допустимые значения: {valid_ranges}"
+            )
+
+        params = {"index_name": index_name, "range": time_range}
+        return await self._make_request("public/get_index_chart_data", params)
+
+    @staticmethod
+    def _validate_index_name(index_name: str) -> None:
+        """Проверка имени индекса"""
+
         valid_indices = ["btc_usd", "eth_usd"]
         if index_name not in valid_indices:
             raise ValueError(
                 f"Недопустимый индекс. Допустимые значения: {valid_indices}"
             )
 
-        params = {"index_name": index_name}
-        return await self._make_request("public/get_index_price", params)
-
     async def get_multiple_index_prices(
         self, indices: List[str]
     ) -> Dict[str, Dict[str, Any]]:
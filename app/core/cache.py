@@ -0,0 +1,46 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+
+class AsyncTTLCache:
+    """
+    Кеш одного значения с временем жизни для асинхронных загрузчиков.
+
+    Одновременные запросы с истекшим кешем ждут одну общую загрузку,
+    поэтому частые запросы не умножают нагрузку на источник.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], ttl: Callable[[], float]):
+        self.loader = loader
+        self.ttl = ttl
+        self._value: Any = None
+        self._expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return self._value is not None and time.monotonic() < self._expires_at
+
+    async def get(self) -> Tuple[Any, bool]:
+        """
+        Returns:
+            Значение и признак того, что оно взято из кеша
+        """
+
+        if self._fresh():
+            return self._value, True
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._fresh():
+                return self._value, True
+
+            self._value = await self.loader()
+            self._expires_at = time.monotonic() + self.ttl()
+            return self._value, False
+
+    def clear(self) -> None:
+        self._value = None
+        self._expires_at = 0.0
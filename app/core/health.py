@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.clients.deribit import DeribitClient
+from app.core.cache import AsyncTTLCache
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.replicas import replica_router
+from app.db.session import get_db_context
+
+
+def check_database() -> bool:
+    """Проверка доступности базы данных"""
+
+    with get_db_context() as db:
+        db.execute(text("SELECT 1"))
+    return True
+
+
+def check_redis() -> bool:
+    """Проверка доступности Redis"""
+
+    return bool(get_redis().ping())
+
+
+def check_replicas() -> Dict[str, Any]:
+    """
+    Состояние реплик по последней проверке фоновой задачи. Без здоровых
+    реплик чтение идет в основную базу, поэтому зависимость доступна всегда
+    """
+
+    replicas = replica_router.status()
+    return {
+        "connected": True,
+        "healthy": sum(replica["healthy"] for replica in replicas),
+        "replicas": replicas,
+    }
+
+
+async def check_deribit() -> bool:
+    """Проверка доступности Deribit API"""
+
+    async with DeribitClient() as client:
+        return await client.health_check()
+
+
+def default_probes() -> Dict[str, Callable]:
+    """
+    Проверки зависимостей: синхронные выполняются в потоках,
+    асинхронные - в цикле событий
+    """
+
+    probes = {
+        "deribit_api": check_deribit,
+        "database": check_database,
+        "redis": check_redis,
+    }
+    if replica_router.enabled:
+        probes["database_replicas"] = check_replicas
+    return probes
+
+
+async def _run_probe(probe: Callable, timeout: float) -> Dict[str, Any]:
+    """Выполнить одну проверку с таймаутом"""
+
+    started = time.perf_counter()
+    error: Optional[str] = None
+    info: Any = False
+
+    try:
+        if asyncio.iscoroutinefunction(probe):
+            info = await asyncio.wait_for(probe(), timeout)
+        else:
+            info = await asyncio.wait_for(asyncio.to_thread(probe), timeout)
+    except asyncio.TimeoutError:
+        error = f"timeout after {timeout}s"
+    except Exception as e:
+        error = str(e)
+
+    if isinstance(info, dict):
+        check = {"available": bool(info.get("connected", False))}
+        check.update(info)
+    else:
+        check = {"available": bool(info), "connected": bool(info)}
+
+    check["status"] = "ok" if check["available"] else "error"
+    check["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if error is not None:
+        check["error"] = error
+    return check
+
+
+async def run_probes(
+    probes: Optional[Dict[str, Callable]] = None, timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Параллельная проверка зависимостей.
+
+    Время проверки ограничено самой медленной зависимостью и таймаутом,
+    а не суммой всех проверок.
+    """
+
+    probes = probes if probes is not None else default_probes()
+    timeout = timeout or settings.HEALTH_PROBE_TIMEOUT_SECONDS
+
+    names = list(probes)
+    results = await asyncio.gather(
+        *(_run_probe(probes[name], timeout) for name in names)
+    )
+    checks = dict(zip(names, results))
+
+    return {
+        "status": (
+            "healthy"
+            if all(check["available"] for check in checks.values())
+            else "unhealthy"
+        ),
+        "checks": checks,
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+class HealthCache(AsyncTTLCache):
+    """Кеш результата проверок на HEALTH_CACHE_TTL_SECONDS"""
+
+    def __init__(self, probes: Optional[Dict[str, Callable]] = None):
+        super().__init__(
+            lambda: run_probes(probes),
+            lambda: settings.HEALTH_CACHE_TTL_SECONDS,
+        )
+
+
+health_cache = HealthCache()
@@ -1,9 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.health import health_cache
 from app.core.logging import setup_logging
+from app.core.metrics import render_metrics
+from app.db.replicas import replica_router
+from app.services.latest_price_service import latest_prices
+from app.services.ticker_service import ticker_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Фоновые подписки на обновления кешей последних цен и реестра тикеров,
+    проверка отставания реплик для чтения
+    """
+
+    listeners = [asyncio.create_task(ticker_registry.listen())]
+    if settings.LATEST_CACHE_ENABLED:
+        listeners.append(asyncio.create_task(latest_prices.listen()))
+    if replica_router.enabled:
+        listeners.append(asyncio.create_task(replica_router.monitor()))
+    yield
+    for listener in listeners:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    await replica_router.dispose()
 
 
 def create_application() -> FastAPI:
@@ -18,6 +47,7 @@ def create_application() -> FastAPI:
         version="1.0.0",
         docs_url="/docs" if settings.DEBUG else None,
         redoc_url="/redoc" if settings.DEBUG else None,
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -41,10 +71,35 @@ def create_application() -> FastAPI:
         }
 
     @app.get("/health")
-    async def health_check():
-        """Health check эндпоинт"""
+    async def health_check(deep: bool = False):
+        """
+        Health check эндпоинт
+
+        deep=1: состояние зависимостей (Deribit, БД, Redis) из кеша проверок;
+        при недоступной зависимости возвращается 503.
+        """
+
+        if not deep:
+            return {"status": "healthy", "service": settings.APP_NAME}
+
+        report, cached = await health_cache.get()
+        return JSONResponse(
+            status_code=200 if report["status"] == "healthy" else 503,
+            content={
+                "status": report["status"],
+                "service": settings.APP_NAME,
+                "checks": report["checks"],
+                "checked_at": report["timestamp"],
+                "cached": cached,
+            },
+        )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Метрики Prometheus (пулы соединений с базой данных)"""
 
-        return {"status": "healthy", "service": settings.APP_NAME}
+        content, media_type = render_metrics()
+        return Response(content=content, media_type=media_type)
 
     return app
 
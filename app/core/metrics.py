@@ -0,0 +1,47 @@
+import math
+import os
+from typing import Any, Dict, List, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, Any]:
+    """Перцентили выборки в миллисекундах (метод ближайшего ранга)"""
+
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+    return {
+        "samples": len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1],
+    }
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Реестр метрик Prometheus: при PROMETHEUS_MULTIPROC_DIR - сумма по всем
+    процессам (воркеры uvicorn, дочерние процессы Celery), иначе - процесс
+    """
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus и тип содержимого"""
+
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
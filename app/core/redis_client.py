@@ -0,0 +1,88 @@
+import asyncio
+from typing import Any, Callable, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_pool: Optional[redis.ConnectionPool] = None
+_async_pool: Optional[aioredis.ConnectionPool] = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Получить клиент Redis на общем пуле соединений процесса (синглтон пула)
+    """
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(
+            settings.redis_url, socket_connect_timeout=1, socket_timeout=5
+        )
+    return redis.Redis(connection_pool=_pool)
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Получить асинхронный клиент Redis на общем пуле соединений процесса
+    (для обработчиков FastAPI, не блокирует цикл событий)
+    """
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = aioredis.ConnectionPool.from_url(
+            settings.redis_url, socket_connect_timeout=1, socket_timeout=5
+        )
+    return aioredis.Redis(connection_pool=_async_pool)
+
+
+def redis_key(*parts: str) -> str:
+    """Ключ Redis с префиксом приложения"""
+
+    return ":".join((settings.REDIS_KEY_PREFIX,) + parts)
+
+
+async def listen_channel(
+    channel: str,
+    on_message: Callable[[Any], None],
+    on_state: Callable[[bool], None],
+) -> None:
+    """
+    Подписка на канал Redis с переподключением (фоновая задача процесса API)
+
+    Подписка держит отдельное соединение без таймаута чтения, чтобы не
+    занимать соединение общего пула. on_state(True) вызывается после
+    подписки, on_state(False) - при разрыве. Сообщения, отправленные без
+    подписки, не доставляются, поэтому зависящее от них состояние
+    подписчик сбрасывает при любой смене.
+    """
+
+    delay = 1
+    while True:
+        client = aioredis.Redis.from_url(
+            settings.redis_url, socket_connect_timeout=1, health_check_interval=30
+        )
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        subscribed = False
+        try:
+            await pubsub.subscribe(channel)
+            subscribed = True
+            on_state(True)
+            delay = 1
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    on_message(message["data"])
+        except (redis.RedisError, OSError) as e:
+            log = logger.warning if subscribed else logger.debug
+            log(
+                "Подписка на канал Redis прервана",
+                extra={"channel": channel, "error": str(e)},
+            )
+        finally:
+            on_state(False)
+            await pubsub.aclose()
+            await client.aclose()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30)
@@ -1,5 +1,17 @@
-from .database import Base, SessionLocal, engine
-from .models import Price
+from .database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from .models import Price, PriceCandle, Ticker, TickerStats
 from .session import get_db, get_db_context
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db", "get_db_context", "Price"]
+__all__ = [
+    "Base",
+    "engine",
+    "SessionLocal",
+    "async_engine",
+    "AsyncSessionLocal",
+    "get_db",
+    "get_db_context",
+    "Price",
+    "PriceCandle",
+    "Ticker",
+    "TickerStats",
+]
@@ -1,20 +1,27 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings
 
-engine = create_engine(
-    settings.database_url,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,  # Проверяем соединение перед использованием
-    pool_recycle=3600,  # Пересоздаем соединения каждый час
-    echo=settings.DEBUG,  # Логируем SQL запросы в debug режиме
-)
+from .pools import create_pooled_async_engine, create_pooled_engine
+
+# Размер пулов задается профилем роли процесса (DB_POOL_ROLE): соединения
+# открываются по требованию, поэтому неиспользуемый движок их не занимает
+engine = create_pooled_engine(settings.database_url, "primary")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для API: запросы не блокируют цикл событий,
+# параллельные запросы обслуживаются разными соединениями пула; синхронная
+# логика выполняется в потоке на сессии из info (app.db.session.run_in_thread)
+async_engine = create_pooled_async_engine(settings.async_database_url, "primary_async")
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    info={"sync_session_factory": SessionLocal},
+)
+
 Base = declarative_base()
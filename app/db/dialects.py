@@ -0,0 +1,19 @@
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def upsert_insert(dialect_name: str):
+    """insert() с поддержкой ON CONFLICT: PostgreSQL, иначе SQLite (тесты)"""
+
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+def greatest_least(dialect_name: str):
+    """
+    Наибольшее и наименьшее из значений в строке: GREATEST и LEAST в
+    PostgreSQL, многоаргументные MAX и MIN в SQLite
+    """
+
+    if dialect_name == "postgresql":
+        return func.greatest, func.least
+    return func.max, func.min
@@ -1,27 +1,409 @@
-from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, Numeric, String
-from sqlalchemy.sql import func
+import sys
+from array import array
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN, Decimal
+from itertools import accumulate
+from typing import List, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    Numeric,
+    SmallInteger,
+    String,
+    TypeDecorator,
+    UniqueConstraint,
+    and_,
+    false,
+    select,
+    true,
+)
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+from sqlalchemy.sql import func, operators
+
+from app.core.config import settings
 
 from .database import Base
 
+# SQLite автоматически нумерует только INTEGER PRIMARY KEY
+TickerId = SmallInteger().with_variant(Integer, "sqlite")
+
+
+def fixed_point_prices() -> bool:
+    """
+    Цены хранятся целыми числами в единицах 10^-scale: режим схемы,
+    с которой сопоставлена модель Price (PRICE_STORAGE при импорте моделей)
+    """
+
+    return Price.__table__.c.price.type.fixed
+
+
+def price_factor(scale: Optional[int]) -> int:
+    """Во сколько раз хранимое значение больше цены"""
+
+    return 10 ** scale if fixed_point_prices() else 1
+
+
+def encode_price(value, scale: Optional[int]):
+    """Хранимое значение цены: Decimal или целое число единиц 10^-scale"""
+
+    if value is None:
+        return None
+    price = Decimal(str(value))
+    if not fixed_point_prices():
+        return price
+    return int(price.scaleb(scale).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def stored_price_value(value):
+    """Хранимое значение из результата запроса или тика (int или Decimal)"""
+
+    if value is None:
+        return None
+    return int(value) if fixed_point_prices() else Decimal(str(value))
+
+
+def decode_price(stored, scale: Optional[int]) -> Optional[float]:
+    """Цена по хранимому значению (перевод в float при выдаче)"""
+
+    if stored is None:
+        return None
+    if not fixed_point_prices():
+        return float(stored)
+    return int(stored) / price_factor(scale)
+
+
+def run_timestamps(timestamp: int, run_offsets: Optional[bytes]) -> List[int]:
+    """
+    Метки времени тиков строки: ее собственная и свернутых в нее повторов
+    (run_offsets - шаги между соседними тиками, uint32 little-endian)
+    """
+
+    if not run_offsets:
+        return [timestamp]
+    steps = array("I", run_offsets)
+    if sys.byteorder == "big":
+        steps.byteswap()
+    return list(accumulate(steps, initial=timestamp))
+
+
+def max_run_ms() -> int:
+    """Наибольшая длина серии повторов одной строки (CHANGE_MAX_RUN_SECONDS)"""
+
+    return settings.CHANGE_MAX_RUN_SECONDS * 1000
+
+
+class PriceValue(TypeDecorator):
+    """
+    Хранимое значение цены: NUMERIC(20, 8), а при PRICE_STORAGE=fixed -
+    BIGINT. Суммы цен (total=True) - NUMERIC(30, 8) или NUMERIC(38, 0),
+    чтобы сумма целых значений не переполняла BIGINT.
+
+    Режим выбирается один раз при сопоставлении моделей - тот же
+    PRICE_STORAGE, по которому миграция привела колонки к своему типу, - и
+    входит в ключ кеша скомпилированных запросов.
+    """
+
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, total: bool = False, fixed: Optional[bool] = None):
+        super().__init__()
+        self.total = total
+        self.fixed = settings.PRICE_STORAGE == "fixed" if fixed is None else fixed
+
+    def load_dialect_impl(self, dialect):
+        if self.fixed:
+            impl = Numeric(38, 0) if self.total else BigInteger()
+        else:
+            impl = Numeric(30, 8) if self.total else Numeric(20, 8)
+        return dialect.type_descriptor(impl)
+
+
+class Ticker(Base):
+    """Реестр тикеров: запись добавляется при первой цене тикера"""
+
+    __tablename__ = "tickers"
+
+    id = Column(TickerId, primary_key=True, autoincrement=True)
+    name = Column(String(10), nullable=False, unique=True)
+    # Знаков после запятой в хранимых ценах тикера (PRICE_STORAGE=fixed);
+    # не меняется после регистрации
+    price_scale = Column(SmallInteger, nullable=False, server_default="8")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<Ticker(id={self.id}, name={self.name})>"
+
+
+class TickerComparator(Comparator):
+    """
+    Условия на имя тикера в запросах к prices
+
+    Сравнение с именем превращается в условие на ticker_id с подзапросом
+    к реестру: подзапрос не зависит от строки, поэтому выполняется один
+    раз, а поиск идет по индексу idx_ticker_timestamp.
+    """
+
+    def __init__(self, ticker_id):
+        self.ticker_id = ticker_id
+
+    def __clause_element__(self):
+        return (
+            select(Ticker.name)
+            .where(Ticker.id == self.ticker_id)
+            .scalar_subquery()
+            .label("ticker")
+        )
+
+    def _id(self, name):
+        return select(Ticker.id).where(Ticker.name == name).scalar_subquery()
+
+    def __eq__(self, name):
+        return self.ticker_id == self._id(name)
+
+    def __ne__(self, name):
+        return self.ticker_id != self._id(name)
+
+    def in_(self, names):
+        return self.ticker_id.in_(select(Ticker.id).where(Ticker.name.in_(names)))
+
+
+class PriceComparator(Comparator):
+    """
+    Цена в запросах к prices
+
+    Сама колонка - хранимое значение (минимумы, максимумы и суммы считаются
+    в нем и переводятся в цену один раз при выдаче). При хранении BIGINT
+    сравнение с числом требует масштаба тикера (Price.price.scaled(scale)):
+    число переводится в целый литерал в единицах 10^-scale, и условие
+    остается условием на саму колонку, пригодным для индекса.
+    """
+
+    # Сравнение с зеркальным оператором: value op price -> price op' value
+    MIRRORED_OPERATORS = {
+        operators.eq: operators.eq,
+        operators.ne: operators.ne,
+        operators.lt: operators.gt,
+        operators.le: operators.ge,
+        operators.gt: operators.lt,
+        operators.ge: operators.le,
+    }
+    SCALED_OPERATORS = (*MIRRORED_OPERATORS, operators.between_op)
+
+    def __init__(self, stored_price, scale: Optional[int] = None):
+        self.stored_price = stored_price
+        self.scale = scale
+
+    def __clause_element__(self):
+        return self.stored_price
+
+    def scaled(self, scale: int) -> "PriceComparator":
+        """Сравнения с ценами тикера с масштабом scale"""
+
+        return PriceComparator(self.stored_price, scale)
+
+    def _bound(self, op, value):
+        """
+        Целое хранимое значение, сравнение с которым равносильно сравнению
+        цены с value; None, если цена в масштабе тикера не бывает равна value
+        """
+
+        if self.scale is None:
+            raise ValueError(
+                "Сравнение цены при PRICE_STORAGE=fixed требует масштаба "
+                "тикера: Price.price.scaled(scale)"
+            )
+        exact = Decimal(str(value)).scaleb(self.scale)
+        if op in (operators.gt, operators.le):
+            return int(exact.to_integral_value(rounding=ROUND_FLOOR))
+        if op in (operators.lt, operators.ge):
+            return int(exact.to_integral_value(rounding=ROUND_CEILING))
+        return int(exact) if exact == exact.to_integral_value() else None
+
+    @staticmethod
+    def _is_number(value) -> bool:
+        return not isinstance(value, bool) and isinstance(value, (int, float, Decimal))
+
+    def operate(self, op, *other, **kwargs):
+        if (
+            not fixed_point_prices()
+            or op not in self.SCALED_OPERATORS
+            or not all(self._is_number(value) for value in other)
+        ):
+            return op(self.stored_price, *other, **kwargs)
+
+        if op is operators.between_op:
+            low, high = other
+            return op(
+                self.stored_price,
+                self._bound(operators.ge, low),
+                self._bound(operators.le, high),
+                **kwargs,
+            )
+        bound = self._bound(op, other[0])
+        if bound is None:
+            # Цена с более мелкими знаками, чем масштаб тикера
+            return false() if op is operators.eq else true()
+        return op(self.stored_price, bound, **kwargs)
+
+    def reverse_operate(self, op, other, **kwargs):
+        if op in self.MIRRORED_OPERATORS:
+            return self.operate(self.MIRRORED_OPERATORS[op], other, **kwargs)
+        return op(other, self.stored_price, **kwargs)
+
 
 class Price(Base):
     """Модель для хранения цен криптовалют"""
 
     __tablename__ = "prices"
 
-    id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String(10), nullable=False, index=True)
-    price = Column(Numeric(20, 8), nullable=False)
+    id = Column(Integer, primary_key=True)
+    ticker_id = Column(TickerId, ForeignKey("tickers.id"), nullable=False)
+    stored_price = Column("price", PriceValue(), nullable=False)
     timestamp = Column(BigInteger, nullable=False)
     source_timestamp = Column(BigInteger)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Серия повторов (CHANGE_ONLY_ENABLED): тики с той же ценой, свернутые
+    # в строку. valid_until - время последнего из них, repeats - их число,
+    # run_offsets - шаги между тиками для точного восстановления серии.
+    # Колонки не входят в индексы, поэтому продление серии - HOT update
+    valid_until = Column(BigInteger)
+    repeats = Column(Integer)
+    run_offsets = Column(LargeBinary)
 
-    # Индекс для быстрого поиска по тикеру и времени
+    # Имя тикера объекта; ticker_id по имени назначается при записи,
+    # имя по ticker_id - при загрузке (кеш реестра в ticker_service)
+    _ticker = None
+    # Масштаб цен тикера и цена, ожидающая кодирования до записи (когда
+    # масштаб нового тикера еще неизвестен)
+    _scale = None
+    _price = None
+
+    # Индекс по тикеру и времени с ценой в INCLUDE и BRIN по колонкам
+    # времени: строки пишутся почти в порядке времени, поэтому BRIN занимает
+    # несколько страниц и почти не замедляет вставку. Колонки серий повторов
+    # в индекс не входят: продление серии остается HOT update, а запросы,
+    # читающие valid_until, обращаются к таблице (benchmarks/prices_indexes.txt)
     __table_args__ = (
-        Index("idx_ticker_timestamp", ticker, timestamp.desc()),
-        Index("idx_created_at", created_at.desc()),
+        Index(
+            "idx_ticker_timestamp",
+            ticker_id,
+            timestamp.desc(),
+            postgresql_include=["price"],
+        ),
+        Index(
+            "brin_prices_timestamp",
+            timestamp,
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
+        Index(
+            "brin_prices_created_at",
+            created_at,
+            postgresql_using="brin",
+            postgresql_with={"pages_per_range": 32},
+        ),
     )
 
+    @hybrid_property
+    def ticker(self):
+        return self._ticker
+
+    @ticker.inplace.setter
+    def _ticker_setter(self, name):
+        if name != self._ticker:
+            self._ticker = name
+            self.ticker_id = None
+
+    @ticker.inplace.comparator
+    @classmethod
+    def _ticker_comparator(cls):
+        return TickerComparator(cls.ticker_id)
+
+    @hybrid_property
+    def price(self):
+        """Цена: Decimal из NUMERIC или float, декодированный из BIGINT"""
+
+        stored = self.stored_price
+        if stored is None:
+            return self._price
+        if fixed_point_prices():
+            return decode_price(stored, self._scale)
+        return stored
+
+    @price.inplace.setter
+    def _price_setter(self, value):
+        if fixed_point_prices() and self._scale is None:
+            self._price = value
+            self.stored_price = None
+        else:
+            self._price = None
+            self.stored_price = encode_price(value, self._scale)
+
+    @price.inplace.comparator
+    @classmethod
+    def _price_comparator(cls):
+        return PriceComparator(cls.stored_price)
+
+    @hybrid_property
+    def ticks(self):
+        """Число тиков строки вместе с повторами"""
+
+        return 1 + (self.repeats or 0)
+
+    @ticks.inplace.expression
+    @classmethod
+    def _ticks_expression(cls):
+        return 1 + func.coalesce(cls.repeats, 0)
+
+    @hybrid_property
+    def covered_until(self):
+        """Время последнего тика строки вместе с повторами"""
+
+        return self.valid_until if self.valid_until is not None else self.timestamp
+
+    @covered_until.inplace.expression
+    @classmethod
+    def _covered_until_expression(cls):
+        return func.coalesce(cls.valid_until, cls.timestamp)
+
+    @classmethod
+    def covering_since(cls, start_timestamp: int):
+        """
+        Условие на строки с тиками не раньше start_timestamp: начало серии
+        ищется по индексу не раньше start - CHANGE_MAX_RUN_SECONDS
+        """
+
+        return and_(
+            cls.timestamp >= start_timestamp - max_run_ms(),
+            cls.covered_until >= start_timestamp,
+        )
+
+    def tick_timestamps(self) -> List[int]:
+        """Метки времени тиков строки вместе с повторами"""
+
+        return run_timestamps(self.timestamp, self.run_offsets)
+
+    def extend_run(self, timestamp: int) -> None:
+        """Свернуть в строку следующий тик с той же ценой"""
+
+        step = array("I", [timestamp - self.covered_until])
+        if sys.byteorder == "big":
+            step.byteswap()
+        self.run_offsets = (self.run_offsets or b"") + step.tobytes()
+        self.valid_until = timestamp
+        self.repeats = (self.repeats or 0) + 1
+
+    # created_at возвращается из INSERT (RETURNING), чтобы кеш последних цен
+    # получил полную запись без повторного запроса
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return (
             f"<Price(ticker={self.ticker}, "
@@ -39,3 +421,120 @@ class Price(Base):
             "source_timestamp": self.source_timestamp,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
+
+
+class PriceCandle(Base):
+    """Модель OHLC свечи для уровней прореживания и роллапов (1m, 5m, 1h, 1d)"""
+
+    __tablename__ = "price_candles"
+
+    id = Column(Integer, primary_key=True)
+    ticker = Column(String(10), nullable=False)
+    resolution = Column(String(4), nullable=False)
+    bucket_start = Column(BigInteger, nullable=False)
+    # Цены свечи - хранимые значения (см. PriceValue)
+    open = Column(PriceValue(), nullable=False)
+    high = Column(PriceValue(), nullable=False)
+    low = Column(PriceValue(), nullable=False)
+    close = Column(PriceValue(), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(PriceValue(total=True))
+    open_timestamp = Column(BigInteger, nullable=False)
+    close_timestamp = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Уникальный ключ свечи одновременно служит индексом для выборок по диапазону
+    __table_args__ = (
+        UniqueConstraint(
+            "ticker", "resolution", "bucket_start", name="uq_candle_bucket"
+        ),
+    )
+
+    def __repr__(self):
+        return (
+            f"<PriceCandle(ticker={self.ticker}, resolution={self.resolution}, "
+            f"bucket_start={self.bucket_start})>"
+        )
+
+    def to_dict(self):
+        """Конвертировать модель в словарь"""
+
+        return {
+            "ticker": self.ticker,
+            "resolution": self.resolution,
+            "bucket_start": self.bucket_start,
+            "open": float(self.open),
+            "high": float(self.high),
+            "low": float(self.low),
+            "close": float(self.close),
+            "count": self.count,
+            "sum": float(self.sum) if self.sum is not None else None,
+            "open_timestamp": self.open_timestamp,
+            "close_timestamp": self.close_timestamp,
+        }
+
+
+class PriceChunk(Base):
+    """
+    Сжатый блок холодных цен тикера за сутки (колоночный формат)
+
+    Каждая колонка цен блока хранится отдельным сжатым массивом: id,
+    timestamp, source_timestamp и created_at (в микросекундах) - через
+    разности второго порядка, цены - через XOR соседних float64 (см.
+    chunk_service). Строки блока упорядочены по (timestamp, id).
+    """
+
+    __tablename__ = "price_chunks"
+
+    id = Column(Integer, primary_key=True)
+    ticker_id = Column(TickerId, ForeignKey("tickers.id"), nullable=False)
+    chunk_start = Column(BigInteger, nullable=False)
+    count = Column(Integer, nullable=False)
+    first_timestamp = Column(BigInteger, nullable=False)
+    last_timestamp = Column(BigInteger, nullable=False)
+    ids = Column(LargeBinary, nullable=False)
+    timestamps = Column(LargeBinary, nullable=False)
+    source_timestamps = Column(LargeBinary, nullable=False)
+    created_ats = Column(LargeBinary, nullable=False)
+    prices = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Уникальный ключ блока одновременно служит индексом для выборок по диапазону
+    __table_args__ = (
+        UniqueConstraint("ticker_id", "chunk_start", name="uq_chunk_ticker_start"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<PriceChunk(ticker_id={self.ticker_id}, "
+            f"chunk_start={self.chunk_start}, count={self.count})>"
+        )
+
+
+class TickerStats(Base):
+    """
+    Текущие агрегаты цен тикера, поддерживаемые при записи и удалении цен
+
+    Среднее и сумма квадратов отклонений (m2) ведутся по алгоритму Уэлфорда,
+    дисперсия равна m2 / (count - 1).
+    """
+
+    __tablename__ = "ticker_stats"
+
+    ticker = Column(String(10), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    # sum, min_price и max_price - хранимые значения (см. PriceValue),
+    # mean и m2 - в ценах
+    sum = Column(PriceValue(total=True), nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0)
+    m2 = Column(Float, nullable=False, default=0)
+    min_price = Column(PriceValue())
+    max_price = Column(PriceValue())
+    first_timestamp = Column(BigInteger)
+    last_timestamp = Column(BigInteger)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self):
+        return f"<TickerStats(ticker={self.ticker}, count={self.count})>"
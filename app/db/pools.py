@@ -0,0 +1,147 @@
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+_LABELS = ("pool", "role")
+
+# Gauge с multiprocess_mode="livesum": при PROMETHEUS_MULTIPROC_DIR значения
+# живых процессов суммируются, и db_pool_capacity показывает, сколько
+# соединений могут открыть все процессы роли вместе
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула (включая подключение и pre-ping)",
+    _LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "Запросы соединения, не дождавшиеся его за pool_timeout",
+    _LABELS,
+)
+POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations",
+    "Соединения, признанные негодными (разрыв, ошибка pre-ping)",
+    _LABELS,
+)
+POOL_CONNECTS = Counter("db_pool_connects", "Новые соединения с базой данных", _LABELS)
+POOL_IN_USE = Gauge(
+    "db_pool_in_use",
+    "Соединения, выданные из пула",
+    _LABELS,
+    multiprocess_mode="livesum",
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Соединения сверх pool_size",
+    _LABELS,
+    multiprocess_mode="livesum",
+)
+POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Предел соединений пула (pool_size + max_overflow)",
+    _LABELS,
+    multiprocess_mode="livesum",
+)
+
+
+class _PoolMetrics:
+    """
+    Метрики пула: время выдачи соединения, таймауты, занятые и сверхлимитные
+    соединения. Метки переносятся в пул, пересоздаваемый engine.dispose()
+    """
+
+    metric_labels: Dict[str, str] = {"pool": "default", "role": "api"}
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(**self.metric_labels).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.labels(**self.metric_labels).observe(
+                time.perf_counter() - started
+            )
+        self._observe_usage()
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._observe_usage()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metric_labels = self.metric_labels
+        return pool
+
+    def _observe_usage(self) -> None:
+        POOL_IN_USE.labels(**self.metric_labels).set(self.checkedout())
+        POOL_OVERFLOW.labels(**self.metric_labels).set(max(self.overflow(), 0))
+
+
+class InstrumentedQueuePool(_PoolMetrics, QueuePool):
+    """QueuePool синхронного движка с метриками"""
+
+
+class InstrumentedAsyncQueuePool(_PoolMetrics, AsyncAdaptedQueuePool):
+    """Пул асинхронного движка с метриками"""
+
+
+def _instrument(pool, name: str, profile: Dict[str, int]) -> None:
+    labels = {"pool": name, "role": settings.DB_POOL_ROLE}
+    pool.metric_labels = labels
+    POOL_CAPACITY.labels(**labels).set(profile["pool_size"] + profile["max_overflow"])
+
+    # Слушатели событий переходят в пересозданный пул вместе с dispatch
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        POOL_CONNECTS.labels(**labels).inc()
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        POOL_INVALIDATIONS.labels(**labels).inc()
+
+
+def _engine_options(profile: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "pool_size": profile["pool_size"],
+        "max_overflow": profile["max_overflow"],
+        "pool_timeout": profile["pool_timeout"],
+        "pool_recycle": profile["pool_recycle"],  # Пересоздаем соединения
+        "pool_pre_ping": True,  # Проверяем соединение перед использованием
+        "echo": settings.DEBUG,  # Логируем SQL запросы в debug режиме
+    }
+
+
+def create_pooled_engine(
+    url: str, name: str, profile: Optional[Dict[str, int]] = None
+) -> Engine:
+    """Синхронный движок с пулом профиля DB_POOL_ROLE и метриками"""
+
+    profile = profile or settings.pool_profile()
+    engine = create_engine(
+        url, poolclass=InstrumentedQueuePool, **_engine_options(profile)
+    )
+    _instrument(engine.pool, name, profile)
+    return engine
+
+
+def create_pooled_async_engine(
+    url: str, name: str, profile: Optional[Dict[str, int]] = None
+) -> AsyncEngine:
+    """Асинхронный движок с пулом профиля DB_POOL_ROLE и метриками"""
+
+    profile = profile or settings.pool_profile()
+    engine = create_async_engine(
+        url, poolclass=InstrumentedAsyncQueuePool, **_engine_options(profile)
+    )
+    _instrument(engine.sync_engine.pool, name, profile)
+    return engine
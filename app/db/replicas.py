@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+from .pools import create_pooled_async_engine, create_pooled_engine
+
+logger = get_logger(__name__)
+
+# Отставание реплики в секундах. На основной базе отставания нет. Если
+# приемник WAL не в состоянии streaming (обрыв связи с основной базой),
+# совпадение полученного и примененного LSN ничего не значит: отставание -
+# возраст последней примененной транзакции (бесконечность, если ее нет).
+# При живом приемнике реплика, применившая все полученные WAL, догнала
+# основную базу (время последней транзакции на простаивающей базе не
+# означает отставания)
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (
+        SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'
+    ) THEN COALESCE(
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8,
+        'Infinity'::float8
+    )
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(
+        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 0
+    )
+END
+"""
+
+
+class Replica:
+    """
+    Реплика для чтения: движки, фабрики сессий и результат проверки
+
+    Синхронный движок на том же сервере нужен запросам, которые выполняются
+    в потоке (run_in_thread); его фабрика передается сессиям через info.
+    """
+
+    def __init__(self, url: str):
+        parsed = make_url(url)
+        self.name = parsed.render_as_string(hide_password=True)
+        self.engine: AsyncEngine = create_pooled_async_engine(url, self.name)
+        sync_url = parsed.set(drivername=parsed.get_backend_name())
+        self.sync_engine: Engine = create_pooled_engine(
+            sync_url.render_as_string(hide_password=False), f"{self.name} sync"
+        )
+        self.sync_session_factory = sessionmaker(
+            self.sync_engine, autocommit=False, autoflush=False
+        )
+        self.session_factory = async_sessionmaker(
+            self.engine,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"sync_session_factory": self.sync_session_factory},
+        )
+        # До первой проверки отставание неизвестно - чтение идет в основную базу
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def measure_lag(self) -> float:
+        """Отставание реплики от основной базы в секундах"""
+
+        async with self.engine.connect() as connection:
+            lag = (await connection.execute(text(LAG_SQL))).scalar()
+        return float(lag or 0)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class ReplicaRouter:
+    """
+    Выбор реплики для запросов API без записи.
+
+    Реплики проверяются фоновой задачей процесса API раз в
+    REPLICA_CHECK_INTERVAL_SECONDS; запросы распределяются по кругу между
+    репликами, отставание которых не больше REPLICA_MAX_LAG_SECONDS.
+    Недоступная реплика исключается до следующей успешной проверки.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None):
+        self._urls = urls
+        self._replicas: Optional[List[Replica]] = None
+        self._counter = itertools.count()
+
+    @property
+    def replicas(self) -> List[Replica]:
+        # Движки создаются при первом обращении, а не при импорте модуля
+        if self._replicas is None:
+            urls = (
+                self._urls if self._urls is not None else settings.replica_database_urls
+            )
+            self._replicas = [Replica(url) for url in urls]
+        return self._replicas
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        """Следующая здоровая реплика или None (чтение из основной базы)"""
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_failed(self, replica: Replica, error: str) -> None:
+        """Исключить реплику до следующей проверки"""
+
+        if replica.healthy:
+            logger.warning(
+                "Реплика исключена из чтения",
+                extra={"replica": replica.name, "error": error},
+            )
+        replica.healthy = False
+        replica.error = error
+
+    async def check(self, replica: Replica) -> None:
+        """Проверить доступность и отставание реплики"""
+
+        try:
+            lag = await asyncio.wait_for(
+                replica.measure_lag(), settings.REPLICA_CHECK_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            lag, error = None, (
+                f"timeout after {settings.REPLICA_CHECK_TIMEOUT_SECONDS}s"
+            )
+        except Exception as e:
+            lag, error = None, str(e)
+        else:
+            error = (
+                f"lag {lag:.1f}s exceeds {settings.REPLICA_MAX_LAG_SECONDS}s"
+                if lag > settings.REPLICA_MAX_LAG_SECONDS
+                else None
+            )
+
+        replica.lag_seconds = lag
+        replica.checked_at = time.time()
+        if error is not None:
+            self.mark_failed(replica, error)
+            return
+
+        if not replica.healthy:
+            logger.info(
+                "Реплика включена в чтение",
+                extra={"replica": replica.name, "lag_seconds": lag},
+            )
+        replica.healthy = True
+        replica.error = None
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def monitor(self) -> None:
+        """Периодическая проверка реплик (фоновая задача процесса API)"""
+
+        while True:
+            await self.check_all()
+            await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL_SECONDS)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [replica.status() for replica in self.replicas]
+
+    async def dispose(self) -> None:
+        """Закрыть пулы соединений реплик"""
+
+        for replica in self._replicas or []:
+            await replica.engine.dispose()
+            replica.sync_engine.dispose()
+        self._replicas = None
+
+
+replica_router = ReplicaRouter()
@@ -1,10 +1,14 @@
+import asyncio
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Callable, Generator, TypeVar
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.db.database import SessionLocal
 
+T = TypeVar("T")
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -33,3 +37,24 @@ def get_db_context():
         raise
     finally:
         db.close()
+
+
+async def run_in_thread(
+    db: AsyncSession, fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """
+    Выполнить синхронную функцию fn(session, ...) в потоке.
+
+    Используется для кода на синхронной сессии (роллапы, блоки, архив,
+    публикация в Redis из обработчиков коммита), который через run_sync
+    блокировал бы цикл событий. Сессия открывается на той же базе, что и
+    асинхронная db: фабрика синхронных сессий передается в db.info.
+    """
+
+    factory = db.info.get("sync_session_factory") or SessionLocal
+
+    def call() -> T:
+        with factory(expire_on_commit=False) as session:
+            return fn(session, *args, **kwargs)
+
+    return await asyncio.to_thread(call)
@@ -1,6 +1,6 @@
 import re
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
@@ -61,3 +61,51 @@ class PriceResponse(PriceInDB):
     """Схема ответа API"""
 
     pass
+
+
+class LatestPriceResponse(PriceResponse):
+    """Схема ответа с последней ценой"""
+
+    data_age_ms: Optional[int] = Field(
+        None, description="Возраст цены на момент ответа (миллисекунды)"
+    )
+
+
+class PricePageResponse(BaseModel):
+    """Страница цен с курсорами (keyset пагинация)"""
+
+    items: List[PriceResponse]
+    next_cursor: Optional[str] = Field(
+        None, description="Курсор следующей (более старой) страницы"
+    )
+    prev_cursor: Optional[str] = Field(
+        None, description="Курсор предыдущей (более новой) страницы"
+    )
+
+
+class CandleResponse(BaseModel):
+    """Схема OHLC свечи"""
+
+    ticker: str
+    resolution: str = Field(..., description="Разрешение свечи (например, 5m, 1h)")
+    bucket_start: int = Field(..., description="Начало бакета в миллисекундах")
+    open: float
+    high: float
+    low: float
+    close: float
+    count: int = Field(..., description="Количество исходных тиков в свече")
+    sum: Optional[float] = Field(None, description="Сумма цен исходных тиков")
+    open_timestamp: int
+    close_timestamp: int
+
+
+class TickerResponse(BaseModel):
+    """Тикер реестра с количеством цен и границами по времени"""
+
+    ticker: str
+    count: int = Field(..., description="Количество цен")
+    first_timestamp: Optional[int] = Field(None, description="Первая цена (мс)")
+    last_timestamp: Optional[int] = Field(None, description="Последняя цена (мс)")
+    registered_at: Optional[datetime] = Field(
+        None, description="Время первой записи тикера"
+    )
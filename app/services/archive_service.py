@@ -0,0 +1,401 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import (
+    Price,
+    PriceChunk,
+    Ticker,
+    decode_price,
+    encode_price,
+    run_timestamps,
+)
+
+from .chunk_service import CHUNK_MS, ColdPrice, cold_prices, delete_prices
+from .ticker_service import ticker_ids
+
+PARTITION_MS = CHUNK_MS
+MANIFEST_NAME = "manifest.json"
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("ticker", pa.string()),
+        ("id", pa.int64()),
+        ("price", pa.float64()),
+        ("timestamp", pa.int64()),
+        ("source_timestamp", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ]
+)
+# Колонки, читаемые запросом по тикеру (тикер участвует только в фильтре)
+_READ_COLUMNS = ["id", "price", "timestamp", "source_timestamp", "created_at"]
+
+
+def partition_name(partition_start: int) -> str:
+    """Имя файла суток: prices-YYYY-MM-DD.parquet (UTC)"""
+
+    day = datetime.fromtimestamp(partition_start / 1000, tz=timezone.utc)
+    return f"prices-{day:%Y-%m-%d}.parquet"
+
+
+def _summarize(rows: List[ColdPrice]) -> Dict[str, Any]:
+    """
+    Агрегаты цен тикера в файле (в ценах): сумма - точной десятичной
+    арифметикой, среднее и m2 - по Уэлфорду
+    """
+
+    total = Decimal(0)
+    mean = m2 = 0.0
+    for count, row in enumerate(rows, start=1):
+        total += Decimal(str(row.price))
+        delta = row.price - mean
+        mean += delta / count
+        m2 += delta * (row.price - mean)
+    prices = [row.price for row in rows]
+    return {
+        "count": len(rows),
+        "sum": str(total),
+        "mean": mean,
+        "m2": m2,
+        "min_price": min(prices),
+        "max_price": max(prices),
+        "first_timestamp": rows[0].timestamp,
+        "last_timestamp": rows[-1].timestamp,
+    }
+
+
+class ArchiveManifest:
+    """
+    Оглавление архива (manifest.json) в памяти процесса
+
+    Для каждого файла суток хранятся границы, число строк и агрегаты по
+    тикерам, поэтому запрос открывает только файлы, где есть цены тикера
+    в нужном диапазоне. Файл перечитывается при изменении mtime.
+    """
+
+    def __init__(self):
+        self._key: Optional[Tuple[str, int]] = None
+        self._partitions: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def path() -> Path:
+        return Path(settings.ARCHIVE_DIR) / MANIFEST_NAME
+
+    def partitions(self) -> List[Dict[str, Any]]:
+        """Файлы архива от старых суток к новым"""
+
+        path = self.path()
+        try:
+            key = (str(path), path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return []
+        if key != self._key:
+            with open(path) as f:
+                self._partitions = json.load(f)["partitions"]
+            self._key = key
+        return self._partitions
+
+    def write(self, partitions: List[Dict[str, Any]]) -> None:
+        """Записать оглавление атомарно (временный файл и rename)"""
+
+        path = self.path()
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w") as f:
+            json.dump({"partitions": sorted(partitions, key=lambda p: p["start"])}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        self._key = None
+
+
+archive_manifest = ArchiveManifest()
+
+
+class ArchiveService:
+    """
+    Сервис архива: закрытые сутки цен в Parquet файлах на локальном диске
+
+    Файл суток содержит цены всех тикеров, отсортированные по тикеру и
+    времени; цены каждого тикера - отдельные группы строк, поэтому фильтр
+    по тикеру и времени отсекает группы по статистике колонок, а запрос
+    читает только нужные колонки. Строки удаляются из prices и price_chunks
+    после записи файла и оглавления; агрегаты тикеров и свечи не меняются.
+    """
+
+    @staticmethod
+    @contextmanager
+    def _locked() -> Iterator[Path]:
+        directory = Path(settings.ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def select_partitions(
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Файлы с ценами тикера в диапазоне дат, от новых к старым"""
+
+        selected = []
+        for partition in reversed(archive_manifest.partitions()):
+            stats = partition["tickers"].get(ticker)
+            if stats is None:
+                continue
+            if start_timestamp and stats["last_timestamp"] < start_timestamp:
+                continue
+            if end_timestamp and stats["first_timestamp"] > end_timestamp:
+                continue
+            selected.append(partition)
+        return selected
+
+    @staticmethod
+    def read_partition(
+        partition: Dict[str, Any],
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[ColdPrice]:
+        """Цены тикера из файла суток, от новых к старым"""
+
+        filters = [("ticker", "=", ticker)]
+        if start_timestamp:
+            filters.append(("timestamp", ">=", start_timestamp))
+        if end_timestamp:
+            filters.append(("timestamp", "<=", end_timestamp))
+
+        table = pq.read_table(
+            Path(settings.ARCHIVE_DIR) / partition["file"],
+            columns=_READ_COLUMNS,
+            filters=filters,
+        )
+        columns = [table.column(name).to_pylist() for name in _READ_COLUMNS]
+        rows = [
+            ColdPrice(price_id, ticker, price, timestamp, source, created_at)
+            for price_id, price, timestamp, source, created_at in zip(*columns)
+        ]
+        rows.reverse()
+        return rows
+
+    @staticmethod
+    def get_prices(
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[ColdPrice]:
+        """Цены тикера из архива в диапазоне дат, от новых к старым"""
+
+        return [
+            price
+            for partition in ArchiveService.select_partitions(
+                ticker, start_timestamp, end_timestamp
+            )
+            for price in ArchiveService.read_partition(
+                partition, ticker, start_timestamp, end_timestamp
+            )
+        ]
+
+    @staticmethod
+    def iter_batches(
+        db: Session, ticker: Optional[str] = None
+    ) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """
+        Агрегаты тикеров по файлам архива (из оглавления, без чтения файлов)
+        в хранимых значениях, для пересчета агрегатов и статистики
+        """
+
+        for partition in archive_manifest.partitions():
+            batches = {}
+            for name, stats in partition["tickers"].items():
+                if ticker is not None and name != ticker:
+                    continue
+                scale = ticker_ids.get_scale(db, ticker_ids.get_id(db, name))
+                batches[name] = dict(
+                    stats,
+                    sum=encode_price(Decimal(stats["sum"]), scale),
+                    min_price=encode_price(stats["min_price"], scale),
+                    max_price=encode_price(stats["max_price"], scale),
+                )
+            if batches:
+                yield batches
+
+    @staticmethod
+    def _read_day(
+        db: Session, partition_start: int
+    ) -> Tuple[List[ColdPrice], List[int], List[int]]:
+        """Цены суток из prices и сжатых блоков, id их строк и блоков"""
+
+        partition_end = partition_start + PARTITION_MS
+        rows = db.execute(
+            select(
+                Price.id,
+                Ticker.name,
+                Ticker.price_scale,
+                Price.price,
+                Price.timestamp,
+                Price.source_timestamp,
+                Price.created_at,
+                Price.run_offsets,
+            )
+            .join(Ticker, Ticker.id == Price.ticker_id)
+            .where(Price.timestamp >= partition_start, Price.timestamp < partition_end)
+        ).all()
+        # Серии повторов выгружаются отдельными тиками
+        prices = [
+            ColdPrice(
+                row.id,
+                row.name,
+                decode_price(row.price, row.price_scale),
+                timestamp,
+                row.source_timestamp if timestamp == row.timestamp else None,
+                row.created_at,
+            )
+            for row in rows
+            for timestamp in run_timestamps(row.timestamp, row.run_offsets)
+        ]
+
+        chunks = db.execute(
+            select(PriceChunk).where(
+                PriceChunk.chunk_start >= partition_start,
+                PriceChunk.chunk_start < partition_end,
+            )
+        ).scalars()
+        chunk_ids = []
+        for chunk in chunks:
+            name = ticker_ids.get_name(db, chunk.ticker_id)
+            for cold in cold_prices([chunk], name):
+                prices.extend(cold)
+            chunk_ids.append(chunk.id)
+        return prices, [row.id for row in rows], chunk_ids
+
+    @staticmethod
+    def _write_partition(
+        directory: Path, partition_start: int, prices: List[ColdPrice]
+    ) -> Dict[str, Any]:
+        """
+        Записать файл суток и вернуть запись оглавления
+
+        Цены сливаются с уже записанным файлом; повторно выгруженная цена
+        (тот же тикер, время и id - например, после отката транзакции
+        удаления) не дублируется.
+        """
+
+        name = partition_name(partition_start)
+        path = directory / name
+        existing = pq.read_table(path).to_pylist() if path.exists() else []
+        merged = {}
+        for price in [ColdPrice(**row) for row in existing] + prices:
+            merged[(price.ticker, price.timestamp, price.id)] = price
+
+        by_ticker: Dict[str, List[ColdPrice]] = {}
+        for price in sorted(merged.values(), key=lambda p: (p.timestamp, p.id)):
+            by_ticker.setdefault(price.ticker, []).append(price)
+
+        temporary = path.with_suffix(".tmp")
+        with pq.ParquetWriter(
+            temporary, ARCHIVE_SCHEMA, compression=settings.ARCHIVE_COMPRESSION
+        ) as writer:
+            for ticker in sorted(by_ticker):
+                table = pa.Table.from_pylist(
+                    [row._asdict() for row in by_ticker[ticker]],
+                    schema=ARCHIVE_SCHEMA,
+                )
+                writer.write_table(
+                    table, row_group_size=settings.ARCHIVE_ROW_GROUP_SIZE
+                )
+        os.replace(temporary, path)
+
+        return {
+            "file": name,
+            "start": partition_start,
+            "end": partition_start + PARTITION_MS,
+            "rows": len(merged),
+            "bytes": path.stat().st_size,
+            "tickers": {ticker: _summarize(rows) for ticker, rows in by_ticker.items()},
+        }
+
+    @staticmethod
+    def archive_day(db: Session, partition_start: int) -> int:
+        """
+        Выгрузить сутки в архив и удалить их строки из prices и price_chunks
+
+        Returns:
+            Количество перенесенных цен
+        """
+
+        prices, price_ids, chunk_ids = ArchiveService._read_day(db, partition_start)
+        if not prices:
+            return 0
+
+        with ArchiveService._locked() as directory:
+            entry = ArchiveService._write_partition(directory, partition_start, prices)
+            partitions = [
+                partition
+                for partition in archive_manifest.partitions()
+                if partition["start"] != partition_start
+            ]
+            archive_manifest.write(partitions + [entry])
+
+        # Удаляются только прочитанные строки: цена, записанная после
+        # чтения, попадет в файл при следующем проходе
+        delete_prices(db, price_ids)
+        if chunk_ids:
+            db.execute(delete(PriceChunk).where(PriceChunk.id.in_(chunk_ids)))
+        db.flush()
+        return len(prices)
+
+    @staticmethod
+    def archive(db: Session, cutoff: int) -> int:
+        """
+        Выгрузить в архив сутки с ценами раньше cutoff (граница суток)
+
+        За один вызов обрабатывается не более DOWNSAMPLE_BATCH_DAYS суток.
+
+        Returns:
+            Количество перенесенных цен
+        """
+
+        moved = 0
+        since = None
+        for _ in range(settings.DOWNSAMPLE_BATCH_DAYS):
+            price_query = select(func.min(Price.timestamp)).where(
+                Price.timestamp < cutoff
+            )
+            chunk_query = select(func.min(PriceChunk.chunk_start)).where(
+                PriceChunk.chunk_start < cutoff
+            )
+            if since is not None:
+                price_query = price_query.where(Price.timestamp >= since)
+                chunk_query = chunk_query.where(PriceChunk.chunk_start >= since)
+            firsts = [
+                first
+                for first in (
+                    db.execute(price_query).scalar(),
+                    db.execute(chunk_query).scalar(),
+                )
+                if first is not None
+            ]
+            if not firsts:
+                break
+
+            first = min(firsts)
+            partition_start = first - first % PARTITION_MS
+            moved += ArchiveService.archive_day(db, partition_start)
+            since = partition_start + PARTITION_MS
+        return moved
@@ -0,0 +1,516 @@
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, exists, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import (
+    Price,
+    PriceCandle,
+    Ticker,
+    decode_price,
+    encode_price,
+    run_timestamps,
+)
+
+from .archive_service import PARTITION_MS, ArchiveService
+from .chunk_service import CHUNK_MS, ChunkService
+from .stats_service import StatsService
+from .ticker_service import ticker_ids
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# Уровни хранения от мелкого к крупному: имя -> (размер бакета, источник,
+# настройка срока хранения). Источник None означает сырую таблицу prices,
+# срок хранения None — бессрочное хранение
+TIERS: Dict[str, Dict[str, Any]] = {
+    "1m": {"size": MINUTE_MS, "source": None, "retention": "RAW_RETENTION_DAYS"},
+    "5m": {
+        "size": 5 * MINUTE_MS,
+        "source": "1m",
+        "retention": "CANDLE_5M_RETENTION_DAYS",
+    },
+    "1h": {"size": HOUR_MS, "source": "5m", "retention": None},
+    "1d": {"size": DAY_MS, "source": "1h", "retention": None},
+}
+
+_RESOLUTION_UNITS = {"m": MINUTE_MS, "h": HOUR_MS, "d": DAY_MS}
+
+
+def parse_resolution(resolution: str) -> int:
+    """Преобразовать разрешение вида '15m', '4h', '1d' в миллисекунды"""
+
+    match = re.fullmatch(r"(\d+)([mhd])", resolution.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(
+            "Разрешение должно иметь формат <число><m|h|d>, например 5m, 1h, 1d"
+        )
+    return int(match.group(1)) * _RESOLUTION_UNITS[match.group(2)]
+
+
+def floor_timestamp(timestamp: int, size: int) -> int:
+    """Округлить timestamp вниз до границы бакета"""
+
+    return timestamp - timestamp % size
+
+
+def ceil_timestamp(timestamp: int, size: int) -> int:
+    """Округлить timestamp вверх до границы бакета"""
+
+    return -floor_timestamp(-timestamp, size)
+
+
+def retention_days(level: Optional[str]) -> Optional[int]:
+    """Срок хранения уровня в днях (None для сырых данных — RAW_RETENTION_DAYS)"""
+
+    if level is None:
+        return settings.RAW_RETENTION_DAYS
+    setting = TIERS[level]["retention"]
+    return getattr(settings, setting) if setting else None
+
+
+def successor_tier(level: Optional[str]) -> Optional[str]:
+    """Уровень, который строится из данного"""
+
+    for name, config in TIERS.items():
+        if config["source"] == level:
+            return name
+    return None
+
+
+def aggregate_candles(
+    candles: Iterable[Dict[str, Any]], size: int
+) -> List[Dict[str, Any]]:
+    """
+    Свернуть упорядоченные по времени свечи (или тики) в бакеты размера size
+    """
+
+    result: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+
+    for candle in candles:
+        bucket_start = floor_timestamp(candle["open_timestamp"], size)
+
+        if current is None or current["bucket_start"] != bucket_start:
+            current = dict(candle, bucket_start=bucket_start)
+            result.append(current)
+            continue
+
+        current["high"] = max(current["high"], candle["high"])
+        current["low"] = min(current["low"], candle["low"])
+        current["close"] = candle["close"]
+        current["close_timestamp"] = candle["close_timestamp"]
+        current["count"] += candle["count"]
+        current["sum"] = (
+            current["sum"] + candle["sum"]
+            if current["sum"] is not None and candle["sum"] is not None
+            else None
+        )
+
+    return result
+
+
+def _price_to_candle(timestamp: int, stored) -> Dict[str, Any]:
+    """Представить сырую цену как вырожденную свечу (в хранимых значениях)"""
+
+    return {
+        "bucket_start": timestamp,
+        "open": stored,
+        "high": stored,
+        "low": stored,
+        "close": stored,
+        "count": 1,
+        "sum": stored,
+        "open_timestamp": timestamp,
+        "close_timestamp": timestamp,
+    }
+
+
+def _model_to_candle(candle: PriceCandle) -> Dict[str, Any]:
+    """Представить строку price_candles как словарь свечи"""
+
+    return {
+        "bucket_start": candle.bucket_start,
+        "open": candle.open,
+        "high": candle.high,
+        "low": candle.low,
+        "close": candle.close,
+        "count": candle.count,
+        "sum": candle.sum,
+        "open_timestamp": candle.open_timestamp,
+        "close_timestamp": candle.close_timestamp,
+    }
+
+
+class CandleService:
+    """Сервис для уровней прореживания и чтения OHLC свечей"""
+
+    @staticmethod
+    def get_tickers(db: Session) -> List[str]:
+        """Получить тикеры, присутствующие в сырых данных или свечах"""
+
+        # Тикеры реестра, у которых остались сырые цены (по индексу ticker_id)
+        raw = {
+            row[0]
+            for row in db.query(Ticker.name).filter(
+                exists().where(Price.ticker_id == Ticker.id)
+            )
+        }
+        candles = {row[0] for row in db.query(PriceCandle.ticker).distinct()}
+        return sorted(raw | candles)
+
+    @staticmethod
+    def get_watermark(db: Session, ticker: str, resolution: str) -> Optional[int]:
+        """Конец последнего построенного бакета уровня (исключительно)"""
+
+        last_bucket = (
+            db.query(func.max(PriceCandle.bucket_start))
+            .filter(PriceCandle.ticker == ticker, PriceCandle.resolution == resolution)
+            .scalar()
+        )
+        if last_bucket is None:
+            return None
+        return last_bucket + TIERS[resolution]["size"]
+
+    @staticmethod
+    def read_source(
+        db: Session,
+        ticker: str,
+        source: Optional[str],
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+    ) -> List[Dict[str, Any]]:
+        """
+        Прочитать свечи уровня source (или сырые цены вместе с ценами
+        сжатых блоков и архива) в [start, end)
+        """
+
+        if source is None:
+            query = db.query(
+                Price.timestamp, Price.stored_price, Price.run_offsets
+            ).filter(Price.ticker == ticker)
+            if start_timestamp is not None:
+                query = query.filter(Price.covering_since(start_timestamp))
+            if end_timestamp is not None:
+                query = query.filter(Price.timestamp < end_timestamp)
+
+            # Серии повторов разворачиваются в тики диапазона
+            candles = []
+            runs = False
+            rows = query.order_by(Price.timestamp).yield_per(1000)
+            for first, stored, run_offsets in rows:
+                runs = runs or run_offsets is not None
+                candles.extend(
+                    _price_to_candle(timestamp, stored)
+                    for timestamp in run_timestamps(first, run_offsets)
+                    if (start_timestamp is None or timestamp >= start_timestamp)
+                    and (end_timestamp is None or timestamp < end_timestamp)
+                )
+            if runs:
+                candles.sort(key=lambda candle: candle["open_timestamp"])
+
+            last = end_timestamp - 1 if end_timestamp is not None else None
+            cold = ChunkService.get_prices(db, ticker, start_timestamp, last)
+            cold.extend(ArchiveService.get_prices(ticker, start_timestamp, last))
+            if cold:
+                scale = ticker_ids.get_scale(db, ticker_ids.get_id(db, ticker))
+                candles.extend(
+                    _price_to_candle(price.timestamp, encode_price(price.price, scale))
+                    for price in cold
+                )
+                candles.sort(key=lambda candle: candle["open_timestamp"])
+            return candles
+
+        query = db.query(PriceCandle).filter(
+            PriceCandle.ticker == ticker,
+            PriceCandle.resolution == source,
+        )
+        if start_timestamp is not None:
+            query = query.filter(PriceCandle.bucket_start >= start_timestamp)
+        if end_timestamp is not None:
+            query = query.filter(PriceCandle.bucket_start < end_timestamp)
+        return [
+            _model_to_candle(candle)
+            for candle in query.order_by(PriceCandle.bucket_start).yield_per(1000)
+        ]
+
+    @staticmethod
+    def _first_source_timestamp(
+        db: Session, ticker: str, source: Optional[str], since: Optional[int] = None
+    ) -> Optional[int]:
+        """Самая ранняя точка в источнике уровня, начиная с since"""
+
+        if source is None:
+            query = db.query(func.min(Price.timestamp)).filter(Price.ticker == ticker)
+            if since is None:
+                return query.scalar()
+            # Серия, начатая раньше since, покрывает since
+            first = query.filter(Price.covering_since(since)).scalar()
+            return max(first, since) if first is not None else None
+
+        query = db.query(func.min(PriceCandle.bucket_start)).filter(
+            PriceCandle.ticker == ticker, PriceCandle.resolution == source
+        )
+        if since is not None:
+            query = query.filter(PriceCandle.bucket_start >= since)
+        return query.scalar()
+
+    @staticmethod
+    def downsample_ticker(
+        db: Session, ticker: str, resolution: str, now: Optional[int] = None
+    ) -> int:
+        """
+        Построить закрытые бакеты уровня resolution после текущего watermark.
+
+        За один вызов обрабатывается не более DOWNSAMPLE_BATCH_DAYS дней,
+        поэтому первичное заполнение догоняет историю за несколько запусков.
+        При ROLLUPS_ENABLED свечи пишет только путь записи цен (RollupService),
+        и прореживание их не строит.
+        """
+
+        if settings.ROLLUPS_ENABLED:
+            return 0
+
+        size = TIERS[resolution]["size"]
+        source = TIERS[resolution]["source"]
+        now = now if now is not None else int(time.time() * 1000)
+
+        # Пропуски в источнике перескакиваем, чтобы watermark не застревал
+        watermark = CandleService.get_watermark(db, ticker, resolution)
+        first = CandleService._first_source_timestamp(db, ticker, source, watermark)
+        if first is None:
+            return 0
+        start = floor_timestamp(first, size)
+
+        # Строим только закрытые бакеты, чей источник уже полностью построен
+        end = floor_timestamp(now, size)
+        if source is not None:
+            source_watermark = CandleService.get_watermark(db, ticker, source)
+            if source_watermark is None:
+                return 0
+            end = min(end, floor_timestamp(source_watermark, size))
+
+        batch_ms = max(settings.DOWNSAMPLE_BATCH_DAYS * DAY_MS, size)
+        end = min(end, start + floor_timestamp(batch_ms, size))
+        if end <= start:
+            return 0
+
+        candles = aggregate_candles(
+            CandleService.read_source(db, ticker, source, start, end), size
+        )
+        db.bulk_insert_mappings(
+            PriceCandle,
+            [dict(candle, ticker=ticker, resolution=resolution) for candle in candles],
+        )
+        return len(candles)
+
+    @staticmethod
+    def retention_cutoff(
+        db: Session,
+        ticker: str,
+        level: Optional[str],
+        now: int,
+        days: Optional[int] = None,
+    ) -> Optional[int]:
+        """
+        Граница, до которой данные уровня level (None — сырые цены) можно удалить.
+
+        Граница не заходит дальше построенной части следующего уровня и
+        выравнивается по его бакетам, поэтому бакет следующего уровня всегда
+        либо целиком покрыт исходными данными, либо не покрыт вовсе.
+        days заменяет срок хранения уровня из настроек.
+        """
+
+        days = days if days is not None else retention_days(level)
+        successor = successor_tier(level)
+        if days is None or successor is None:
+            return None
+
+        watermark = CandleService.get_watermark(db, ticker, successor)
+        if watermark is None:
+            return None
+
+        cutoff = min(now - days * DAY_MS, watermark)
+        return floor_timestamp(cutoff, TIERS[successor]["size"])
+
+    @staticmethod
+    def compress_cold_prices(
+        db: Session, ticker: str, now: Optional[int] = None
+    ) -> int:
+        """
+        Перенести сырые цены старше COLD_CHUNK_AFTER_DAYS в сжатые блоки.
+
+        Переносятся только целые сутки, уже свернутые в 1m, поэтому
+        построение следующих уровней читает только таблицу prices.
+        """
+
+        if not settings.COLD_CHUNKS_ENABLED:
+            return 0
+
+        now = now if now is not None else int(time.time() * 1000)
+        watermark = CandleService.get_watermark(db, ticker, "1m")
+        if watermark is None:
+            return 0
+
+        cutoff = min(now - settings.COLD_CHUNK_AFTER_DAYS * DAY_MS, watermark)
+        return ChunkService.compress(db, ticker, floor_timestamp(cutoff, CHUNK_MS))
+
+    @staticmethod
+    def archive_prices(db: Session, now: Optional[int] = None) -> int:
+        """
+        Выгрузить в архив сутки старше ARCHIVE_AFTER_DAYS.
+
+        Файл суток содержит цены всех тикеров, поэтому граница - наименьший
+        1m watermark среди тикеров с сырыми ценами: выгружаются только
+        сутки, уже свернутые в 1m у всех тикеров.
+        """
+
+        if not settings.ARCHIVE_ENABLED:
+            return 0
+
+        now = now if now is not None else int(time.time() * 1000)
+        cutoff = now - settings.ARCHIVE_AFTER_DAYS * DAY_MS
+        for ticker in CandleService.get_tickers(db):
+            watermark = CandleService.get_watermark(db, ticker, "1m")
+            if watermark is not None:
+                cutoff = min(cutoff, watermark)
+            elif CandleService._first_source_timestamp(db, ticker, None) is not None:
+                return 0
+
+        return ArchiveService.archive(db, floor_timestamp(cutoff, PARTITION_MS))
+
+    @staticmethod
+    def apply_raw_retention(
+        db: Session, ticker: str, now: int, days: Optional[int] = None
+    ) -> int:
+        """
+        Удалить сырые цены тикера старше срока хранения (по умолчанию
+        RAW_RETENTION_DAYS), уже свернутые в 1m свечи.
+
+        Цены, перенесенные в сжатые блоки или архив, в таблице prices уже
+        отсутствуют; не свернутые минуты остаются до следующего прореживания.
+        """
+
+        raw_cutoff = CandleService.retention_cutoff(db, ticker, None, now, days)
+        if raw_cutoff is None:
+            return 0
+
+        # Серия удаляется, только когда все ее тики старше границы
+        criteria = (
+            Price.ticker == ticker,
+            Price.timestamp < raw_cutoff,
+            Price.covered_until < raw_cutoff,
+        )
+        removed = StatsService.before_delete(db, *criteria)
+        deleted = db.execute(delete(Price).where(*criteria)).rowcount
+        StatsService.remove(db, removed)
+        return deleted
+
+    @staticmethod
+    def apply_retention(db: Session, ticker: str, now: Optional[int] = None) -> int:
+        """
+        Удалить устаревшие сырые цены и свечи уровней с ограниченным сроком.
+
+        Удаляются только данные, уже свернутые в следующий уровень.
+        """
+
+        now = now if now is not None else int(time.time() * 1000)
+        deleted = CandleService.apply_raw_retention(db, ticker, now)
+
+        for resolution in TIERS:
+            cutoff = CandleService.retention_cutoff(db, ticker, resolution, now)
+            if cutoff is None:
+                continue
+            deleted += db.execute(
+                delete(PriceCandle).where(
+                    PriceCandle.ticker == ticker,
+                    PriceCandle.resolution == resolution,
+                    PriceCandle.bucket_start < cutoff,
+                )
+            ).rowcount
+
+        return deleted
+
+    @staticmethod
+    def select_tier(resolution_ms: int) -> Optional[str]:
+        """Самый крупный уровень, из которого можно собрать разрешение"""
+
+        tier = None
+        for name, config in TIERS.items():
+            if resolution_ms % config["size"] == 0:
+                tier = name
+        return tier
+
+    @staticmethod
+    def get_candles(
+        db: Session,
+        ticker: str,
+        resolution: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Получить OHLC свечи заданного разрешения.
+
+        Данные читаются из самого крупного подходящего уровня, а хвост,
+        который этот уровень еще не покрывает, добирается из более мелких
+        уровней и, в конце, из сырых цен.
+        """
+
+        size = parse_resolution(resolution)
+        end = end_timestamp + 1 if end_timestamp is not None else None
+        cursor = (
+            floor_timestamp(start_timestamp, size)
+            if start_timestamp is not None
+            else None
+        )
+
+        # Цепочка источников от выбранного уровня к сырым данным
+        chain: List[Optional[str]] = []
+        tier = CandleService.select_tier(size)
+        while tier is not None:
+            chain.append(tier)
+            tier = TIERS[tier]["source"]
+        chain.append(None)
+
+        series: List[Dict[str, Any]] = []
+        for source in chain:
+            if source is None:
+                covered_until = end
+            else:
+                covered_until = CandleService.get_watermark(db, ticker, source)
+                if covered_until is None:
+                    continue
+                if end is not None:
+                    covered_until = min(covered_until, end)
+
+            if (
+                cursor is not None
+                and covered_until is not None
+                and covered_until <= cursor
+            ):
+                continue
+
+            series.extend(
+                CandleService.read_source(db, ticker, source, cursor, covered_until)
+            )
+            cursor = covered_until
+
+        # Свечи собираются в хранимых значениях и декодируются один раз
+        scale = ticker_ids.get_scale(db, ticker_ids.get_id(db, ticker))
+        return [
+            dict(
+                candle,
+                ticker=ticker,
+                resolution=resolution,
+                **{
+                    field: decode_price(candle[field], scale)
+                    for field in ("open", "high", "low", "close", "sum")
+                },
+            )
+            for candle in aggregate_candles(series, size)
+        ]
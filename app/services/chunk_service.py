@@ -0,0 +1,451 @@
+import heapq
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from operator import attrgetter, sub, xor
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Price, PriceChunk, decode_price, encode_price, run_timestamps
+
+from .ticker_service import ticker_ids
+
+CHUNK_MS = 24 * 60 * 60 * 1000
+
+_COMPRESSION_LEVEL = 6
+_DELETE_BATCH_SIZE = 500
+_BIG_ENDIAN = sys.byteorder == "big"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _pack(values: array) -> bytes:
+    """Сжать массив 64-битных значений (little-endian)"""
+
+    if _BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    raw = values.tobytes()
+    # Байты одного разряда подряд: старшие байты малых разностей почти всегда
+    # нулевые и сжимаются в длинные серии
+    return zlib.compress(b"".join(raw[i::8] for i in range(8)), _COMPRESSION_LEVEL)
+
+
+def _unpack(blob: bytes, typecode: str) -> array:
+    shuffled = zlib.decompress(blob)
+    size = len(shuffled) // 8
+    raw = bytearray(len(shuffled))
+    for i in range(8):
+        raw[i::8] = shuffled[i * size : (i + 1) * size]
+    values = array(typecode, bytes(raw))
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _differences(values: List[int]) -> List[int]:
+    return values[:1] + list(map(sub, values[1:], values))
+
+
+def encode_integers(values: Iterable[Optional[int]]) -> bytes:
+    """
+    Последовательность целых как разности второго порядка (delta-of-delta)
+
+    Для меток времени с постоянным шагом почти все разности равны нулю.
+    None хранится как 0.
+    """
+
+    values = [0 if value is None else value for value in values]
+    return _pack(array("q", _differences(_differences(values))))
+
+
+def decode_integers(blob: bytes) -> array:
+    """Обратное к encode_integers: две накопленные суммы по всему массиву"""
+
+    return array("q", accumulate(accumulate(_unpack(blob, "q"))))
+
+
+def encode_floats(values: Iterable[float]) -> bytes:
+    """
+    Последовательность float64 как XOR соседних значений
+
+    У близких цен совпадают знак, порядок и старшие биты мантиссы, поэтому
+    в XOR остаются в основном нулевые байты.
+    """
+
+    bits = array("Q", array("d", values).tobytes())
+    return _pack(bits[:1] + array("Q", map(xor, bits[1:], bits)))
+
+
+def decode_floats(blob: bytes) -> array:
+    """Обратное к encode_floats: накопленный XOR по всему массиву"""
+
+    return array("d", array("Q", accumulate(_unpack(blob, "Q"), xor)).tobytes())
+
+
+def _to_micros(value: Optional[datetime]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(value: int) -> Optional[datetime]:
+    return _EPOCH + timedelta(microseconds=value) if value else None
+
+
+class ColdPrice(NamedTuple):
+    """Цена из сжатого блока (только чтение, поля как у Price)"""
+
+    id: int
+    ticker: str
+    price: float
+    timestamp: int
+    source_timestamp: Optional[int]
+    created_at: Optional[datetime]
+
+
+class ChunkColumns(NamedTuple):
+    """Декодированные колонки блока, упорядоченные по (timestamp, id)"""
+
+    ids: array
+    timestamps: array
+    source_timestamps: array
+    created_ats: array
+    prices: array
+
+
+def encode_chunk(rows: List[tuple]) -> Dict[str, Any]:
+    """
+    Колонки блока по строкам (id, timestamp, source_timestamp, created_at в
+    микросекундах, цена), упорядоченным по (timestamp, id)
+    """
+
+    ids, timestamps, source_timestamps, created_ats, prices = zip(*rows)
+    return {
+        "count": len(rows),
+        "first_timestamp": timestamps[0],
+        "last_timestamp": timestamps[-1],
+        "ids": encode_integers(ids),
+        "timestamps": encode_integers(timestamps),
+        "source_timestamps": encode_integers(source_timestamps),
+        "created_ats": encode_integers(created_ats),
+        "prices": encode_floats(prices),
+    }
+
+
+def decode_chunk(chunk: PriceChunk) -> ChunkColumns:
+    """Декодировать все колонки блока"""
+
+    return ChunkColumns(
+        ids=decode_integers(chunk.ids),
+        timestamps=decode_integers(chunk.timestamps),
+        source_timestamps=decode_integers(chunk.source_timestamps),
+        created_ats=decode_integers(chunk.created_ats),
+        prices=decode_floats(chunk.prices),
+    )
+
+
+def cold_prices(
+    chunks: Iterable[PriceChunk],
+    ticker: str,
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> Iterator[List[ColdPrice]]:
+    """
+    Цены блоков в диапазоне дат, по блоку за раз, от новых к старым
+
+    Блоки должны идти от новых к старым (см. ChunkService.select_chunks).
+    Колонки декодируются целиком, границы диапазона ищутся бинарным
+    поиском по меткам времени.
+    """
+
+    for chunk in chunks:
+        columns = decode_chunk(chunk)
+        low = bisect_left(columns.timestamps, start_timestamp) if start_timestamp else 0
+        high = (
+            bisect_right(columns.timestamps, end_timestamp)
+            if end_timestamp
+            else chunk.count
+        )
+        rows = [
+            ColdPrice(
+                price_id,
+                ticker,
+                price,
+                timestamp,
+                source or None,
+                _from_micros(created),
+            )
+            for price_id, timestamp, source, created, price in zip(
+                columns.ids[low:high],
+                columns.timestamps[low:high],
+                columns.source_timestamps[low:high],
+                columns.created_ats[low:high],
+                columns.prices[low:high],
+            )
+        ]
+        rows.reverse()
+        yield rows
+
+
+def run_prices(
+    price: Price,
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> List[Any]:
+    """
+    Тики строки prices в диапазоне дат от новых к старым: сама строка и
+    восстановленные повторы ее серии (CHANGE_ONLY_ENABLED). У повторов id и
+    created_at строки, время биржи не хранится
+    """
+
+    if not price.repeats:
+        return [price]
+
+    ticks = []
+    for timestamp in reversed(price.tick_timestamps()):
+        if start_timestamp and timestamp < start_timestamp:
+            break
+        if end_timestamp and timestamp > end_timestamp:
+            continue
+        if timestamp == price.timestamp:
+            ticks.append(price)
+        else:
+            ticks.append(
+                ColdPrice(
+                    price.id,
+                    price.ticker,
+                    float(price.price),
+                    timestamp,
+                    None,
+                    price.created_at,
+                )
+            )
+    return ticks
+
+
+def expand_runs(
+    prices: List[Price],
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> List[Any]:
+    """
+    Строки prices, упорядоченные от новых к старым, с восстановленными
+    сериями повторов (тики вне диапазона дат отбрасываются)
+    """
+
+    if not any(price.repeats for price in prices):
+        return prices
+    ticks = [
+        tick
+        for price in prices
+        for tick in run_prices(price, start_timestamp, end_timestamp)
+    ]
+    # Серия может перекрываться с более поздней строкой, записанной не по порядку
+    ticks.sort(key=attrgetter("timestamp"), reverse=True)
+    return ticks
+
+
+def merge_newest_first(hot: List[Any], cold: List[ColdPrice]) -> List[Any]:
+    """Слить цены таблицы prices и блоков, упорядоченные от новых к старым"""
+
+    if not cold:
+        return hot
+    return list(heapq.merge(hot, cold, key=attrgetter("timestamp"), reverse=True))
+
+
+def delete_prices(db: Session, ids: List[int]) -> None:
+    """
+    Удалить перенесенные строки prices пачками по id (агрегаты тикеров не
+    меняются: цены остаются в холодном уровне)
+    """
+
+    for start in range(0, len(ids), _DELETE_BATCH_SIZE):
+        db.execute(
+            delete(Price)
+            .where(Price.id.in_(ids[start : start + _DELETE_BATCH_SIZE]))
+            .execution_options(synchronize_session=False)
+        )
+
+
+class ChunkService:
+    """
+    Сервис холодного уровня: сжатые суточные блоки цен (price_chunks)
+
+    Сырые цены переносятся в блок целыми сутками, строки удаляются из
+    prices в той же транзакции. Цены блоков доступны только для чтения:
+    запросы по диапазону дат PriceService читают их вместе с prices, а
+    агрегаты тикеров и свечи при переносе не меняются.
+    """
+
+    @staticmethod
+    def select_chunks(
+        ticker_id: int,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ):
+        """Запрос блоков, пересекающих диапазон дат, от новых к старым"""
+
+        query = select(PriceChunk).where(PriceChunk.ticker_id == ticker_id)
+        if start_timestamp:
+            query = query.where(PriceChunk.chunk_start > start_timestamp - CHUNK_MS)
+        if end_timestamp:
+            query = query.where(PriceChunk.chunk_start <= end_timestamp)
+        return query.order_by(desc(PriceChunk.chunk_start))
+
+    @staticmethod
+    def get_prices(
+        db: Session,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[ColdPrice]:
+        """Цены блоков тикера в диапазоне дат, от новых к старым"""
+
+        ticker_id = ticker_ids.get_id(db, ticker)
+        if ticker_id is None:
+            return []
+
+        chunks = db.execute(
+            ChunkService.select_chunks(ticker_id, start_timestamp, end_timestamp)
+        ).scalars()
+        return [
+            price
+            for rows in cold_prices(chunks, ticker, start_timestamp, end_timestamp)
+            for price in rows
+        ]
+
+    @staticmethod
+    def compress_day(db: Session, ticker_id: int, chunk_start: int) -> int:
+        """
+        Перенести цены тикера за сутки в блок (со слиянием с уже
+        существующим блоком этих суток)
+
+        Returns:
+            Количество перенесенных строк
+        """
+
+        rows = db.execute(
+            select(
+                Price.id,
+                Price.timestamp,
+                Price.source_timestamp,
+                Price.created_at,
+                Price.price,
+                Price.run_offsets,
+            ).where(
+                Price.ticker_id == ticker_id,
+                Price.timestamp >= chunk_start,
+                Price.timestamp < chunk_start + CHUNK_MS,
+            )
+        ).all()
+        if not rows:
+            return 0
+
+        # Серии повторов разворачиваются в отдельные тики (серия не
+        # переходит границу суток, см. PriceService.create_prices)
+        scale = ticker_ids.get_scale(db, ticker_id)
+        merged = [
+            (
+                row.id,
+                timestamp,
+                row.source_timestamp if timestamp == row.timestamp else None,
+                _to_micros(row.created_at),
+                decode_price(row.price, scale),
+            )
+            for row in rows
+            for timestamp in run_timestamps(row.timestamp, row.run_offsets)
+        ]
+
+        chunk = (
+            db.query(PriceChunk)
+            .filter(
+                PriceChunk.ticker_id == ticker_id,
+                PriceChunk.chunk_start == chunk_start,
+            )
+            .with_for_update()
+            .first()
+        )
+        if chunk is None:
+            chunk = PriceChunk(ticker_id=ticker_id, chunk_start=chunk_start)
+            db.add(chunk)
+        else:
+            merged.extend(zip(*decode_chunk(chunk)))
+
+        merged.sort(key=lambda row: (row[1], row[0]))
+        for field, value in encode_chunk(merged).items():
+            setattr(chunk, field, value)
+
+        # Удаляются только прочитанные строки: цена, записанная после
+        # чтения, попадет в блок при следующем переносе
+        delete_prices(db, [row.id for row in rows])
+        db.flush()
+        return len(rows)
+
+    @staticmethod
+    def compress(db: Session, ticker: str, cutoff: int) -> int:
+        """
+        Перенести в блоки сутки с ценами тикера раньше cutoff (граница суток)
+
+        За один вызов обрабатывается не более DOWNSAMPLE_BATCH_DAYS суток
+        с ценами.
+
+        Returns:
+            Количество перенесенных строк
+        """
+
+        ticker_id = ticker_ids.get_id(db, ticker)
+        if ticker_id is None:
+            return 0
+
+        moved = 0
+        since = None
+        for _ in range(settings.DOWNSAMPLE_BATCH_DAYS):
+            query = db.query(func.min(Price.timestamp)).filter(
+                Price.ticker_id == ticker_id, Price.timestamp < cutoff
+            )
+            if since is not None:
+                query = query.filter(Price.timestamp >= since)
+            first = query.scalar()
+            if first is None:
+                break
+
+            chunk_start = first - first % CHUNK_MS
+            moved += ChunkService.compress_day(db, ticker_id, chunk_start)
+            since = chunk_start + CHUNK_MS
+        return moved
+
+    @staticmethod
+    def iter_ticks(
+        db: Session, ticker: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Тики блоков (хранимые значения цен) по блоку за раз, для пересчета
+        агрегатов тикеров
+        """
+
+        query = db.query(PriceChunk)
+        if ticker is not None:
+            query = query.filter(PriceChunk.ticker_id == ticker_ids.get_id(db, ticker))
+
+        for chunk in query.order_by(PriceChunk.id).yield_per(100):
+            name = ticker_ids.get_name(db, chunk.ticker_id)
+            scale = ticker_ids.get_scale(db, chunk.ticker_id)
+            columns = decode_chunk(chunk)
+            yield [
+                {
+                    "ticker": name,
+                    "price": encode_price(price, scale),
+                    "timestamp": timestamp,
+                    "scale": scale,
+                }
+                for timestamp, price in zip(columns.timestamps, columns.prices)
+            ]
@@ -0,0 +1,171 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.metrics import summarize_ms
+from app.core.redis_client import get_redis, redis_key
+
+# Этапы пути тика: время биржи (usOut ответа Deribit), получение ответа,
+# коммит в БД и публикация в кеш (если кеш используется)
+STAGES = ("exchange", "fetched", "committed", "published")
+
+
+def stage_lags(stages: Dict[str, Optional[int]]) -> Dict[str, int]:
+    """Задержки между соседними известными этапами тика (миллисекунды)"""
+
+    lags: Dict[str, int] = {}
+    previous: Optional[str] = None
+    for stage in STAGES:
+        if stages.get(stage) is None:
+            continue
+        if previous is not None:
+            lags[f"{previous}_to_{stage}_ms"] = max(stages[stage] - stages[previous], 0)
+        previous = stage
+    return lags
+
+
+def end_to_end_lag(stages: Dict[str, Optional[int]]) -> Optional[int]:
+    """Задержка от времени биржи до последнего пройденного этапа"""
+
+    known = [stages[stage] for stage in STAGES if stages.get(stage) is not None]
+    if len(known) < 2:
+        return None
+    return max(known[-1] - known[0], 0)
+
+
+def burn_rate(bad: int, total: int) -> Optional[float]:
+    """
+    Скорость расходования бюджета ошибок SLO: доля нарушений, деленная
+    на допустимую долю (1 - FRESHNESS_SLO_TARGET). Значение 1 расходует
+    бюджет ровно за окно, больше 1 - быстрее.
+    """
+
+    if total == 0:
+        return None
+    allowed = 1 - settings.FRESHNESS_SLO_TARGET
+    if allowed <= 0:
+        return None if bad == 0 else float("inf")
+    return round(bad / total / allowed, 3)
+
+
+class FreshnessService:
+    """
+    Задержка сбора и свежесть данных по тикерам (Redis)
+
+    Для каждого тика хранятся времена этапов последнего тика и выборка
+    (время коммита, задержка, пиковый возраст) за самое длинное окно
+    FRESHNESS_BURN_WINDOWS_MINUTES. Пиковый возраст - возраст данных
+    непосредственно перед коммитом нового тика, т.е. максимальный
+    возраст, который видели потребители между двумя тиками.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client or get_redis()
+        self.last_key = redis_key("freshness", "last")
+
+    @staticmethod
+    def samples_key(ticker: str) -> str:
+        return redis_key("freshness", "samples", ticker)
+
+    @staticmethod
+    def _window_ms() -> int:
+        return max(settings.FRESHNESS_BURN_WINDOWS_MINUTES) * 60 * 1000
+
+    def record(self, ticks: Dict[str, Dict[str, Optional[int]]]) -> None:
+        """Сохранить этапы тиков: {ticker: {stage: timestamp_ms}}"""
+
+        ticks = {ticker: stages for ticker, stages in ticks.items() if stages}
+        if not ticks:
+            return
+
+        tickers = list(ticks)
+        previous = dict(zip(tickers, self.redis.hmget(self.last_key, tickers)))
+
+        pipe = self.redis.pipeline(transaction=False)
+        for ticker, stages in ticks.items():
+            committed = stages.get("committed")
+            source = stages.get("exchange") or stages.get("fetched")
+            if committed is None or source is None:
+                continue
+
+            lag = end_to_end_lag(stages) or 0
+            prev_stages = json.loads(previous[ticker]) if previous[ticker] else {}
+            prev_source = prev_stages.get("exchange") or prev_stages.get("fetched")
+            peak_age = max(committed - (prev_source or source), lag)
+
+            pipe.hset(self.last_key, ticker, json.dumps(stages))
+            key = self.samples_key(ticker)
+            pipe.zadd(key, {f"{committed}:{lag}:{peak_age}": committed})
+            pipe.zremrangebyscore(key, "-inf", committed - self._window_ms())
+        pipe.execute()
+
+    def report(
+        self, tickers: List[str], now_ms: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Свежесть, перцентили задержки и burn rate SLO по тикерам"""
+
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        slo_ms = settings.FRESHNESS_SLO_SECONDS * 1000
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget(self.last_key, tickers)
+        for ticker in tickers:
+            pipe.zrangebyscore(
+                self.samples_key(ticker), now_ms - self._window_ms(), "+inf"
+            )
+        last, *samples = pipe.execute()
+
+        report: Dict[str, Any] = {}
+        for ticker, raw_last, raw_samples in zip(tickers, last, samples):
+            if not raw_last:
+                report[ticker] = {"age_ms": None, "within_slo": False}
+                continue
+
+            stages = json.loads(raw_last)
+            source = stages.get("exchange") or stages.get("fetched")
+            age_ms = max(now_ms - source, 0)
+
+            points = []
+            for member in raw_samples:
+                member = member.decode() if isinstance(member, bytes) else member
+                committed, lag, peak_age = (int(part) for part in member.split(":"))
+                points.append((committed, lag, peak_age))
+
+            lags = [lag for _, lag, _ in points]
+            burn: Dict[str, Any] = {}
+            for minutes in settings.FRESHNESS_BURN_WINDOWS_MINUTES:
+                since = now_ms - minutes * 60 * 1000
+                window = [age for committed, _, age in points if committed >= since]
+                bad = sum(1 for age in window if age > slo_ms)
+                total = len(window)
+                # Остановившийся сбор не дает новых выборок, поэтому текущий
+                # интервал без тиков учитывается, как только нарушил SLO
+                if age_ms > slo_ms:
+                    bad += 1
+                    total += 1
+                burn[f"{minutes}m"] = {
+                    "events": total,
+                    "violations": bad,
+                    "burn_rate": burn_rate(bad, total),
+                }
+
+            report[ticker] = {
+                "age_ms": age_ms,
+                "within_slo": age_ms <= slo_ms,
+                "last_tick": stages,
+                "stage_lags": stage_lags(stages),
+                "lag": summarize_ms(lags) if lags else {"samples": 0},
+                "burn": burn,
+            }
+
+        return {
+            "slo": {
+                "max_age_seconds": settings.FRESHNESS_SLO_SECONDS,
+                "target": settings.FRESHNESS_SLO_TARGET,
+            },
+            "tickers": report,
+            "timestamp": now_ms,
+        }
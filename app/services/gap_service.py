@@ -0,0 +1,176 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Price
+
+from .candle_service import ceil_timestamp, floor_timestamp
+
+
+def coalesce_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Слить пересекающиеся и смежные диапазоны [start, end)"""
+
+    result: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if result and start <= result[-1][1]:
+            result[-1] = (result[-1][0], max(result[-1][1], end))
+        else:
+            result.append((start, end))
+    return result
+
+
+def expected_interval_ms() -> int:
+    """
+    Ожидаемый шаг между ценами. При адаптивном опросе спокойный тикер
+    опрашивается раз в POLL_MAX_INTERVAL_SECONDS, и это не пропуск.
+    """
+
+    if settings.ADAPTIVE_POLLING_ENABLED:
+        return max(
+            settings.GAP_EXPECTED_INTERVAL_MS, settings.POLL_MAX_INTERVAL_SECONDS * 1000
+        )
+    return settings.GAP_EXPECTED_INTERVAL_MS
+
+
+class GapService:
+    """Сервис поиска пропущенных минут и оценки полноты данных"""
+
+    @staticmethod
+    def find_gaps(
+        db: Session,
+        ticker: str,
+        start_timestamp: int,
+        end_timestamp: int,
+        interval: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """
+        Найти пропущенные бакеты тикера в окне [start, end).
+
+        Пары соседних цен находятся оконной функцией LEAD по диапазонному
+        скану idx_ticker_timestamp; из базы возвращаются только строки,
+        за которыми следует разрыв больше ожидаемого шага. Серия повторов
+        (CHANGE_ONLY_ENABLED) не содержит разрывов, поэтому строка покрывает
+        время до своего covered_until; разрыв считается от наибольшего
+        covered_until предыдущих строк.
+
+        Returns:
+            Слитые диапазоны пропусков [start, end), выровненные по бакетам
+        """
+
+        interval = interval or expected_interval_ms()
+        window_start = ceil_timestamp(start_timestamp, interval)
+        window_end = floor_timestamp(end_timestamp, interval)
+        if window_end <= window_start:
+            return []
+
+        in_window = (
+            Price.ticker == ticker,
+            Price.covering_since(window_start),
+            Price.timestamp < window_end,
+        )
+
+        bounds = db.query(
+            func.min(Price.timestamp), func.max(Price.covered_until)
+        ).filter(*in_window)
+        first, last = bounds.one()
+        if first is None:
+            return [(window_start, window_end)]
+
+        pairs = (
+            db.query(
+                func.max(Price.covered_until)
+                .over(order_by=Price.timestamp, rows=(None, 0))
+                .label("covered_until"),
+                func.lead(Price.timestamp)
+                .over(order_by=Price.timestamp)
+                .label("next_timestamp"),
+            )
+            .filter(*in_window)
+            .subquery()
+        )
+        jumps = (
+            db.query(pairs.c.covered_until, pairs.c.next_timestamp)
+            .filter(pairs.c.next_timestamp - pairs.c.covered_until > interval)
+            .all()
+        )
+
+        gaps: List[Tuple[int, int]] = []
+        if floor_timestamp(first, interval) > window_start:
+            gaps.append((window_start, floor_timestamp(first, interval)))
+
+        for covered_until, next_timestamp in jumps:
+            gap_start = floor_timestamp(covered_until, interval) + interval
+            gap_end = floor_timestamp(next_timestamp, interval)
+            if gap_end > gap_start:
+                gaps.append((gap_start, gap_end))
+
+        tail_start = floor_timestamp(last, interval) + interval
+        if tail_start < window_end:
+            gaps.append((tail_start, window_end))
+
+        return coalesce_ranges(gaps)
+
+    @staticmethod
+    def get_completeness(
+        db: Session,
+        ticker: str,
+        start_timestamp: int,
+        end_timestamp: int,
+        interval: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Доля заполненных бакетов тикера в окне [start, end)
+
+        Пустые бакеты - это ровно бакеты пропусков find_gaps (соседние цены
+        не дальше шага лежат в одном или соседних бакетах), поэтому серии
+        повторов учитываются без разворачивания.
+        """
+
+        interval = interval or expected_interval_ms()
+        window_start = ceil_timestamp(start_timestamp, interval)
+        window_end = floor_timestamp(end_timestamp, interval)
+        expected = max((window_end - window_start) // interval, 0)
+
+        missing = sum(
+            (gap_end - gap_start) // interval
+            for gap_start, gap_end in GapService.find_gaps(
+                db, ticker, start_timestamp, end_timestamp, interval
+            )
+        )
+        present = expected - missing
+
+        return {
+            "ticker": ticker,
+            "start_timestamp": window_start,
+            "end_timestamp": window_end,
+            "expected_buckets": expected,
+            "present_buckets": present,
+            "missing_buckets": missing,
+            "completeness": round(present / expected, 6) if expected else 1.0,
+        }
+
+    @staticmethod
+    def select_backfill_points(
+        points: Iterable[Iterable[Any]],
+        gaps: List[Tuple[int, int]],
+        interval: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Выбрать из исторических точек [timestamp, price] по одной на
+        пропущенный бакет (первую по времени)
+        """
+
+        interval = interval or expected_interval_ms()
+        selected: Dict[int, Tuple[int, float]] = {}
+
+        for point in points:
+            timestamp, price = int(point[0]), float(point[1])
+            if not any(start <= timestamp < end for start, end in gaps):
+                continue
+            bucket = floor_timestamp(timestamp, interval)
+            if bucket not in selected or timestamp < selected[bucket][0]:
+                selected[bucket] = (timestamp, price)
+
+        return [selected[bucket] for bucket in sorted(selected)]
@@ -0,0 +1,294 @@
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.redis_client import get_async_redis, get_redis, listen_channel, redis_key
+from app.db.models import Price
+
+from .chunk_service import ColdPrice, run_prices
+from .ticker_service import ticker_ids
+
+logger = get_logger(__name__)
+
+_PENDING_KEY = "latest_prices_pending"
+
+# Записать цену, только если она не старше уже сохраненной (бэкфилл и спул
+# пишут старые цены), и разослать ее подписчикам
+_PUBLISH_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local stored = cjson.decode(current)
+    if tonumber(stored['timestamp']) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[3])
+redis.call('PUBLISH', ARGV[4], ARGV[5])
+return 1
+"""
+
+
+def price_payload(price: Union[Price, ColdPrice]) -> Dict[str, Any]:
+    """
+    Последняя цена в формате PriceResponse для кеша: тик или строка prices
+    (для серии повторов - последний тик серии, время биржи которого не
+    хранится)
+    """
+
+    if isinstance(price, Price):
+        price = run_prices(price)[0]
+    return {
+        "id": price.id,
+        "ticker": price.ticker,
+        "price": float(price.price),
+        "timestamp": price.timestamp,
+        "source_timestamp": price.source_timestamp,
+        "created_at": price.created_at.isoformat() if price.created_at else None,
+    }
+
+
+def price_key(ticker: str) -> str:
+    return redis_key("latest", "price", ticker)
+
+
+def updates_channel() -> str:
+    return redis_key("latest", "updates")
+
+
+def _publish_args(payload: Dict[str, Any]) -> Tuple[list, list]:
+    message = json.dumps({"ticker": payload["ticker"], "price": payload})
+    return [price_key(payload["ticker"])], [
+        json.dumps(payload),
+        payload["timestamp"],
+        settings.LATEST_CACHE_TTL_SECONDS * 1000,
+        updates_channel(),
+        message,
+    ]
+
+
+class LatestPriceCache:
+    """
+    Запись последних цен в Redis (write-through при коммите цен)
+
+    Цена тикера хранится в отдельном ключе со временем жизни
+    LATEST_CACHE_TTL_SECONDS и рассылается по pub/sub процессам API.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client or get_redis()
+        self._publish = self.redis.register_script(_PUBLISH_SCRIPT)
+
+    def publish(self, payloads: Iterable[Dict[str, Any]]) -> None:
+        """Записать и разослать последние цены"""
+
+        pipe = self.redis.pipeline(transaction=False)
+        for payload in payloads:
+            keys, args = _publish_args(payload)
+            self._publish(keys=keys, args=args, client=pipe)
+        pipe.execute()
+
+    def invalidate(self, tickers: Iterable[str]) -> None:
+        """Удалить цены тикеров (после изменения или удаления цен)"""
+
+        pipe = self.redis.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.delete(price_key(ticker))
+            pipe.publish(
+                updates_channel(), json.dumps({"ticker": ticker, "price": None})
+            )
+        pipe.execute()
+
+
+class LatestPriceService:
+    """
+    Чтение последних цен для API: память процесса, Redis, затем БД
+
+    Память процесса обновляется сообщениями pub/sub и используется, только
+    пока подписка активна; запись в памяти не старше
+    LATEST_CACHE_LOCAL_TTL_SECONDS, поэтому потерянное сообщение
+    задерживает новую цену не дольше этого времени.
+    """
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self._redis = client
+        self._publish = None
+        self._entries: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self.subscribed = False
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            self._redis = get_async_redis()
+        return self._redis
+
+    @property
+    def publish_script(self):
+        if self._publish is None:
+            self._publish = self.redis.register_script(_PUBLISH_SCRIPT)
+        return self._publish
+
+    def _remember(self, payload: Dict[str, Any]) -> None:
+        if not self.subscribed:
+            return
+        current = self._entries.get(payload["ticker"])
+        if current is None or current[0]["timestamp"] <= payload["timestamp"]:
+            self._entries[payload["ticker"]] = (payload, time.monotonic())
+
+    def _local(self, ticker: str) -> Optional[Dict[str, Any]]:
+        if not self.subscribed:
+            return None
+        entry = self._entries.get(ticker)
+        if entry is None:
+            return None
+        payload, stored_at = entry
+        if time.monotonic() - stored_at > settings.LATEST_CACHE_LOCAL_TTL_SECONDS:
+            return None
+        return payload
+
+    def apply_message(self, data: Any) -> None:
+        """Применить сообщение pub/sub: новая цена или сброс тикера"""
+
+        message = json.loads(data)
+        if message["price"] is None:
+            self._entries.pop(message["ticker"], None)
+        else:
+            self._remember(message["price"])
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get(
+        self,
+        ticker: str,
+        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Последняя цена тикера; при промахе кеша - из loader (БД), после
+        чего цена сохраняется в Redis
+        """
+
+        if not settings.LATEST_CACHE_ENABLED:
+            return await loader()
+
+        payload = self._local(ticker)
+        if payload is not None:
+            return payload
+
+        try:
+            raw = await self.redis.get(price_key(ticker))
+            payload = json.loads(raw) if raw else None
+        except redis.RedisError as e:
+            logger.debug(
+                "Кеш последних цен недоступен",
+                extra={"ticker": ticker, "error": str(e)},
+            )
+            return await loader()
+
+        if payload is None:
+            payload = await loader()
+            if payload is None:
+                return None
+            try:
+                keys, args = _publish_args(payload)
+                await self.publish_script(keys=keys, args=args)
+            except redis.RedisError as e:
+                logger.debug(
+                    "Не удалось сохранить последнюю цену в кеш",
+                    extra={"ticker": ticker, "error": str(e)},
+                )
+
+        self._remember(payload)
+        return payload
+
+    def _set_subscribed(self, subscribed: bool) -> None:
+        self.subscribed = subscribed
+        self.clear()
+
+    async def listen(self) -> None:
+        """Подписка на обновления цен (фоновая задача процесса API)"""
+
+        await listen_channel(
+            updates_channel(), self.apply_message, self._set_subscribed
+        )
+
+
+latest_prices = LatestPriceService()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_latest_prices(session, flush_context):
+    """Запомнить записанные и измененные цены до коммита"""
+
+    if not settings.LATEST_CACHE_ENABLED:
+        return
+
+    prices, invalidated = session.info.setdefault(_PENDING_KEY, ({}, set()))
+
+    for obj in session.new:
+        if isinstance(obj, Price) and obj.id is not None:
+            current = prices.get(obj.ticker)
+            if current is None or current["timestamp"] <= obj.covered_until:
+                prices[obj.ticker] = price_payload(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, Price):
+            invalidated.add(obj.ticker)
+
+    for obj in session.dirty:
+        if isinstance(obj, Price):
+            state = inspect(obj)
+            # Продленная серия повторов - новая последняя цена тикера
+            if state.attrs["valid_until"].history.has_changes():
+                current = prices.get(obj.ticker)
+                if current is None or current["timestamp"] <= obj.covered_until:
+                    prices[obj.ticker] = price_payload(obj)
+            for field in ("ticker_id", "stored_price", "timestamp"):
+                history = state.attrs[field].history
+                if not history.has_changes():
+                    continue
+                invalidated.add(obj.ticker)
+                if field == "ticker_id":
+                    invalidated.update(
+                        ticker_ids.get_name(session, ticker_id)
+                        for ticker_id in history.deleted
+                        if ticker_id is not None
+                    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_latest_prices(session):
+    """Обновить кеш последних цен после коммита"""
+
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    prices, invalidated = pending
+    try:
+        cache = LatestPriceCache()
+        if invalidated:
+            cache.invalidate(sorted(invalidated))
+        payloads = [
+            payload for ticker, payload in prices.items() if ticker not in invalidated
+        ]
+        if payloads:
+            cache.publish(payloads)
+    except redis.RedisError as e:
+        # Без записи в кеш новая цена видна после истечения
+        # LATEST_CACHE_TTL_SECONDS старой
+        logger.warning(
+            "Не удалось обновить кеш последних цен",
+            extra={"tickers": sorted(prices), "error": str(e)},
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_latest_prices(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,174 @@
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, redis_key
+
+# Атомарно забрать тикеры, срок опроса которых наступил: следующий срок
+# сразу сдвигается на текущий интервал тикера, поэтому пересекающиеся
+# запуски задачи не опрашивают один тикер дважды
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local claimed = {}
+for i = 3, #ARGV do
+    local ticker = ARGV[i]
+    local due = redis.call('HGET', KEYS[1], ticker)
+    if not due or tonumber(due) <= now then
+        local interval = redis.call('HGET', KEYS[2], ticker) or ARGV[2]
+        redis.call('HSET', KEYS[1], ticker, now + tonumber(interval))
+        table.insert(claimed, ticker)
+    end
+end
+return claimed
+"""
+
+# Общий для всех воркеров бюджет запросов (token bucket)
+_BUDGET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or capacity)
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local granted = math.min(requested, math.floor(tokens))
+redis.call('HSET', KEYS[1], 'tokens', tokens - granted, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return granted
+"""
+
+
+def realized_volatility(prices: Sequence[float]) -> float:
+    """Стандартное отклонение лог-доходностей между соседними ценами окна"""
+
+    returns = [
+        math.log(current / previous)
+        for previous, current in zip(prices, prices[1:])
+        if previous > 0 and current > 0
+    ]
+    if len(returns) < 2:
+        return 0.0
+    mean = sum(returns) / len(returns)
+    return math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+
+
+def price_change(prices: Sequence[float]) -> float:
+    """Относительное изменение цены за окно"""
+
+    if len(prices) < 2 or prices[0] <= 0:
+        return 0.0
+    return abs(prices[-1] / prices[0] - 1)
+
+
+def compute_interval(prices: Sequence[float]) -> int:
+    """
+    Интервал опроса (секунды) по ценам окна в хронологическом порядке.
+
+    Высокая волатильность или сильное движение цены - минимальный интервал,
+    спокойный рынок - максимальный, иначе базовый.
+    """
+
+    if len(prices) < 3:
+        return settings.POLL_BASE_INTERVAL_SECONDS
+
+    volatility = realized_volatility(prices)
+    change = price_change(prices)
+
+    if (
+        volatility >= settings.POLL_HIGH_VOLATILITY
+        or change >= settings.POLL_HIGH_CHANGE
+    ):
+        return settings.POLL_MIN_INTERVAL_SECONDS
+    if volatility <= settings.POLL_LOW_VOLATILITY:
+        return settings.POLL_MAX_INTERVAL_SECONDS
+    return settings.POLL_BASE_INTERVAL_SECONDS
+
+
+class PollingService:
+    """
+    Состояние адаптивного опроса в Redis: интервал и следующий срок
+    опроса каждого тикера, общий бюджет запросов к Deribit
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client or get_redis()
+        self.next_due_key = redis_key("poll", "next_due")
+        self.interval_key = redis_key("poll", "interval")
+        self.budget_key = redis_key("poll", "budget")
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._budget = self.redis.register_script(_BUDGET_SCRIPT)
+
+    def get_intervals(self) -> Dict[str, int]:
+        """Текущие интервалы опроса (секунды)"""
+
+        return {
+            (key.decode() if isinstance(key, bytes) else key): int(value) // 1000
+            for key, value in self.redis.hgetall(self.interval_key).items()
+        }
+
+    def claim_due(self, tickers: List[str], now_ms: Optional[int] = None) -> List[str]:
+        """
+        Забрать тикеры, которые пора опросить, в пределах бюджета.
+
+        При нехватке бюджета в первую очередь опрашиваются тикеры с
+        меньшим интервалом (более волатильные); остальные остаются
+        к опросу на следующем запуске.
+        """
+
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        claimed = [
+            ticker.decode() if isinstance(ticker, bytes) else ticker
+            for ticker in self._claim(
+                keys=[self.next_due_key, self.interval_key],
+                args=[now_ms, settings.POLL_BASE_INTERVAL_SECONDS * 1000, *tickers],
+            )
+        ]
+        if not claimed:
+            return []
+
+        intervals = self.get_intervals()
+        claimed.sort(
+            key=lambda ticker: intervals.get(
+                ticker, settings.POLL_BASE_INTERVAL_SECONDS
+            )
+        )
+
+        budget = settings.POLL_BUDGET_PER_MINUTE
+        granted = int(
+            self._budget(
+                keys=[self.budget_key],
+                args=[budget, budget / 60000, now_ms, len(claimed)],
+            )
+        )
+
+        deferred = claimed[granted:]
+        if deferred:
+            self.redis.hset(
+                self.next_due_key, mapping={ticker: now_ms for ticker in deferred}
+            )
+        return claimed[:granted]
+
+    def reschedule(
+        self, intervals: Dict[str, int], now_ms: Optional[int] = None
+    ) -> None:
+        """Сохранить новые интервалы (секунды) и следующие сроки опроса"""
+
+        if not intervals:
+            return
+
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(
+            self.interval_key,
+            mapping={ticker: seconds * 1000 for ticker, seconds in intervals.items()},
+        )
+        pipe.hset(
+            self.next_due_key,
+            mapping={
+                ticker: now_ms + seconds * 1000 for ticker, seconds in intervals.items()
+            },
+        )
+        pipe.execute()
@@ -1,30 +1,284 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple, Union
 
-from sqlalchemy import desc
+from sqlalchemy import Float, asc, cast, desc, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.models import Price
+from app.core.config import settings
+from app.db.models import (
+    Price,
+    fixed_point_prices,
+    max_run_ms,
+    price_factor,
+    run_timestamps,
+)
+from app.db.session import run_in_thread
 from app.schemas.price import PriceCreate, PriceUpdate
 
+from .archive_service import ArchiveService
+from .chunk_service import (
+    CHUNK_MS,
+    ChunkService,
+    ColdPrice,
+    cold_prices,
+    expand_runs,
+    merge_newest_first,
+    run_prices,
+)
+from .gap_service import expected_interval_ms
+from .rollup_service import RollupService
+from .stats_service import StatsService, batch_stats, combine_batches, summarize_ticks
+from .ticker_service import ticker_ids, ticker_registry
+
+
+def encode_cursor(price: Price, direction: str) -> str:
+    """Непрозрачный курсор страницы: позиция (timestamp, id) и направление"""
+
+    payload = json.dumps(
+        {"t": price.timestamp, "i": price.id, "d": direction}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, str]:
+    """
+    Разобрать курсор страницы
+
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp, price_id, direction = int(data["t"]), int(data["i"]), data["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if direction not in ("next", "prev"):
+        raise ValueError("Некорректный курсор")
+    return timestamp, price_id, direction
+
+
+def window_ticks(
+    prices: List[Price], skip: int, limit: int
+) -> List[Union[Price, ColdPrice]]:
+    """
+    Тики с skip по skip + limit строк prices, упорядоченных от новых к
+    старым: строка серии повторов - не меньше одного тика, поэтому первых
+    skip + limit строк хватает
+    """
+
+    return expand_runs(prices)[skip : skip + limit]
+
+
+def stream_runs(
+    rows: List[Mapping[str, Any]],
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> List[Mapping[str, Any]]:
+    """
+    Строки потока с восстановленными сериями повторов в диапазоне дат, от
+    новых к старым (как chunk_service.run_prices для ORM объектов)
+    """
+
+    ticks: List[Mapping[str, Any]] = []
+    for row in rows:
+        for timestamp in reversed(run_timestamps(row["timestamp"], row["run_offsets"])):
+            if start_timestamp and timestamp < start_timestamp:
+                break
+            if end_timestamp and timestamp > end_timestamp:
+                continue
+            if timestamp == row["timestamp"]:
+                ticks.append(row)
+            else:
+                ticks.append(dict(row, timestamp=timestamp, source_timestamp=None))
+    ticks.sort(key=lambda tick: tick["timestamp"], reverse=True)
+    return ticks
+
 
 class PriceService:
-    """Сервис для работы с ценами"""
+    """
+    Сервис для работы с ценами
+
+    В prices тикер хранится как ticker_id (smallint) из реестра tickers;
+    имя переводится в id через память процесса, поэтому запросы по тикеру
+    идут по индексу без обращения к реестру.
+    """
+
+    @staticmethod
+    def get_ticker_id(db: Session, ticker: str) -> Optional[int]:
+        """id тикера по имени; None, если цен тикера нет"""
+
+        return ticker_ids.get_id(db, ticker)
 
     @staticmethod
     def create_price(db: Session, price_data: PriceCreate) -> Price:
-        """Создать запись о цене"""
+        """
+        Создать запись о цене (при CHANGE_ONLY_ENABLED - строка, в которую
+        записан тик: новая или продленная серия повторов)
+        """
 
-        db_price = Price(
-            ticker=price_data.ticker,
-            price=price_data.price,
-            timestamp=price_data.timestamp,
-            source_timestamp=price_data.source_timestamp,
-        )
-        db.add(db_price)
+        db_price = PriceService._add_prices(db, [price_data])[0]
         db.commit()
         db.refresh(db_price)
         return db_price
 
+    @staticmethod
+    def create_prices(db: Session, prices_data: List[PriceCreate]) -> List[Price]:
+        """
+        Создать записи о ценах одним коммитом (строки, в которые записаны
+        тики, в порядке prices_data)
+        """
+
+        db_prices = PriceService._add_prices(db, prices_data)
+        db.commit()
+        return db_prices
+
+    @staticmethod
+    def _add_prices(db: Session, prices_data: List[PriceCreate]) -> List[Price]:
+        """
+        Добавить цены в сессию
+
+        При CHANGE_ONLY_ENABLED тик, цена которого отличается от цены
+        последней строки тикера не больше чем на допуск тикера, продлевает
+        эту строку (Price.extend_run). Серия прерывается пропущенным бакетом
+        (иначе поиск пропусков не увидел бы его), длиной
+        CHANGE_MAX_RUN_SECONDS и границей суток (блоки и архив хранят сутки).
+        Тик раньше последней строки (заполнение пропуска) так же продлевает
+        строку, начатую до него, не заходя на следующую строку. Тик, уже
+        записанный в серию (повторное воспроизведение спула или заполнения
+        пропусков), не записывается повторно. Агрегаты, свечи и кеш последних
+        цен обновляются обработчиками сессии по продленным строкам.
+        """
+
+        if not settings.CHANGE_ONLY_ENABLED:
+            db_prices = [
+                Price(
+                    ticker=price_data.ticker,
+                    price=price_data.price,
+                    timestamp=price_data.timestamp,
+                    source_timestamp=price_data.source_timestamp,
+                )
+                for price_data in prices_data
+            ]
+            db.add_all(db_prices)
+            return db_prices
+
+        heads: Dict[str, Optional[Price]] = {}
+        # Для тиков раньше последней строки: строка перед тиком и начало
+        # следующей за ней строки
+        earlier: Dict[str, Tuple[Optional[Price], int]] = {}
+        db_prices: List[Optional[Price]] = [None] * len(prices_data)
+        order = sorted(range(len(prices_data)), key=lambda i: prices_data[i].timestamp)
+        for i in order:
+            price_data = prices_data[i]
+            ticker = price_data.ticker
+            timestamp = price_data.timestamp
+            if ticker not in heads:
+                heads[ticker] = PriceService._run_head(db, ticker)
+            head = run = heads[ticker]
+            backfill = head is not None and timestamp < head.timestamp
+            if backfill:
+                if ticker not in earlier or timestamp >= earlier[ticker][1]:
+                    earlier[ticker] = PriceService._run_before(db, ticker, timestamp)
+                run = earlier[ticker][0]
+
+            if run is not None and PriceService._unchanged(run, price_data):
+                if timestamp in run.tick_timestamps():
+                    db_prices[i] = run
+                    continue
+                if PriceService._extends_run(run, timestamp):
+                    run.extend_run(timestamp)
+                    db_prices[i] = run
+                    continue
+
+            db_price = Price(
+                ticker=ticker,
+                price=price_data.price,
+                timestamp=price_data.timestamp,
+                source_timestamp=price_data.source_timestamp,
+            )
+            db.add(db_price)
+            db_prices[i] = db_price
+            if backfill:
+                earlier[ticker] = (db_price, earlier[ticker][1])
+            elif head is None or timestamp > head.covered_until:
+                heads[ticker] = db_price
+        return db_prices
+
+    @staticmethod
+    def _run_head(db: Session, ticker: str) -> Optional[Price]:
+        """
+        Последняя строка тикера; блокируется до коммита, чтобы параллельная
+        запись не продлила ту же серию
+        """
+
+        ticker_id = ticker_ids.get_id(db, ticker)
+        if ticker_id is None:
+            return None
+        return (
+            db.query(Price)
+            .filter(Price.ticker_id == ticker_id)
+            .order_by(desc(Price.timestamp))
+            .with_for_update()
+            .first()
+        )
+
+    @staticmethod
+    def _run_before(
+        db: Session, ticker: str, timestamp: int
+    ) -> Tuple[Optional[Price], int]:
+        """
+        Строка тикера, начатая не позже timestamp (блокируется, как в
+        _run_head), и начало следующей строки; вызывается для тиков раньше
+        последней строки, поэтому следующая строка есть
+        """
+
+        ticker_id = ticker_ids.get_id(db, ticker)
+        run = (
+            db.query(Price)
+            .filter(Price.ticker_id == ticker_id, Price.timestamp <= timestamp)
+            .order_by(desc(Price.timestamp))
+            .with_for_update()
+            .first()
+        )
+        next_start = (
+            db.query(Price.timestamp)
+            .filter(Price.ticker_id == ticker_id, Price.timestamp > timestamp)
+            .order_by(Price.timestamp)
+            .limit(1)
+            .scalar()
+        )
+        return run, next_start
+
+    @staticmethod
+    def _unchanged(head: Price, price_data: PriceCreate) -> bool:
+        """Цена тика в пределах допуска тикера от цены строки"""
+
+        epsilon = Decimal(str(settings.change_epsilon(price_data.ticker)))
+        change = Decimal(str(price_data.price)) - Decimal(str(head.price))
+        return abs(change) <= epsilon
+
+    @staticmethod
+    def _extends_run(head: Price, timestamp: int) -> bool:
+        """
+        Тик продолжает серию строки без пропущенного бакета (в смысле
+        GapService), лимита длины и смены суток
+        """
+
+        interval = expected_interval_ms()
+        return (
+            timestamp > head.covered_until
+            and timestamp // interval - head.covered_until // interval <= 1
+            and timestamp - head.timestamp <= max_run_ms()
+            and timestamp // CHUNK_MS == head.timestamp // CHUNK_MS
+        )
+
     @staticmethod
     def get_price(db: Session, price_id: int) -> Optional[Price]:
         """Получить цену по ID"""
@@ -34,28 +288,37 @@ class PriceService:
     @staticmethod
     def get_prices(
         db: Session, ticker: str, skip: int = 0, limit: int = 100
-    ) -> List[Price]:
-        """Получить список цен по тикеру"""
+    ) -> List[Union[Price, ColdPrice]]:
+        """Получить список цен по тикеру (серии повторов - по тикам)"""
 
-        return (
+        ticker_id = PriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return []
+
+        query = (
             db.query(Price)
-            .filter(Price.ticker == ticker)
+            .filter(Price.ticker_id == ticker_id)
             .order_by(desc(Price.timestamp))
-            .offset(skip)
-            .limit(limit)
-            .all()
         )
+        if not settings.CHANGE_ONLY_ENABLED:
+            return query.offset(skip).limit(limit).all()
+        return window_ticks(query.limit(skip + limit).all(), skip, limit)
 
     @staticmethod
-    def get_latest_price(db: Session, ticker: str) -> Optional[Price]:
-        """Получить последнюю цену по тикеру"""
+    def get_latest_price(db: Session, ticker: str) -> Optional[Union[Price, ColdPrice]]:
+        """Получить последнюю цену по тикеру (последний тик серии повторов)"""
 
-        return (
+        ticker_id = PriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return None
+
+        price = (
             db.query(Price)
-            .filter(Price.ticker == ticker)
+            .filter(Price.ticker_id == ticker_id)
             .order_by(desc(Price.timestamp))
             .first()
         )
+        return run_prices(price)[0] if price is not None else None
 
     @staticmethod
     def get_prices_by_date_range(
@@ -63,18 +326,34 @@ class PriceService:
         ticker: str,
         start_timestamp: Optional[int] = None,
         end_timestamp: Optional[int] = None,
-    ) -> List[Price]:
-        """Получить цены по тикеру в диапазоне дат"""
+    ) -> List[Union[Price, ColdPrice]]:
+        """
+        Получить цены по тикеру в диапазоне дат (вместе с ценами сжатых
+        блоков холодного уровня и архива)
+        """
+
+        ticker_id = PriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return []
 
-        query = db.query(Price).filter(Price.ticker == ticker)
+        query = db.query(Price).filter(Price.ticker_id == ticker_id)
 
         if start_timestamp:
-            query = query.filter(Price.timestamp >= start_timestamp)
+            query = query.filter(Price.covering_since(start_timestamp))
 
         if end_timestamp:
             query = query.filter(Price.timestamp <= end_timestamp)
 
-        return query.order_by(desc(Price.timestamp)).all()
+        hot = expand_runs(
+            query.order_by(desc(Price.timestamp)).all(),
+            start_timestamp,
+            end_timestamp,
+        )
+        cold = merge_newest_first(
+            ChunkService.get_prices(db, ticker, start_timestamp, end_timestamp),
+            ArchiveService.get_prices(ticker, start_timestamp, end_timestamp),
+        )
+        return merge_newest_first(hot, cold)
 
     @staticmethod
     def update_price(
@@ -110,32 +389,355 @@ class PriceService:
     def get_stats(db: Session, ticker: str) -> Dict[str, Any]:
         """Получить статистику по ценам для тикера"""
 
-        from sqlalchemy import func
+        # Агрегаты тикера - одна строка; без них дневные роллапы дают ответ
+        # за несколько строк вместо полного скана
+        stats = StatsService.get_stats(db, ticker)
+        if stats is not None:
+            return stats
+
+        stats = RollupService.get_stats(db, ticker)
+        if stats is not None:
+            return dict(stats, stddev_price=None)
+
+        # Полный пересчет: строки prices, сжатые блоки и оглавление архива
+        ticker_id = PriceService.get_ticker_id(db, ticker)
+        batch = None
+        if ticker_id is not None:
+            batch = combine_batches(
+                StatsService.summarize_rows(db, Price.ticker_id == ticker_id),
+                summarize_ticks(
+                    tick
+                    for ticks in ChunkService.iter_ticks(db, ticker)
+                    for tick in ticks
+                ),
+                *ArchiveService.iter_batches(db, ticker),
+            ).get(ticker)
+        if batch is None:
+            return {
+                "count": 0,
+                "min_price": None,
+                "max_price": None,
+                "avg_price": None,
+                "stddev_price": None,
+                "first_timestamp": None,
+                "last_timestamp": None,
+            }
+        return batch_stats(batch, ticker_ids.get_scale(db, ticker_id))
+
 
-        result = (
-            db.query(
-                func.count(Price.id).label("count"),
-                func.min(Price.price).label("min_price"),
-                func.max(Price.price).label("max_price"),
-                func.avg(Price.price).label("avg_price"),
-                func.min(Price.timestamp).label("first_timestamp"),
-                func.max(Price.timestamp).label("last_timestamp"),
+class AsyncPriceService:
+    """
+    Асинхронные варианты запросов PriceService для API
+
+    Частые запросы выполняются через asyncpg напрямую; статистика и запись,
+    использующие роллапы, выполняют синхронную логику PriceService в потоке
+    с синхронной сессией той же базы (run_in_thread): чтение блоков и
+    публикация в Redis из обработчиков коммита не блокируют цикл событий.
+    """
+
+    @staticmethod
+    async def get_ticker_id(db: AsyncSession, ticker: str) -> Optional[int]:
+        """id тикера по имени (реестр читается только при промахе)"""
+
+        ticker_id = ticker_ids.cached_id(ticker)
+        if ticker_id is None:
+            ticker_id = await db.run_sync(ticker_ids.get_id, ticker)
+        return ticker_id
+
+    @staticmethod
+    async def get_prices(
+        db: AsyncSession, ticker: str, skip: int = 0, limit: int = 100
+    ) -> List[Union[Price, ColdPrice]]:
+        """Получить список цен по тикеру (серии повторов - по тикам)"""
+
+        ticker_id = await AsyncPriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return []
+
+        query = (
+            select(Price)
+            .where(Price.ticker_id == ticker_id)
+            .order_by(desc(Price.timestamp))
+        )
+        if not settings.CHANGE_ONLY_ENABLED:
+            result = await db.execute(query.offset(skip).limit(limit))
+            return list(result.scalars().all())
+        result = await db.execute(query.limit(skip + limit))
+        return window_ticks(list(result.scalars().all()), skip, limit)
+
+    @staticmethod
+    async def get_prices_page(
+        db: AsyncSession, ticker: str, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[Union[Price, ColdPrice]], Optional[str], Optional[str]]:
+        """
+        Страница цен по тикеру от новых к старым (keyset пагинация)
+
+        Страница продолжается с позиции (timestamp, id) из курсора, поэтому
+        стоимость запроса не зависит от глубины страницы, в отличие от
+        offset. Условие по timestamp идет по индексу idx_ticker_timestamp,
+        сравнение по id разрешает только равные timestamp. Серии повторов
+        разворачиваются в тики; позиция тика серии - его время и id строки.
+
+        Returns:
+            Цены страницы, курсор следующей и курсор предыдущей страницы
+
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+
+        decoded = decode_cursor(cursor) if cursor is not None else None
+        ticker_id = await AsyncPriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return [], None, None
+
+        query = select(Price).where(Price.ticker_id == ticker_id)
+        direction = "next"
+
+        if decoded is not None:
+            timestamp, price_id, direction = decoded
+            position = tuple_(Price.timestamp, Price.id)
+            if direction == "next":
+                query = query.where(
+                    Price.timestamp <= timestamp, position < (timestamp, price_id)
+                )
+            else:
+                query = query.where(
+                    Price.timestamp >= timestamp, position > (timestamp, price_id)
+                )
+
+        order = desc if direction == "next" else asc
+        result = await db.execute(
+            query.order_by(order(Price.timestamp), order(Price.id)).limit(limit + 1)
+        )
+        prices = list(result.scalars().all())
+        if any(price.repeats for price in prices) or (
+            direction == "prev" and settings.CHANGE_ONLY_ENABLED
+        ):
+            prices = await AsyncPriceService._page_ticks(
+                db, ticker_id, prices, decoded, limit
             )
-            .filter(Price.ticker == ticker)
-            .first()
+        has_more = len(prices) > limit
+        prices = prices[:limit]
+
+        if direction == "prev":
+            prices.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = cursor is not None, has_more
+
+        if not prices:
+            return prices, None, None
+
+        next_cursor = encode_cursor(prices[-1], "next") if has_older else None
+        prev_cursor = encode_cursor(prices[0], "prev") if has_newer else None
+        return prices, next_cursor, prev_cursor
+
+    @staticmethod
+    async def _page_ticks(
+        db: AsyncSession,
+        ticker_id: int,
+        prices: List[Price],
+        decoded: Optional[Tuple[int, int, str]],
+        limit: int,
+    ) -> List[Union[Price, ColdPrice]]:
+        """
+        Первые limit + 1 тиков страницы по строкам страницы
+
+        У каждой строки есть тик после курсора в сторону старых цен (ее
+        начало), поэтому limit + 1 строк хватает. В сторону новых цен к
+        строкам добавляются серии, начатые до курсора и продолженные после
+        него.
+        """
+
+        if decoded is None:
+            timestamp, price_id, direction = None, None, "next"
+        else:
+            timestamp, price_id, direction = decoded
+        if direction == "prev":
+            result = await db.execute(
+                select(Price).where(
+                    Price.ticker_id == ticker_id,
+                    Price.timestamp < timestamp,
+                    Price.covering_since(timestamp),
+                )
+            )
+            prices = prices + list(result.scalars().all())
+
+        ticks = [tick for price in prices for tick in run_prices(price)]
+        if direction == "next" and decoded is not None:
+            ticks = [t for t in ticks if (t.timestamp, t.id) < (timestamp, price_id)]
+        elif direction == "prev":
+            ticks = [t for t in ticks if (t.timestamp, t.id) > (timestamp, price_id)]
+        ticks.sort(
+            key=lambda tick: (tick.timestamp, tick.id), reverse=direction == "next"
+        )
+        return ticks[: limit + 1]
+
+    @staticmethod
+    async def get_latest_price(
+        db: AsyncSession, ticker: str
+    ) -> Optional[Union[Price, ColdPrice]]:
+        """Получить последнюю цену по тикеру (последний тик серии повторов)"""
+
+        ticker_id = await AsyncPriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return None
+
+        result = await db.execute(
+            select(Price)
+            .where(Price.ticker_id == ticker_id)
+            .order_by(desc(Price.timestamp))
+            .limit(1)
+        )
+        price = result.scalars().first()
+        return run_prices(price)[0] if price is not None else None
+
+    @staticmethod
+    async def get_prices_by_date_range(
+        db: AsyncSession,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Union[Price, ColdPrice]]:
+        """
+        Получить цены по тикеру в диапазоне дат (вместе с ценами сжатых
+        блоков холодного уровня и архива; файлы архива читаются в потоке)
+        """
+
+        ticker_id = await AsyncPriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return []
+
+        query = AsyncPriceService._date_range_query(
+            select(Price), ticker_id, start_timestamp, end_timestamp
+        )
+        result = await db.execute(query)
+        hot = expand_runs(list(result.scalars().all()), start_timestamp, end_timestamp)
+
+        chunks = await db.execute(
+            ChunkService.select_chunks(ticker_id, start_timestamp, end_timestamp)
         )
+        cold = [
+            price
+            for rows in cold_prices(
+                chunks.scalars(), ticker, start_timestamp, end_timestamp
+            )
+            for price in rows
+        ]
+        partitions = ArchiveService.select_partitions(
+            ticker, start_timestamp, end_timestamp
+        )
+        if partitions:
+            archived = await asyncio.to_thread(
+                ArchiveService.get_prices, ticker, start_timestamp, end_timestamp
+            )
+            cold = merge_newest_first(cold, archived)
+        return merge_newest_first(hot, cold)
+
+    @staticmethod
+    async def stream_prices_by_date_range(
+        db: AsyncSession,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[List[Mapping[str, Any]]]:
+        """
+        Потоковое чтение цен по тикеру в диапазоне дат пачками строк
+
+        Серверный курсор отдает по batch_size строк (STREAM_BATCH_SIZE);
+        читаются только колонки, без создания ORM объектов, поэтому память
+        не зависит от размера диапазона. После строк prices отдаются цены
+        сжатых блоков и затем архива, по суткам за раз.
+        """
+
+        ticker_id = await AsyncPriceService.get_ticker_id(db, ticker)
+        if ticker_id is None:
+            return
+
+        price = Price.price
+        if fixed_point_prices():
+            # Строки потока минуют ORM, поэтому BIGINT декодируется в запросе
+            factor = price_factor(ticker_ids.cached_scale(ticker))
+            price = (cast(Price.price, Float) / factor).label("price")
+
+        query = AsyncPriceService._date_range_query(
+            select(
+                Price.id,
+                literal(ticker).label("ticker"),
+                price,
+                Price.timestamp,
+                Price.source_timestamp,
+                Price.created_at,
+                Price.run_offsets,
+            ),
+            ticker_id,
+            start_timestamp,
+            end_timestamp,
+        )
+        result = await db.stream(
+            query.execution_options(yield_per=batch_size or settings.STREAM_BATCH_SIZE)
+        )
+        async for partition in result.mappings().partitions():
+            if any(row["run_offsets"] for row in partition):
+                partition = stream_runs(partition, start_timestamp, end_timestamp)
+            if partition:
+                yield partition
+
+        chunks = await db.stream(
+            ChunkService.select_chunks(ticker_id, start_timestamp, end_timestamp)
+        )
+        async for chunk in chunks.scalars():
+            for rows in cold_prices([chunk], ticker, start_timestamp, end_timestamp):
+                if rows:
+                    yield [row._asdict() for row in rows]
+
+        for partition in ArchiveService.select_partitions(
+            ticker, start_timestamp, end_timestamp
+        ):
+            rows = await asyncio.to_thread(
+                ArchiveService.read_partition,
+                partition,
+                ticker,
+                start_timestamp,
+                end_timestamp,
+            )
+            if rows:
+                yield [row._asdict() for row in rows]
+
+    @staticmethod
+    def _date_range_query(
+        query,
+        ticker_id: int,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ):
+        """Фильтр по тикеру и диапазону дат, от новых цен к старым"""
+
+        query = query.where(Price.ticker_id == ticker_id)
+
+        if start_timestamp:
+            query = query.where(Price.covering_since(start_timestamp))
+
+        if end_timestamp:
+            query = query.where(Price.timestamp <= end_timestamp)
+
+        return query.order_by(desc(Price.timestamp))
+
+    @staticmethod
+    async def get_available_tickers(db: AsyncSession) -> List[str]:
+        """Получить список тикеров, для которых есть цены (из реестра)"""
+
+        return await ticker_registry.get_names(db)
+
+    @staticmethod
+    async def get_stats(db: AsyncSession, ticker: str) -> Dict[str, Any]:
+        """Получить статистику по ценам для тикера"""
+
+        return await run_in_thread(db, PriceService.get_stats, ticker)
+
+    @staticmethod
+    async def create_price(db: AsyncSession, price_data: PriceCreate) -> Price:
+        """Создать запись о цене (роллапы обновляются в той же транзакции)"""
 
-        return {
-            "count": result.count if result else 0,
-            "min_price": float(result.min_price)
-            if result and result.min_price
-            else None,
-            "max_price": float(result.max_price)
-            if result and result.max_price
-            else None,
-            "avg_price": float(result.avg_price)
-            if result and result.avg_price
-            else None,
-            "first_timestamp": result.first_timestamp if result else None,
-            "last_timestamp": result.last_timestamp if result else None,
-        }
+        return await run_in_thread(db, PriceService.create_price, price_data)
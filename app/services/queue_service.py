@@ -0,0 +1,120 @@
+import asyncio
+from typing import Any, Dict, List
+
+from celery import Celery
+
+from app.core.config import settings
+from app.core.metrics import summarize_ms
+from app.workers.lanes import queue_wait_key
+
+
+class QueueService:
+    """Сервис интроспекции очередей и воркеров Celery"""
+
+    @staticmethod
+    def known_queues(app: Celery) -> List[str]:
+        """Очереди из конфигурации Celery: очередь по умолчанию, маршруты и Beat"""
+
+        conf = app.conf
+        queues = {conf.task_default_queue}
+        queues.update(
+            route.get("queue")
+            for route in (conf.task_routes or {}).values()
+            if isinstance(route, dict)
+        )
+        queues.update(
+            entry.get("options", {}).get("queue")
+            for entry in (conf.beat_schedule or {}).values()
+            if isinstance(entry, dict)
+        )
+        return sorted(queue for queue in queues if isinstance(queue, str))
+
+    @staticmethod
+    async def get_queue_lengths(client, queues: List[str]) -> Dict[str, Dict[str, int]]:
+        """Длины очередей брокера одним конвейером LLEN"""
+
+        pipe = client.pipeline(transaction=False)
+        for queue in queues:
+            pipe.llen(queue)
+        lengths = await pipe.execute()
+        return {
+            queue: {"length": int(length)} for queue, length in zip(queues, lengths)
+        }
+
+    @staticmethod
+    async def get_queue_wait(client, queues: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Время ожидания задач в очередях по последним QUEUE_WAIT_SAMPLES"""
+
+        pipe = client.pipeline(transaction=False)
+        for queue in queues:
+            pipe.lrange(queue_wait_key(queue), 0, -1)
+        samples = await pipe.execute()
+        return {
+            queue: summarize_ms([float(value) for value in values])
+            for queue, values in zip(queues, samples)
+            if values
+        }
+
+    @staticmethod
+    async def inspect_workers(app: Celery, method: str) -> Dict[str, Any]:
+        """
+        Вызов inspect().<method>() вне цикла событий.
+
+        Ожидание ответов воркеров ограничено QUEUE_INSPECT_TIMEOUT_SECONDS,
+        поэтому медленный воркер не блокирует остальные запросы к API.
+        """
+
+        timeout = settings.QUEUE_INSPECT_TIMEOUT_SECONDS
+
+        def call() -> Dict[str, Any]:
+            inspector = app.control.inspect(timeout=timeout)
+            if not inspector:
+                return {}
+            return getattr(inspector, method)() or {}
+
+        return await asyncio.wait_for(asyncio.to_thread(call), timeout + 1)
+
+    @staticmethod
+    async def collect(app: Celery, client) -> Dict[str, Any]:
+        """
+        Состояние очередей, воркеров и брокера.
+
+        Длины очередей и ответы воркеров запрашиваются параллельно; ошибка
+        одного источника не скрывает данные остальных.
+        """
+
+        queues = QueueService.known_queues(app)
+        lengths, waits, active, registered = await asyncio.gather(
+            QueueService.get_queue_lengths(client, queues),
+            QueueService.get_queue_wait(client, queues),
+            QueueService.inspect_workers(app, "active"),
+            QueueService.inspect_workers(app, "registered"),
+            return_exceptions=True,
+        )
+
+        redis_connected = not isinstance(lengths, Exception)
+        errors = [
+            f"{name}: {type(result).__name__} {result}".strip()
+            for name, result in (("active", active), ("registered", registered))
+            if isinstance(result, Exception)
+        ]
+        active = active if isinstance(active, dict) else {}
+        registered = registered if isinstance(registered, dict) else {}
+
+        workers = {
+            "count": len(active),
+            "active": list(active.keys()),
+            "registered": registered,
+        }
+        if errors:
+            workers["errors"] = errors
+
+        return {
+            "queues": lengths if redis_connected else {},
+            "queue_wait": waits if isinstance(waits, dict) else {},
+            "workers": workers,
+            "redis": {
+                "connected": redis_connected,
+                "broker_url": app.conf.broker_url,
+            },
+        }
@@ -0,0 +1,331 @@
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.dialects import greatest_least, upsert_insert
+from app.db.models import (
+    Price,
+    PriceCandle,
+    decode_price,
+    price_factor,
+    stored_price_value,
+)
+
+from .candle_service import (
+    DAY_MS,
+    TIERS,
+    CandleService,
+    aggregate_candles,
+    ceil_timestamp,
+    floor_timestamp,
+    retention_days,
+)
+from .ticker_service import ticker_ids
+
+# Колонки, изменение которых переносит тики строки в другие бакеты
+_TRACKED_COLUMNS = ("ticker_id", "stored_price", "timestamp")
+_STALE_KEY = "rollups_stale"
+
+
+def _build_upsert(dialect_name: str, rows: List[Dict[str, Any]]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE, сливающий новые тики с существующей свечой
+    """
+
+    insert = upsert_insert(dialect_name)
+    greatest, least = greatest_least(dialect_name)
+
+    table = PriceCandle.__table__.c
+    stmt = insert(PriceCandle.__table__).values(rows)
+    excluded = stmt.excluded
+
+    return stmt.on_conflict_do_update(
+        index_elements=[table["ticker"], table["resolution"], table["bucket_start"]],
+        set_={
+            "open": case(
+                (
+                    excluded["open_timestamp"] < table["open_timestamp"],
+                    excluded["open"],
+                ),
+                else_=table["open"],
+            ),
+            "open_timestamp": least(
+                table["open_timestamp"], excluded["open_timestamp"]
+            ),
+            "high": greatest(table["high"], excluded["high"]),
+            "low": least(table["low"], excluded["low"]),
+            "close": case(
+                (
+                    excluded["close_timestamp"] >= table["close_timestamp"],
+                    excluded["close"],
+                ),
+                else_=table["close"],
+            ),
+            "close_timestamp": greatest(
+                table["close_timestamp"], excluded["close_timestamp"]
+            ),
+            "count": table["count"] + excluded["count"],
+            "sum": table["sum"] + excluded["sum"],
+        },
+    )
+
+
+class RollupService:
+    """Сервис инкрементальных OHLC роллапов (1m, 5m, 1h, 1d)"""
+
+    @staticmethod
+    def apply_ticks(db: Session, ticks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Слить тики в свечи всех уровней одним upsert-запросом.
+
+        Выполняется на соединении сессии, то есть в той же транзакции,
+        что и запись самих цен. Цены тиков - хранимые значения.
+        """
+
+        by_ticker: Dict[str, List[Dict[str, Any]]] = {}
+        for tick in ticks:
+            price = stored_price_value(tick["price"])
+            by_ticker.setdefault(tick["ticker"], []).append(
+                {
+                    "bucket_start": tick["timestamp"],
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "count": 1,
+                    "sum": price,
+                    "open_timestamp": tick["timestamp"],
+                    "close_timestamp": tick["timestamp"],
+                }
+            )
+
+        rows: List[Dict[str, Any]] = []
+        for ticker, candles in by_ticker.items():
+            candles.sort(key=lambda candle: candle["open_timestamp"])
+            for resolution, config in TIERS.items():
+                rows.extend(
+                    dict(candle, ticker=ticker, resolution=resolution)
+                    for candle in aggregate_candles(candles, config["size"])
+                )
+
+        if rows:
+            connection = db.connection()
+            connection.execute(_build_upsert(connection.dialect.name, rows))
+        return len(rows)
+
+    @staticmethod
+    def rebuild(
+        db: Session,
+        ticker: str,
+        start_timestamp: int,
+        end_timestamp: int,
+        now: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Пересобрать свечи всех уровней, пересекающиеся с диапазоном.
+
+        Каждый уровень строится из предыдущего. Часть диапазона, где исходный
+        уровень мог быть удален по сроку хранения, не трогается, чтобы не
+        потерять уже свернутую историю.
+        """
+
+        now = now if now is not None else int(time.time() * 1000)
+        rebuilt: Dict[str, int] = {}
+
+        for resolution, config in TIERS.items():
+            size = config["size"]
+            source = config["source"]
+
+            range_start = floor_timestamp(start_timestamp, size)
+            range_end = floor_timestamp(end_timestamp, size) + size
+
+            days = retention_days(source)
+            if days is not None:
+                range_start = max(
+                    range_start, ceil_timestamp(now - days * DAY_MS, size)
+                )
+
+            if range_end <= range_start:
+                rebuilt[resolution] = 0
+                continue
+
+            db.execute(
+                delete(PriceCandle).where(
+                    PriceCandle.ticker == ticker,
+                    PriceCandle.resolution == resolution,
+                    PriceCandle.bucket_start >= range_start,
+                    PriceCandle.bucket_start < range_end,
+                )
+            )
+            candles = aggregate_candles(
+                CandleService.read_source(db, ticker, source, range_start, range_end),
+                size,
+            )
+            # Запрос на соединении сессии: пересборка выполняется и из
+            # обработчика after_flush
+            if candles:
+                db.connection().execute(
+                    PriceCandle.__table__.insert(),
+                    [
+                        dict(candle, ticker=ticker, resolution=resolution)
+                        for candle in candles
+                    ],
+                )
+            rebuilt[resolution] = len(candles)
+
+        return rebuilt
+
+    @staticmethod
+    def get_stats(db: Session, ticker: str) -> Optional[Dict[str, Any]]:
+        """
+        Статистика по дневным роллапам.
+
+        Возвращает None, если роллапы не покрывают сырые данные целиком
+        (например, до выполнения rebuild_rollups_task), чтобы вызывающий
+        код посчитал статистику по таблице prices.
+        """
+
+        result = (
+            db.query(
+                func.count(PriceCandle.id).label("buckets"),
+                func.count(PriceCandle.sum).label("buckets_with_sum"),
+                func.sum(PriceCandle.count).label("count"),
+                func.min(PriceCandle.low).label("min_price"),
+                func.max(PriceCandle.high).label("max_price"),
+                func.sum(PriceCandle.sum).label("total"),
+                func.min(PriceCandle.open_timestamp).label("first_timestamp"),
+                func.max(PriceCandle.close_timestamp).label("last_timestamp"),
+            )
+            .filter(PriceCandle.ticker == ticker, PriceCandle.resolution == "1d")
+            .one()
+        )
+
+        if not result.buckets or result.buckets_with_sum != result.buckets:
+            return None
+
+        raw_bounds = (
+            db.query(func.min(Price.timestamp), func.max(Price.covered_until))
+            .filter(Price.ticker == ticker)
+            .one()
+        )
+        if raw_bounds[0] is not None and (
+            raw_bounds[0] < result.first_timestamp
+            or raw_bounds[1] > result.last_timestamp
+        ):
+            return None
+
+        scale = ticker_ids.get_scale(db, ticker_ids.get_id(db, ticker))
+        return {
+            "count": int(result.count),
+            "min_price": decode_price(result.min_price, scale),
+            "max_price": decode_price(result.max_price, scale),
+            "avg_price": float(
+                Decimal(str(result.total)) / int(result.count) / price_factor(scale)
+            ),
+            "first_timestamp": result.first_timestamp,
+            "last_timestamp": result.last_timestamp,
+        }
+
+
+def _changed_ranges(session, obj) -> List[Tuple[str, int, int]]:
+    """
+    Диапазоны (тикер, первый тик, последний тик) строки до и после изменения
+    цены, времени или тикера; пустой список, если строка только продлена
+    """
+
+    state = inspect(obj)
+    if not any(
+        state.attrs[column].history.has_changes() for column in _TRACKED_COLUMNS
+    ):
+        return []
+
+    # Прежние значения читаются из базы: у истекшей после коммита строки
+    # история атрибутов их не хранит
+    stored = session.execute(
+        select(Price.ticker_id, Price.timestamp, Price.valid_until).where(
+            Price.id == obj.id
+        )
+    ).one()
+    return [
+        (
+            ticker_ids.get_name(session, stored.ticker_id),
+            stored.timestamp,
+            stored.valid_until or stored.timestamp,
+        ),
+        (obj.ticker, obj.timestamp, obj.covered_until),
+    ]
+
+
+@event.listens_for(Session, "before_flush")
+def _apply_rollups_before_flush(session, flush_context, instances):
+    """
+    Обновить роллапы для новых цен и продленных серий в той же транзакции и
+    запомнить бакеты измененных и удаленных цен для пересборки
+    """
+
+    session.info.pop(_STALE_KEY, None)
+    if not settings.ROLLUPS_ENABLED:
+        return
+
+    ticks = []
+    for obj in session.new:
+        if (
+            isinstance(obj, Price)
+            and obj.ticker is not None
+            and obj.stored_price is not None
+            and obj.timestamp is not None
+        ):
+            ticks.extend(
+                {
+                    "ticker": obj.ticker,
+                    "price": obj.stored_price,
+                    "timestamp": timestamp,
+                }
+                for timestamp in obj.tick_timestamps()
+            )
+
+    # Минимум, максимум, открытие и закрытие свечи нельзя "вычесть":
+    # бакеты удаленных и измененных цен пересобираются после записи строк
+    stale: List[Tuple[str, int, int]] = [
+        (obj.ticker, obj.timestamp, obj.covered_until)
+        for obj in session.deleted
+        if isinstance(obj, Price)
+    ]
+
+    for obj in session.dirty:
+        if not isinstance(obj, Price):
+            continue
+        changed = _changed_ranges(session, obj)
+        if changed:
+            stale.extend(changed)
+            continue
+
+        # Продленная серия повторов: свечи получают только новые тики серии
+        history = inspect(obj).attrs["repeats"].history
+        old_repeats = (history.deleted[0] or 0) if history.deleted else obj.repeats
+        if obj.repeats and obj.repeats > (old_repeats or 0):
+            ticks.extend(
+                {
+                    "ticker": obj.ticker,
+                    "price": obj.stored_price,
+                    "timestamp": timestamp,
+                }
+                for timestamp in obj.tick_timestamps()[(old_repeats or 0) + 1 :]
+            )
+
+    if ticks:
+        RollupService.apply_ticks(session, ticks)
+    if stale:
+        session.info[_STALE_KEY] = stale
+
+
+@event.listens_for(Session, "after_flush")
+def _rebuild_stale_rollups(session, flush_context):
+    """Пересобрать бакеты удаленных и измененных цен по записанным строкам"""
+
+    for ticker, start_timestamp, end_timestamp in session.info.pop(_STALE_KEY, []):
+        RollupService.rebuild(session, ticker, start_timestamp, end_timestamp)
@@ -0,0 +1,510 @@
+import math
+from decimal import Decimal, localcontext
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Numeric,
+    case,
+    cast,
+    delete,
+    event,
+    func,
+    inspect,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.dialects import greatest_least, upsert_insert
+from app.db.models import (
+    Price,
+    Ticker,
+    TickerStats,
+    decode_price,
+    price_factor,
+    stored_price_value,
+)
+
+from .archive_service import ArchiveService
+from .chunk_service import ChunkService
+from .ticker_service import ticker_ids
+
+# Поля цены, изменение которых меняет агрегаты тикера (тикер - по ticker_id);
+# тики несут хранимое значение цены под ключом price
+_TRACKED_FIELDS = ("ticker", "stored_price", "timestamp")
+_TRACKED_COLUMNS = ("ticker_id", "stored_price", "timestamp")
+_PENDING_KEY = "ticker_stats_pending"
+
+
+def stddev(count: int, m2: float) -> Optional[float]:
+    """Выборочное стандартное отклонение по сумме квадратов отклонений"""
+
+    if count < 2:
+        return None
+    return math.sqrt(max(m2, 0.0) / (count - 1))
+
+
+def batch_stats(batch: Dict[str, Any], scale: Optional[int] = None) -> Dict[str, Any]:
+    """Ответ /prices/stats по агрегатам (хранимые значения - в масштабе scale)"""
+
+    count = int(batch["count"])
+    return {
+        "count": count,
+        "min_price": decode_price(batch["min_price"], scale),
+        "max_price": decode_price(batch["max_price"], scale),
+        "avg_price": float(Decimal(str(batch["sum"])) / count / price_factor(scale)),
+        "stddev_price": stddev(count, batch["m2"]),
+        "first_timestamp": batch["first_timestamp"],
+        "last_timestamp": batch["last_timestamp"],
+    }
+
+
+def summarize_ticks(ticks: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Агрегаты пачки тиков по тикерам: сумма и границы - в хранимых
+    значениях, среднее и m2 (по Уэлфорду) - в ценах масштаба tick["scale"]
+
+    Тик серии повторов несет число тиков ("ticks") и время последнего из
+    них ("until"); повторы учитываются как тики с весом (формула Уэста).
+    """
+
+    batches: Dict[str, Dict[str, Any]] = {}
+    for tick in ticks:
+        price = stored_price_value(tick["price"])
+        value = decode_price(price, tick.get("scale"))
+        weight = tick.get("ticks", 1)
+        timestamp = tick["timestamp"]
+        until = tick.get("until", timestamp)
+        batch = batches.get(tick["ticker"])
+        if batch is None:
+            batches[tick["ticker"]] = {
+                "count": weight,
+                "sum": price * weight,
+                "mean": value,
+                "m2": 0.0,
+                "min_price": price,
+                "max_price": price,
+                "first_timestamp": timestamp,
+                "last_timestamp": until,
+            }
+            continue
+
+        batch["count"] += weight
+        batch["sum"] += price * weight
+        delta = value - batch["mean"]
+        batch["mean"] += delta * weight / batch["count"]
+        batch["m2"] += delta * (value - batch["mean"]) * weight
+        batch["min_price"] = min(batch["min_price"], price)
+        batch["max_price"] = max(batch["max_price"], price)
+        batch["first_timestamp"] = min(batch["first_timestamp"], timestamp)
+        batch["last_timestamp"] = max(batch["last_timestamp"], until)
+    return batches
+
+
+def combine_batches(*sources: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Слить агрегаты нескольких источников по тикерам (параллельная формула
+    Чана для среднего и m2, как в _build_merge)
+    """
+
+    batches: Dict[str, Dict[str, Any]] = {}
+    for source in sources:
+        for ticker, batch in source.items():
+            current = batches.get(ticker)
+            if current is None:
+                batches[ticker] = dict(batch)
+                continue
+
+            count = current["count"] + batch["count"]
+            delta = batch["mean"] - current["mean"]
+            current["m2"] += (
+                batch["m2"] + delta * delta * current["count"] * batch["count"] / count
+            )
+            current["mean"] += delta * batch["count"] / count
+            current["count"] = count
+            current["sum"] += batch["sum"]
+            for field, pick in (
+                ("min_price", min),
+                ("max_price", max),
+                ("first_timestamp", min),
+                ("last_timestamp", max),
+            ):
+                current[field] = pick(current[field], batch[field])
+    return batches
+
+
+def _build_merge(dialect_name: str, rows: List[Dict[str, Any]]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE, сливающий агрегаты пачки с текущими
+    (параллельная формула Чана для среднего и m2). Правые части SET видят
+    значения строки до обновления, поэтому слияние атомарно.
+    """
+
+    insert = upsert_insert(dialect_name)
+    greatest, least = greatest_least(dialect_name)
+
+    table = TickerStats.__table__.c
+    stmt = insert(TickerStats.__table__).values(rows)
+    excluded = stmt.excluded
+
+    count = table["count"] + excluded["count"]
+    delta = excluded["mean"] - table["mean"]
+
+    return stmt.on_conflict_do_update(
+        index_elements=[table["ticker"]],
+        set_={
+            "count": count,
+            "sum": table["sum"] + excluded["sum"],
+            "mean": table["mean"] + delta * excluded["count"] / count,
+            "m2": table["m2"]
+            + excluded["m2"]
+            + delta * delta * table["count"] * excluded["count"] / count,
+            "min_price": least(table["min_price"], excluded["min_price"]),
+            "max_price": greatest(table["max_price"], excluded["max_price"]),
+            "first_timestamp": least(
+                table["first_timestamp"], excluded["first_timestamp"]
+            ),
+            "last_timestamp": greatest(
+                table["last_timestamp"], excluded["last_timestamp"]
+            ),
+            "updated_at": func.now(),
+        },
+    )
+
+
+def _build_removal(dialect_name: str, ticker: str, batch: Dict[str, Any]):
+    """
+    UPDATE, вычитающий агрегаты удаленных цен из текущих.
+
+    Минимум, максимум и границы по времени нельзя вычесть: если удаленные
+    цены их задевали, значение пересчитывается по таблице prices (границы
+    по времени - по индексу idx_ticker_timestamp). Выполняется после
+    удаления строк.
+    """
+
+    greatest, _ = greatest_least(dialect_name)
+    table = TickerStats.__table__.c
+
+    removed = batch["count"]
+    remaining = table["count"] - removed
+    delta = literal(batch["mean"]) - table["mean"]
+
+    def recompute(column, aggregate, affected):
+        current = select(aggregate).where(Price.ticker == ticker).scalar_subquery()
+        return case((affected, current), else_=column)
+
+    return (
+        update(TickerStats)
+        .where(TickerStats.ticker == ticker)
+        .values(
+            count=remaining,
+            sum=table["sum"] - batch["sum"],
+            mean=case(
+                (remaining > 0, table["mean"] - delta * removed / remaining),
+                else_=0.0,
+            ),
+            m2=case(
+                (
+                    remaining > 0,
+                    greatest(
+                        table["m2"]
+                        - batch["m2"]
+                        - delta * delta * table["count"] * removed / remaining,
+                        0.0,
+                    ),
+                ),
+                else_=0.0,
+            ),
+            min_price=recompute(
+                table["min_price"],
+                func.min(Price.price),
+                table["min_price"] >= batch["min_price"],
+            ),
+            max_price=recompute(
+                table["max_price"],
+                func.max(Price.price),
+                table["max_price"] <= batch["max_price"],
+            ),
+            first_timestamp=recompute(
+                table["first_timestamp"],
+                func.min(Price.timestamp),
+                table["first_timestamp"] >= batch["first_timestamp"],
+            ),
+            last_timestamp=recompute(
+                table["last_timestamp"],
+                func.max(Price.covered_until),
+                table["last_timestamp"] <= batch["last_timestamp"],
+            ),
+            updated_at=func.now(),
+        )
+    )
+
+
+class StatsService:
+    """
+    Сервис агрегатов тикеров (count, sum, min/max, среднее и дисперсия
+    по Уэлфорду, первая и последняя метка времени)
+
+    Агрегаты обновляются в той же транзакции, что и запись, изменение или
+    удаление цен, поэтому /prices/stats читает одну строку вместо скана
+    всех цен тикера.
+    """
+
+    @staticmethod
+    def merge(db: Session, batches: Dict[str, Dict[str, Any]]) -> None:
+        """Слить агрегаты новых цен с агрегатами тикеров"""
+
+        if not batches:
+            return
+
+        # Строки блокируются в одном порядке во всех транзакциях
+        rows = [dict(batch, ticker=ticker) for ticker, batch in sorted(batches.items())]
+        connection = db.connection()
+        connection.execute(_build_merge(connection.dialect.name, rows))
+
+    @staticmethod
+    def before_delete(db: Session, *criteria) -> Dict[str, Dict[str, Any]]:
+        """
+        Агрегаты цен, которые будут удалены массовым DELETE по условиям;
+        после удаления их передают в remove
+        """
+
+        if not settings.TICKER_STATS_ENABLED:
+            return {}
+        return StatsService.summarize_rows(db, *criteria)
+
+    @staticmethod
+    def remove(db: Session, batches: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Вычесть агрегаты удаленных цен (вызывается после удаления строк
+        в той же транзакции)
+        """
+
+        if not batches:
+            return
+
+        connection = db.connection()
+        for ticker, batch in sorted(batches.items()):
+            connection.execute(_build_removal(connection.dialect.name, ticker, batch))
+            connection.execute(
+                delete(TickerStats).where(
+                    TickerStats.ticker == ticker, TickerStats.count <= 0
+                )
+            )
+
+    @staticmethod
+    def summarize_rows(db: Session, *criteria) -> Dict[str, Dict[str, Any]]:
+        """
+        Агрегаты цен, подходящих под условия, по тикерам (например, перед
+        массовым удалением). m2 считается через сумму квадратов с точной
+        десятичной арифметикой (квадраты BIGINT считаются в NUMERIC).
+        Строка серии повторов учитывается с весом Price.ticks.
+        """
+
+        value = cast(Price.price, Numeric)
+        rows = db.execute(
+            select(
+                Ticker.name,
+                Ticker.price_scale,
+                func.sum(Price.ticks),
+                func.sum(Price.price * Price.ticks),
+                func.sum(value * value * Price.ticks),
+                func.min(Price.price),
+                func.max(Price.price),
+                func.min(Price.timestamp),
+                func.max(Price.covered_until),
+            )
+            .join(Ticker, Ticker.id == Price.ticker_id)
+            .where(*criteria)
+            .group_by(Ticker.name, Ticker.price_scale)
+        )
+
+        batches: Dict[str, Dict[str, Any]] = {}
+        for ticker, scale, count, total, squares, low, high, first, last in rows:
+            if not count:
+                continue
+            count = int(count)
+            total = stored_price_value(total)
+            factor = price_factor(scale)
+            with localcontext() as context:
+                context.prec = 60
+                m2 = Decimal(str(squares)) - Decimal(total) * total / count
+            batches[ticker] = {
+                "count": count,
+                "sum": total,
+                "mean": float(Decimal(total) / count / factor),
+                "m2": max(float(m2) / factor**2, 0.0),
+                "min_price": stored_price_value(low),
+                "max_price": stored_price_value(high),
+                "first_timestamp": first,
+                "last_timestamp": last,
+            }
+        return batches
+
+    @staticmethod
+    def rebuild(db: Session, ticker: Optional[str] = None) -> int:
+        """
+        Пересчитать агрегаты по таблице prices, сжатым блокам и архиву
+        (восстановление после сбоя или работы с TICKER_STATS_ENABLED=false)
+
+        Returns:
+            Количество пересчитанных тикеров
+        """
+
+        stats_criteria = [TickerStats.ticker == ticker] if ticker else []
+        price_criteria = [Price.ticker == ticker] if ticker else []
+
+        db.execute(delete(TickerStats).where(*stats_criteria))
+        batches = StatsService.summarize_rows(db, *price_criteria)
+        if batches:
+            db.execute(
+                TickerStats.__table__.insert(),
+                [dict(batch, ticker=name) for name, batch in batches.items()],
+            )
+
+        tickers = set(batches)
+        for ticks in ChunkService.iter_ticks(db, ticker):
+            chunk_batches = summarize_ticks(ticks)
+            StatsService.merge(db, chunk_batches)
+            tickers.update(chunk_batches)
+        for archive_batches in ArchiveService.iter_batches(db, ticker):
+            StatsService.merge(db, archive_batches)
+            tickers.update(archive_batches)
+        db.flush()
+        return len(tickers)
+
+    @staticmethod
+    def get_stats(db: Session, ticker: str) -> Optional[Dict[str, Any]]:
+        """
+        Статистика тикера по агрегатам.
+
+        Возвращает None, если агрегаты не ведутся или строки тикера нет,
+        чтобы вызывающий код посчитал статистику другим способом.
+        """
+
+        if not settings.TICKER_STATS_ENABLED:
+            return None
+
+        row = db.execute(
+            select(TickerStats.__table__).where(TickerStats.ticker == ticker)
+        ).first()
+        if row is None or row.count <= 0:
+            return None
+
+        scale = ticker_ids.get_scale(db, ticker_ids.get_id(db, ticker))
+        return batch_stats(row._asdict(), scale)
+
+
+def _tick(session: Session, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if any(values[field] is None for field in _TRACKED_FIELDS):
+        return None
+    ticker_id = ticker_ids.get_id(session, values["ticker"])
+    return {
+        "ticker": values["ticker"],
+        "price": values["stored_price"],
+        "timestamp": values["timestamp"],
+        "ticks": values.get("ticks", 1),
+        "until": values.get("until") or values["timestamp"],
+        "scale": ticker_ids.get_scale(session, ticker_id),
+    }
+
+
+def _values(obj: Price) -> Dict[str, Any]:
+    """Поля цены для _tick вместе с серией повторов"""
+
+    values = {field: getattr(obj, field) for field in _TRACKED_FIELDS}
+    values["ticks"] = obj.ticks
+    values["until"] = obj.valid_until
+    return values
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_ticker_stats(session, flush_context, instances):
+    """Запомнить добавляемые, изменяемые и удаляемые цены до записи"""
+
+    session.info.pop(_PENDING_KEY, None)
+    if not settings.TICKER_STATS_ENABLED:
+        return
+
+    added: List[Dict[str, Any]] = []
+    removed: List[Dict[str, Any]] = []
+
+    for obj in session.new:
+        if isinstance(obj, Price):
+            tick = _tick(session, _values(obj))
+            if tick:
+                added.append(tick)
+
+    for obj in session.deleted:
+        if isinstance(obj, Price):
+            tick = _tick(session, _values(obj))
+            if tick:
+                removed.append(tick)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Price):
+            continue
+        state = inspect(obj)
+        if not any(
+            state.attrs[column].history.has_changes() for column in _TRACKED_COLUMNS
+        ):
+            # Продление серии повторов - только новые тики с ценой строки
+            # (extend_run читает серию до изменения, поэтому история есть)
+            repeats = state.attrs["repeats"].history
+            old_repeats = repeats.deleted[0] if repeats.deleted else obj.repeats
+            added_ticks = (obj.repeats or 0) - (old_repeats or 0)
+            if added_ticks > 0:
+                tick = _tick(session, _values(obj))
+                if tick:
+                    added.append(
+                        dict(tick, timestamp=obj.valid_until, ticks=added_ticks)
+                    )
+            continue
+
+        # Изменение цены - удаление старого значения и запись нового.
+        # Прежние значения читаются из базы: у истекшей после коммита строки
+        # история атрибутов их не хранит
+        stored = session.execute(
+            select(
+                Price.ticker_id,
+                Price.stored_price,
+                Price.timestamp,
+                Price.repeats,
+                Price.valid_until,
+            ).where(Price.id == obj.id)
+        ).one()
+        old = _tick(
+            session,
+            {
+                "ticker": ticker_ids.get_name(session, stored.ticker_id),
+                "stored_price": stored.stored_price,
+                "timestamp": stored.timestamp,
+                "ticks": 1 + (stored.repeats or 0),
+                "until": stored.valid_until,
+            },
+        )
+        new = _tick(session, _values(obj))
+        if old:
+            removed.append(old)
+        if new:
+            added.append(new)
+
+    if added or removed:
+        session.info[_PENDING_KEY] = (added, removed)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_ticker_stats(session, flush_context):
+    """Обновить агрегаты тикеров в той же транзакции после записи строк"""
+
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+
+    added, removed = pending
+    # Сначала слияние: удаление старого значения при изменении цены не
+    # должно обнулять агрегат тикера
+    StatsService.merge(session, summarize_ticks(added))
+    StatsService.remove(session, summarize_ticks(removed))
@@ -0,0 +1,301 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import redis
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.redis_client import get_redis, listen_channel, redis_key
+from app.db.dialects import upsert_insert
+from app.db.models import Price, Ticker, TickerStats, fixed_point_prices
+
+logger = get_logger(__name__)
+
+_PENDING_KEY = "tickers_registered"
+
+
+def registry_channel() -> str:
+    return redis_key("tickers", "changed")
+
+
+class TickerService:
+    """Сервис реестра тикеров"""
+
+    @staticmethod
+    def register(db: Session, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Добавить тикеры, которых еще нет в реестре
+
+        Сначала читаются уже известные тикеры, вставка выполняется только
+        для новых, поэтому обычная запись цен не расходует значения
+        последовательности id.
+
+        Returns:
+            id тикеров, добавленных этим вызовом
+        """
+
+        names = set(names)
+        if not names:
+            return {}
+
+        connection = db.connection()
+        existing = set(
+            connection.execute(select(Ticker.name).where(Ticker.name.in_(names)))
+            .scalars()
+            .all()
+        )
+        missing = sorted(names - existing)
+        if not missing:
+            return {}
+
+        insert = upsert_insert(connection.dialect.name)
+        table = Ticker.__table__
+        stmt = (
+            insert(table)
+            .values(
+                [
+                    {"name": name, "price_scale": settings.price_scale(name)}
+                    for name in missing
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(table.c.name, table.c.id)
+        )
+        return {name: ticker_id for name, ticker_id in connection.execute(stmt)}
+
+    @staticmethod
+    async def get_names(db: AsyncSession) -> List[str]:
+        """Имена тикеров реестра"""
+
+        result = await db.execute(select(Ticker.name).order_by(Ticker.name))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_tickers(db: AsyncSession) -> List[Dict[str, Any]]:
+        """Тикеры реестра с количеством цен и границами по времени"""
+
+        result = await db.execute(
+            select(
+                Ticker.name,
+                Ticker.created_at,
+                TickerStats.count,
+                TickerStats.first_timestamp,
+                TickerStats.last_timestamp,
+            )
+            .outerjoin(TickerStats, TickerStats.ticker == Ticker.name)
+            .order_by(Ticker.name)
+        )
+        return [
+            {
+                "ticker": row.name,
+                "count": row.count or 0,
+                "first_timestamp": row.first_timestamp,
+                "last_timestamp": row.last_timestamp,
+                "registered_at": row.created_at,
+            }
+            for row in result
+        ]
+
+
+class TickerIds:
+    """
+    Соответствие имен, id и масштабов цен тикеров в памяти процесса
+
+    id и масштаб тикера не меняются, поэтому найденные значения не
+    устаревают; при промахе реестр (десятки строк) читается целиком.
+    Тикеры, добавленные в откаченной транзакции, забываются.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._scales: Dict[int, int] = {}
+
+    def remember(self, name: str, ticker_id: int, scale: int) -> None:
+        self._ids[name] = ticker_id
+        self._names[ticker_id] = name
+        self._scales[ticker_id] = scale
+
+    def forget(self, names: Iterable[str]) -> None:
+        for name in names:
+            ticker_id = self._ids.pop(name, None)
+            self._names.pop(ticker_id, None)
+            self._scales.pop(ticker_id, None)
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._names.clear()
+        self._scales.clear()
+
+    def cached_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def cached_scale(self, name: str) -> Optional[int]:
+        return self._scales.get(self._ids.get(name))
+
+    def load(self, db: Session) -> None:
+        """Прочитать реестр целиком"""
+
+        rows = db.connection().execute(
+            select(Ticker.id, Ticker.name, Ticker.price_scale)
+        )
+        for ticker_id, name, scale in rows:
+            self.remember(name, ticker_id, scale)
+
+    def get_id(self, db: Session, name: str) -> Optional[int]:
+        """id тикера по имени; None, если тикера нет в реестре"""
+
+        if name not in self._ids:
+            self.load(db)
+        return self._ids.get(name)
+
+    def get_name(self, db: Session, ticker_id: int) -> Optional[str]:
+        """Имя тикера по id"""
+
+        if ticker_id not in self._names:
+            self.load(db)
+        return self._names.get(ticker_id)
+
+    def get_scale(self, db: Session, ticker_id: int) -> Optional[int]:
+        """Масштаб цен тикера по id"""
+
+        if ticker_id not in self._scales:
+            self.load(db)
+        return self._scales.get(ticker_id)
+
+
+ticker_ids = TickerIds()
+
+
+class TickerRegistry:
+    """
+    Список тикеров реестра в памяти процесса API
+
+    Список сбрасывается сообщением о новом тикере и используется, только
+    пока подписка активна; без подписки каждый запрос читает реестр.
+    TICKER_REGISTRY_TTL_SECONDS ограничивает возраст списка при потере
+    сообщения.
+    """
+
+    def __init__(self):
+        self._names: Optional[List[str]] = None
+        self._loaded_at = 0.0
+        self.subscribed = False
+
+    def invalidate(self, *args: Any) -> None:
+        self._names = None
+
+    def _set_subscribed(self, subscribed: bool) -> None:
+        self.subscribed = subscribed
+        self.invalidate()
+
+    async def get_names(self, db: AsyncSession) -> List[str]:
+        """Имена тикеров (из памяти процесса или из реестра)"""
+
+        if (
+            self.subscribed
+            and self._names is not None
+            and time.monotonic() - self._loaded_at
+            < settings.TICKER_REGISTRY_TTL_SECONDS
+        ):
+            return list(self._names)
+
+        names = await TickerService.get_names(db)
+        if self.subscribed:
+            self._names, self._loaded_at = names, time.monotonic()
+        return list(names)
+
+    async def listen(self) -> None:
+        """Подписка на изменения реестра (фоновая задача процесса API)"""
+
+        await listen_channel(registry_channel(), self.invalidate, self._set_subscribed)
+
+
+ticker_registry = TickerRegistry()
+
+
+@event.listens_for(Session, "before_flush", insert=True)
+def _register_tickers(session, flush_context, instances):
+    """
+    Назначить ticker_id новым и измененным ценам, добавив в реестр новые
+    тикеры в той же транзакции, и закодировать цены в масштабе тикера
+
+    Выполняется до остальных обработчиков before_flush: агрегаты читают
+    уже назначенные ticker_id и хранимые значения цен.
+    """
+
+    pending = [
+        obj
+        for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, Price)
+        and obj.ticker is not None
+        and (obj.ticker_id is None or obj.stored_price is None)
+    ]
+    if not pending:
+        return
+
+    ids = {}
+    for name in {obj.ticker for obj in pending}:
+        ids[name] = ticker_ids.get_id(session, name)
+
+    unknown = [name for name, ticker_id in ids.items() if ticker_id is None]
+    if unknown:
+        registered = TickerService.register(session, unknown)
+        for name, ticker_id in registered.items():
+            ticker_ids.remember(name, ticker_id, settings.price_scale(name))
+        session.info.setdefault(_PENDING_KEY, set()).update(registered)
+        # Тикеры, одновременно добавленные другой транзакцией
+        for name in unknown:
+            ids[name] = ticker_ids.get_id(session, name)
+
+    for obj in pending:
+        # Цена, декодированная в прежнем масштабе, кодируется в масштабе
+        # назначенного тикера
+        price = obj.price
+        obj.ticker_id = ids[obj.ticker]
+        obj._scale = ticker_ids.get_scale(session, obj.ticker_id)
+        if fixed_point_prices():
+            obj.price = price
+
+
+@event.listens_for(Price, "load")
+def _load_ticker_name(target, context):
+    """Имя тикера и масштаб цен загруженной цены (из памяти процесса)"""
+
+    target._ticker = ticker_ids.get_name(context.session, target.ticker_id)
+    target._scale = ticker_ids.get_scale(context.session, target.ticker_id)
+    target._price = None
+
+
+@event.listens_for(Price, "refresh")
+def _refresh_ticker_name(target, context, attrs):
+    if attrs is None or "ticker_id" in attrs:
+        _load_ticker_name(target, context)
+
+
+@event.listens_for(Session, "after_commit")
+def _announce_tickers(session):
+    """Сообщить процессам API о новых тикерах после коммита"""
+
+    registered = session.info.pop(_PENDING_KEY, None)
+    if not registered:
+        return
+
+    ticker_registry.invalidate()
+    try:
+        get_redis().publish(registry_channel(), ",".join(sorted(registered)))
+    except redis.RedisError as e:
+        logger.warning(
+            "Не удалось сообщить о новых тикерах",
+            extra={"tickers": sorted(registered), "error": str(e)},
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tickers(session):
+    registered = session.info.pop(_PENDING_KEY, None)
+    if registered:
+        ticker_ids.forget(registered)
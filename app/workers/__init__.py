@@ -1,9 +1,23 @@
 from .celery_app import celery_app
-from .tasks import cleanup_old_prices_task, fetch_prices_task, health_check_task
+from .tasks import (
+    backfill_gaps_task,
+    cleanup_old_prices_task,
+    downsample_prices_task,
+    fetch_prices_task,
+    fetch_shard_task,
+    health_check_task,
+    rebuild_rollups_task,
+    rebuild_ticker_stats_task,
+)
 
 __all__ = [
     "celery_app",
     "fetch_prices_task",
+    "fetch_shard_task",
     "health_check_task",
     "cleanup_old_prices_task",
+    "downsample_prices_task",
+    "rebuild_rollups_task",
+    "rebuild_ticker_stats_task",
+    "backfill_gaps_task",
 ]
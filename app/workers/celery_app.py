@@ -1,7 +1,21 @@
+import os
+from datetime import timedelta
+
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_shutdown
+from prometheus_client import multiprocess, start_http_server
 
 from app.core.config import settings
+from app.core.metrics import metrics_registry
+
+from .lanes import (
+    MAINTENANCE_LANE,
+    MONITORING_LANE,
+    PRICES_LANE,
+    build_task_annotations,
+    build_task_routes,
+)
 
 
 def create_celery_app() -> Celery:
@@ -34,39 +48,66 @@ def create_celery_app() -> Celery:
         task_track_started=True,
         worker_prefetch_multiplier=1,  # По одной задаче на воркер
         worker_max_tasks_per_child=1000,  # Перезапуск после 1000 задач
-        # Расписание (Beat)
+        # Расписание (Beat): задачи ставит только лидер среди экземпляров Beat
+        beat_scheduler="app.workers.leader:LeaderScheduler",
         beat_schedule={
-            # Задача получения цен каждую минуту
+            # Задача получения цен каждую минуту; при адаптивном опросе
+            # запускается чаще и сама выбирает тикеры, которые пора опросить
             "fetch-prices-every-minute": {
                 "task": "fetch_prices_task",
-                "schedule": crontab(minute="*"),
-                "options": {"queue": "prices"},
+                "schedule": timedelta(seconds=settings.fetch_prices_period),
+                "options": {"queue": PRICES_LANE},
             },
             # Проверка здоровья API каждые 5 минут
             "health-check-every-5-minutes": {
                 "task": "health_check_task",
                 "schedule": crontab(minute="*/5"),
-                "options": {"queue": "monitoring"},
+                "options": {"queue": MONITORING_LANE},
+            },
+            # Прореживание цен по уровням хранения каждые 5 минут
+            "downsample-prices-every-5-minutes": {
+                "task": "downsample_prices_task",
+                "schedule": crontab(minute="*/5"),
+                "options": {"queue": MAINTENANCE_LANE},
+            },
+            # Выгрузка закрытых суток в Parquet архив каждый час
+            "archive-prices-every-hour": {
+                "task": "archive_prices_task",
+                "schedule": crontab(minute=30),
+                "options": {"queue": MAINTENANCE_LANE},
+            },
+            # Поиск и заполнение пропущенных минут каждые 15 минут
+            "backfill-gaps-every-15-minutes": {
+                "task": "backfill_gaps_task",
+                "schedule": crontab(minute="*/15"),
+                "options": {"queue": MAINTENANCE_LANE},
             },
         },
-        # Очереди
-        task_routes={
-            "app.workers.tasks.fetch_prices_task": {"queue": "prices"},
-            "app.workers.tasks.health_check_task": {"queue": "monitoring"},
-        },
-        # Обработка ошибок
-        task_annotations={
-            "*": {
-                "rate_limit": "10/m",  # Ограничение 10 задач в минуту
-                "max_retries": 3,
-                "retry_backoff": True,
-                "retry_backoff_max": 600,  # Максимум 10 минут
-                "retry_jitter": True,  # Случайная задержка для предотвращения stampede
-            }
-        },
+        # Линии обработки: маршруты и ограничения по задачам (см. lanes.py)
+        task_routes=build_task_routes(),
+        task_annotations=build_task_annotations(),
     )
 
     return app
 
 
 celery_app = create_celery_app()
+
+
+@worker_init.connect
+def _start_metrics_server(**kwargs):
+    """
+    HTTP сервер метрик в главном процессе воркера; метрики дочерних процессов
+    prefork собираются через PROMETHEUS_MULTIPROC_DIR
+    """
+
+    if settings.METRICS_PORT:
+        start_http_server(settings.METRICS_PORT, registry=metrics_registry())
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid=None, **kwargs):
+    """Исключить завершенный дочерний процесс из gauge-метрик (livesum)"""
+
+    if pid is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,132 @@
+import time
+from typing import Any, Dict, Optional
+
+import redis
+from celery.signals import before_task_publish, task_prerun
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.redis_client import get_redis, redis_key
+
+logger = get_logger(__name__)
+
+# Линии (очереди) обработки задач. Каждую линию обслуживает свой пул
+# воркеров, поэтому массовые задачи не задерживают ежеминутный сбор цен.
+PRICES_LANE = "prices"  # Критичная к задержке: сбор цен
+MONITORING_LANE = "monitoring"  # Проверки здоровья
+MAINTENANCE_LANE = "maintenance"  # Массовые задачи: бэкфилл, свертка, очистка
+
+# Профили маршрутизации: линия и ограничения выполнения для каждой задачи
+TASK_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fetch_prices_task": {
+        "queue": PRICES_LANE,
+        "soft_time_limit": 45,  # Успеть до следующего запуска Beat
+        "time_limit": 55,
+    },
+    "fetch_shard_task": {
+        "queue": PRICES_LANE,  # Ставится в личную очередь воркера линии prices
+        "soft_time_limit": 45,
+        "time_limit": 55,
+    },
+    "health_check_task": {
+        "queue": MONITORING_LANE,
+        "rate_limit": "30/m",
+        "time_limit": 30,
+    },
+    "downsample_prices_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "12/m",
+    },
+    "archive_prices_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "2/m",
+    },
+    "rebuild_rollups_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "2/m",
+    },
+    "rebuild_ticker_stats_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "2/m",
+    },
+    "backfill_gaps_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "4/m",
+    },
+    "cleanup_old_prices_task": {
+        "queue": MAINTENANCE_LANE,
+        "rate_limit": "1/m",
+    },
+}
+
+_ANNOTATED_OPTIONS = ("rate_limit", "soft_time_limit", "time_limit")
+
+
+def build_task_routes() -> Dict[str, Dict[str, str]]:
+    """Маршруты задач по линиям (ключ - имя задачи)"""
+
+    return {
+        name: {"queue": profile["queue"]} for name, profile in TASK_PROFILES.items()
+    }
+
+
+def build_task_annotations() -> Dict[str, Dict[str, Any]]:
+    """Ограничения выполнения по задачам вместо общего для всех rate_limit"""
+
+    annotations: Dict[str, Dict[str, Any]] = {
+        "*": {
+            "max_retries": 3,
+            "retry_backoff": True,
+            "retry_backoff_max": 600,  # Максимум 10 минут
+            "retry_jitter": True,  # Случайная задержка для предотвращения stampede
+        }
+    }
+    for name, profile in TASK_PROFILES.items():
+        options = {key: profile[key] for key in _ANNOTATED_OPTIONS if key in profile}
+        if options:
+            annotations[name] = options
+    return annotations
+
+
+def queue_wait_key(queue: str) -> str:
+    """Ключ Redis с последними временами ожидания задач в очереди"""
+
+    return redis_key("queue_wait", queue)
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    """Отметить время постановки задачи в очередь"""
+
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@task_prerun.connect
+def _record_queue_wait(task=None, **kwargs):
+    """
+    Сохранить время ожидания задачи в очереди (последние
+    QUEUE_WAIT_SAMPLES значений на очередь)
+    """
+
+    request = task.request if task is not None else None
+    published_at: Optional[float] = getattr(request, "published_at", None)
+    # Отложенные задачи ждут не в очереди, а до своего eta
+    if published_at is None or getattr(request, "eta", None):
+        return
+
+    queue = (getattr(request, "delivery_info", None) or {}).get("routing_key")
+    if not queue:
+        return
+    if queue.startswith(f"{PRICES_LANE}.shard."):
+        queue = PRICES_LANE
+
+    wait_ms = max((time.time() - float(published_at)) * 1000, 0.0)
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.lpush(queue_wait_key(queue), round(wait_ms, 2))
+        pipe.ltrim(queue_wait_key(queue), 0, settings.QUEUE_WAIT_SAMPLES - 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.debug("Не удалось сохранить время ожидания", extra={"error": str(e)})
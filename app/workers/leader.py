@@ -0,0 +1,233 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import redis
+from celery.beat import PersistentScheduler
+from celery.utils.time import maybe_make_aware
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.redis_client import get_redis, redis_key
+
+logger = get_logger(__name__)
+
+# Аренда планировщика: ее токен получают все задачи, поставленные лидером
+BEAT_LEASE_NAME = "beat"
+
+# Захват свободной аренды выдает новый (возрастающий) токен ограждения,
+# продление своей аренды возвращает текущий; чужая аренда - nil
+_ACQUIRE_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return redis.call('INCR', KEYS[2])
+end
+if owner == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return tonumber(redis.call('GET', KEYS[2]))
+end
+return false
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _default_owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """
+    Аренда лидера в Redis с токенами ограждения (fencing tokens).
+
+    Лидером является владелец ключа аренды, пока он продлевает ее чаще, чем
+    истекает LEADER_LEASE_TTL_SECONDS. Каждый новый лидер получает
+    токен больше всех предыдущих, поэтому работа бывшего лидера (например,
+    после долгой паузы процесса) распознается и отбрасывается.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        owner_id: Optional[str] = None,
+        client: Optional[redis.Redis] = None,
+    ):
+        self.name = name
+        self.owner_id = owner_id or _default_owner_id()
+        self.redis = client or get_redis()
+        self.key = redis_key("leader", name)
+        self.fence_key = redis_key("leader", name, "fence")
+        self.runs_key = redis_key("leader", name, "runs")
+        self.token: Optional[int] = None
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    def acquire(self) -> Optional[int]:
+        """
+        Захватить или продлить аренду
+
+        Returns:
+            Токен ограждения, если процесс является лидером, иначе None
+        """
+
+        token = self._acquire(
+            keys=[self.key, self.fence_key],
+            args=[self.owner_id, settings.LEADER_LEASE_TTL_SECONDS * 1000],
+        )
+        self.token = int(token) if token is not None else None
+        return self.token
+
+    def release(self) -> None:
+        """Освободить аренду, если она принадлежит процессу"""
+
+        self._release(keys=[self.key], args=[self.owner_id])
+        self.token = None
+
+    def record_run(self, entry_name: str, run_at: datetime) -> None:
+        """Сохранить время последней постановки записи расписания"""
+
+        self.redis.hset(self.runs_key, entry_name, run_at.timestamp())
+
+    def last_runs(self) -> Dict[str, datetime]:
+        """Время последних постановок записей расписания всеми лидерами"""
+
+        runs = {}
+        for name, value in self.redis.hgetall(self.runs_key).items():
+            if isinstance(name, bytes):
+                name = name.decode()
+            runs[name] = datetime.fromtimestamp(float(value), tz=timezone.utc)
+        return runs
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None
+
+
+def get_fencing_token(request: Any) -> Optional[int]:
+    """Токен ограждения из заголовков задачи (None при ручном запуске)"""
+
+    token = getattr(request, "fencing_token", None)
+    if token is None:
+        token = (getattr(request, "headers", None) or {}).get("fencing_token")
+    return int(token) if token is not None else None
+
+
+def is_stale_token(token: int, name: str = BEAT_LEASE_NAME) -> bool:
+    """
+    Выдан ли токен лидером, которого уже сменили.
+
+    При недоступности Redis токен считается действительным: пропуск
+    записи хуже, чем маловероятный дубль.
+    """
+
+    try:
+        current = get_redis().get(redis_key("leader", name, "fence"))
+    except redis.RedisError as e:
+        logger.warning("Не удалось проверить токен ограждения", extra={"error": str(e)})
+        return False
+    return current is not None and token < int(current)
+
+
+class LeaderScheduler(PersistentScheduler):
+    """
+    Планировщик Celery Beat для нескольких экземпляров.
+
+    Задачи ставит только держатель аренды BEAT_LEASE_NAME, передавая им
+    токен ограждения в заголовке fencing_token; резервные экземпляры
+    пытаются захватить аренду каждые LEADER_RENEW_SECONDS секунд.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.lease: Optional[LeaderLease] = None
+        super().__init__(*args, **kwargs)
+
+    def tick(self, *args, **kwargs) -> float:
+        if not settings.LEADER_ELECTION_ENABLED:
+            return super().tick(*args, **kwargs)
+
+        if self.lease is None:
+            self.lease = LeaderLease(BEAT_LEASE_NAME)
+
+        was_leader = self.lease.is_leader
+        try:
+            self.lease.acquire()
+        except redis.RedisError as e:
+            self.lease.token = None
+            logger.warning("Не удалось продлить аренду лидера", extra={"error": str(e)})
+
+        if not self.lease.is_leader:
+            if was_leader:
+                logger.warning("Планировщик потерял лидерство")
+            return settings.LEADER_RENEW_SECONDS
+
+        if not was_leader:
+            logger.info(
+                "Планировщик стал лидером",
+                extra={
+                    "owner_id": self.lease.owner_id,
+                    "fencing_token": self.lease.token,
+                },
+            )
+            self._restore_last_runs()
+
+        return min(super().tick(*args, **kwargs), settings.LEADER_RENEW_SECONDS)
+
+    def _restore_last_runs(self) -> None:
+        """
+        Перенять время последних запусков у предыдущих лидеров.
+
+        Запуски, уже поставленные ими, не повторяются; записи, срок которых
+        наступил до захвата аренды, но которые никто не поставил, выполняются
+        на ближайшем такте (повтор безопасен благодаря токену ограждения)
+        """
+
+        try:
+            last_runs = self.lease.last_runs()
+        except redis.RedisError as e:
+            logger.warning(
+                "Не удалось прочитать время последних запусков",
+                extra={"error": str(e)},
+            )
+            return
+
+        for name, entry in self.schedule.items():
+            last_run_at = last_runs.get(name)
+            if last_run_at is not None and last_run_at > maybe_make_aware(
+                entry.last_run_at
+            ):
+                entry.last_run_at = last_run_at
+        self._heap = None
+
+    def apply_async(self, entry, producer=None, advance=True, **kwargs):
+        if settings.LEADER_ELECTION_ENABLED and self.lease is not None:
+            if not self.lease.is_leader:
+                return None
+            headers = dict(entry.options.get("headers") or {})
+            headers["fencing_token"] = self.lease.token
+            entry.options = dict(entry.options, headers=headers)
+            result = super().apply_async(entry, producer, advance, **kwargs)
+            try:
+                self.lease.record_run(entry.name, self.schedule[entry.name].last_run_at)
+            except redis.RedisError as e:
+                logger.warning(
+                    "Не удалось сохранить время запуска",
+                    extra={"entry": entry.name, "error": str(e)},
+                )
+            return result
+        return super().apply_async(entry, producer, advance, **kwargs)
+
+    def close(self) -> None:
+        super().close()
+        if self.lease is not None and self.lease.is_leader:
+            try:
+                self.lease.release()
+            except redis.RedisError:
+                pass
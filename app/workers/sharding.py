@@ -0,0 +1,151 @@
+import bisect
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+from celery.signals import worker_ready, worker_shutdown
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.redis_client import get_redis, redis_key
+
+from .lanes import PRICES_LANE
+
+logger = get_logger(__name__)
+
+
+def shard_queue_name(worker_id: str) -> str:
+    """Личная очередь воркера, в которую приходит его часть инструментов"""
+
+    return f"{PRICES_LANE}.shard.{worker_id}"
+
+
+class HashRing:
+    """
+    Кольцо согласованного хеширования.
+
+    Каждый воркер представлен несколькими виртуальными узлами, поэтому при
+    появлении или выбытии воркера переезжает только ~1/N инструментов.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: Optional[int] = None):
+        replicas = replicas or settings.SHARD_VIRTUAL_NODES
+        self._ring: List[Tuple[int, str]] = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in set(nodes)
+            for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def get_node(self, key: str) -> Optional[str]:
+        """Воркер, владеющий ключом"""
+
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Распределить ключи по воркерам"""
+
+        assignment: Dict[str, List[str]] = {}
+        for key in keys:
+            node = self.get_node(key)
+            if node is not None:
+                assignment.setdefault(node, []).append(key)
+        return assignment
+
+
+class ShardMembership:
+    """
+    Членство воркеров в Redis: sorted set, где score - время последнего
+    heartbeat. Воркеры без heartbeat дольше SHARD_MEMBER_TTL_SECONDS
+    считаются выбывшими.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis = client or get_redis()
+        self.key = redis_key("shards", "members")
+
+    def heartbeat(self, worker_id: str) -> None:
+        """Зарегистрировать воркер или продлить его членство"""
+
+        self.redis.zadd(self.key, {worker_id: time.time()})
+
+    def leave(self, worker_id: str) -> None:
+        """Исключить воркер (штатная остановка)"""
+
+        self.redis.zrem(self.key, worker_id)
+
+    def members(self) -> List[str]:
+        """Живые воркеры; просроченные удаляются из множества"""
+
+        cutoff = time.time() - settings.SHARD_MEMBER_TTL_SECONDS
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.key, "-inf", cutoff)
+        pipe.zrange(self.key, 0, -1)
+        _, members = pipe.execute()
+        return sorted(
+            member.decode() if isinstance(member, bytes) else member
+            for member in members
+        )
+
+
+_heartbeat_stop = threading.Event()
+
+
+def _heartbeat_loop(worker_id: str) -> None:
+    membership = ShardMembership()
+    while not _heartbeat_stop.is_set():
+        try:
+            membership.heartbeat(worker_id)
+        except redis.RedisError as e:
+            logger.warning(
+                "Не удалось продлить членство воркера",
+                extra={"worker_id": worker_id, "error": str(e)},
+            )
+        _heartbeat_stop.wait(settings.SHARD_HEARTBEAT_SECONDS)
+
+
+@worker_ready.connect
+def _join_shards(sender=None, **kwargs):
+    """Подписать воркер на личную очередь и запустить heartbeat"""
+
+    if not settings.SHARDING_ENABLED:
+        return
+
+    # В кольцо входят только воркеры линии сбора цен
+    consumed = {queue.name for queue in sender.task_consumer.queues}
+    if PRICES_LANE not in consumed:
+        return
+
+    worker_id = sender.hostname
+    sender.add_task_queue(shard_queue_name(worker_id))
+    _heartbeat_stop.clear()
+    threading.Thread(
+        target=_heartbeat_loop,
+        args=(worker_id,),
+        name="shard-heartbeat",
+        daemon=True,
+    ).start()
+    logger.info("Воркер вступил в шардирование", extra={"worker_id": worker_id})
+
+
+@worker_shutdown.connect
+def _leave_shards(sender=None, **kwargs):
+    """Выйти из кольца сразу, не дожидаясь истечения TTL"""
+
+    if not settings.SHARDING_ENABLED:
+        return
+
+    _heartbeat_stop.set()
+    try:
+        ShardMembership().leave(sender.hostname)
+    except redis.RedisError as e:
+        logger.warning("Не удалось выйти из шардирования", extra={"error": str(e)})
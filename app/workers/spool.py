@@ -0,0 +1,265 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Заголовок сегмента: сигнатура и смещение первой не воспроизведенной записи
+SEGMENT_MAGIC = b"DTSPOOL1"
+_HEADER = struct.Struct("<8sQ")
+# Заголовок записи: длина данных и CRC32; нулевая длина - конец данных
+_RECORD = struct.Struct("<II")
+DATA_START = _HEADER.size
+
+
+class SpoolCorruptedError(Exception):
+    """Сегмент спула поврежден"""
+
+
+class SegmentSpool:
+    """
+    Локальный журнал цен на диске (store-and-forward)
+
+    Пока база данных недоступна, сборщик дописывает цены в сегменты
+    фиксированного размера, отображенные в память. Каждая запись несет
+    CRC32, поэтому оборванная при сбое запись отбрасывается при чтении.
+    Заполненный сегмент закрывается и начинается следующий; воспроизведенные
+    сегменты удаляются. Смещение воспроизведения хранится в заголовке
+    сегмента и сдвигается только после коммита пачки в БД.
+
+    Доступ процессов одного воркера сериализуется блокировкой файла.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        max_segments: Optional[int] = None,
+    ):
+        self.directory = Path(directory or settings.SPOOL_DIR)
+        self.segment_bytes = segment_bytes or settings.SPOOL_SEGMENT_BYTES
+        self.max_segments = max_segments or settings.SPOOL_MAX_SEGMENTS
+
+    @contextmanager
+    def _locked(self, blocking: bool = True) -> Iterator[bool]:
+        """
+        Эксклюзивная блокировка спула
+
+        Без ожидания (blocking=False) отдает False, если спул занят другим
+        процессом.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "a") as lock:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def segments(self) -> List[Path]:
+        """Сегменты от старых к новым"""
+
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.seg"))
+
+    def pending(self) -> bool:
+        """Есть ли сегменты, ожидающие воспроизведения"""
+
+        return bool(self.segments())
+
+    def _create_segment(self, sequence: int) -> Path:
+        path = self.directory / f"{sequence:012d}.seg"
+        with open(path, "wb") as f:
+            f.truncate(self.segment_bytes)
+            f.write(_HEADER.pack(SEGMENT_MAGIC, DATA_START))
+            f.flush()
+            os.fsync(f.fileno())
+        return path
+
+    @staticmethod
+    @contextmanager
+    def _mapped(path: Path) -> Iterator[mmap.mmap]:
+        with open(path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0)
+            try:
+                magic, _ = _HEADER.unpack_from(mm, 0)
+                if magic != SEGMENT_MAGIC:
+                    raise SpoolCorruptedError(f"Неверная сигнатура сегмента {path}")
+                yield mm
+            finally:
+                mm.close()
+
+    @staticmethod
+    def _scan(
+        mm: mmap.mmap, offset: int
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], bool]:
+        """
+        Прочитать записи сегмента начиная со смещения
+
+        Returns:
+            Список (смещение следующей записи, запись) до конца данных и
+            признак повреждения: запись с неверной длиной или CRC (например,
+            оборванная при сбое) и все записи после нее не читаются
+        """
+
+        records: List[Tuple[int, Dict[str, Any]]] = []
+        size = len(mm)
+        while offset + _RECORD.size <= size:
+            length, checksum = _RECORD.unpack_from(mm, offset)
+            if length == 0:
+                return records, False
+            start = offset + _RECORD.size
+            payload = mm[start : start + length]
+            if start + length > size or zlib.crc32(payload) != checksum:
+                return records, True
+            offset = start + length
+            records.append((offset, json.loads(payload)))
+        return records, False
+
+    def _end_offset(self, mm: mmap.mmap) -> int:
+        """
+        Смещение, с которого продолжается запись в сегмент (оборванная
+        последняя запись перезаписывается)
+        """
+
+        _, offset = _HEADER.unpack_from(mm, 0)
+        records, _ = self._scan(mm, offset)
+        return records[-1][0] if records else offset
+
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Дописать записи в журнал
+
+        Returns:
+            Количество записанных записей (меньше переданного, если журнал
+            достиг SPOOL_MAX_SEGMENTS)
+        """
+
+        if not records:
+            return 0
+
+        written = 0
+        with self._locked():
+            segments = self.segments()
+            path = segments[-1] if segments else self._create_segment(1)
+            count = len(segments) or 1
+
+            pending = [
+                json.dumps(record, separators=(",", ":")).encode() for record in records
+            ]
+            while pending:
+                with self._mapped(path) as mm:
+                    offset = self._end_offset(mm)
+                    while pending:
+                        payload = pending[0]
+                        end = offset + _RECORD.size + len(payload)
+                        if end > len(mm):
+                            break
+                        mm[offset + _RECORD.size : end] = payload
+                        _RECORD.pack_into(mm, offset, len(payload), zlib.crc32(payload))
+                        offset = end
+                        written += 1
+                        pending.pop(0)
+                    mm.flush()
+
+                if not pending:
+                    break
+                if DATA_START + _RECORD.size + len(pending[0]) > self.segment_bytes:
+                    raise ValueError("Запись больше размера сегмента спула")
+                if count >= self.max_segments:
+                    logger.error(
+                        "Спул переполнен, записи отброшены",
+                        extra={"dropped": len(pending), "segments": count},
+                    )
+                    break
+                path = self._create_segment(int(path.stem) + 1)
+                count += 1
+
+        return written
+
+    def replay(
+        self,
+        handler: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None,
+        blocking: bool = True,
+    ) -> int:
+        """
+        Воспроизвести журнал пачками через handler (например, запись в БД)
+
+        Смещение сдвигается после каждой успешной пачки; исключение handler
+        прерывает воспроизведение, пачка повторится при следующем вызове.
+        Без ожидания (blocking=False) спул, который уже воспроизводит или
+        пополняет другой процесс, пропускается.
+
+        Returns:
+            Количество воспроизведенных записей
+        """
+
+        batch_size = batch_size or settings.SPOOL_REPLAY_BATCH_SIZE
+        max_batches = max_batches or settings.SPOOL_REPLAY_MAX_BATCHES
+        replayed = 0
+        batches = 0
+
+        with self._locked(blocking) as acquired:
+            for path in self.segments() if acquired else []:
+                drained = True
+                try:
+                    with self._mapped(path) as mm:
+                        _, offset = _HEADER.unpack_from(mm, 0)
+                        records, corrupted = self._scan(mm, offset)
+                        for start in range(0, len(records), batch_size):
+                            if batches >= max_batches:
+                                drained = False
+                                break
+                            chunk = records[start : start + batch_size]
+                            handler([record for _, record in chunk])
+                            self._commit_offset(mm, chunk[-1][0])
+                            replayed += len(chunk)
+                            batches += 1
+                except SpoolCorruptedError as e:
+                    corrupted = True
+                    logger.error(
+                        "Поврежденный сегмент спула",
+                        extra={"segment": str(path), "error": str(e)},
+                    )
+
+                if not drained:
+                    break
+                if corrupted:
+                    # Записи после повреждения не восстановить: сегмент
+                    # откладывается для разбора
+                    target = path.with_name(f"{path.stem}.{int(time.time())}.corrupt")
+                    path.rename(target)
+                    logger.error(
+                        "Сегмент спула отложен после повреждения",
+                        extra={"segment": str(target)},
+                    )
+                else:
+                    path.unlink()
+
+        if replayed:
+            logger.info("Спул воспроизведен", extra={"records": replayed})
+        return replayed
+
+    @staticmethod
+    def _commit_offset(mm: mmap.mmap, offset: int) -> None:
+        _HEADER.pack_into(mm, 0, SEGMENT_MAGIC, offset)
+        mm.flush()
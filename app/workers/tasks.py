@@ -1,22 +1,41 @@
 import asyncio
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 import redis
-from sqlalchemy import delete
+from celery.signals import worker_ready
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 from app.clients.deribit import DeribitClient
 from app.clients.exceptions import DeribitAPIError, DeribitConnectionError
 from app.core.config import settings
+from app.core.health import run_probes
 from app.core.logging import get_logger
+from app.db.database import engine
+from app.db.models import Price, run_timestamps
 from app.db.session import get_db_context
 from app.schemas.price import PriceCreate
+from app.services.candle_service import TIERS, CandleService
+from app.services.freshness_service import FreshnessService
+from app.services.gap_service import GapService
+from app.services.polling_service import PollingService, compute_interval
 from app.services.price_service import PriceService
+from app.services.rollup_service import RollupService
+from app.services.stats_service import StatsService
 
 from .celery_app import celery_app
+from .lanes import PRICES_LANE
+from .leader import get_fencing_token, is_stale_token
+from .sharding import HashRing, ShardMembership, shard_queue_name
+from .spool import SegmentSpool
 
 logger = get_logger(__name__)
 
+# Ошибки недоступности базы данных (соединение, failover, таймаут пула),
+# при которых цены уходят в локальный спул
+DB_UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
 
 def run_async(coro):
     """Запуск асинхронной функции в синхронном контексте"""
@@ -29,13 +48,203 @@ def run_async(coro):
 def fetch_prices_task(self) -> Dict[str, Any]:
     """
     Задача для получения и сохранения цен с Deribit
+
+    При SHARDING_ENABLED задача только распределяет инструменты по живым
+    воркерам и ставит им fetch_shard_task; если живых воркеров нет,
+    цены собираются здесь же целиком.
+
+    Задача, поставленная бывшим лидером Beat (устаревший токен
+    ограждения), ничего не записывает.
     """
     task_id = self.request.id
+    fencing_token = get_fencing_token(self.request)
     logger.info(
         "Запуск задачи получения цен",
-        extra={"task_id": task_id, "attempt": self.request.retries},
+        extra={
+            "task_id": task_id,
+            "attempt": self.request.retries,
+            "fencing_token": fencing_token,
+        },
+    )
+
+    tickers = None
+    if settings.ADAPTIVE_POLLING_ENABLED:
+        tickers = _claim_due_tickers(task_id)
+        if tickers == []:
+            return {
+                "task_id": task_id,
+                "status": "not_due",
+                "timestamp": int(time.time() * 1000),
+            }
+
+    if settings.SHARDING_ENABLED:
+        if fencing_token is not None and is_stale_token(fencing_token):
+            return _fenced_result(task_id, fencing_token)
+        dispatched = _dispatch_shards(task_id, fencing_token, tickers)
+        if dispatched is not None:
+            return dispatched
+
+    return _collect_prices(task_id, tickers, _save_prices_to_db, fencing_token)
+
+
+@celery_app.task(bind=True, name="fetch_shard_task")
+def fetch_shard_task(self, tickers: List[str]) -> Dict[str, Any]:
+    """
+    Задача получения цен для части инструментов, назначенной воркеру
+    """
+    task_id = self.request.id
+    fencing_token = get_fencing_token(self.request)
+    logger.info(
+        "Запуск задачи получения цен шарда",
+        extra={"task_id": task_id, "tickers": tickers},
+    )
+
+    return _collect_prices(task_id, tickers, _save_prices_batch, fencing_token)
+
+
+def _fenced_result(task_id: str, fencing_token: int) -> Dict[str, Any]:
+    """Результат задачи, отброшенной из-за устаревшего токена ограждения"""
+
+    logger.warning(
+        "Задача поставлена бывшим лидером и пропущена",
+        extra={"task_id": task_id, "fencing_token": fencing_token},
+    )
+    return {
+        "task_id": task_id,
+        "status": "fenced",
+        "fencing_token": fencing_token,
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+def _claim_due_tickers(task_id: str) -> Optional[List[str]]:
+    """
+    Тикеры, которые пора опросить при адаптивном опросе
+
+    Returns:
+        Список тикеров или None, если состояние опроса недоступно
+        (тогда опрашиваются все тикеры)
+    """
+
+    try:
+        return PollingService().claim_due(list(settings.TRACKED_TICKERS))
+    except redis.RedisError as e:
+        logger.warning(
+            "Состояние адаптивного опроса недоступно, опрашиваются все тикеры",
+            extra={"task_id": task_id, "error": str(e)},
+        )
+        return None
+
+
+def _update_poll_intervals(tickers: List[str]) -> Dict[str, int]:
+    """Пересчитать интервалы опроса тикеров по последним ценам окна"""
+
+    intervals: Dict[str, int] = {}
+    with get_db_context() as db:
+        for ticker in tickers:
+            recent = PriceService.get_prices(
+                db, ticker, limit=settings.POLL_VOLATILITY_WINDOW
+            )
+            intervals[ticker] = compute_interval(
+                [float(price.price) for price in reversed(recent)]
+            )
+
+    PollingService().reschedule(intervals)
+    return intervals
+
+
+def _record_freshness(
+    task_id: str, prices_data: Dict[str, Dict[str, Any]], committed_at: int
+) -> None:
+    """Сохранить времена этапов тиков для отчета о свежести данных"""
+
+    ticks = {
+        ticker: {
+            "exchange": data.get("exchange_timestamp"),
+            "fetched": data.get("timestamp"),
+            "committed": committed_at,
+        }
+        for ticker, data in prices_data.items()
+        if isinstance(data, dict)
+    }
+    try:
+        FreshnessService().record(ticks)
+    except redis.RedisError as e:
+        logger.warning(
+            "Не удалось сохранить свежесть данных",
+            extra={"task_id": task_id, "error": str(e)},
+        )
+
+
+def _dispatch_shards(
+    task_id: str,
+    fencing_token: Optional[int] = None,
+    tickers: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Распределение инструментов по воркерам согласованным хешированием.
+
+    Кольцо строится заново из текущего членства при каждом запуске, поэтому
+    появление или выбытие воркера учитывается со следующей минуты.
+
+    Returns:
+        Результат распределения или None, если шардирование недоступно
+    """
+
+    try:
+        members = ShardMembership().members()
+    except redis.RedisError as e:
+        logger.warning(
+            "Членство шардов недоступно, цены собираются локально",
+            extra={"task_id": task_id, "error": str(e)},
+        )
+        return None
+
+    if not members:
+        logger.warning(
+            "Нет живых воркеров шардирования, цены собираются локально",
+            extra={"task_id": task_id},
+        )
+        return None
+
+    assignment = HashRing(members).assign(tickers or settings.TRACKED_TICKERS)
+    headers = {"fencing_token": fencing_token} if fencing_token is not None else {}
+    # Шард, не взятый до следующего запуска Beat, устарел: его инструменты
+    # уже распределены заново, а очередь выбывшего воркера не копится
+    for worker_id, tickers in assignment.items():
+        fetch_shard_task.apply_async(
+            args=[tickers],
+            queue=shard_queue_name(worker_id),
+            headers=headers,
+            expires=settings.fetch_prices_period,
+        )
+
+    logger.info(
+        "Инструменты распределены по шардам",
+        extra={"task_id": task_id, "members": members, "assignment": assignment},
     )
 
+    return {
+        "task_id": task_id,
+        "status": "dispatched",
+        "members": members,
+        "shards": assignment,
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+def _collect_prices(
+    task_id: str,
+    indices: Optional[List[str]],
+    save,
+    fencing_token: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Получение цен указанных индексов и их сохранение функцией save
+
+    Токен ограждения проверяется непосредственно перед записью.
+    """
+
     results = {
         "task_id": task_id,
         "status": "success",
@@ -47,18 +256,42 @@ def fetch_prices_task(self) -> Dict[str, Any]:
     }
 
     try:
-        prices_data = run_async(_fetch_prices_async())
+        prices_data = run_async(_fetch_prices_async(indices))
 
         if not prices_data:
             results["status"] = "no_data"
             logger.warning("Не получены данные о ценах")
             return results
 
-        saved_count = _save_prices_to_db(prices_data)
+        if fencing_token is not None and is_stale_token(fencing_token):
+            return _fenced_result(task_id, fencing_token)
+
+        try:
+            saved_count = save(prices_data)
+        except DB_UNAVAILABLE_ERRORS as e:
+            if not settings.SPOOL_ENABLED:
+                raise
+            return _spool_prices(task_id, prices_data, results, e)
+        committed_at = int(time.time() * 1000)
+
+        if settings.SPOOL_ENABLED and saved_count:
+            results["prices_replayed"] = _replay_spool(task_id)
+
+        if settings.FRESHNESS_TRACKING_ENABLED and saved_count:
+            _record_freshness(task_id, prices_data, committed_at)
 
         results["prices_fetched"] = len(prices_data)
         results["prices_saved"] = saved_count
 
+        if settings.ADAPTIVE_POLLING_ENABLED and saved_count:
+            try:
+                results["poll_intervals"] = _update_poll_intervals(list(prices_data))
+            except Exception as e:
+                logger.warning(
+                    "Не удалось пересчитать интервалы опроса",
+                    extra={"task_id": task_id, "error": str(e)},
+                )
+
         # Логика определения статуса
         if saved_count == 0:
             results["status"] = "error"
@@ -110,12 +343,16 @@ def fetch_prices_task(self) -> Dict[str, Any]:
     return results
 
 
-async def _fetch_prices_async() -> Dict[str, Dict[str, Any]]:
+async def _fetch_prices_async(
+    indices: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
     """
     Асинхронное получение цен с Deribit API с логикой повторных попыток
+
+    indices: индексы для получения (по умолчанию все TRACKED_TICKERS)
     """
 
-    indices = ["btc_usd", "eth_usd"]
+    indices = list(indices or settings.TRACKED_TICKERS)
     max_retries = 3
     retry_delay = 0.1  # Задержка между попытками (в секундах)
     last_exception = None
@@ -135,9 +372,13 @@ async def _fetch_prices_async() -> Dict[str, Dict[str, Any]]:
                         and "error" not in data
                         and "index_price" in data
                     ):
+                        us_out = data.get("us_out")
                         result[ticker] = {
                             "index_price": data["index_price"],
                             "timestamp": current_timestamp,
+                            "exchange_timestamp": (
+                                us_out // 1000 if us_out is not None else None
+                            ),
                             "source_data": data,
                         }
                 return result
@@ -156,9 +397,132 @@ async def _fetch_prices_async() -> Dict[str, Dict[str, Any]]:
         raise last_exception
 
 
+def _spool_prices(
+    task_id: str,
+    prices_data: Dict[str, Dict[str, Any]],
+    results: Dict[str, Any],
+    error: Exception,
+) -> Dict[str, Any]:
+    """Записать цены в локальный спул, пока база данных недоступна"""
+
+    records = [
+        {
+            "ticker": ticker,
+            "price": data["index_price"],
+            "timestamp": data["timestamp"],
+            "source_timestamp": _source_timestamp(data),
+        }
+        for ticker, data in prices_data.items()
+        if isinstance(data, dict)
+    ]
+    spooled = SegmentSpool().append(records)
+
+    logger.warning(
+        "База данных недоступна, цены записаны в спул",
+        extra={"task_id": task_id, "spooled": spooled, "error": str(error)},
+    )
+
+    results["status"] = "spooled"
+    results["prices_fetched"] = len(prices_data)
+    results["prices_spooled"] = spooled
+    results["errors"].append(f"База данных недоступна: {str(error)}")
+    return results
+
+
+def _replay_spool(task_id: str, blocking: bool = True) -> int:
+    """Дописать в БД цены, накопленные в спуле за время недоступности"""
+
+    spool = SegmentSpool()
+    if not spool.pending():
+        return 0
+
+    try:
+        return spool.replay(_save_spooled_prices, blocking=blocking)
+    except Exception as e:
+        logger.warning(
+            "Не удалось воспроизвести спул",
+            extra={"task_id": task_id, "error": str(e)},
+        )
+        return 0
+
+
+@worker_ready.connect
+def _replay_spool_on_start(sender=None, **kwargs):
+    """
+    Воспроизвести спул при запуске воркера линии сбора цен
+
+    Цены, записанные в спул до перезапуска, попадают в БД сразу, а не после
+    следующей успешной записи. Спул, который уже воспроизводит другой
+    воркер с тем же SPOOL_DIR, пропускается без ожидания: его допишет
+    владелец блокировки. Соединения главного процесса закрываются, чтобы
+    их не унаследовали дочерние процессы prefork.
+    """
+
+    if not settings.SPOOL_ENABLED:
+        return
+
+    consumed = {queue.name for queue in sender.task_consumer.queues}
+    if PRICES_LANE not in consumed or not SegmentSpool().pending():
+        return
+
+    replayed = _replay_spool(sender.hostname, blocking=False)
+    engine.dispose()
+    if replayed:
+        logger.info(
+            "Спул воспроизведен при запуске воркера",
+            extra={"worker_id": sender.hostname, "prices_replayed": replayed},
+        )
+
+
+def _save_spooled_prices(records: List[Dict[str, Any]]) -> int:
+    """
+    Сохранение пачки цен из спула одним коммитом
+
+    Цены, уже записанные в БД (например, до сбоя посреди сохранения),
+    пропускаются, поэтому повторное воспроизведение пачки безопасно.
+    """
+
+    tickers = {record["ticker"] for record in records}
+    timestamps = [record["timestamp"] for record in records]
+
+    with get_db_context() as db:
+        # Вместе с тиками, свернутыми в серии повторов (CHANGE_ONLY_ENABLED)
+        rows = db.query(Price.ticker, Price.timestamp, Price.run_offsets).filter(
+            Price.ticker.in_(tickers),
+            Price.covering_since(min(timestamps)),
+            Price.timestamp <= max(timestamps),
+        )
+        existing = {
+            (ticker, timestamp)
+            for ticker, first, run_offsets in rows
+            for timestamp in run_timestamps(first, run_offsets)
+        }
+        prices = [
+            PriceCreate(**record)
+            for record in records
+            if (record["ticker"], record["timestamp"]) not in existing
+        ]
+        if prices:
+            PriceService.create_prices(db, prices)
+
+    return len(prices)
+
+
+def _source_timestamp(data: Dict[str, Any]) -> int:
+    """
+    Время цены на бирже (микросекунды); если биржа его не передала -
+    текущее время
+    """
+
+    us_out = (data.get("source_data") or {}).get("us_out")
+    return int(us_out) if us_out is not None else int(time.time() * 1_000_000)
+
+
 def _save_prices_to_db(prices_data: Dict[str, Dict[str, Any]]) -> int:
     """
     Сохранение цен в базу данных
+
+    Ошибки недоступности базы данных пробрасываются, чтобы цены ушли в спул
     """
     saved_count = 0
 
@@ -170,7 +534,7 @@ def _save_prices_to_db(prices_data: Dict[str, Dict[str, Any]]) -> int:
                     ticker=ticker,
                     price=data["index_price"],
                     timestamp=data["timestamp"],
-                    source_timestamp=int(time.time() * 1_000_000),  # микросекунды
+                    source_timestamp=_source_timestamp(data),
                 )
 
                 # Сохраняем цену
@@ -186,6 +550,8 @@ def _save_prices_to_db(prices_data: Dict[str, Dict[str, Any]]) -> int:
                     },
                 )
 
+            except DB_UNAVAILABLE_ERRORS:
+                raise
             except Exception as e:
                 logger.error(
                     "Ошибка при сохранении цены в БД",
@@ -196,10 +562,46 @@ def _save_prices_to_db(prices_data: Dict[str, Dict[str, Any]]) -> int:
     return saved_count
 
 
+def _save_prices_batch(prices_data: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Сохранение цен шарда одной пачкой (один INSERT и один коммит)
+    """
+
+    prices: List[PriceCreate] = []
+
+    for ticker, data in prices_data.items():
+        try:
+            prices.append(
+                PriceCreate(
+                    ticker=ticker,
+                    price=data["index_price"],
+                    timestamp=data["timestamp"],
+                    source_timestamp=_source_timestamp(data),
+                )
+            )
+        except Exception as e:
+            logger.error(
+                "Ошибка при подготовке цены к сохранению",
+                extra={"ticker": ticker, "error": str(e)},
+            )
+
+    if not prices:
+        return 0
+
+    with get_db_context() as db:
+        PriceService.create_prices(db, prices)
+
+    logger.debug("Цены шарда сохранены в БД", extra={"count": len(prices)})
+    return len(prices)
+
+
 @celery_app.task(bind=True, name="health_check_task")
 def health_check_task(self) -> Dict[str, Any]:
     """
     Задача проверки здоровья системы
+
+    Deribit, база данных и Redis проверяются параллельно, каждая проверка
+    ограничена HEALTH_PROBE_TIMEOUT_SECONDS.
     """
 
     task_id = self.request.id
@@ -213,152 +615,386 @@ def health_check_task(self) -> Dict[str, Any]:
     }
 
     try:
-        try:
-            api_available = run_async(_check_deribit_health_async())
-            results["checks"]["deribit_api"] = {
-                "available": api_available,
-                "status": "ok" if api_available else "error",
-            }
-        except asyncio.TimeoutError:
-            results["checks"]["deribit_api"] = {
-                "available": False,
-                "status": "error",
-                "error": "API timeout",
-            }
-        except Exception as e:
-            results["checks"]["deribit_api"] = {
-                "available": False,
-                "status": "error",
-                "error": str(e),
-            }
+        report = run_async(run_probes())
+        results["checks"] = report["checks"]
+        results["status"] = report["status"]
 
-        # 2. Проверка БД (Исправлено для тестов)
-        db_info = _check_database_health()
-        if isinstance(db_info, dict):
-            # Если вернулся словарь, распаковываем его
-            results["checks"]["database"] = {
-                "available": db_info.get("connected", False)
-            }
-            results["checks"]["database"].update(db_info)
-        else:
-            # Если вернулся булево значение
-            results["checks"]["database"] = {"available": db_info, "connected": db_info}
-        results["checks"]["database"]["status"] = (
-            "ok" if results["checks"]["database"]["available"] else "error"
+        logger.info(
+            "Задача проверки здоровья выполнена",
+            extra={"task_id": task_id, "status": results["status"]},
         )
 
-        # 3. Проверка Redis
-        redis_info = _check_redis_health()
-        if isinstance(redis_info, dict):
-            results["checks"]["redis"] = {
-                "available": redis_info.get("connected", False)
-            }
-            results["checks"]["redis"].update(redis_info)
-        else:
-            results["checks"]["redis"] = {
-                "available": redis_info,
-                "connected": redis_info,
-            }
-        results["checks"]["redis"]["status"] = (
-            "ok" if results["checks"]["redis"]["available"] else "error"
+    except Exception as e:
+        results["status"] = "error"
+        results["error"] = str(e)
+        logger.error(
+            "Ошибка при проверке здоровья", extra={"task_id": task_id, "error": str(e)}
         )
 
-        # 4. Определяем общий статус
-        all_checks_ok = all(
-            check.get("available", False) for check in results["checks"].values()
-        )
-        results["status"] = "healthy" if all_checks_ok else "unhealthy"
+    return results
+
+
+@celery_app.task(name="cleanup_old_prices_task")
+def cleanup_old_prices_task(days_to_keep: int = 30) -> Dict[str, Any]:
+    """
+    Задача очистки старых записей о ценах
+
+    Удаляются только сырые цены, уже свернутые в 1m свечи (граница - как у
+    прореживания, но со сроком days_to_keep); цены, перенесенные в сжатые
+    блоки или архив, хранятся там и не затрагиваются.
+    """
+
+    logger.info(
+        "Запуск задачи очистки старых цен", extra={"days_to_keep": days_to_keep}
+    )
+
+    results = {
+        "task": "cleanup_old_prices",
+        "status": "success",
+        "days_to_keep": days_to_keep,
+        "deleted_count": 0,
+        "timestamp": int(time.time() * 1000),
+    }
+
+    try:
+        with get_db_context() as db:
+            for ticker in CandleService.get_tickers(db):
+                results["deleted_count"] += CandleService.apply_raw_retention(
+                    db, ticker, results["timestamp"], days=days_to_keep
+                )
 
         logger.info(
-            "Задача проверки здоровья выполнена",
-            extra={"task_id": task_id, "status": results["status"]},
+            "Очистка старых цен завершена",
+            extra={
+                "deleted_count": results["deleted_count"],
+                "days_to_keep": days_to_keep,
+            },
         )
 
     except Exception as e:
         results["status"] = "error"
         results["error"] = str(e)
         logger.error(
-            "Ошибка при проверке здоровья", extra={"task_id": task_id, "error": str(e)}
+            "Ошибка при очистке старых цен",
+            extra={"error": str(e), "days_to_keep": days_to_keep},
         )
 
     return results
 
 
-async def _check_deribit_health_async() -> bool:
-    """Асинхронная проверка доступности Deribit API"""
+@celery_app.task(name="downsample_prices_task")
+def downsample_prices_task() -> Dict[str, Any]:
+    """
+    Задача инкрементального прореживания цен по уровням хранения
+    """
+
+    logger.info("Запуск задачи прореживания цен")
+
+    results = {
+        "task": "downsample_prices",
+        "status": "success",
+        "candles_built": {},
+        "chunked_count": 0,
+        "deleted_count": 0,
+        "errors": [],
+        "timestamp": int(time.time() * 1000),
+    }
 
     try:
-        async with DeribitClient() as client:
-            return await client.health_check()
-    except Exception:
-        return False
+        with get_db_context() as db:
+            tickers = CandleService.get_tickers(db)
+    except Exception as e:
+        results["status"] = "error"
+        results["errors"].append(str(e))
+        logger.error("Ошибка при получении списка тикеров", extra={"error": str(e)})
+        return results
 
+    for ticker in tickers:
+        try:
+            with get_db_context() as db:
+                built = {}
+                for resolution in TIERS:
+                    built[resolution] = CandleService.downsample_ticker(
+                        db, ticker, resolution, now=results["timestamp"]
+                    )
+                    db.flush()
+
+                results["chunked_count"] += CandleService.compress_cold_prices(
+                    db, ticker, now=results["timestamp"]
+                )
+                results["deleted_count"] += CandleService.apply_retention(
+                    db, ticker, now=results["timestamp"]
+                )
+                results["candles_built"][ticker] = built
 
-def _check_database_health() -> bool:
-    """Проверка доступности базы данных"""
+        except Exception as e:
+            results["status"] = "partial_success"
+            results["errors"].append(f"{ticker}: {str(e)}")
+            logger.error(
+                "Ошибка при прореживании цен",
+                extra={"ticker": ticker, "error": str(e)},
+            )
+
+    logger.info(
+        "Прореживание цен завершено",
+        extra={
+            "candles_built": results["candles_built"],
+            "chunked_count": results["chunked_count"],
+            "deleted_count": results["deleted_count"],
+        },
+    )
+
+    return results
+
+
+@celery_app.task(name="archive_prices_task")
+def archive_prices_task() -> Dict[str, Any]:
+    """
+    Задача выгрузки закрытых суток цен в Parquet архив
+    """
+
+    logger.info("Запуск задачи архивации цен")
+
+    results = {
+        "task": "archive_prices",
+        "status": "success",
+        "archived_count": 0,
+        "timestamp": int(time.time() * 1000),
+    }
 
     try:
         with get_db_context() as db:
-            # Выполняем простой запрос
-            db.execute("SELECT 1")
-            return True
-    except Exception:
-        return False
+            results["archived_count"] = CandleService.archive_prices(
+                db, now=results["timestamp"]
+            )
 
+        logger.info(
+            "Архивация цен завершена",
+            extra={"archived_count": results["archived_count"]},
+        )
 
-def _check_redis_health() -> bool:
-    """Проверка доступности Redis"""
+    except Exception as e:
+        results["status"] = "error"
+        results["error"] = str(e)
+        logger.error("Ошибка при архивации цен", extra={"error": str(e)})
 
-    try:
-        r = redis.Redis.from_url(settings.redis_url, socket_connect_timeout=1)
-        return r.ping()
-    except Exception:
-        return False
+    return results
 
 
-@celery_app.task(name="cleanup_old_prices_task")
-def cleanup_old_prices_task(days_to_keep: int = 30) -> Dict[str, Any]:
+@celery_app.task(name="rebuild_rollups_task")
+def rebuild_rollups_task(
+    start_timestamp: int, end_timestamp: int, ticker: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Задача очистки старых записей о ценах
+    Задача пересборки роллапов за диапазон (например, после бэкфилла)
     """
 
     logger.info(
-        "Запуск задачи очистки старых цен", extra={"days_to_keep": days_to_keep}
+        "Запуск задачи пересборки роллапов",
+        extra={"ticker": ticker, "start": start_timestamp, "end": end_timestamp},
     )
 
     results = {
-        "task": "cleanup_old_prices",
+        "task": "rebuild_rollups",
         "status": "success",
-        "days_to_keep": days_to_keep,
-        "deleted_count": 0,
+        "rebuilt": {},
+        "errors": [],
         "timestamp": int(time.time() * 1000),
     }
 
     try:
-        cutoff_timestamp = int(time.time() * 1000) - (
-            days_to_keep * 24 * 60 * 60 * 1000
+        with get_db_context() as db:
+            tickers = [ticker] if ticker else CandleService.get_tickers(db)
+
+        for current_ticker in tickers:
+            with get_db_context() as db:
+                results["rebuilt"][current_ticker] = RollupService.rebuild(
+                    db, current_ticker, start_timestamp, end_timestamp
+                )
+
+        logger.info(
+            "Пересборка роллапов завершена", extra={"rebuilt": results["rebuilt"]}
         )
 
-        with get_db_context() as db:
-            from app.db.models import Price
+    except Exception as e:
+        results["status"] = "error"
+        results["errors"].append(str(e))
+        logger.error("Ошибка при пересборке роллапов", extra={"error": str(e)})
 
-            stmt = delete(Price).where(Price.timestamp < cutoff_timestamp)
-            result = db.execute(stmt)
-            db.commit()
+    return results
 
-            results["deleted_count"] = result.rowcount
 
-            logger.info(
-                "Очистка старых цен завершена",
-                extra={"deleted_count": result.rowcount, "days_to_keep": days_to_keep},
-            )
+@celery_app.task(name="rebuild_ticker_stats_task")
+def rebuild_ticker_stats_task(ticker: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Задача пересчета агрегатов тикеров по таблице prices (восстановление)
+    """
+
+    logger.info("Запуск задачи пересчета агрегатов тикеров", extra={"ticker": ticker})
+
+    results = {
+        "task": "rebuild_ticker_stats",
+        "status": "success",
+        "ticker": ticker,
+        "tickers_rebuilt": 0,
+        "timestamp": int(time.time() * 1000),
+    }
+
+    try:
+        with get_db_context() as db:
+            results["tickers_rebuilt"] = StatsService.rebuild(db, ticker)
+
+        logger.info(
+            "Пересчет агрегатов тикеров завершен",
+            extra={"tickers_rebuilt": results["tickers_rebuilt"]},
+        )
 
     except Exception as e:
         results["status"] = "error"
         results["error"] = str(e)
-        logger.error(
-            "Ошибка при очистке старых цен",
-            extra={"error": str(e), "days_to_keep": days_to_keep},
+        logger.error("Ошибка при пересчете агрегатов тикеров", extra={"error": str(e)})
+
+    return results
+
+
+@celery_app.task(name="backfill_gaps_task")
+def backfill_gaps_task(lookback_hours: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Задача поиска пропущенных минут и их заполнения историей Deribit
+    """
+
+    lookback_hours = lookback_hours or settings.GAP_LOOKBACK_HOURS
+    now = int(time.time() * 1000)
+    end_timestamp = now - settings.GAP_GRACE_MINUTES * 60 * 1000
+    start_timestamp = end_timestamp - lookback_hours * 60 * 60 * 1000
+
+    logger.info(
+        "Запуск задачи заполнения пропусков", extra={"lookback_hours": lookback_hours}
+    )
+
+    results = {
+        "task": "backfill_gaps",
+        "status": "success",
+        "gaps": {},
+        "filled": {},
+        "completeness": {},
+        "errors": [],
+        "timestamp": now,
+    }
+
+    try:
+        with get_db_context() as db:
+            for ticker in settings.TRACKED_TICKERS:
+                gaps = GapService.find_gaps(db, ticker, start_timestamp, end_timestamp)
+                if gaps:
+                    results["gaps"][ticker] = gaps
+
+        if results["gaps"]:
+            history = run_async(_fetch_history_async(results["gaps"], now))
+
+            for ticker, points in history.items():
+                if isinstance(points, dict):
+                    results["status"] = "partial_success"
+                    results["errors"].append(f"{ticker}: {points['error']}")
+                    continue
+                results["filled"][ticker] = _save_backfill_to_db(ticker, points)
+
+        with get_db_context() as db:
+            for ticker in settings.TRACKED_TICKERS:
+                results["completeness"][ticker] = GapService.get_completeness(
+                    db, ticker, start_timestamp, end_timestamp
+                )
+
+        logger.info(
+            "Заполнение пропусков завершено",
+            extra={
+                "filled": results["filled"],
+                "completeness": {
+                    ticker: report["completeness"]
+                    for ticker, report in results["completeness"].items()
+                },
+            },
         )
 
+    except Exception as e:
+        results["status"] = "error"
+        results["errors"].append(str(e))
+        logger.error("Ошибка при заполнении пропусков", extra={"error": str(e)})
+
     return results
+
+
+def _chart_range_for(age_ms: int) -> str:
+    """Минимальная глубина истории Deribit, покрывающая возраст пропуска"""
+
+    hour_ms = 60 * 60 * 1000
+    for time_range, limit in (
+        ("1h", hour_ms),
+        ("1d", 24 * hour_ms),
+        ("2d", 48 * hour_ms),
+        ("1m", 30 * 24 * hour_ms),
+        ("1y", 365 * 24 * hour_ms),
+    ):
+        if age_ms <= limit:
+            return time_range
+    return "all"
+
+
+async def _fetch_history_async(
+    gaps: Dict[str, List[Tuple[int, int]]], now: int
+) -> Dict[str, Any]:
+    """
+    Получение истории индексов с Deribit: один запрос на тикер,
+    покрывающий все его слитые пропуски
+    """
+
+    history: Dict[str, Any] = {}
+
+    async with DeribitClient() as client:
+        for ticker, ticker_gaps in gaps.items():
+            time_range = _chart_range_for(now - ticker_gaps[0][0])
+            try:
+                points = await client.get_index_chart_data(ticker, time_range)
+                history[ticker] = GapService.select_backfill_points(
+                    points or [], ticker_gaps
+                )
+            except Exception as e:
+                logger.error(
+                    "Ошибка при получении истории цен",
+                    extra={"ticker": ticker, "error": str(e)},
+                )
+                history[ticker] = {"error": str(e)}
+
+    return history
+
+
+def _save_backfill_to_db(ticker: str, points: List[Tuple[int, float]]) -> int:
+    """
+    Сохранение исторических цен, найденных для пропусков
+
+    Цены пишутся через PriceService, поэтому при CHANGE_ONLY_ENABLED они
+    продлевают серии повторов, а уже записанные тики не дублируются.
+    """
+
+    if not points:
+        return 0
+
+    with get_db_context() as db:
+        PriceService.create_prices(
+            db,
+            [
+                PriceCreate(
+                    ticker=ticker,
+                    price=price,
+                    timestamp=timestamp,
+                    source_timestamp=timestamp * 1000,  # микросекунды
+                )
+                for timestamp, price in points
+            ],
+        )
+
+    logger.info(
+        "Пропуски заполнены историческими ценами",
+        extra={"ticker": ticker, "count": len(points)},
+    )
+    return len(points)
@@ -0,0 +1,326 @@
+"""
+Сравнение наборов индексов таблицы prices на PostgreSQL
+
+Создает во временной схеме копии таблицы prices с разными индексами:
+прежними (ix_prices_id, ix_prices_ticker_id, idx_ticker_timestamp,
+idx_created_at), индексами миграции a3d8f2c6e9b1 (покрывающий
+idx_ticker_timestamp с ценой в INCLUDE и BRIN по времени) и тем же набором
+с колонками серий повторов (valid_until, repeats) в INCLUDE. В таблицы
+вставляются одинаковые минутные цены пачками, затем продлеваются серии
+последних строк (как при CHANGE_ONLY_ENABLED) и выполняются типичные
+запросы сервиса. Выводятся скорость вставки и продления серий, доля
+HOT-обновлений, размер индексов, медиана времени запросов, узел плана и
+число обращений к таблице (Heap Fetches) при index-only scan.
+
+Запуск (нужна база из настроек POSTGRES_*):
+    python -m benchmarks.prices_indexes --rows 2000000 --explain
+
+Результат последнего прогона - benchmarks/prices_indexes.txt.
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+
+SCHEMA = "bench_prices_indexes"
+MINUTE_MS = 60 * 1000
+BASE_TIMESTAMP = 1704067200000  # 2024-01-01 00:00:00 UTC
+
+INDEX_SETS: Dict[str, List[str]] = {
+    "legacy": [
+        "CREATE INDEX ON {table} (id)",
+        "CREATE INDEX ON {table} (ticker_id)",
+        "CREATE INDEX ON {table} (ticker_id, timestamp DESC)",
+        "CREATE INDEX ON {table} (created_at DESC)",
+    ],
+    "targeted": [
+        "CREATE INDEX ON {table} (ticker_id, timestamp DESC) INCLUDE (price)",
+        "CREATE INDEX ON {table} USING brin (timestamp) " "WITH (pages_per_range = 32)",
+        "CREATE INDEX ON {table} USING brin (created_at) "
+        "WITH (pages_per_range = 32)",
+    ],
+    "runs_included": [
+        "CREATE INDEX ON {table} (ticker_id, timestamp DESC) "
+        "INCLUDE (price, valid_until, repeats)",
+        "CREATE INDEX ON {table} USING brin (timestamp) " "WITH (pages_per_range = 32)",
+        "CREATE INDEX ON {table} USING brin (created_at) "
+        "WITH (pages_per_range = 32)",
+    ],
+}
+
+# Строка серии покрывает тики до valid_until (не дольше CHANGE_MAX_RUN_SECONDS)
+MAX_RUN_MS = 3600 * 1000
+
+# Запросы сервиса: :first и :last - границы данных тикера 1
+QUERIES: Dict[str, str] = {
+    # /prices/filter и свечи из сырых цен за сутки (Price.covering_since)
+    "range_1d": (
+        "SELECT timestamp, price, valid_until, repeats FROM {table} "
+        "WHERE ticker_id = 1 AND timestamp >= :last - 86400000 - :max_run "
+        "AND coalesce(valid_until, timestamp) >= :last - 86400000 "
+        "ORDER BY timestamp DESC"
+    ),
+    # Агрегаты тикера (summarize_rows: повторы учитываются с весом)
+    "ticker_stats": (
+        "SELECT sum(1 + coalesce(repeats, 0)), "
+        "sum(price * (1 + coalesce(repeats, 0))), min(price), max(price), "
+        "min(timestamp), max(coalesce(valid_until, timestamp)) "
+        "FROM {table} WHERE ticker_id = 1"
+    ),
+    # Поиск пропусков за сутки (find_gaps: конец покрытия каждой строки)
+    "gaps_1d": (
+        "SELECT timestamp, coalesce(valid_until, timestamp) FROM {table} "
+        "WHERE ticker_id = 1 AND timestamp >= :last - 86400000 - :max_run "
+        "AND coalesce(valid_until, timestamp) >= :last - 86400000 "
+        "ORDER BY timestamp"
+    ),
+    # Последняя цена тикера
+    "latest": (
+        "SELECT * FROM {table} WHERE ticker_id = 1 ORDER BY timestamp DESC LIMIT 1"
+    ),
+    # Очистка и архив: сутки всех тикеров по времени
+    "day_all_tickers": (
+        "SELECT count(*) FROM {table} "
+        "WHERE timestamp >= :first AND timestamp < :first + 86400000"
+    ),
+    # Недавние записи по времени вставки
+    "recent_created": (
+        "SELECT count(*) FROM {table} "
+        "WHERE created_at >= to_timestamp((:last - 3600000) / 1000.0)"
+    ),
+}
+
+
+def create_table(connection: Connection, name: str) -> str:
+    table = f"{SCHEMA}.prices_{name}"
+    connection.execute(
+        text(
+            f"CREATE TABLE {table} ("
+            "id serial PRIMARY KEY, "
+            "ticker_id smallint NOT NULL, "
+            "price numeric(20, 8) NOT NULL, "
+            "timestamp bigint NOT NULL, "
+            "source_timestamp bigint, "
+            "created_at timestamptz DEFAULT now(), "
+            "valid_until bigint, "
+            "repeats integer, "
+            "run_offsets bytea)"
+        )
+    )
+    for statement in INDEX_SETS[name]:
+        connection.execute(text(statement.format(table=table)))
+    return table
+
+
+def insert_rows(
+    connection: Connection, table: str, rows: int, tickers: int, batch_size: int
+) -> float:
+    """Вставить минутные цены пачками (как сбор цен), вернуть строк в секунду"""
+
+    elapsed = 0.0
+    for start in range(0, rows, batch_size):
+        end = min(start + batch_size, rows) - 1
+        started = time.perf_counter()
+        connection.execute(
+            text(
+                f"INSERT INTO {table} "
+                "(ticker_id, price, timestamp, source_timestamp, created_at) "
+                "SELECT 1 + g % :tickers, "
+                "40000 + 1000 * sin(g / 500.0) + (g % 97) * 0.01, "
+                ":base + (g / :tickers) * :minute, "
+                "(:base + (g / :tickers) * :minute) * 1000, "
+                "to_timestamp((:base + (g / :tickers) * :minute) / 1000.0) "
+                # bigint: минуты от :base переполняют integer после ~70 тыс. строк
+                "FROM generate_series(CAST(:start AS bigint), "
+                "CAST(:end AS bigint)) AS g"
+            ),
+            {
+                "tickers": tickers,
+                "base": BASE_TIMESTAMP,
+                "minute": MINUTE_MS,
+                "start": start,
+                "end": end,
+            },
+        )
+        elapsed += time.perf_counter() - started
+    return rows / elapsed
+
+
+def extend_runs(
+    connection: Connection, table: str, tickers: int, updates: int
+) -> Tuple[float, float]:
+    """
+    Продлить серии последних строк тикеров (как Price.extend_run), вернуть
+    обновлений в секунду и долю HOT-обновлений
+    """
+
+    heads = connection.execute(
+        text(
+            f"SELECT DISTINCT ON (ticker_id) id, timestamp FROM {table} "
+            "ORDER BY ticker_id, timestamp DESC"
+        )
+    ).all()
+    started = time.perf_counter()
+    for step in range(updates):
+        row_id, timestamp = heads[step % tickers]
+        connection.execute(
+            text(
+                f"UPDATE {table} SET valid_until = :until, "
+                "repeats = coalesce(repeats, 0) + 1, "
+                "run_offsets = coalesce(run_offsets, '') || '\\x60ea0000'::bytea "
+                "WHERE id = :id"
+            ),
+            {"id": row_id, "until": timestamp + (step // tickers + 1) * MINUTE_MS},
+        )
+    elapsed = time.perf_counter() - started
+
+    connection.execute(text("SELECT pg_stat_force_next_flush()"))
+    updated, hot = connection.execute(
+        text(
+            "SELECT n_tup_upd, n_tup_hot_upd FROM pg_stat_user_tables "
+            "WHERE schemaname = :schema AND relname = :name"
+        ),
+        {"schema": SCHEMA, "name": table.split(".", 1)[1]},
+    ).one()
+    return updates / elapsed, hot / updated if updated else 0.0
+
+
+def run_query(
+    connection: Connection, sql: str, params: Dict[str, int], repeats: int
+) -> Tuple[float, str, Optional[int], str]:
+    """
+    Медиана времени запроса (мс), верхний узел плана, Heap Fetches
+    index-only scan и текст плана EXPLAIN ANALYZE
+    """
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        connection.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    plan = connection.execute(
+        text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params
+    ).scalar()
+    node = plan[0]["Plan"]
+    while node.get("Plans") and node["Node Type"] in (
+        "Aggregate",
+        "Limit",
+        "Sort",
+        "Gather",
+        "Gather Merge",
+        "Finalize Aggregate",
+        "Partial Aggregate",
+    ):
+        node = node["Plans"][0]
+    plan_text = "\n".join(
+        row[0]
+        for row in connection.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}"), params
+        )
+    )
+    return (
+        statistics.median(timings),
+        node["Node Type"],
+        node.get("Heap Fetches"),
+        plan_text,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--tickers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="вывести планы")
+    parser.add_argument("--keep", action="store_true", help="не удалять схему")
+    args = parser.parse_args()
+
+    # Каждая пачка - отдельная транзакция, как при сборе цен
+    engine = create_engine(settings.database_url, isolation_level="AUTOCOMMIT")
+    results: Dict[str, Dict[str, object]] = {}
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+        try:
+            for name in INDEX_SETS:
+                table = create_table(connection, name)
+                result: Dict[str, object] = {
+                    "insert_rows_per_s": insert_rows(
+                        connection, table, args.rows, args.tickers, args.batch_size
+                    )
+                }
+                result["extend_runs_per_s"], result["hot_update_pct"] = extend_runs(
+                    connection, table, args.tickers, args.updates
+                )
+                result["hot_update_pct"] *= 100
+
+                # Карта видимости нужна для index-only scan
+                connection.execute(text(f"VACUUM ANALYZE {table}"))
+
+                result["index_mb"] = (
+                    connection.execute(
+                        text("SELECT pg_indexes_size(:table)"), {"table": table}
+                    ).scalar()
+                    / 1024
+                    / 1024
+                )
+                first, last = connection.execute(
+                    text(
+                        f"SELECT min(timestamp), max(timestamp) FROM {table} "
+                        "WHERE ticker_id = 1"
+                    )
+                ).one()
+                for query, sql in QUERIES.items():
+                    result[query] = run_query(
+                        connection,
+                        sql.format(table=table),
+                        {"first": first, "last": last, "max_run": MAX_RUN_MS},
+                        args.repeats,
+                    )
+                results[name] = result
+        finally:
+            if not args.keep:
+                connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+    names = list(INDEX_SETS)
+    print(
+        f"rows={args.rows} tickers={args.tickers} batch={args.batch_size} "
+        f"updates={args.updates}"
+    )
+    print(f"{'metric':<22}" + "".join(f"{name:>30}" for name in names))
+    for metric in (
+        "insert_rows_per_s",
+        "extend_runs_per_s",
+        "hot_update_pct",
+        "index_mb",
+    ):
+        print(
+            f"{metric:<22}"
+            + "".join(f"{results[name][metric]:>30.1f}" for name in names)
+        )
+    for query in QUERIES:
+        cells = []
+        for name in names:
+            elapsed, node, heap_fetches, _ = results[name][query]
+            fetches = f" hf={heap_fetches}" if heap_fetches is not None else ""
+            cells.append(f"{f'{elapsed:.2f} {node}{fetches}':>30}")
+        print(f"{query + ' (ms)':<22}" + "".join(cells))
+
+    if args.explain:
+        for name in names:
+            for query in QUERIES:
+                print(f"\n-- {name}: {query}")
+                print(results[name][query][3])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,54 @@
 import asyncio
+import os
+import tempfile
 import tracemalloc
-from typing import Any, Dict, Generator
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Sequence, Union
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+
+# Модули приложения импортируются до подмены settings в фикстурах, иначе
+# при запуске отдельного файла они получат MagicMock вместо настроек
+from app.core import main as _app_main  # noqa: F401, E402
 
 
 def pytest_configure(config):
     tracemalloc.start()
 
 
-TEST_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(
-    TEST_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+# Файловая SQLite: синхронные фикстуры и асинхронные сессии API
+# работают с одной базой через разные соединения
+TEST_DATABASE_FILE = os.path.join(
+    tempfile.gettempdir(), f"deribit_tracker_test_{os.getpid()}.db"
 )
+TEST_DATABASE_URL = f"sqlite:///{TEST_DATABASE_FILE}"
+TEST_ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{TEST_DATABASE_FILE}"
+
+engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient запускает свой цикл событий, соединения aiosqlite
+# не переиспользуются между циклами
+async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    info={"sync_session_factory": TestingSessionLocal},
+)
+
+
+async def override_get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Асинхронная сессия тестовой базы для эндпоинтов API"""
+
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -36,6 +65,7 @@ def setup_database():
 
     with patch("app.core.config.settings") as mock_settings:
         mock_settings.database_url = TEST_DATABASE_URL
+        mock_settings.async_database_url = TEST_ASYNC_DATABASE_URL
         mock_settings.DATABASE_URL = TEST_DATABASE_URL
         mock_settings.DEBUG = False
         mock_settings.REDIS_URL = "redis://localhost:6379/0"
@@ -50,33 +80,37 @@ def setup_database():
 
         from app.db.database import Base
 
+        Base.metadata.drop_all(bind=engine)
         Base.metadata.create_all(bind=engine)
 
         yield
 
+    engine.dispose()
+    if os.path.exists(TEST_DATABASE_FILE):
+        os.remove(TEST_DATABASE_FILE)
+
 
 @pytest.fixture
 def db_session() -> Generator[Session, None, None]:
     """Сессия базы данных для тестов"""
 
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
-
-    nested = connection.begin_nested()
+    from app.db.database import Base
+    from app.services.ticker_service import ticker_ids
 
-    @event.listens_for(session, "after_transaction_end")
-    def end_savepoint(session, transaction):
-        nonlocal nested
-        if not nested.is_active:
-            nested = connection.begin_nested()
+    session = TestingSessionLocal()
 
     try:
         yield session
     finally:
+        # Данные видны асинхронным сессиям API только после коммита,
+        # поэтому изоляция тестов - очистка таблиц, а не откат транзакции
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
         session.close()
-        transaction.rollback()
-        connection.close()
+        # SQLite снова выдает id очищенного реестра
+        ticker_ids.clear()
 
 
 @pytest.fixture
@@ -89,6 +123,7 @@ def test_client(db_session: Session) -> Generator[TestClient, None, None]:
         "app.db.database.engine", engine
     ):
         mock_settings.database_url = TEST_DATABASE_URL
+        mock_settings.async_database_url = TEST_ASYNC_DATABASE_URL
         mock_settings.DATABASE_URL = TEST_DATABASE_URL
         mock_settings.DEBUG = False
         mock_settings.REDIS_URL = "redis://localhost:6379/0"
@@ -117,7 +152,10 @@ def test_client(db_session: Session) -> Generator[TestClient, None, None]:
                     db_session.rollback()
                     raise
 
+        from app.api.v1.deps import get_async_db
+
         app.dependency_overrides[original_get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
 
         with TestClient(app) as client:
             yield client
@@ -137,6 +175,55 @@ def sample_price_data() -> Dict[str, Any]:
     }
 
 
+# Метка времени первой цены, записанной фикстурой add_prices
+PRICES_START = 1705593600000  # 2024-01-18 16:00:00 UTC
+
+
+@pytest.fixture
+def add_prices(db_session: Session) -> Callable[..., List[Any]]:
+    """
+    Фикстура записи цен одним коммитом
+
+    add_prices(values, ticker="btc_usd", start=PRICES_START, step=1):
+    values - цены строк или их число (тогда цены повторяют цикл из семи
+    значений, а у каждой третьей строки нет source_timestamp); ticker - имя
+    тикера или имена по строкам; i-я строка получает метку start + i * step.
+    Возвращает записанные строки.
+    """
+
+    from app.db.models import Price
+
+    def add(
+        values: Union[int, Sequence[float]],
+        ticker: Union[str, Sequence[str]] = "btc_usd",
+        start: int = PRICES_START,
+        step: int = 1,
+    ) -> List[Any]:
+        if isinstance(values, int):
+            values = [42000.5 + (i % 7) * 0.25 for i in range(values)]
+            sourced = [i % 3 != 0 for i in range(len(values))]
+        else:
+            sourced = [False] * len(values)
+        tickers = [ticker] * len(values) if isinstance(ticker, str) else ticker
+
+        prices = []
+        for i, (value, name, has_source) in enumerate(zip(values, tickers, sourced)):
+            timestamp = start + i * step
+            prices.append(
+                Price(
+                    ticker=name,
+                    price=value,
+                    timestamp=timestamp,
+                    source_timestamp=timestamp * 1000 if has_source else None,
+                )
+            )
+        db_session.add_all(prices)
+        db_session.commit()
+        return prices
+
+    return add
+
+
 @pytest.fixture
 def mock_aiohttp_client():
     """Mock для aiohttp.ClientSession"""
@@ -170,6 +257,7 @@ def workers_test_client():
         "app.db.database.engine", engine
     ):
         mock_settings.database_url = TEST_DATABASE_URL
+        mock_settings.async_database_url = TEST_ASYNC_DATABASE_URL
         mock_settings.DATABASE_URL = TEST_DATABASE_URL
         mock_settings.DEBUG = False
         mock_settings.REDIS_URL = "redis://localhost:6379/0"
@@ -182,8 +270,10 @@ def workers_test_client():
         mock_settings.LOG_LEVEL = "INFO"
         mock_settings.LOG_FILE = None
 
+        from app.api.v1.endpoints.workers import queue_info_cache
         from app.core.main import create_application
 
+        queue_info_cache.clear()
         app = create_application()
 
         with TestClient(app) as client:
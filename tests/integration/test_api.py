@@ -1,3 +1,8 @@
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+
 class TestPricesAPI:
     """Тесты API эндпоинтов для цен"""
 
@@ -66,6 +71,116 @@ class TestPricesAPI:
 
         assert data1[0]["timestamp"] != data2[0]["timestamp"]
 
+    def test_get_prices_page_walk(self, test_client, db_session, sample_price_data):
+        """Тест обхода истории по курсорам вперед и назад"""
+
+        from app.db.models import Price
+
+        db_session.query(Price).delete()
+        db_session.commit()
+
+        # Две цены с одинаковым timestamp проверяют порядок по id
+        for i in [0, 1, 2, 3, 3, 4, 5]:
+            price_data = sample_price_data.copy()
+            price_data["timestamp"] += i * 60000
+            db_session.add(Price(**price_data))
+        db_session.commit()
+
+        expected = [
+            p.id
+            for p in db_session.query(Price).order_by(
+                Price.timestamp.desc(), Price.id.desc()
+            )
+        ]
+
+        pages = []
+        cursor = None
+        while True:
+            url = "/v1/prices/page?ticker=btc_usd&limit=3"
+            response = test_client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            assert response.status_code == 200
+            page = response.json()
+            pages.append(page)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert [item["id"] for page in pages for item in page["items"]] == expected
+        assert pages[0]["prev_cursor"] is None
+        assert [len(page["items"]) for page in pages] == [3, 3, 1]
+
+        back = test_client.get(
+            f"/v1/prices/page?ticker=btc_usd&limit=3&cursor={pages[2]['prev_cursor']}"
+        ).json()
+        assert back["items"] == pages[1]["items"]
+        assert back["next_cursor"] is not None
+
+        first = test_client.get(
+            f"/v1/prices/page?ticker=btc_usd&limit=3&cursor={back['prev_cursor']}"
+        ).json()
+        assert first["items"] == pages[0]["items"]
+        assert first["prev_cursor"] is None
+
+    def test_change_only_reads_expand_runs(self, test_client, db_session):
+        """Тест чтения серий повторов по тикам: список, страницы и последняя цена"""
+
+        from app.db.models import Price
+        from app.schemas.price import PriceCreate
+        from app.services.price_service import PriceService
+
+        # Тики раз в минуту: три серии повторов (100, 101, 100)
+        values = [100.0] * 4 + [101.0] * 3 + [100.0] * 3
+        timestamps = [1705536000000 + i * 60000 for i in range(len(values))]
+        with patch(
+            "app.services.price_service.settings.CHANGE_ONLY_ENABLED", True
+        ), patch(
+            "app.services.price_service.settings.CHANGE_EPSILONS", {"btc_usd": 0.01}
+        ):
+            PriceService.create_prices(
+                db_session,
+                [
+                    PriceCreate(ticker="btc_usd", price=value, timestamp=timestamp)
+                    for value, timestamp in zip(values, timestamps)
+                ],
+            )
+            assert db_session.query(Price).count() == 3
+
+            listed = test_client.get("/v1/prices/?ticker=btc_usd&skip=2&limit=5")
+            assert [item["timestamp"] for item in listed.json()] == timestamps[7:2:-1]
+
+            url = "/v1/prices/page?ticker=btc_usd&limit=4"
+            pages = []
+            cursor = None
+            while True:
+                page = test_client.get(
+                    url + (f"&cursor={cursor}" if cursor else "")
+                ).json()
+                pages.append(page)
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+
+            walked = [item["timestamp"] for page in pages for item in page["items"]]
+            assert walked == timestamps[::-1]
+            assert [len(page["items"]) for page in pages] == [4, 4, 2]
+
+            back = test_client.get(f"{url}&cursor={pages[2]['prev_cursor']}").json()
+            assert back["items"] == pages[1]["items"]
+            first = test_client.get(f"{url}&cursor={back['prev_cursor']}").json()
+            assert first["items"] == pages[0]["items"]
+            assert first["prev_cursor"] is None
+
+            latest = test_client.get("/v1/prices/latest?ticker=btc_usd").json()
+            assert latest["timestamp"] == timestamps[-1]
+            assert latest["price"] == 100.0
+
+    def test_get_prices_page_invalid_cursor(self, test_client):
+        """Тест поврежденного курсора"""
+
+        response = test_client.get("/v1/prices/page?ticker=btc_usd&cursor=garbage")
+
+        assert response.status_code == 400
+
     def test_get_latest_price_success(self, test_client, db_session, sample_price_data):
         """Тест получения последней цены"""
 
@@ -89,6 +204,71 @@ class TestPricesAPI:
 
         assert data["timestamp"] == sample_price_data["timestamp"] + 120000
 
+    def test_get_latest_price_with_age(
+        self, test_client, db_session, sample_price_data
+    ):
+        """Тест возраста последней цены относительно времени биржи"""
+
+        from app.db.models import Price
+
+        db_session.query(Price).delete()
+        db_session.commit()
+
+        now_ms = int(time.time() * 1000)
+        price_data = sample_price_data.copy()
+        price_data["timestamp"] = now_ms
+        price_data["source_timestamp"] = (now_ms - 5000) * 1000
+        db_session.add(Price(**price_data))
+        db_session.commit()
+
+        plain = test_client.get("/v1/prices/latest?ticker=btc_usd").json()
+        assert "data_age_ms" not in plain
+
+        response = test_client.get("/v1/prices/latest?ticker=btc_usd&include_age=true")
+
+        assert response.status_code == 200
+        assert 5000 <= response.json()["data_age_ms"] < 65000
+
+    def test_get_latest_price_from_cache(self, test_client, db_session):
+        """Тест ответа из кеша последних цен без запроса к БД"""
+
+        from app.services.latest_price_service import LatestPriceService
+
+        cached = {
+            "id": 7,
+            "ticker": "btc_usd",
+            "price": 95000.5,
+            "timestamp": 1705593600000,
+            "source_timestamp": None,
+            "created_at": "2024-01-18T16:00:00+00:00",
+        }
+        client = AsyncMock()
+        client.get.return_value = json.dumps(cached).encode()
+
+        with patch(
+            "app.api.v1.endpoints.prices.latest_prices", LatestPriceService(client)
+        ), patch(
+            "app.api.v1.endpoints.prices.AsyncPriceService.get_latest_price"
+        ) as mock_query:
+            response = test_client.get("/v1/prices/latest?ticker=btc_usd")
+
+        assert response.status_code == 200
+        assert response.json()["id"] == 7
+        assert response.json()["price"] == 95000.5
+        mock_query.assert_not_called()
+
+    def test_get_freshness(self, test_client):
+        """Тест отчета о свежести данных"""
+
+        report = {"slo": {}, "tickers": {"btc_usd": {"age_ms": 1000}}}
+        with patch("app.api.v1.endpoints.prices.FreshnessService") as mock_service:
+            mock_service.return_value.report.return_value = report
+            response = test_client.get("/v1/prices/freshness?ticker=btc_usd")
+
+        assert response.status_code == 200
+        assert response.json() == report
+        mock_service.return_value.report.assert_called_once_with(["btc_usd"])
+
     def test_get_latest_price_not_found(self, test_client, db_session):
         """Тест получения последней цены при отсутствии данных"""
 
@@ -130,6 +310,36 @@ class TestPricesAPI:
         assert len(data) == 2
         assert all(timestamps[1] <= item["timestamp"] <= timestamps[2] for item in data)
 
+    def test_filter_prices_stream(
+        self, test_client, db_session, sample_price_data, monkeypatch
+    ):
+        """Тест потоковой выдачи NDJSON пачками серверного курсора"""
+
+        from app.db.models import Price
+
+        monkeypatch.setattr("app.services.price_service.settings.STREAM_BATCH_SIZE", 2)
+        db_session.query(Price).delete()
+        db_session.commit()
+
+        for i in range(5):
+            price_data = sample_price_data.copy()
+            price_data["timestamp"] += i * 60000
+            db_session.add(Price(**price_data))
+        db_session.commit()
+
+        url = f"/v1/prices/filter?ticker=btc_usd&start={sample_price_data['timestamp']}"
+        expected = test_client.get(url).json()
+        response = test_client.get(url + "&stream=true")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 5
+        assert [line["id"] for line in lines] == [item["id"] for item in expected]
+        assert lines[0]["price"] == expected[0]["price"]
+        assert lines[0]["timestamp"] == expected[0]["timestamp"]
+        assert lines[0]["created_at"] == expected[0]["created_at"]
+
     def test_filter_prices_invalid_range(self, test_client):
         """Тест фильтрации с некорректным диапазоном"""
 
@@ -210,6 +420,60 @@ class TestPricesAPI:
         assert "eth_usd" in data
         assert data[0] == "btc_usd"
 
+    def test_get_tickers(self, test_client, db_session, sample_price_data):
+        """Тест реестра тикеров с метаданными"""
+
+        from app.db.models import Price
+
+        for i in range(3):
+            price_data = sample_price_data.copy()
+            price_data["timestamp"] += i * 60000
+            db_session.add(Price(**price_data))
+        db_session.commit()
+
+        response = test_client.get("/v1/prices/tickers")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["ticker"] == sample_price_data["ticker"]
+        assert data[0]["count"] == 3
+        assert data[0]["first_timestamp"] == sample_price_data["timestamp"]
+        assert data[0]["last_timestamp"] == sample_price_data["timestamp"] + 120000
+
+    def test_get_candles(self, test_client, db_session, sample_price_data):
+        """Тест получения OHLC свечей"""
+
+        from app.db.models import Price
+
+        db_session.query(Price).delete()
+        db_session.commit()
+
+        for i, value in enumerate([100.0, 105.0, 95.0, 101.0, 102.0, 110.0]):
+            price_data = sample_price_data.copy()
+            price_data["price"] = value
+            price_data["timestamp"] += i * 60000
+            db_session.add(Price(**price_data))
+        db_session.commit()
+
+        response = test_client.get("/v1/prices/candles?ticker=btc_usd&resolution=5m")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == 2
+        assert data[0]["open"] == 100.0
+        assert data[0]["high"] == 105.0
+        assert data[0]["low"] == 95.0
+        assert data[0]["close"] == 102.0
+        assert data[0]["count"] == 5
+        assert data[1]["count"] == 1
+
+    def test_get_candles_invalid_resolution(self, test_client):
+        """Тест некорректного разрешения свечей"""
+
+        response = test_client.get("/v1/prices/candles?ticker=btc_usd&resolution=5s")
+        assert response.status_code == 400
+
     def test_create_price(self, test_client, db_session):
         """Тест создания записи о цене"""
 
@@ -260,3 +524,22 @@ class TestPricesAPI:
         response = test_client.get("/health")
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
+
+    def test_deep_health_endpoint(self, test_client):
+        """Тест health check с проверкой зависимостей"""
+
+        report = {
+            "status": "unhealthy",
+            "checks": {"redis": {"available": False, "status": "error"}},
+            "timestamp": 1705593600000,
+        }
+
+        with patch("app.core.main.health_cache") as mock_cache:
+            mock_cache.get = AsyncMock(return_value=(report, True))
+            response = test_client.get("/health?deep=1")
+
+        assert response.status_code == 503
+        data = response.json()
+        assert data["status"] == "unhealthy"
+        assert data["cached"] is True
+        assert data["checks"]["redis"]["status"] == "error"
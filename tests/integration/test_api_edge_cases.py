@@ -3,8 +3,9 @@ import asyncio
 import pytest
 from httpx import ASGITransport, AsyncClient
 
-from app.api.v1.deps import get_db
+from app.api.v1.deps import get_async_db
 from app.core.main import app
+from tests.conftest import override_get_async_db
 
 
 class TestPricesEdgeCases:
@@ -225,10 +226,7 @@ class TestPricesEdgeCases:
         db_session.query(Price).delete()
         db_session.commit()
 
-        def override_get_db():
-            yield db_session
-
-        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
 
         try:
             async with AsyncClient(
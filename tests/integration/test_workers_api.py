@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 
 class TestWorkersAPI:
@@ -64,12 +64,13 @@ class TestWorkersAPI:
     def test_get_queue_info(self, workers_test_client):
         """Тест получения информации об очередях"""
 
-        with patch("redis.Redis") as mock_redis_class, patch(
+        with patch(
+            "app.api.v1.endpoints.workers.get_async_redis"
+        ) as mock_get_redis, patch(
             "app.api.v1.endpoints.workers.celery_app"
         ) as mock_celery:
-            mock_redis_instance = MagicMock()
-            mock_redis_instance.ping.return_value = True
-            mock_redis_class.from_url.return_value = mock_redis_instance
+            mock_pipe = mock_get_redis.return_value.pipeline.return_value
+            mock_pipe.execute = AsyncMock(return_value=[])
 
             mock_inspector = MagicMock()
             mock_inspector.active.return_value = {"worker1@hostname": []}
@@ -89,6 +90,28 @@ class TestWorkersAPI:
             assert "redis" in data
             assert data["redis"]["connected"] is True
 
+    def test_get_queue_info_cached(self, workers_test_client):
+        """Тест повторного ответа об очередях из кеша"""
+
+        with patch(
+            "app.api.v1.endpoints.workers.get_async_redis"
+        ) as mock_get_redis, patch(
+            "app.api.v1.endpoints.workers.celery_app"
+        ) as mock_celery:
+            mock_pipe = mock_get_redis.return_value.pipeline.return_value
+            mock_pipe.execute = AsyncMock(return_value=[])
+            mock_celery.control.inspect.return_value.active.return_value = {}
+            mock_celery.control.inspect.return_value.registered.return_value = {}
+            mock_celery.conf.broker_url = "redis://localhost:6379/0"
+
+            first = workers_test_client.get("/v1/queues").json()
+            redis_calls = mock_pipe.execute.await_count
+            second = workers_test_client.get("/v1/queues").json()
+
+            assert first["cached"] is False
+            assert second["cached"] is True
+            assert mock_pipe.execute.await_count == redis_calls
+
     def test_get_task_status_not_found(self, workers_test_client):
         """Тест получения статуса несуществующей задачи"""
 
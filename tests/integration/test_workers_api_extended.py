@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 
 class TestWorkersAPIExtended:
@@ -57,12 +57,13 @@ class TestWorkersAPIExtended:
     def test_get_queue_info_with_redis_error(self, workers_test_client):
         """Тест получения информации об очередях с ошибкой Redis"""
 
-        with patch("redis.Redis") as mock_redis_class, patch(
+        with patch(
+            "app.api.v1.endpoints.workers.get_async_redis"
+        ) as mock_get_redis, patch(
             "app.api.v1.endpoints.workers.celery_app"
         ) as mock_celery:
-            mock_redis_instance = MagicMock()
-            mock_redis_instance.ping = Mock(side_effect=Exception("Redis error"))
-            mock_redis_class.from_url.return_value = mock_redis_instance
+            mock_pipe = mock_get_redis.return_value.pipeline.return_value
+            mock_pipe.execute = AsyncMock(side_effect=Exception("Redis error"))
 
             mock_inspector = MagicMock()
             mock_inspector.active.return_value = None
@@ -81,12 +82,13 @@ class TestWorkersAPIExtended:
     def test_get_queue_info_no_inspector(self, workers_test_client):
         """Тест получения информации об очередях без инспектора"""
 
-        with patch("redis.Redis") as mock_redis_class, patch(
+        with patch(
+            "app.api.v1.endpoints.workers.get_async_redis"
+        ) as mock_get_redis, patch(
             "app.api.v1.endpoints.workers.celery_app"
         ) as mock_celery:
-            mock_redis_instance = MagicMock()
-            mock_redis_instance.ping.return_value = True
-            mock_redis_class.from_url.return_value = mock_redis_instance
+            mock_pipe = mock_get_redis.return_value.pipeline.return_value
+            mock_pipe.execute = AsyncMock(return_value=[])
 
             mock_celery.control.inspect.return_value = None
             mock_celery.conf.broker_url = "redis://localhost:6379/0"
@@ -0,0 +1,235 @@
+import json
+import statistics
+from unittest.mock import patch
+
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.config import settings
+from app.db.models import Price, PriceChunk
+from app.services.archive_service import ArchiveService, partition_name
+from app.services.candle_service import DAY_MS, MINUTE_MS, CandleService
+from app.services.price_service import AsyncPriceService, PriceService
+from app.services.rollup_service import RollupService
+from app.services.stats_service import StatsService, combine_batches
+from tests.conftest import TestingAsyncSessionLocal
+
+DAY_START = 1705536000000  # 2024-01-18 00:00:00 UTC
+NOW = DAY_START + 30 * DAY_MS
+# Сутки заполняются ценами через полчаса: выгружаются целые сутки, а не
+# каждая минута, поэтому наполнение через ORM не занимает секунды
+STEP_MS = 30 * MINUTE_MS
+ROWS_PER_DAY = DAY_MS // STEP_MS
+# Цена - в последней минуте своего шага: последняя цена суток закрывает
+# сутки в 1m уровне
+FIRST_PRICE = DAY_START + STEP_MS - MINUTE_MS
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with patch.object(settings, "ARCHIVE_ENABLED", True), patch.object(
+        settings, "ARCHIVE_DIR", str(tmp_path)
+    ):
+        yield tmp_path
+
+
+def _rows(prices):
+    return [
+        (
+            p.id,
+            p.timestamp,
+            float(p.price),
+            p.source_timestamp,
+            p.created_at.replace(tzinfo=None),
+        )
+        for p in prices
+    ]
+
+
+class TestArchiveService:
+    """Тесты Parquet архива"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_archive_keeps_range_queries(
+        self, mock_redis, db_session, add_prices, archive
+    ):
+        """Тест выгрузки суток: файлы, оглавление и прозрачные запросы"""
+
+        add_prices(3 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        add_prices(
+            ROWS_PER_DAY,
+            ticker="eth_usd",
+            start=FIRST_PRICE + 2 * DAY_MS,
+            step=STEP_MS,
+        )
+        start, end = DAY_START + DAY_MS - 90 * MINUTE_MS, DAY_START + 2 * DAY_MS + 5
+        expected = _rows(
+            PriceService.get_prices_by_date_range(db_session, "btc_usd", start, end)
+        )
+        stats = StatsService.get_stats(db_session, "btc_usd")
+
+        moved = CandleService.archive_prices(db_session, now=NOW)
+        db_session.commit()
+
+        assert moved == 4 * ROWS_PER_DAY
+        assert db_session.query(Price).count() == 0
+        assert sorted(path.name for path in archive.glob("*.parquet")) == [
+            partition_name(DAY_START + day * DAY_MS) for day in range(3)
+        ]
+        assert (
+            _rows(
+                PriceService.get_prices_by_date_range(db_session, "btc_usd", start, end)
+            )
+            == expected
+        )
+        assert StatsService.get_stats(db_session, "btc_usd") == stats
+
+        manifest = json.loads((archive / "manifest.json").read_text())
+        last = manifest["partitions"][-1]
+        assert last["rows"] == 2 * ROWS_PER_DAY
+        assert last["tickers"]["eth_usd"]["count"] == ROWS_PER_DAY
+        metadata = pq.ParquetFile(archive / last["file"]).metadata
+        assert metadata.num_row_groups == 2
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_archive_moves_chunks(self, mock_redis, db_session, add_prices, archive):
+        """Тест выгрузки сжатых блоков вместе со строками prices"""
+
+        add_prices(2 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        with patch.object(settings, "COLD_CHUNKS_ENABLED", True):
+            CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW)
+        db_session.commit()
+        assert db_session.query(PriceChunk).count() == 2
+
+        assert CandleService.archive_prices(db_session, now=NOW) == 2 * ROWS_PER_DAY
+        db_session.commit()
+
+        assert db_session.query(PriceChunk).count() == 0
+        prices = PriceService.get_prices_by_date_range(db_session, "btc_usd")
+        assert len(prices) == 2 * ROWS_PER_DAY
+        assert prices[0].timestamp == DAY_START + 2 * DAY_MS - MINUTE_MS
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_late_prices_merged_into_file(
+        self, mock_redis, db_session, add_prices, archive
+    ):
+        """Тест цены, записанной в уже выгруженные сутки"""
+
+        add_prices(2 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        CandleService.archive_prices(db_session, now=NOW)
+        add_prices(1, start=DAY_START + 30 * 1000, step=MINUTE_MS)
+
+        assert CandleService.archive_prices(db_session, now=NOW) == 1
+        db_session.commit()
+
+        prices = ArchiveService.get_prices("btc_usd", DAY_START, DAY_START + DAY_MS - 1)
+        assert len(prices) == ROWS_PER_DAY + 1
+        assert prices[-1].timestamp == DAY_START + 30 * 1000
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_not_archived_before_rollup(
+        self, mock_redis, db_session, add_prices, archive
+    ):
+        """Тест: сутки выгружаются только после свертки в 1m у всех тикеров"""
+
+        add_prices(2 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            add_prices(10, ticker="eth_usd", start=DAY_START, step=MINUTE_MS)
+            add_prices(
+                1,
+                ticker="eth_usd",
+                start=DAY_START + 2 * DAY_MS,
+                step=MINUTE_MS,
+            )
+
+        assert CandleService.archive_prices(db_session, now=NOW) == 0
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            CandleService.downsample_ticker(db_session, "eth_usd", "1m", now=NOW)
+            db_session.flush()
+        assert (
+            CandleService.archive_prices(db_session, now=NOW) == 2 * ROWS_PER_DAY + 10
+        )
+
+    @pytest.mark.asyncio
+    @patch("app.services.ticker_service.get_redis")
+    async def test_async_range_and_stream(
+        self, mock_redis, db_session, add_prices, archive
+    ):
+        """Тест асинхронного запроса и потока: горячие цены и архив"""
+
+        add_prices(2 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        CandleService.archive_prices(db_session, now=NOW)
+        db_session.commit()
+        add_prices(10, start=DAY_START + 5 * DAY_MS, step=MINUTE_MS)
+
+        async with TestingAsyncSessionLocal() as db:
+            prices = await AsyncPriceService.get_prices_by_date_range(db, "btc_usd")
+            streamed = [
+                row
+                async for rows in AsyncPriceService.stream_prices_by_date_range(
+                    db, "btc_usd", end_timestamp=DAY_START + 5 * DAY_MS
+                )
+                for row in rows
+            ]
+
+        timestamps = [price.timestamp for price in prices]
+        assert len(prices) == 2 * ROWS_PER_DAY + 10
+        assert timestamps == sorted(timestamps, reverse=True)
+        assert prices[-1].created_at is not None
+        assert [row["timestamp"] for row in streamed] == timestamps[9:]
+        assert streamed[-1]["price"] == 42000.5
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_stats_read_manifest(self, mock_redis, db_session, add_prices, archive):
+        """Тест пересчета агрегатов и статистики по оглавлению архива"""
+
+        add_prices(2 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        add_prices(5, start=DAY_START + 3 * DAY_MS, step=MINUTE_MS)
+        values = [float(p.price) for p in db_session.query(Price)]
+        CandleService.archive_prices(db_session, now=NOW)
+        db_session.commit()
+
+        assert StatsService.rebuild(db_session) == 1
+        stats = StatsService.get_stats(db_session, "btc_usd")
+        assert stats["count"] == len(values)
+        assert stats["avg_price"] == pytest.approx(statistics.mean(values))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(values))
+
+        with patch.object(settings, "TICKER_STATS_ENABLED", False), patch.object(
+            RollupService, "get_stats", return_value=None
+        ):
+            fallback = PriceService.get_stats(db_session, "btc_usd")
+        assert fallback["count"] == len(values)
+        assert fallback["min_price"] == min(values)
+        assert fallback["stddev_price"] == pytest.approx(statistics.stdev(values))
+
+    def test_combine_batches(self):
+        """Тест слияния агрегатов по формуле Чана"""
+
+        left, right = [1.0, 2.0, 4.0], [8.0, 16.0]
+
+        def batch(values):
+            mean = statistics.mean(values)
+            return {
+                "count": len(values),
+                "sum": sum(values),
+                "mean": mean,
+                "m2": sum((value - mean) ** 2 for value in values),
+                "min_price": min(values),
+                "max_price": max(values),
+                "first_timestamp": 1,
+                "last_timestamp": len(values),
+            }
+
+        combined = combine_batches({"a": batch(left)}, {"a": batch(right)}, {})["a"]
+
+        assert combined["count"] == 5
+        assert combined["sum"] == 31.0
+        assert combined["mean"] == pytest.approx(statistics.mean(left + right))
+        assert combined["m2"] == pytest.approx(batch(left + right)["m2"])
+        assert combined["max_price"] == 16.0
+
+    def test_empty_archive(self, archive):
+        """Тест чтения без оглавления"""
+
+        assert ArchiveService.get_prices("btc_usd") == []
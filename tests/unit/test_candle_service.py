@@ -0,0 +1,215 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import Price, PriceCandle
+from app.services.candle_service import (
+    DAY_MS,
+    HOUR_MS,
+    MINUTE_MS,
+    CandleService,
+    aggregate_candles,
+    parse_resolution,
+)
+from tests.conftest import PRICES_START
+
+BASE_TIMESTAMP = PRICES_START  # 2024-01-18 16:00:00 UTC, граница суток не важна
+
+
+class TestResolutionHelpers:
+    """Тесты вспомогательных функций разрешений"""
+
+    def test_parse_resolution(self):
+        """Тест разбора разрешений"""
+
+        assert parse_resolution("5m") == 5 * MINUTE_MS
+        assert parse_resolution("4h") == 4 * HOUR_MS
+        assert parse_resolution("1D") == DAY_MS
+
+    @pytest.mark.parametrize("value", ["", "0m", "5s", "abc", "-1h"])
+    def test_parse_resolution_invalid(self, value):
+        """Тест некорректных разрешений"""
+
+        with pytest.raises(ValueError):
+            parse_resolution(value)
+
+    def test_aggregate_candles(self):
+        """Тест свертки тиков в OHLC"""
+
+        ticks = [
+            {
+                "bucket_start": ts,
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "count": 1,
+                "sum": price,
+                "open_timestamp": ts,
+                "close_timestamp": ts,
+            }
+            for ts, price in [(0, 10), (60000, 12), (120000, 9), (300000, 11)]
+        ]
+
+        candles = aggregate_candles(ticks, 5 * MINUTE_MS)
+
+        assert len(candles) == 2
+        assert candles[0]["open"] == 10
+        assert candles[0]["high"] == 12
+        assert candles[0]["low"] == 9
+        assert candles[0]["close"] == 9
+        assert candles[0]["count"] == 3
+        assert candles[0]["sum"] == 31
+        assert candles[1]["bucket_start"] == 300000
+
+
+class TestCandleService:
+    """Тесты сервиса уровней прореживания"""
+
+    @pytest.fixture(autouse=True)
+    def disable_ingest_rollups(self):
+        """Уровни строятся задачей прореживания, а не при записи цен"""
+
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            yield
+
+    def test_select_tier(self):
+        """Тест выбора самого крупного подходящего уровня"""
+
+        assert CandleService.select_tier(MINUTE_MS) == "1m"
+        assert CandleService.select_tier(30 * 1000) is None
+        assert CandleService.select_tier(15 * MINUTE_MS) == "5m"
+        assert CandleService.select_tier(4 * HOUR_MS) == "1h"
+        assert CandleService.select_tier(7 * DAY_MS) == "1d"
+
+    def test_downsample_builds_only_closed_buckets(self, db_session, add_prices):
+        """Тест построения только закрытых 5-минутных бакетов"""
+
+        add_prices([100 + i for i in range(12)], step=MINUTE_MS)
+        now = BASE_TIMESTAMP + 12 * MINUTE_MS
+
+        CandleService.downsample_ticker(db_session, "btc_usd", "1m", now=now)
+        db_session.flush()
+        built = CandleService.downsample_ticker(db_session, "btc_usd", "5m", now=now)
+
+        assert built == 2
+        candles = (
+            db_session.query(PriceCandle)
+            .filter(PriceCandle.resolution == "5m")
+            .order_by(PriceCandle.bucket_start)
+            .all()
+        )
+        assert [c.count for c in candles] == [5, 5]
+        assert float(candles[0].open) == 100
+        assert float(candles[0].close) == 104
+        assert CandleService.get_watermark(db_session, "btc_usd", "5m") == (
+            BASE_TIMESTAMP + 10 * MINUTE_MS
+        )
+
+        # Повторный запуск ничего не дублирует
+        assert (
+            CandleService.downsample_ticker(db_session, "btc_usd", "5m", now=now) == 0
+        )
+
+    def test_downsample_cascades_to_coarser_tiers(self, db_session, add_prices):
+        """Тест построения часового уровня из 5-минутного"""
+
+        add_prices([float(i) for i in range(130)], step=MINUTE_MS)
+        now = BASE_TIMESTAMP + 3 * HOUR_MS
+
+        for resolution in ("1m", "5m"):
+            CandleService.downsample_ticker(db_session, "btc_usd", resolution, now=now)
+            db_session.flush()
+        built = CandleService.downsample_ticker(db_session, "btc_usd", "1h", now=now)
+
+        assert built == 2
+        hourly = (
+            db_session.query(PriceCandle)
+            .filter(PriceCandle.resolution == "1h")
+            .order_by(PriceCandle.bucket_start)
+            .first()
+        )
+        assert hourly.count == 60
+        assert float(hourly.low) == 0
+        assert float(hourly.high) == 59
+
+    def test_retention_keeps_not_downsampled_data(self, db_session, add_prices):
+        """Тест удаления только уже свернутых сырых данных"""
+
+        add_prices([100.0] * 10, step=MINUTE_MS)
+        now = BASE_TIMESTAMP + 365 * DAY_MS
+
+        assert CandleService.apply_retention(db_session, "btc_usd", now=now) == 0
+
+        CandleService.downsample_ticker(
+            db_session, "btc_usd", "1m", now=BASE_TIMESTAMP + 5 * MINUTE_MS
+        )
+        db_session.flush()
+        deleted = CandleService.apply_retention(db_session, "btc_usd", now=now)
+
+        # Сырые данные удаляются только в пределах свернутых 1m бакетов,
+        # а сами 1m свечи остаются, пока их не покроет 5m уровень
+        assert deleted == 5
+        assert db_session.query(Price).count() == 5
+        assert db_session.query(PriceCandle).count() == 5
+
+    def test_raw_retention_with_custom_days(self, db_session, add_prices):
+        """Тест очистки с заданным сроком: удаляются только свернутые минуты"""
+
+        add_prices([100.0] * 10, step=MINUTE_MS)
+        CandleService.downsample_ticker(
+            db_session, "btc_usd", "1m", now=BASE_TIMESTAMP + 5 * MINUTE_MS
+        )
+        db_session.flush()
+        now = BASE_TIMESTAMP + 2 * DAY_MS
+
+        assert CandleService.apply_raw_retention(db_session, "btc_usd", now, 3) == 0
+        assert CandleService.apply_raw_retention(db_session, "btc_usd", now, 1) == 5
+        assert db_session.query(Price).count() == 5
+        assert db_session.query(PriceCandle).count() == 5
+
+    def test_get_candles_reads_tier_and_raw_tail(self, db_session, add_prices):
+        """Тест чтения из уровня с добором хвоста из сырых данных"""
+
+        add_prices([float(i) for i in range(12)], step=MINUTE_MS)
+        for resolution in ("1m", "5m"):
+            CandleService.downsample_ticker(
+                db_session, "btc_usd", resolution, now=BASE_TIMESTAMP + 12 * MINUTE_MS
+            )
+            db_session.flush()
+
+        # Удаляем сырые данные и 1m свечи, покрытые 5m уровнем:
+        # ответ должен строиться из 5m свечей
+        db_session.query(Price).filter(
+            Price.timestamp < BASE_TIMESTAMP + 10 * MINUTE_MS
+        ).delete()
+        db_session.query(PriceCandle).filter(
+            PriceCandle.resolution == "1m",
+            PriceCandle.bucket_start < BASE_TIMESTAMP + 10 * MINUTE_MS,
+        ).delete()
+        db_session.flush()
+
+        candles = CandleService.get_candles(db_session, "btc_usd", "5m")
+
+        assert [c["count"] for c in candles] == [5, 5, 2]
+        assert candles[0]["open"] == 0
+        assert candles[2]["close"] == 11
+
+    def test_get_candles_coarser_resolution(self, db_session, add_prices):
+        """Тест сборки 15-минутных свечей"""
+
+        add_prices([float(i) for i in range(30)], step=MINUTE_MS)
+
+        candles = CandleService.get_candles(
+            db_session,
+            "btc_usd",
+            "15m",
+            start_timestamp=BASE_TIMESTAMP,
+            end_timestamp=BASE_TIMESTAMP + 29 * MINUTE_MS,
+        )
+
+        assert len(candles) == 2
+        assert candles[0]["count"] == 15
+        assert candles[1]["close"] == 29
+        assert all(c["resolution"] == "15m" for c in candles)
@@ -0,0 +1,215 @@
+import statistics
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import Price, PriceCandle, PriceChunk
+from app.services.candle_service import DAY_MS, MINUTE_MS, CandleService
+from app.services.chunk_service import (
+    ChunkService,
+    decode_floats,
+    decode_integers,
+    encode_floats,
+    encode_integers,
+)
+from app.services.price_service import AsyncPriceService, PriceService
+from app.services.rollup_service import RollupService
+from app.services.stats_service import StatsService
+from tests.conftest import TestingAsyncSessionLocal
+
+DAY_START = 1705536000000  # 2024-01-18 00:00:00 UTC
+NOW = DAY_START + 30 * DAY_MS
+# Сутки заполняются ценами через полчаса: переносятся целые сутки, а не
+# каждая минута, поэтому наполнение через ORM не занимает секунды
+STEP_MS = 30 * MINUTE_MS
+ROWS_PER_DAY = DAY_MS // STEP_MS
+# Цена - в последней минуте своего шага: последняя цена суток закрывает
+# сутки в 1m уровне
+FIRST_PRICE = DAY_START + STEP_MS - MINUTE_MS
+
+
+@pytest.fixture
+def cold_chunks():
+    with patch.object(settings, "COLD_CHUNKS_ENABLED", True):
+        yield
+
+
+def _close_day(add_prices):
+    """Цена через двое суток: 1m уровень покрывает первые сутки целиком"""
+
+    add_prices(1, start=DAY_START + 2 * DAY_MS)
+
+
+def _rows(prices):
+    return [
+        (
+            p.id,
+            p.timestamp,
+            float(p.price),
+            p.source_timestamp,
+            p.created_at.replace(tzinfo=None),
+        )
+        for p in prices
+    ]
+
+
+class TestChunkCodec:
+    """Тесты кодирования колонок блока"""
+
+    def test_integers_round_trip(self):
+        """Тест delta-of-delta: обратимость и сжатие регулярных меток"""
+
+        timestamps = [DAY_START + i * MINUTE_MS for i in range(1440)]
+        values = [5, None, -3, 2**40, 0, 7]
+
+        assert list(decode_integers(encode_integers(timestamps))) == timestamps
+        assert list(decode_integers(encode_integers(values))) == [
+            5,
+            0,
+            -3,
+            2**40,
+            0,
+            7,
+        ]
+        assert len(encode_integers(timestamps)) < 100
+
+    def test_floats_round_trip(self):
+        """Тест XOR: точное восстановление float64"""
+
+        values = [42000.5 + (i % 7) * 0.25 for i in range(1440)] + [0.1, -1e-8]
+
+        assert list(decode_floats(encode_floats(values))) == values
+        assert len(encode_floats(values)) < len(values) * 8 / 4
+
+
+class TestChunkService:
+    """Тесты холодного уровня"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_compress_keeps_range_queries(
+        self, mock_redis, db_session, add_prices, cold_chunks
+    ):
+        """Тест переноса суток в блоки: запросы по диапазону не меняются"""
+
+        add_prices(3 * ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        start, end = DAY_START + DAY_MS - 90 * MINUTE_MS, DAY_START + 2 * DAY_MS + 5
+        expected = _rows(
+            PriceService.get_prices_by_date_range(db_session, "btc_usd", start, end)
+        )
+        stats = StatsService.get_stats(db_session, "btc_usd")
+
+        moved = CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW)
+        db_session.commit()
+
+        assert moved == 3 * ROWS_PER_DAY
+        assert db_session.query(Price).count() == 0
+        assert db_session.query(PriceChunk).count() == 3
+        assert (
+            _rows(
+                PriceService.get_prices_by_date_range(db_session, "btc_usd", start, end)
+            )
+            == expected
+        )
+        assert StatsService.get_stats(db_session, "btc_usd") == stats
+
+    @pytest.mark.asyncio
+    @patch("app.services.ticker_service.get_redis")
+    async def test_async_range_and_stream(
+        self, mock_redis, db_session, add_prices, cold_chunks
+    ):
+        """Тест асинхронного запроса и потока: горячие и холодные цены"""
+
+        add_prices(ROWS_PER_DAY, start=FIRST_PRICE, step=STEP_MS)
+        CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW)
+        db_session.commit()
+        add_prices(10, start=DAY_START + 5 * DAY_MS, step=MINUTE_MS)
+
+        async with TestingAsyncSessionLocal() as db:
+            prices = await AsyncPriceService.get_prices_by_date_range(db, "btc_usd")
+            streamed = [
+                row
+                async for rows in AsyncPriceService.stream_prices_by_date_range(
+                    db, "btc_usd", end_timestamp=DAY_START + 5 * DAY_MS
+                )
+                for row in rows
+            ]
+
+        timestamps = [price.timestamp for price in prices]
+        assert len(prices) == ROWS_PER_DAY + 10
+        assert timestamps == sorted(timestamps, reverse=True)
+        assert prices[-1].created_at is not None
+        assert [row["timestamp"] for row in streamed] == timestamps[9:]
+        assert streamed[-1]["price"] == 42000.5
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_late_prices_merged_into_chunk(
+        self, mock_redis, db_session, add_prices, cold_chunks
+    ):
+        """Тест цены, записанной в уже сжатые сутки"""
+
+        add_prices(60, start=DAY_START, step=MINUTE_MS)
+        _close_day(add_prices)
+        CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW)
+        add_prices(1, start=DAY_START + 30 * 1000)
+
+        assert CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW) == 1
+        db_session.commit()
+
+        chunk = db_session.query(PriceChunk).one()
+        prices = PriceService.get_prices_by_date_range(db_session, "btc_usd")
+        assert chunk.count == 61
+        assert prices[-2].timestamp == DAY_START + 30 * 1000
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_not_compressed_before_rollup(
+        self, mock_redis, db_session, add_prices, cold_chunks
+    ):
+        """Тест: сутки переносятся только после свертки в 1m"""
+
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            add_prices(10, start=DAY_START, step=MINUTE_MS)
+            _close_day(add_prices)
+
+        assert CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW) == 0
+        with patch.object(settings, "COLD_CHUNKS_ENABLED", False), patch.object(
+            settings, "ROLLUPS_ENABLED", False
+        ):
+            CandleService.downsample_ticker(db_session, "btc_usd", "1m", now=NOW)
+            db_session.flush()
+            assert CandleService.compress_cold_prices(db_session, "btc_usd", NOW) == 0
+        assert CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW) == 10
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_rebuilds_read_chunks(
+        self, mock_redis, db_session, add_prices, cold_chunks
+    ):
+        """Тест пересчета агрегатов и свечей по ценам блоков"""
+
+        add_prices(120, start=DAY_START, step=MINUTE_MS)
+        _close_day(add_prices)
+        values = [float(p.price) for p in db_session.query(Price)]
+        CandleService.compress_cold_prices(db_session, "btc_usd", now=NOW)
+        db_session.commit()
+
+        assert StatsService.rebuild(db_session) == 1
+        stats = StatsService.get_stats(db_session, "btc_usd")
+        assert stats["count"] == 121
+        assert stats["avg_price"] == pytest.approx(statistics.mean(values))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(values))
+
+        rebuilt = RollupService.rebuild(
+            db_session, "btc_usd", DAY_START, DAY_START + 120 * MINUTE_MS - 1, now=NOW
+        )
+        assert rebuilt["1m"] == 120
+        assert (
+            db_session.query(PriceCandle).filter(PriceCandle.resolution == "1m").count()
+            == 121
+        )
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_unknown_ticker(self, mock_redis, db_session):
+        """Тест тикера без цен"""
+
+        assert ChunkService.get_prices(db_session, "eth_usd") == []
+        assert ChunkService.compress(db_session, "eth_usd", NOW) == 0
@@ -57,6 +57,35 @@ class TestDeribitClientFixed:
                 assert result["index_price"] == 50000.50
                 mock_session.post.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_get_index_price_exchange_time(self):
+        """Тест передачи времени ответа биржи (usOut) вместе с ценой"""
+
+        client = DeribitClient()
+
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.json.return_value = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": {"index_price": 50000.50},
+            "usIn": 1705593600000000,
+            "usOut": 1705593600000150,
+        }
+
+        mock_post_context = AsyncMock()
+        mock_post_context.__aenter__.return_value = mock_response
+
+        mock_session = MagicMock()
+        mock_session.post.return_value = mock_post_context
+        mock_session.close = AsyncMock()
+
+        with patch.object(client, "_create_session", return_value=mock_session):
+            async with client:
+                result = await client.get_index_price("btc_usd")
+
+        assert result == {"index_price": 50000.50, "us_out": 1705593600000150}
+
     @pytest.mark.asyncio
     async def test_get_index_price_api_error(self):
         """Тест обработки ошибки API (код 200, но в теле ответа 'error')"""
@@ -163,6 +192,31 @@ class TestDeribitClientFixed:
             assert "error" in results["eth_usd"]
             assert results["btc_usd"]["index_price"] == 50000.50
 
+    @pytest.mark.asyncio
+    async def test_get_index_chart_data(self):
+        """Тест получения истории индексной цены"""
+
+        client = DeribitClient()
+
+        with patch.object(client, "_make_request") as mock_request:
+            mock_request.return_value = [[1705593600000, 50000.5]]
+
+            result = await client.get_index_chart_data("btc_usd", "1d")
+
+            assert result == [[1705593600000, 50000.5]]
+            mock_request.assert_called_once_with(
+                "public/get_index_chart_data", {"index_name": "btc_usd", "range": "1d"}
+            )
+
+    @pytest.mark.asyncio
+    async def test_get_index_chart_data_invalid_range(self):
+        """Тест недопустимого диапазона истории"""
+
+        client = DeribitClient()
+
+        with pytest.raises(ValueError):
+            await client.get_index_chart_data("btc_usd", "5d")
+
     @pytest.mark.asyncio
     async def test_health_check_success(self):
         """Тест проверки здоровья - успех"""
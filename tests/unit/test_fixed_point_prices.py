@@ -0,0 +1,224 @@
+import statistics
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import BigInteger, Numeric
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.db.database import Base
+from app.db.models import (
+    Price,
+    PriceValue,
+    Ticker,
+    TickerStats,
+    decode_price,
+    encode_price,
+    fixed_point_prices,
+)
+from app.services.candle_service import CandleService
+from app.services.price_service import PriceService
+from app.services.stats_service import StatsService
+from tests.conftest import PRICES_START, async_engine, engine
+
+BASE_TIMESTAMP = PRICES_START
+VALUES = [95000.12345678, 95001.5, 94999.25, 95010.0]
+
+
+@pytest.fixture
+def fixed_storage():
+    """
+    Схема с ценами BIGINT (как после миграции с PRICE_STORAGE=fixed) и
+    масштабом 2 для eth_usd
+    """
+
+    # Флаг меняется у самих типов колонок: их разделяют аннотированные копии
+    # колонок, которые ORM запоминает в запросах
+    types = [
+        column.type
+        for table in Base.metadata.tables.values()
+        for column in table.columns
+        if isinstance(column.type, PriceValue)
+    ]
+    with ExitStack() as stack:
+        for price_type in types:
+            stack.enter_context(patch.object(price_type, "fixed", True))
+        stack.enter_context(patch.object(settings, "PRICE_SCALES", {"eth_usd": 2}))
+        # Реализации типов и скомпилированные запросы прежнего режима не
+        # должны достаться ни тесту, ни следующим тестам
+        stack.callback(_reset_compiled, types)
+        _reset_compiled(types)
+        yield
+
+
+def _reset_compiled(types):
+    for test_engine in (engine, async_engine.sync_engine):
+        test_engine.clear_compiled_cache()
+        for price_type in types:
+            test_engine.dialect._type_memos.pop(price_type, None)
+    for mapper in Base.registry.mappers:
+        mapper._compiled_cache.clear()
+
+
+class TestPriceCodec:
+    """Тесты кодирования цен"""
+
+    def test_numeric_storage_keeps_decimal(self):
+        """Тест режима numeric: хранимое значение - Decimal"""
+
+        assert str(encode_price(95000.12345678, 8)) == "95000.12345678"
+        assert decode_price(encode_price(0.1, 8), 8) == 0.1
+
+    def test_fixed_storage_round_trip(self, fixed_storage):
+        """Тест режима fixed: целое число единиц 10^-scale"""
+
+        assert encode_price(95000.12345678, 8) == 9500012345678
+        assert encode_price(0.125, 2) == 12
+        assert decode_price(9500012345678, 8) == 95000.12345678
+
+
+class TestPriceValue:
+    """Тесты типа хранимой цены"""
+
+    def test_type_by_mode(self):
+        """Тест типа колонки в обоих режимах"""
+
+        dialect = postgresql.dialect()
+
+        assert isinstance(PriceValue(fixed=True).load_dialect_impl(dialect), BigInteger)
+        fixed_total = PriceValue(total=True, fixed=True).load_dialect_impl(dialect)
+        assert (fixed_total.precision, fixed_total.scale) == (38, 0)
+        numeric = PriceValue(fixed=False).load_dialect_impl(dialect)
+        assert isinstance(numeric, Numeric)
+        assert (numeric.precision, numeric.scale) == (20, 8)
+
+    def test_mode_fixed_at_mapping(self):
+        """Тест: режим задан схемой, а не текущим значением настроек"""
+
+        with patch.object(settings, "PRICE_STORAGE", "fixed"):
+            assert fixed_point_prices() is False
+            assert Price.__table__.c.price.type.fixed is False
+
+        assert (
+            PriceValue(fixed=True)._static_cache_key
+            != PriceValue(fixed=False)._static_cache_key
+        )
+
+
+class TestPriceComparator:
+    """Тесты сравнений Price.price с ценой"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_compare_numeric(self, mock_redis, db_session, add_prices):
+        """Тест сравнения в режиме numeric"""
+
+        add_prices(VALUES)
+
+        query = db_session.query(Price.timestamp).filter(Price.price > 95000.5)
+        assert sorted(ts for (ts,) in query) == [BASE_TIMESTAMP + 1, BASE_TIMESTAMP + 3]
+        assert db_session.query(Price).filter(95000 > Price.price).count() == 1
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_compare_fixed(self, mock_redis, db_session, add_prices, fixed_storage):
+        """Тест сравнения в режиме fixed: цена переводится в масштаб тикера"""
+
+        add_prices(VALUES)
+        add_prices([3000.456], ticker="eth_usd")
+        btc = db_session.query(Price).filter(Price.ticker == "btc_usd")
+        eth = db_session.query(Price).filter(Price.ticker == "eth_usd")
+        btc_price = Price.price.scaled(8)
+        eth_price = Price.price.scaled(2)
+
+        query = btc.with_entities(Price.timestamp).filter(btc_price > 95000.5)
+        assert sorted(ts for (ts,) in query) == [BASE_TIMESTAMP + 1, BASE_TIMESTAMP + 3]
+        assert btc.filter(95000 > btc_price).count() == 1
+        assert eth.filter(eth_price.between(3000.4, 3000.5)).count() == 1
+        # Между 3000.46 и 3000.47 цен в масштабе 2 нет
+        assert eth.filter(eth_price.between(3000.461, 3000.469)).count() == 0
+        assert eth.filter(eth_price > 3000.455).count() == 1
+        assert eth.filter(eth_price >= 3000.461).count() == 0
+        assert eth.filter(eth_price == 3000.46).count() == 1
+        assert eth.filter(eth_price == 3000.456).count() == 0
+
+    def test_compare_fixed_against_scaled_literal(self, fixed_storage):
+        """Тест: условие на саму колонку с целым литералом, без масштаба строки"""
+
+        condition = Price.price.scaled(8) > 95000.5
+        sql = str(condition.compile(compile_kwargs={"literal_binds": True}))
+
+        assert sql == "prices.price > 9500050000000"
+        with pytest.raises(ValueError):
+            Price.price > 95000.5
+
+
+class TestFixedPointStorage:
+    """Тесты хранения цен в режиме fixed"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_prices_stored_as_integers(
+        self, mock_redis, db_session, add_prices, fixed_storage
+    ):
+        """Тест записи и чтения цен в масштабе тикера"""
+
+        add_prices(VALUES)
+        add_prices([3000.456], ticker="eth_usd")
+        db_session.expunge_all()
+
+        scales = dict(db_session.query(Ticker.name, Ticker.price_scale))
+        assert scales == {"btc_usd": 8, "eth_usd": 2}
+
+        price = PriceService.get_latest_price(db_session, "btc_usd")
+        assert int(price.stored_price) == 9501000000000
+        assert price.price == 95010.0
+        assert PriceService.get_latest_price(db_session, "eth_usd").price == 3000.46
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_stats_decoded_once(
+        self, mock_redis, db_session, add_prices, fixed_storage
+    ):
+        """Тест агрегатов в хранимых значениях и статистики в ценах"""
+
+        add_prices(VALUES)
+
+        row = db_session.query(TickerStats).one()
+        assert int(row.min_price) == 9499925000000
+
+        stats = StatsService.get_stats(db_session, "btc_usd")
+        assert stats["min_price"] == 94999.25
+        assert stats["max_price"] == 95010.0
+        assert stats["avg_price"] == pytest.approx(statistics.mean(VALUES))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(VALUES))
+
+        batch = StatsService.summarize_rows(db_session)["btc_usd"]
+        assert batch["m2"] == pytest.approx(row.m2)
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_ticker_change_reencodes_price(
+        self, mock_redis, db_session, add_prices, fixed_storage
+    ):
+        """Тест смены тикера: цена кодируется в масштабе нового тикера"""
+
+        add_prices([3000.0], ticker="eth_usd")
+        add_prices([95000.12345678])
+        price = PriceService.get_latest_price(db_session, "btc_usd")
+
+        price.ticker = "eth_usd"
+        db_session.commit()
+
+        assert int(price.stored_price) == 9500012
+        assert price.price == 95000.12
+        assert StatsService.get_stats(db_session, "eth_usd")["max_price"] == 95000.12
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_candles_decoded(self, mock_redis, db_session, add_prices, fixed_storage):
+        """Тест свечей: сборка в хранимых значениях, ответ в ценах"""
+
+        add_prices(VALUES)
+
+        candles = CandleService.get_candles(db_session, "btc_usd", "1m")
+
+        assert len(candles) == 1
+        assert candles[0]["open"] == 95000.12345678
+        assert candles[0]["low"] == 94999.25
+        assert candles[0]["sum"] == pytest.approx(sum(VALUES))
@@ -0,0 +1,142 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.freshness_service import (
+    FreshnessService,
+    burn_rate,
+    end_to_end_lag,
+    stage_lags,
+)
+
+NOW = 1_700_000_000_000
+
+
+@pytest.fixture
+def redis_client():
+    client = MagicMock()
+    client.hmget.return_value = [None]
+    return client
+
+
+class TestFreshnessHelpers:
+    """Тесты расчета задержек и burn rate"""
+
+    def test_stage_lags_skip_missing_stages(self):
+        """Тест задержек между известными этапами"""
+
+        stages = {"exchange": 1000, "fetched": 1150, "committed": 1400}
+
+        assert stage_lags(stages) == {
+            "exchange_to_fetched_ms": 150,
+            "fetched_to_committed_ms": 250,
+        }
+        assert end_to_end_lag(stages) == 400
+        assert stage_lags({"fetched": 1150, "committed": 1400}) == {
+            "fetched_to_committed_ms": 250
+        }
+        assert end_to_end_lag({"committed": 1400}) is None
+
+    def test_burn_rate(self, monkeypatch):
+        """Тест скорости расходования бюджета ошибок"""
+
+        monkeypatch.setattr(
+            "app.services.freshness_service.settings.FRESHNESS_SLO_TARGET", 0.99
+        )
+
+        assert burn_rate(0, 0) is None
+        assert burn_rate(0, 100) == 0
+        assert burn_rate(1, 100) == pytest.approx(1.0)
+        assert burn_rate(5, 100) == pytest.approx(5.0)
+
+
+class TestFreshnessService:
+    """Тесты учета свежести данных"""
+
+    def test_record_peak_age_from_previous_tick(self, redis_client):
+        """Тест пикового возраста: от предыдущего тика до нового коммита"""
+
+        redis_client.hmget.return_value = [json.dumps({"exchange": NOW - 60_000})]
+        service = FreshnessService(redis_client)
+
+        service.record(
+            {
+                "btc_usd": {
+                    "exchange": NOW - 300,
+                    "fetched": NOW - 200,
+                    "committed": NOW,
+                }
+            }
+        )
+
+        pipe = redis_client.pipeline.return_value
+        pipe.zadd.assert_called_once_with(
+            service.samples_key("btc_usd"), {f"{NOW}:300:60000": NOW}
+        )
+        pipe.execute.assert_called_once()
+
+    def test_record_skips_uncommitted(self, redis_client):
+        """Тест пропуска тиков без коммита"""
+
+        service = FreshnessService(redis_client)
+
+        service.record({"btc_usd": {"exchange": NOW, "committed": None}})
+
+        redis_client.pipeline.return_value.zadd.assert_not_called()
+
+    def test_report(self, redis_client, monkeypatch):
+        """Тест отчета: возраст, перцентили задержки и burn rate"""
+
+        monkeypatch.setattr(
+            "app.services.freshness_service.settings.FRESHNESS_SLO_SECONDS", 90
+        )
+        monkeypatch.setattr(
+            "app.services.freshness_service.settings.FRESHNESS_BURN_WINDOWS_MINUTES",
+            [60],
+        )
+        last = {"exchange": NOW - 5_000, "fetched": NOW - 4_800, "committed": NOW}
+        samples = [
+            f"{NOW - 120_000}:300:60000".encode(),
+            f"{NOW - 60_000}:500:150000".encode(),
+            f"{NOW}:200:60000".encode(),
+        ]
+        redis_client.pipeline.return_value.execute.return_value = [
+            [json.dumps(last).encode(), None],
+            samples,
+            [],
+        ]
+
+        report = FreshnessService(redis_client).report(["btc_usd", "eth_usd"], NOW)
+
+        btc = report["tickers"]["btc_usd"]
+        assert btc["age_ms"] == 5_000
+        assert btc["within_slo"] is True
+        assert btc["lag"]["p50_ms"] == 300
+        assert btc["lag"]["max_ms"] == 500
+        assert btc["burn"]["60m"]["events"] == 3
+        assert btc["burn"]["60m"]["violations"] == 1
+        assert report["tickers"]["eth_usd"] == {"age_ms": None, "within_slo": False}
+
+    def test_report_counts_stalled_ingestion(self, redis_client, monkeypatch):
+        """Тест учета остановившегося сбора как нарушения SLO"""
+
+        monkeypatch.setattr(
+            "app.services.freshness_service.settings.FRESHNESS_SLO_SECONDS", 90
+        )
+        monkeypatch.setattr(
+            "app.services.freshness_service.settings.FRESHNESS_BURN_WINDOWS_MINUTES",
+            [60],
+        )
+        last = {"exchange": NOW - 600_000, "committed": NOW - 599_000}
+        redis_client.pipeline.return_value.execute.return_value = [
+            [json.dumps(last)],
+            [],
+        ]
+
+        report = FreshnessService(redis_client).report(["btc_usd"], NOW)
+
+        btc = report["tickers"]["btc_usd"]
+        assert btc["within_slo"] is False
+        assert btc["burn"]["60m"]["violations"] == 1
+        assert btc["lag"] == {"samples": 0}
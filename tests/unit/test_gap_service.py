@@ -0,0 +1,107 @@
+from app.db.models import Price
+from app.services.gap_service import GapService, coalesce_ranges
+
+MINUTE = 60000
+BASE_TIMESTAMP = 1705593600000
+
+
+def _add_minutes(db_session, minutes, ticker="btc_usd", jitter=0):
+    for minute in minutes:
+        db_session.add(
+            Price(
+                ticker=ticker,
+                price=50000.0,
+                timestamp=BASE_TIMESTAMP + minute * MINUTE + jitter,
+            )
+        )
+    db_session.commit()
+
+
+class TestGapService:
+    """Тесты поиска пропусков"""
+
+    def test_coalesce_ranges(self):
+        """Тест слияния смежных диапазонов"""
+
+        assert coalesce_ranges([(5, 7), (0, 2), (2, 3), (6, 9)]) == [(0, 3), (5, 9)]
+
+    def test_find_gaps(self, db_session):
+        """Тест поиска пропусков внутри, в начале и в конце окна"""
+
+        _add_minutes(db_session, [2, 3, 4, 7, 8], jitter=1500)
+        _add_minutes(db_session, range(10), ticker="eth_usd")
+
+        gaps = GapService.find_gaps(
+            db_session, "btc_usd", BASE_TIMESTAMP, BASE_TIMESTAMP + 10 * MINUTE
+        )
+
+        assert gaps == [
+            (BASE_TIMESTAMP, BASE_TIMESTAMP + 2 * MINUTE),
+            (BASE_TIMESTAMP + 5 * MINUTE, BASE_TIMESTAMP + 7 * MINUTE),
+            (BASE_TIMESTAMP + 9 * MINUTE, BASE_TIMESTAMP + 10 * MINUTE),
+        ]
+        assert (
+            GapService.find_gaps(
+                db_session, "eth_usd", BASE_TIMESTAMP, BASE_TIMESTAMP + 10 * MINUTE
+            )
+            == []
+        )
+
+    def test_find_gaps_no_data(self, db_session):
+        """Тест окна без данных"""
+
+        gaps = GapService.find_gaps(
+            db_session, "btc_usd", BASE_TIMESTAMP, BASE_TIMESTAMP + 5 * MINUTE
+        )
+
+        assert gaps == [(BASE_TIMESTAMP, BASE_TIMESTAMP + 5 * MINUTE)]
+
+    def test_jitter_is_not_a_gap(self, db_session):
+        """Тест: неравномерный шаг внутри соседних минут не считается пропуском"""
+
+        db_session.add(Price(ticker="btc_usd", price=1.0, timestamp=BASE_TIMESTAMP))
+        db_session.add(
+            Price(
+                ticker="btc_usd", price=1.0, timestamp=BASE_TIMESTAMP + MINUTE + 59000
+            )
+        )
+        db_session.commit()
+
+        gaps = GapService.find_gaps(
+            db_session, "btc_usd", BASE_TIMESTAMP, BASE_TIMESTAMP + 2 * MINUTE
+        )
+
+        assert gaps == []
+
+    def test_get_completeness(self, db_session):
+        """Тест отчета о полноте данных"""
+
+        _add_minutes(db_session, [0, 1, 2, 5])
+
+        report = GapService.get_completeness(
+            db_session, "btc_usd", BASE_TIMESTAMP, BASE_TIMESTAMP + 8 * MINUTE
+        )
+
+        assert report["expected_buckets"] == 8
+        assert report["present_buckets"] == 4
+        assert report["missing_buckets"] == 4
+        assert report["completeness"] == 0.5
+
+    def test_select_backfill_points(self):
+        """Тест выбора одной исторической точки на пропущенную минуту"""
+
+        gaps = [(BASE_TIMESTAMP + MINUTE, BASE_TIMESTAMP + 3 * MINUTE)]
+        points = [
+            [BASE_TIMESTAMP + 10, 1.0],
+            [BASE_TIMESTAMP + MINUTE + 20, 2.0],
+            [BASE_TIMESTAMP + MINUTE + 10, 3.0],
+            [BASE_TIMESTAMP + 2 * MINUTE, 4.0],
+            [BASE_TIMESTAMP + 3 * MINUTE, 5.0],
+        ]
+
+        selected = GapService.select_backfill_points(points, gaps)
+
+        assert selected == [
+            (BASE_TIMESTAMP + MINUTE + 10, 3.0),
+            (BASE_TIMESTAMP + 2 * MINUTE, 4.0),
+        ]
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.health import HealthCache, run_probes
+
+
+async def _slow_probe():
+    await asyncio.sleep(0.2)
+    return True
+
+
+def _blocking_probe():
+    time.sleep(0.2)
+    return True
+
+
+def _failing_probe():
+    raise ConnectionError("connection refused")
+
+
+class TestHealthProbes:
+    """Тесты параллельных проверок зависимостей"""
+
+    @pytest.mark.asyncio
+    async def test_probes_run_concurrently(self):
+        """Тест параллельного выполнения синхронных и асинхронных проверок"""
+
+        started = time.perf_counter()
+        report = await run_probes(
+            {"api": _slow_probe, "db": _blocking_probe, "redis": _blocking_probe}
+        )
+
+        assert time.perf_counter() - started < 0.5
+        assert report["status"] == "healthy"
+        assert all(check["status"] == "ok" for check in report["checks"].values())
+
+    @pytest.mark.asyncio
+    async def test_probe_timeout_and_error(self):
+        """Тест таймаута и ошибки отдельной проверки"""
+
+        report = await run_probes(
+            {"api": _slow_probe, "db": _failing_probe}, timeout=0.05
+        )
+
+        assert report["status"] == "unhealthy"
+        assert "timeout" in report["checks"]["api"]["error"]
+        assert report["checks"]["db"]["error"] == "connection refused"
+        assert report["checks"]["db"]["available"] is False
+
+
+class TestHealthCache:
+    """Тесты кеша результатов проверок"""
+
+    @pytest.mark.asyncio
+    async def test_report_is_cached(self):
+        """Тест повторного использования результата в пределах TTL"""
+
+        calls = []
+
+        def probe():
+            calls.append(1)
+            return True
+
+        cache = HealthCache({"db": probe})
+
+        first, first_cached = await cache.get()
+        second, second_cached = await cache.get()
+
+        assert (first_cached, second_cached) == (False, True)
+        assert first is second
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_probe(self):
+        """Тест одной проверки на одновременные запросы с пустым кешем"""
+
+        calls = []
+
+        async def probe():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return True
+
+        cache = HealthCache({"api": probe})
+        await asyncio.gather(*(cache.get() for _ in range(5)))
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_report_expires(self):
+        """Тест повторной проверки после истечения TTL"""
+
+        calls = []
+
+        def probe():
+            calls.append(1)
+            return True
+
+        cache = HealthCache({"db": probe})
+
+        with patch("app.core.health.settings.HEALTH_CACHE_TTL_SECONDS", 0):
+            await cache.get()
+            _, cached = await cache.get()
+
+        assert cached is False
+        assert len(calls) == 2
@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock, patch
+
+from celery.app.task import Context
+
+from app.workers.celery_app import celery_app
+from app.workers.lanes import (
+    MAINTENANCE_LANE,
+    PRICES_LANE,
+    TASK_PROFILES,
+    _record_queue_wait,
+    _stamp_published_at,
+)
+
+
+class TestLanes:
+    """Тесты линий обработки задач"""
+
+    def test_routes_match_registered_tasks(self):
+        """Тест маршрутов по реальным именам задач"""
+
+        import app.workers.tasks  # noqa: F401
+
+        routes = celery_app.conf.task_routes
+
+        assert set(TASK_PROFILES) <= set(celery_app.tasks)
+        assert routes["fetch_prices_task"] == {"queue": PRICES_LANE}
+        assert routes["backfill_gaps_task"] == {"queue": MAINTENANCE_LANE}
+
+    def test_bulk_limits_do_not_apply_to_fetch(self):
+        """Тест отсутствия общего rate_limit для всех задач"""
+
+        annotations = celery_app.conf.task_annotations
+
+        assert "rate_limit" not in annotations["*"]
+        assert "rate_limit" not in annotations["fetch_prices_task"]
+        assert annotations["cleanup_old_prices_task"]["rate_limit"] == "1/m"
+
+    def test_stamp_published_at(self):
+        """Тест отметки времени постановки задачи"""
+
+        headers = {}
+
+        with patch("app.workers.lanes.time.time", return_value=100.0):
+            _stamp_published_at(headers=headers)
+
+        assert headers == {"published_at": 100.0}
+
+    @patch("app.workers.lanes.get_redis")
+    def test_record_queue_wait(self, mock_get_redis):
+        """Тест записи времени ожидания шарда в линию prices"""
+
+        task = MagicMock()
+        task.request = Context(
+            published_at=100.0,
+            delivery_info={"routing_key": "prices.shard.celery@host1"},
+        )
+
+        with patch("app.workers.lanes.time.time", return_value=100.25):
+            _record_queue_wait(task=task)
+
+        pipe = mock_get_redis.return_value.pipeline.return_value
+        pipe.lpush.assert_called_once_with("deribit_tracker:queue_wait:prices", 250.0)
+        pipe.execute.assert_called_once()
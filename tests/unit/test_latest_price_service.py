@@ -0,0 +1,210 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis
+
+from app.core.config import settings
+from app.db.models import Price
+from app.services.latest_price_service import (
+    LatestPriceCache,
+    LatestPriceService,
+    price_key,
+)
+
+BASE_TIMESTAMP = 1705593600000
+
+
+def _payload(timestamp=BASE_TIMESTAMP, price=95000.0):
+    return {
+        "id": 1,
+        "ticker": "btc_usd",
+        "price": price,
+        "timestamp": timestamp,
+        "source_timestamp": None,
+        "created_at": "2024-01-18T16:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def async_redis():
+    client = MagicMock()
+    client.get = AsyncMock(return_value=None)
+    client.register_script.return_value = AsyncMock(return_value=1)
+    return client
+
+
+class TestLatestPriceService:
+    """Тесты чтения последних цен"""
+
+    @pytest.mark.asyncio
+    async def test_redis_hit(self, async_redis):
+        """Тест ответа из Redis без обращения к БД"""
+
+        async_redis.get.return_value = json.dumps(_payload()).encode()
+        loader = AsyncMock()
+
+        payload = await LatestPriceService(async_redis).get("btc_usd", loader)
+
+        assert payload == _payload()
+        async_redis.get.assert_awaited_once_with(price_key("btc_usd"))
+        loader.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_miss_loads_and_fills_cache(self, async_redis):
+        """Тест промаха: цена из БД сохраняется в Redis"""
+
+        loader = AsyncMock(return_value=_payload())
+
+        payload = await LatestPriceService(async_redis).get("btc_usd", loader)
+
+        assert payload == _payload()
+        script = async_redis.register_script.return_value
+        script.assert_awaited_once()
+        assert script.await_args.kwargs["keys"] == [price_key("btc_usd")]
+
+    @pytest.mark.asyncio
+    async def test_redis_error_falls_back_to_database(self, async_redis):
+        """Тест чтения из БД при недоступном Redis"""
+
+        async_redis.get.side_effect = redis.ConnectionError("down")
+        loader = AsyncMock(return_value=_payload())
+
+        assert await LatestPriceService(async_redis).get("btc_usd", loader) == (
+            _payload()
+        )
+
+    @pytest.mark.asyncio
+    async def test_local_layer_only_while_subscribed(self, async_redis):
+        """Тест памяти процесса: используется только при активной подписке"""
+
+        async_redis.get.return_value = json.dumps(_payload()).encode()
+        service = LatestPriceService(async_redis)
+
+        await service.get("btc_usd", AsyncMock())
+        await service.get("btc_usd", AsyncMock())
+        assert async_redis.get.await_count == 2
+
+        service.subscribed = True
+        service.apply_message(
+            json.dumps({"ticker": "btc_usd", "price": _payload(BASE_TIMESTAMP + 1)})
+        )
+
+        payload = await service.get("btc_usd", AsyncMock())
+        assert payload["timestamp"] == BASE_TIMESTAMP + 1
+        assert async_redis.get.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_local_entry_expires(self, async_redis, monkeypatch):
+        """Тест ограничения возраста записи в памяти процесса"""
+
+        monkeypatch.setattr(settings, "LATEST_CACHE_LOCAL_TTL_SECONDS", 0)
+        async_redis.get.return_value = json.dumps(_payload()).encode()
+        service = LatestPriceService(async_redis)
+        service.subscribed = True
+        service.apply_message(json.dumps({"ticker": "btc_usd", "price": _payload()}))
+
+        await service.get("btc_usd", AsyncMock())
+
+        async_redis.get.assert_awaited_once()
+
+    def test_messages_keep_newest_and_invalidate(self, async_redis):
+        """Тест сообщений pub/sub: старая цена не вытесняет новую, сброс"""
+
+        service = LatestPriceService(async_redis)
+        service.subscribed = True
+
+        service.apply_message(
+            json.dumps({"ticker": "btc_usd", "price": _payload(BASE_TIMESTAMP + 1)})
+        )
+        service.apply_message(json.dumps({"ticker": "btc_usd", "price": _payload()}))
+        assert service._local("btc_usd")["timestamp"] == BASE_TIMESTAMP + 1
+
+        service.apply_message(json.dumps({"ticker": "btc_usd", "price": None}))
+        assert service._local("btc_usd") is None
+
+
+class TestLatestPriceHooks:
+    """Тесты записи кеша при коммите цен"""
+
+    @patch("app.services.latest_price_service.LatestPriceCache")
+    def test_commit_publishes_newest_price(self, mock_cache, db_session):
+        """Тест публикации последней цены каждого тикера после коммита"""
+
+        db_session.add_all(
+            [
+                Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP + 1),
+                Price(ticker="btc_usd", price=90.0, timestamp=BASE_TIMESTAMP),
+                Price(ticker="eth_usd", price=10.0, timestamp=BASE_TIMESTAMP),
+            ]
+        )
+        db_session.flush()
+        mock_cache.return_value.publish.assert_not_called()
+
+        db_session.commit()
+
+        (payloads,) = mock_cache.return_value.publish.call_args.args
+        by_ticker = {payload["ticker"]: payload for payload in payloads}
+        assert by_ticker["btc_usd"]["price"] == 100.0
+        assert by_ticker["btc_usd"]["created_at"] is not None
+        assert by_ticker["eth_usd"]["timestamp"] == BASE_TIMESTAMP
+
+    @patch("app.services.latest_price_service.LatestPriceCache")
+    def test_rollback_publishes_nothing(self, mock_cache, db_session):
+        """Тест отсутствия публикации после отката"""
+
+        db_session.add(Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP))
+        db_session.flush()
+        db_session.rollback()
+        db_session.commit()
+
+        mock_cache.return_value.publish.assert_not_called()
+
+    def test_delete_invalidates_ticker(self, db_session):
+        """Тест сброса кеша тикера при удалении цены"""
+
+        price = Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP)
+        db_session.add(price)
+        db_session.commit()
+
+        with patch("app.services.latest_price_service.LatestPriceCache") as mock_cache:
+            db_session.delete(price)
+            db_session.commit()
+
+        mock_cache.return_value.invalidate.assert_called_once_with(["btc_usd"])
+        mock_cache.return_value.publish.assert_not_called()
+
+    def test_redis_error_does_not_fail_commit(self, db_session):
+        """Тест коммита цен при недоступном Redis"""
+
+        with patch("app.services.latest_price_service.LatestPriceCache") as mock_cache:
+            mock_cache.return_value.publish.side_effect = redis.ConnectionError("down")
+            db_session.add(
+                Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP)
+            )
+            db_session.commit()
+
+        assert db_session.query(Price).count() == 1
+
+
+class TestLatestPriceCache:
+    """Тесты записи последних цен в Redis"""
+
+    def test_publish_and_invalidate(self):
+        """Тест записи через скрипт и сброса тикера"""
+
+        client = MagicMock()
+        cache = LatestPriceCache(client)
+
+        cache.publish([_payload()])
+        cache.invalidate(["btc_usd"])
+
+        script = client.register_script.return_value
+        keys = script.call_args.kwargs["keys"]
+        args = script.call_args.kwargs["args"]
+        assert keys == [price_key("btc_usd")]
+        assert json.loads(args[0]) == _payload()
+        assert args[2] == settings.LATEST_CACHE_TTL_SECONDS * 1000
+        pipe = client.pipeline.return_value
+        pipe.delete.assert_called_once_with(price_key("btc_usd"))
+        assert pipe.execute.call_count == 2
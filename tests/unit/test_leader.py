@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from celery.app.task import Context
+
+from app.core.config import settings
+from app.workers.celery_app import celery_app
+from app.workers.leader import (
+    LeaderLease,
+    LeaderScheduler,
+    get_fencing_token,
+    is_stale_token,
+)
+
+
+@pytest.fixture
+def redis_client():
+    client = MagicMock()
+    client.register_script.side_effect = lambda script: MagicMock()
+    return client
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    scheduler = LeaderScheduler(
+        app=celery_app, schedule_filename=str(tmp_path / "beat-schedule")
+    )
+    scheduler.lease = MagicMock(token=None, is_leader=False)
+    yield scheduler
+    scheduler.lease = None
+    scheduler.close()
+
+
+class TestLeaderLease:
+    """Тесты аренды лидера"""
+
+    def test_acquire_returns_fencing_token(self, redis_client):
+        """Тест захвата аренды с выдачей токена ограждения"""
+
+        lease = LeaderLease("beat", owner_id="beat-1", client=redis_client)
+        lease._acquire.return_value = 7
+
+        assert lease.acquire() == 7
+        assert lease.is_leader
+        lease._acquire.assert_called_once_with(
+            keys=["deribit_tracker:leader:beat", "deribit_tracker:leader:beat:fence"],
+            args=["beat-1", settings.LEADER_LEASE_TTL_SECONDS * 1000],
+        )
+
+    def test_acquire_held_by_other(self, redis_client):
+        """Тест аренды, занятой другим экземпляром"""
+
+        lease = LeaderLease("beat", owner_id="beat-2", client=redis_client)
+        lease._acquire.return_value = None
+
+        assert lease.acquire() is None
+        assert not lease.is_leader
+
+    def test_release(self, redis_client):
+        """Тест освобождения аренды только своим владельцем"""
+
+        lease = LeaderLease("beat", owner_id="beat-1", client=redis_client)
+        lease.token = 3
+
+        lease.release()
+
+        lease._release.assert_called_once_with(
+            keys=["deribit_tracker:leader:beat"], args=["beat-1"]
+        )
+        assert not lease.is_leader
+
+
+class TestFencing:
+    """Тесты токенов ограждения"""
+
+    def test_get_fencing_token(self):
+        """Тест чтения токена из заголовков задачи"""
+
+        assert get_fencing_token(Context(fencing_token="5")) == 5
+        assert get_fencing_token(Context(headers={"fencing_token": 6})) == 6
+        assert get_fencing_token(Context()) is None
+
+    @patch("app.workers.leader.get_redis")
+    def test_is_stale_token(self, mock_get_redis):
+        """Тест отбрасывания токена бывшего лидера"""
+
+        mock_get_redis.return_value.get.return_value = b"4"
+
+        assert is_stale_token(3) is True
+        assert is_stale_token(4) is False
+
+
+class TestLeaderScheduler:
+    """Тесты планировщика Beat с выбором лидера"""
+
+    @patch("celery.beat.PersistentScheduler.tick")
+    def test_standby_does_not_tick(self, mock_tick, scheduler):
+        """Тест резервного экземпляра: задачи не ставятся"""
+
+        assert scheduler.tick() == settings.LEADER_RENEW_SECONDS
+        scheduler.lease.acquire.assert_called_once()
+        mock_tick.assert_not_called()
+
+    @patch("celery.beat.PersistentScheduler.tick", return_value=60)
+    def test_leader_ticks_and_renews(self, mock_tick, scheduler):
+        """Тест лидера: расписание выполняется, аренда продлевается вовремя"""
+
+        scheduler.lease.is_leader = True
+        scheduler.lease.token = 2
+
+        assert scheduler.tick() == settings.LEADER_RENEW_SECONDS
+        mock_tick.assert_called_once()
+
+    @patch("celery.beat.PersistentScheduler.apply_async")
+    def test_apply_async_passes_fencing_token(self, mock_apply, scheduler):
+        """Тест передачи токена ограждения в заголовках задачи"""
+
+        scheduler.lease.is_leader = True
+        scheduler.lease.token = 9
+        entry = scheduler.schedule["fetch-prices-every-minute"]
+
+        scheduler.apply_async(entry)
+
+        assert entry.options["headers"] == {"fencing_token": 9}
+        assert entry.options["queue"] == "prices"
+        mock_apply.assert_called_once()
+
+    @patch("celery.beat.PersistentScheduler.apply_async")
+    def test_apply_async_records_run(self, mock_apply, scheduler):
+        """Тест сохранения времени постановки для следующего лидера"""
+
+        scheduler.lease.is_leader = True
+        scheduler.lease.token = 9
+        entry = scheduler.schedule["fetch-prices-every-minute"]
+
+        scheduler.apply_async(entry)
+
+        scheduler.lease.record_run.assert_called_once_with(
+            "fetch-prices-every-minute", entry.last_run_at
+        )
+
+    @patch("celery.beat.PersistentScheduler.tick", return_value=60)
+    def test_takeover_runs_only_missed_entries(self, mock_tick, scheduler):
+        """Тест захвата лидерства: поставленные прежним лидером записи не
+        повторяются, пропущенные выполняются"""
+
+        now = celery_app.now()
+        stale = now - timedelta(hours=1)
+        for entry in scheduler.schedule.values():
+            entry.last_run_at = stale
+        scheduler.lease.last_runs.return_value = {"fetch-prices-every-minute": now}
+
+        def acquire():
+            scheduler.lease.is_leader = True
+            scheduler.lease.token = 10
+
+        scheduler.lease.acquire.side_effect = acquire
+        scheduler.tick()
+
+        fetch = scheduler.schedule["fetch-prices-every-minute"]
+        assert fetch.last_run_at == now
+        assert not fetch.is_due()[0]
+        missed = [
+            entry
+            for name, entry in scheduler.schedule.items()
+            if name != "fetch-prices-every-minute"
+        ]
+        assert all(entry.last_run_at == stale for entry in missed)
+        assert any(entry.is_due()[0] for entry in missed)
+
+
+class TestLeaderRuns:
+    """Тесты общего для лидеров времени последних запусков"""
+
+    def test_record_and_read_runs(self, redis_client):
+        """Тест записи и чтения времени запусков в Redis"""
+
+        lease = LeaderLease("beat", owner_id="beat-1", client=redis_client)
+        run_at = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        redis_client.hgetall.return_value = {
+            b"fetch-prices-every-minute": str(run_at.timestamp()).encode()
+        }
+
+        lease.record_run("fetch-prices-every-minute", run_at)
+
+        redis_client.hset.assert_called_once_with(
+            "deribit_tracker:leader:beat:runs",
+            "fetch-prices-every-minute",
+            run_at.timestamp(),
+        )
+        assert lease.last_runs() == {"fetch-prices-every-minute": run_at}
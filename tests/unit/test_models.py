@@ -1,7 +1,9 @@
 from datetime import datetime
 
 import pytest
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
 
 from app.db.models import Price
 
@@ -81,3 +83,21 @@ class TestPriceModel:
         )
 
         assert len(prices) == 3
+
+    def test_price_index_set(self):
+        """Тест набора индексов prices: покрывающий и BRIN по времени"""
+
+        indexes = {
+            index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+            for index in Price.__table__.indexes
+        }
+
+        assert set(indexes) == {
+            "idx_ticker_timestamp",
+            "brin_prices_timestamp",
+            "brin_prices_created_at",
+        }
+        assert indexes["idx_ticker_timestamp"].endswith(
+            "(ticker_id, timestamp DESC) INCLUDE (price)"
+        )
+        assert "USING brin (timestamp)" in indexes["brin_prices_timestamp"]
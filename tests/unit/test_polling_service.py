@@ -0,0 +1,133 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.config import settings
+from app.services.polling_service import (
+    PollingService,
+    compute_interval,
+    price_change,
+    realized_volatility,
+)
+
+QUIET = [100.0, 100.001, 100.0, 100.001, 100.0, 100.001]
+CHOPPY = [100.0, 100.5, 99.8, 100.6, 99.7, 100.4]
+TRENDING = [100.0, 100.2, 100.4, 100.6, 100.8, 101.0]
+
+
+@pytest.fixture
+def redis_client():
+    client = MagicMock()
+    client.register_script.side_effect = lambda script: MagicMock()
+    client.hgetall.return_value = {}
+    return client
+
+
+class TestVolatility:
+    """Тесты оценки волатильности"""
+
+    def test_realized_volatility(self):
+        """Тест СКО лог-доходностей"""
+
+        assert realized_volatility([100.0]) == 0.0
+        assert realized_volatility(TRENDING) < realized_volatility(CHOPPY)
+        assert price_change(TRENDING) == pytest.approx(0.01)
+
+    @pytest.mark.parametrize(
+        "prices,expected",
+        [
+            (QUIET, "POLL_MAX_INTERVAL_SECONDS"),
+            (CHOPPY, "POLL_MIN_INTERVAL_SECONDS"),
+            (TRENDING, "POLL_MIN_INTERVAL_SECONDS"),
+            ([100.0, 100.01], "POLL_BASE_INTERVAL_SECONDS"),
+        ],
+    )
+    def test_compute_interval(self, prices, expected):
+        """Тест выбора интервала опроса по порогам"""
+
+        assert compute_interval(prices) == getattr(settings, expected)
+
+
+class TestPollingService:
+    """Тесты состояния адаптивного опроса"""
+
+    def test_claim_due_within_budget(self, redis_client):
+        """Тест приоритета волатильных тикеров при нехватке бюджета"""
+
+        service = PollingService(redis_client)
+        service._claim.return_value = [b"btc_usd", b"eth_usd"]
+        service._budget.return_value = 1
+        redis_client.hgetall.return_value = {
+            b"btc_usd": b"180000",
+            b"eth_usd": b"10000",
+        }
+
+        claimed = service.claim_due(["btc_usd", "eth_usd"], now_ms=1000)
+
+        assert claimed == ["eth_usd"]
+        redis_client.hset.assert_called_once_with(
+            "deribit_tracker:poll:next_due", mapping={"btc_usd": 1000}
+        )
+
+    def test_claim_nothing_due(self, redis_client):
+        """Тест запуска, когда ни один тикер еще не пора опрашивать"""
+
+        service = PollingService(redis_client)
+        service._claim.return_value = []
+
+        assert service.claim_due(["btc_usd"], now_ms=1000) == []
+        service._budget.assert_not_called()
+
+    def test_reschedule(self, redis_client):
+        """Тест сохранения интервалов и следующих сроков"""
+
+        PollingService(redis_client).reschedule({"btc_usd": 10}, now_ms=1000)
+
+        pipe = redis_client.pipeline.return_value
+        pipe.hset.assert_any_call(
+            "deribit_tracker:poll:interval", mapping={"btc_usd": 10000}
+        )
+        pipe.hset.assert_any_call(
+            "deribit_tracker:poll:next_due", mapping={"btc_usd": 11000}
+        )
+
+
+class TestAdaptiveFetch:
+    """Тесты адаптивного опроса в задаче получения цен"""
+
+    @patch("app.workers.tasks.PollingService")
+    def test_nothing_due(self, mock_polling):
+        """Тест пропуска запуска без тикеров к опросу"""
+
+        from app.workers.tasks import fetch_prices_task
+
+        mock_polling.return_value.claim_due.return_value = []
+
+        with patch.object(settings, "ADAPTIVE_POLLING_ENABLED", True):
+            result = fetch_prices_task()
+
+        assert result["status"] == "not_due"
+
+    @patch("app.workers.tasks._update_poll_intervals", return_value={"eth_usd": 10})
+    @patch("app.workers.tasks._save_prices_to_db", return_value=1)
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._fetch_prices_async")
+    @patch("app.workers.tasks.PollingService")
+    def test_fetch_due_subset(
+        self, mock_polling, mock_fetch, mock_run_async, mock_save, mock_update
+    ):
+        """Тест опроса только тикеров, которые пора опросить"""
+
+        from app.workers.tasks import fetch_prices_task
+
+        mock_polling.return_value.claim_due.return_value = ["eth_usd"]
+        mock_run_async.return_value = {
+            "eth_usd": {"index_price": 3342.62, "timestamp": 1705593600000},
+        }
+
+        with patch.object(settings, "ADAPTIVE_POLLING_ENABLED", True):
+            result = fetch_prices_task()
+
+        mock_fetch.assert_called_once_with(["eth_usd"])
+        mock_update.assert_called_once_with(["eth_usd"])
+        assert result["poll_intervals"] == {"eth_usd": 10}
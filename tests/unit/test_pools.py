@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import exc, text
+
+from app.core.config import settings
+from app.db.pools import create_pooled_engine
+from tests.conftest import TEST_DATABASE_URL
+
+PROFILE = {"pool_size": 1, "max_overflow": 1, "pool_timeout": 0, "pool_recycle": 60}
+
+
+def _sample(name, pool):
+    return REGISTRY.get_sample_value(name, {"pool": pool, "role": "api"}) or 0
+
+
+class TestPoolProfiles:
+    """Тесты профилей пулов по роли процесса"""
+
+    def test_profile_by_role(self):
+        """Тест выбора профиля по DB_POOL_ROLE"""
+
+        with patch.object(settings, "DB_POOL_ROLE", "worker"):
+            profile = settings.pool_profile()
+            engine = create_pooled_engine(TEST_DATABASE_URL, "test_role")
+
+        assert profile == settings.DB_POOL_PROFILES["worker"]
+        assert engine.pool.size() == profile["pool_size"]
+        assert engine.pool.metric_labels["role"] == "worker"
+        assert REGISTRY.get_sample_value(
+            "db_pool_capacity", {"pool": "test_role", "role": "worker"}
+        ) == (profile["pool_size"] + profile["max_overflow"])
+
+    def test_unknown_role(self):
+        """Тест ошибки при неизвестной роли"""
+
+        with pytest.raises(ValueError):
+            settings.pool_profile("scheduler")
+
+
+class TestPoolMetrics:
+    """Тесты метрик пула соединений"""
+
+    def test_checkout_usage_and_timeout(self):
+        """Тест занятых и сверхлимитных соединений, ожидания и таймаута"""
+
+        engine = create_pooled_engine(TEST_DATABASE_URL, "test_usage", PROFILE)
+        waits = _sample("db_pool_checkout_wait_seconds_count", "test_usage")
+
+        first, second = engine.connect(), engine.connect()
+        assert _sample("db_pool_in_use", "test_usage") == 2
+        assert _sample("db_pool_overflow", "test_usage") == 1
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        assert _sample("db_pool_checkout_timeouts_total", "test_usage") == 1
+
+        first.close()
+        second.close()
+        assert _sample("db_pool_in_use", "test_usage") == 0
+        assert _sample("db_pool_checkout_wait_seconds_count", "test_usage") == (
+            waits + 3
+        )
+        assert _sample("db_pool_connects_total", "test_usage") == 2
+
+    def test_invalidation_survives_dispose(self):
+        """Тест счетчика негодных соединений после пересоздания пула"""
+
+        engine = create_pooled_engine(TEST_DATABASE_URL, "test_invalid", PROFILE)
+        engine.dispose()
+
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.invalidate()
+
+        assert engine.pool.metric_labels["pool"] == "test_invalid"
+        assert _sample("db_pool_invalidations_total", "test_invalid") == 1
+        assert _sample("db_pool_connects_total", "test_invalid") == 1
+
+
+class TestMetricsEndpoint:
+    """Тесты эндпоинта метрик"""
+
+    def test_metrics(self, test_client):
+        """Тест выдачи метрик пула в формате Prometheus"""
+
+        response = test_client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'db_pool_capacity{pool="primary",role="api"}' in response.text
@@ -0,0 +1,229 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import Price, PriceCandle, PriceChunk
+from app.schemas.price import PriceCreate
+from app.services.candle_service import DAY_MS, MINUTE_MS, CandleService
+from app.services.gap_service import GapService
+from app.services.price_service import AsyncPriceService, PriceService
+from app.services.stats_service import StatsService
+from app.workers.tasks import _save_backfill_to_db, _save_spooled_prices
+from tests.conftest import TestingAsyncSessionLocal
+
+DAY_START = 1705536000000  # 2024-01-18 00:00:00 UTC
+# Шаг опроса с дрожанием, как у сбора цен
+TIMESTAMPS = [DAY_START + i * MINUTE_MS + (i % 4) * 700 for i in range(10)]
+PRICES = [100.0, 100.0, 100.005, 100.0, 101.0, 101.0, 101.0, 100.0, 100.0, 100.0]
+
+
+@pytest.fixture
+def change_only():
+    with patch.object(settings, "CHANGE_ONLY_ENABLED", True), patch.object(
+        settings, "CHANGE_EPSILONS", {"btc_usd": 0.01}
+    ):
+        yield
+
+
+def _ticks(timestamps=TIMESTAMPS, prices=PRICES, ticker="btc_usd"):
+    return [
+        PriceCreate(
+            ticker=ticker,
+            price=price,
+            timestamp=timestamp,
+            source_timestamp=timestamp * 1000,
+        )
+        for timestamp, price in zip(timestamps, prices)
+    ]
+
+
+class TestChangeOnlyStorage:
+    """Тесты хранения только изменений цены"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_runs_reconstruct_series(self, mock_redis, db_session, change_only):
+        """Тест свертки неизменных цен и восстановления серии при чтении"""
+
+        PriceService.create_prices(db_session, _ticks()[:5])
+        for tick in _ticks()[5:]:
+            PriceService.create_price(db_session, tick)
+
+        rows = db_session.query(Price).order_by(Price.timestamp).all()
+        assert [(row.timestamp, row.repeats) for row in rows] == [
+            (TIMESTAMPS[0], 3),
+            (TIMESTAMPS[4], 2),
+            (TIMESTAMPS[7], 2),
+        ]
+        assert rows[0].tick_timestamps() == TIMESTAMPS[:4]
+
+        prices = PriceService.get_prices_by_date_range(
+            db_session, "btc_usd", TIMESTAMPS[2], TIMESTAMPS[8]
+        )
+        assert [price.timestamp for price in prices] == TIMESTAMPS[8:1:-1]
+        assert [float(price.price) for price in prices] == [
+            100.0,
+            100.0,
+            101.0,
+            101.0,
+            101.0,
+            100.0,
+            100.0,
+        ]
+        assert prices[-1].source_timestamp is None
+
+        stats = StatsService.get_stats(db_session, "btc_usd")
+        assert stats["count"] == 10
+        assert stats["last_timestamp"] == TIMESTAMPS[-1]
+        assert StatsService.summarize_rows(db_session)["btc_usd"]["count"] == 10
+
+        candles = db_session.query(PriceCandle).filter_by(resolution="1m").all()
+        assert sorted(candle.open_timestamp for candle in candles) == TIMESTAMPS
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_run_breaks(self, mock_redis, db_session, change_only):
+        """Тест: серию прерывают разрыв, длина серии, граница суток и тикер"""
+
+        timestamps = [DAY_START - 2 * MINUTE_MS, DAY_START - MINUTE_MS, DAY_START]
+        timestamps += [DAY_START + 5 * MINUTE_MS, DAY_START + 6 * MINUTE_MS]
+        with patch.object(settings, "CHANGE_MAX_RUN_SECONDS", 60):
+            PriceService.create_prices(
+                db_session, _ticks(timestamps, [100.0] * len(timestamps))
+            )
+        PriceService.create_prices(
+            db_session, _ticks(TIMESTAMPS[:2], [100.0, 100.005], ticker="eth_usd")
+        )
+
+        rows = db_session.query(Price).order_by(Price.timestamp).all()
+        assert [row.ticks for row in rows if row.ticker == "btc_usd"] == [2, 1, 2]
+        assert [row.ticks for row in rows if row.ticker == "eth_usd"] == [1, 1]
+        assert GapService.find_gaps(
+            db_session, "btc_usd", DAY_START, DAY_START + 7 * MINUTE_MS
+        ) == [(DAY_START + MINUTE_MS, DAY_START + 5 * MINUTE_MS)]
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_gaps_and_completeness(self, mock_redis, db_session, change_only):
+        """Тест: серия повторов покрывает свои минуты при поиске пропусков"""
+
+        PriceService.create_prices(db_session, _ticks())
+
+        assert db_session.query(Price).count() == 3
+        end = DAY_START + 12 * MINUTE_MS
+        assert GapService.find_gaps(db_session, "btc_usd", DAY_START, end) == [
+            (DAY_START + 10 * MINUTE_MS, end)
+        ]
+        completeness = GapService.get_completeness(
+            db_session, "btc_usd", DAY_START + 2 * MINUTE_MS, end
+        )
+        assert completeness["present_buckets"] == 8
+        assert completeness["missing_buckets"] == 2
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_spool_replay_is_idempotent(self, mock_redis, db_session, change_only):
+        """Тест повторного воспроизведения тиков, свернутых в серии"""
+
+        records = [tick.model_dump() for tick in _ticks()]
+        PriceService.create_prices(db_session, _ticks()[:6])
+
+        with patch("app.workers.tasks.get_db_context") as mock_context:
+            mock_context.return_value.__enter__.return_value = db_session
+            assert _save_spooled_prices(records) == 4
+
+        PriceService.create_prices(db_session, _ticks()[7:])
+        assert sum(row.ticks for row in db_session.query(Price)) == 10
+        assert StatsService.get_stats(db_session, "btc_usd")["count"] == 10
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_backfill_extends_runs(self, mock_redis, db_session, change_only):
+        """Тест заполнения пропуска: тики продлевают серию перед пропуском"""
+
+        live = [0, 1, 2, 7, 8, 9]
+        PriceService.create_prices(
+            db_session, _ticks([TIMESTAMPS[i] for i in live], [100.0] * len(live))
+        )
+        points = [(TIMESTAMPS[2], 100.0), (TIMESTAMPS[3], 100.0)]
+        points += [(TIMESTAMPS[4], 100.0), (TIMESTAMPS[5], 101.0)]
+        points += [(TIMESTAMPS[6], 101.0)]
+
+        with patch("app.workers.tasks.get_db_context") as mock_context:
+            mock_context.return_value.__enter__.return_value = db_session
+            _save_backfill_to_db("btc_usd", points)
+
+        rows = db_session.query(Price).order_by(Price.timestamp).all()
+        assert [(row.timestamp, row.ticks) for row in rows] == [
+            (TIMESTAMPS[0], 5),
+            (TIMESTAMPS[5], 2),
+            (TIMESTAMPS[7], 3),
+        ]
+        assert StatsService.get_stats(db_session, "btc_usd")["count"] == 10
+        prices = PriceService.get_prices_by_date_range(db_session, "btc_usd")
+        assert [price.timestamp for price in prices] == TIMESTAMPS[::-1]
+        assert (
+            GapService.find_gaps(db_session, "btc_usd", TIMESTAMPS[0], TIMESTAMPS[-1])
+            == []
+        )
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_downsample_and_cold_tier(self, mock_redis, db_session, change_only):
+        """Тест свертки в 1m и переноса в сжатые блоки отдельными тиками"""
+
+        next_day = DAY_START + DAY_MS
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            PriceService.create_prices(
+                db_session, _ticks() + _ticks([next_day], [100.0])
+            )
+            CandleService.downsample_ticker(
+                db_session, "btc_usd", "1m", now=next_day + MINUTE_MS
+            )
+        candles = db_session.query(PriceCandle).order_by(PriceCandle.bucket_start)
+        assert [candle.close_timestamp for candle in candles] == TIMESTAMPS + [next_day]
+
+        with patch.object(settings, "COLD_CHUNKS_ENABLED", True):
+            moved = CandleService.compress_cold_prices(
+                db_session, "btc_usd", now=DAY_START + 30 * DAY_MS
+            )
+        db_session.commit()
+
+        assert moved == 3
+        assert db_session.query(PriceChunk).one().count == 10
+        prices = PriceService.get_prices_by_date_range(
+            db_session, "btc_usd", end_timestamp=next_day - 1
+        )
+        assert [price.timestamp for price in prices] == TIMESTAMPS[::-1]
+        assert prices[0].source_timestamp is None
+
+    @patch("app.services.latest_price_service.LatestPriceCache")
+    @patch("app.services.ticker_service.get_redis")
+    def test_latest_price_is_last_tick(
+        self, mock_redis, mock_cache, db_session, change_only
+    ):
+        """Тест: продление серии публикует последний тик в кеш"""
+
+        PriceService.create_prices(db_session, _ticks()[:3])
+
+        (payloads,) = mock_cache.return_value.publish.call_args.args
+        assert payloads[0]["timestamp"] == TIMESTAMPS[2]
+        assert payloads[0]["source_timestamp"] is None
+
+    @pytest.mark.asyncio
+    @patch("app.services.ticker_service.get_redis")
+    async def test_async_range_and_stream(self, mock_redis, db_session, change_only):
+        """Тест асинхронного запроса и потока с восстановленными сериями"""
+
+        PriceService.create_prices(db_session, _ticks())
+
+        async with TestingAsyncSessionLocal() as db:
+            prices = await AsyncPriceService.get_prices_by_date_range(
+                db, "btc_usd", start_timestamp=TIMESTAMPS[1]
+            )
+            streamed = [
+                row
+                async for rows in AsyncPriceService.stream_prices_by_date_range(
+                    db, "btc_usd", end_timestamp=TIMESTAMPS[5], batch_size=2
+                )
+                for row in rows
+            ]
+
+        assert [price.timestamp for price in prices] == TIMESTAMPS[:0:-1]
+        assert [row["timestamp"] for row in streamed] == TIMESTAMPS[5::-1]
+        assert [row["price"] for row in streamed][:3] == [101.0, 101.0, 100.0]
@@ -0,0 +1,87 @@
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.queue_service import QueueService
+from app.workers.celery_app import celery_app
+
+
+def _redis_client(lengths):
+    client = MagicMock()
+    client.pipeline.return_value.execute = AsyncMock(return_value=lengths)
+    return client
+
+
+class TestQueueService:
+    """Тесты интроспекции очередей"""
+
+    def test_known_queues(self):
+        """Тест списка очередей из конфигурации Celery"""
+
+        queues = QueueService.known_queues(celery_app)
+
+        assert "celery" in queues
+        assert {"prices", "monitoring", "maintenance"} <= set(queues)
+
+    @pytest.mark.asyncio
+    async def test_queue_lengths_pipelined(self):
+        """Тест длин очередей одним конвейером"""
+
+        client = _redis_client([3, 0])
+
+        lengths = await QueueService.get_queue_lengths(client, ["prices", "celery"])
+
+        assert lengths == {"prices": {"length": 3}, "celery": {"length": 0}}
+        client.pipeline.assert_called_once_with(transaction=False)
+        pipe = client.pipeline.return_value
+        assert [call.args[0] for call in pipe.llen.call_args_list] == [
+            "prices",
+            "celery",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_collect_with_slow_worker(self, monkeypatch):
+        """Тест ограничения ожидания медленного воркера"""
+
+        monkeypatch.setattr(
+            "app.services.queue_service.settings.QUEUE_INSPECT_TIMEOUT_SECONDS", 0.05
+        )
+        app = MagicMock()
+        app.conf.task_default_queue = "celery"
+        app.conf.task_routes = {}
+        app.conf.beat_schedule = {}
+        app.conf.broker_url = "redis://localhost:6379/0"
+        app.control.inspect.return_value.active.side_effect = lambda: time.sleep(2)
+        app.control.inspect.return_value.registered.return_value = {"w1": []}
+
+        started = time.perf_counter()
+        info = await QueueService.collect(app, _redis_client([5]))
+
+        assert time.perf_counter() - started < 1.5
+        assert info["queues"] == {"celery": {"length": 5}}
+        assert info["redis"]["connected"] is True
+        assert info["workers"]["registered"] == {"w1": []}
+        assert info["workers"]["count"] == 0
+        assert info["workers"]["errors"][0].startswith("active: TimeoutError")
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_percentiles(self):
+        """Тест перцентилей времени ожидания в очереди"""
+
+        client = MagicMock()
+        client.pipeline.return_value.execute = AsyncMock(
+            return_value=[[str(value).encode() for value in range(1, 101)], []]
+        )
+
+        waits = await QueueService.get_queue_wait(client, ["prices", "maintenance"])
+
+        assert waits == {
+            "prices": {
+                "samples": 100,
+                "p50_ms": 50.0,
+                "p95_ms": 95.0,
+                "p99_ms": 99.0,
+                "max_ms": 100.0,
+            }
+        }
@@ -0,0 +1,246 @@
+import time
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.db.models import Price, PriceCandle
+from app.schemas.price import PriceCreate, PriceUpdate
+from app.services.candle_service import (
+    DAY_MS,
+    HOUR_MS,
+    MINUTE_MS,
+    CandleService,
+    floor_timestamp,
+)
+from app.services.price_service import PriceService
+from app.services.rollup_service import RollupService
+
+BASE_TIMESTAMP = 1705593600000
+# Пересборка возможна только в пределах срока хранения сырых данных
+RECENT_TIMESTAMP = floor_timestamp(int(time.time() * 1000) - DAY_MS, DAY_MS)
+
+
+def _price_create(price, offset):
+    return PriceCreate(
+        ticker="btc_usd", price=price, timestamp=RECENT_TIMESTAMP + offset
+    )
+
+
+def _candle(db_session, resolution, bucket_start=BASE_TIMESTAMP):
+    return (
+        db_session.query(PriceCandle)
+        .filter(
+            PriceCandle.ticker == "btc_usd",
+            PriceCandle.resolution == resolution,
+            PriceCandle.bucket_start == bucket_start,
+        )
+        .one()
+    )
+
+
+class TestRollupService:
+    """Тесты инкрементальных роллапов"""
+
+    def test_rollups_updated_on_insert(self, db_session):
+        """Тест обновления всех уровней при записи цены"""
+
+        for i, value in enumerate([100.0, 110.0, 90.0]):
+            db_session.add(
+                Price(
+                    ticker="btc_usd",
+                    price=value,
+                    timestamp=BASE_TIMESTAMP + i * MINUTE_MS,
+                )
+            )
+            db_session.commit()
+
+        hourly = _candle(db_session, "1h")
+        assert hourly.count == 3
+        assert float(hourly.open) == 100.0
+        assert float(hourly.high) == 110.0
+        assert float(hourly.low) == 90.0
+        assert float(hourly.close) == 90.0
+        assert float(hourly.sum) == 300.0
+
+        assert db_session.query(PriceCandle).filter_by(resolution="1m").count() == 3
+        assert _candle(db_session, "1d", BASE_TIMESTAMP - 16 * HOUR_MS).count == 3
+
+    def test_late_tick_keeps_open_and_close(self, db_session):
+        """Тест запоздавшего тика внутри уже существующей свечи"""
+
+        db_session.add(Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP))
+        db_session.add(
+            Price(ticker="btc_usd", price=105.0, timestamp=BASE_TIMESTAMP + 120000)
+        )
+        db_session.commit()
+        db_session.add(
+            Price(ticker="btc_usd", price=80.0, timestamp=BASE_TIMESTAMP + 60000)
+        )
+        db_session.commit()
+
+        candle = _candle(db_session, "5m")
+        assert float(candle.open) == 100.0
+        assert float(candle.close) == 105.0
+        assert float(candle.low) == 80.0
+        assert candle.count == 3
+
+    def test_rollups_disabled(self, db_session):
+        """Тест отключения роллапов на пути записи"""
+
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            db_session.add(
+                Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP)
+            )
+            db_session.commit()
+
+        assert db_session.query(PriceCandle).count() == 0
+
+    def test_rebuild_after_backfill(self, db_session):
+        """Тест пересборки диапазона после записи в обход роллапов"""
+
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            for i in range(10):
+                db_session.add(
+                    Price(
+                        ticker="btc_usd",
+                        price=100.0 + i,
+                        timestamp=BASE_TIMESTAMP + i * MINUTE_MS,
+                    )
+                )
+            db_session.commit()
+
+        rebuilt = RollupService.rebuild(
+            db_session,
+            "btc_usd",
+            BASE_TIMESTAMP,
+            BASE_TIMESTAMP + 9 * MINUTE_MS,
+            now=BASE_TIMESTAMP + HOUR_MS,
+        )
+
+        assert rebuilt == {"1m": 10, "5m": 2, "1h": 1, "1d": 1}
+        assert _candle(db_session, "1h").count == 10
+        assert float(_candle(db_session, "1h").close) == 109.0
+
+    def test_rebuild_skips_expired_source(self, db_session):
+        """Тест защиты истории от пересборки из удаленных сырых данных"""
+
+        db_session.add(Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP))
+        db_session.commit()
+        db_session.query(Price).delete()
+        db_session.flush()
+
+        rebuilt = RollupService.rebuild(
+            db_session,
+            "btc_usd",
+            BASE_TIMESTAMP,
+            BASE_TIMESTAMP,
+            now=BASE_TIMESTAMP + 400 * 24 * HOUR_MS,
+        )
+
+        assert rebuilt["1m"] == 0
+        assert rebuilt["5m"] == 0
+        assert _candle(db_session, "1h").count == 1
+
+    def test_delete_price_rebuilds_buckets(self, db_session):
+        """Тест согласованности роллапов при удалении цены"""
+
+        first = PriceService.create_price(db_session, _price_create(100.0, 0))
+        PriceService.create_price(db_session, _price_create(120.0, MINUTE_MS))
+
+        assert PriceService.delete_price(db_session, first.id) is True
+
+        minute_candles = db_session.query(PriceCandle).filter_by(resolution="1m")
+        assert [c.bucket_start for c in minute_candles] == [
+            RECENT_TIMESTAMP + MINUTE_MS
+        ]
+        daily = _candle(db_session, "1d", RECENT_TIMESTAMP)
+        assert daily.count == 1
+        assert float(daily.open) == 120.0
+
+    def test_update_price_rebuilds_buckets(self, db_session):
+        """Тест согласованности роллапов при изменении цены"""
+
+        price = PriceService.create_price(db_session, _price_create(100.0, 0))
+
+        PriceService.update_price(db_session, price.id, PriceUpdate(price=150.0))
+
+        daily = _candle(db_session, "1d", RECENT_TIMESTAMP)
+        assert daily.count == 1
+        assert float(daily.high) == 150.0
+
+    def test_orm_changes_rebuild_buckets(self, db_session):
+        """Тест: изменение и удаление цены в обход сервиса пересобирают бакеты"""
+
+        first = PriceService.create_price(db_session, _price_create(100.0, 0))
+        second = PriceService.create_price(db_session, _price_create(120.0, MINUTE_MS))
+
+        first.timestamp = RECENT_TIMESTAMP + 2 * MINUTE_MS
+        db_session.commit()
+
+        minute_candles = db_session.query(PriceCandle).filter_by(resolution="1m")
+        assert [c.bucket_start for c in minute_candles.order_by("bucket_start")] == [
+            RECENT_TIMESTAMP + MINUTE_MS,
+            RECENT_TIMESTAMP + 2 * MINUTE_MS,
+        ]
+        assert float(_candle(db_session, "1d", RECENT_TIMESTAMP).close) == 100.0
+
+        db_session.delete(second)
+        db_session.commit()
+
+        daily = _candle(db_session, "1d", RECENT_TIMESTAMP)
+        assert daily.count == 1
+        assert float(daily.high) == 100.0
+
+    def test_downsampling_skipped_with_rollups(self, db_session):
+        """Тест: при роллапах свечи пишет только путь записи цен"""
+
+        for i in range(10):
+            db_session.add(
+                Price(
+                    ticker="btc_usd",
+                    price=100.0 + i,
+                    timestamp=BASE_TIMESTAMP + i * MINUTE_MS,
+                )
+            )
+        db_session.commit()
+
+        now = BASE_TIMESTAMP + DAY_MS
+        for resolution in ("1m", "5m", "1h"):
+            assert (
+                CandleService.downsample_ticker(
+                    db_session, "btc_usd", resolution, now=now
+                )
+                == 0
+            )
+        assert _candle(db_session, "1h").count == 10
+
+    def test_stats_from_rollups(self, db_session):
+        """Тест статистики по роллапам"""
+
+        for i, value in enumerate([10.0, 20.0, 30.0]):
+            db_session.add(
+                Price(ticker="btc_usd", price=value, timestamp=BASE_TIMESTAMP + i)
+            )
+        db_session.commit()
+
+        stats = RollupService.get_stats(db_session, "btc_usd")
+
+        assert stats["count"] == 3
+        assert stats["avg_price"] == 20.0
+        assert stats["first_timestamp"] == BASE_TIMESTAMP
+        assert stats["last_timestamp"] == BASE_TIMESTAMP + 2
+
+    def test_stats_fall_back_when_rollups_incomplete(self, db_session):
+        """Тест отказа от роллапов, если они не покрывают сырые данные"""
+
+        with patch.object(settings, "ROLLUPS_ENABLED", False):
+            db_session.add(
+                Price(ticker="btc_usd", price=10.0, timestamp=BASE_TIMESTAMP)
+            )
+            db_session.commit()
+        db_session.add(
+            Price(ticker="btc_usd", price=20.0, timestamp=BASE_TIMESTAMP + 1)
+        )
+        db_session.commit()
+
+        assert RollupService.get_stats(db_session, "btc_usd") is None
+        assert PriceService.get_stats(db_session, "btc_usd")["count"] == 2
@@ -1,6 +1,9 @@
+import pytest
+
 from app.db.models import Price
 from app.schemas.price import PriceCreate
-from app.services.price_service import PriceService
+from app.services.price_service import AsyncPriceService, PriceService
+from tests.conftest import TestingAsyncSessionLocal
 
 
 class TestPriceService:
@@ -114,6 +117,20 @@ class TestPriceService:
         assert db_price is not None
         assert db_price.ticker == "btc_usd"
 
+    def test_create_prices(self, db_session):
+        """Тест пакетного создания записей о ценах"""
+
+        created = PriceService.create_prices(
+            db_session,
+            [
+                PriceCreate(ticker="btc_usd", price=50000.50, timestamp=1705593600000),
+                PriceCreate(ticker="eth_usd", price=3000.25, timestamp=1705593600000),
+            ],
+        )
+
+        assert all(price.id is not None for price in created)
+        assert db_session.query(Price).count() == 2
+
     def test_get_stats(self, db_session, sample_price_data):
         """Тест получения статистики"""
 
@@ -147,3 +164,69 @@ class TestPriceService:
         assert stats["avg_price"] is None
         assert stats["first_timestamp"] is None
         assert stats["last_timestamp"] is None
+
+
+class TestAsyncPriceService:
+    """Тесты асинхронных запросов сервиса цен"""
+
+    @pytest.fixture
+    def saved_prices(self, db_session, sample_price_data):
+        for i in range(5):
+            price_data = sample_price_data.copy()
+            price_data["timestamp"] += i * 60000
+            price_data["price"] += i
+            db_session.add(Price(**price_data))
+        db_session.add(Price(**{**sample_price_data, "ticker": "eth_usd"}))
+        db_session.commit()
+        return sample_price_data
+
+    @pytest.mark.asyncio
+    async def test_get_prices(self, saved_prices):
+        """Тест получения цен с пагинацией"""
+
+        async with TestingAsyncSessionLocal() as db:
+            prices = await AsyncPriceService.get_prices(db, "btc_usd", skip=1, limit=2)
+
+        assert [p.timestamp for p in prices] == [
+            saved_prices["timestamp"] + 180000,
+            saved_prices["timestamp"] + 120000,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_latest_price_and_range(self, saved_prices):
+        """Тест последней цены и фильтра по диапазону"""
+
+        start = saved_prices["timestamp"] + 60000
+        async with TestingAsyncSessionLocal() as db:
+            latest = await AsyncPriceService.get_latest_price(db, "btc_usd")
+            in_range = await AsyncPriceService.get_prices_by_date_range(
+                db, "btc_usd", start, start + 60000
+            )
+            missing = await AsyncPriceService.get_latest_price(db, "btc_perpetual")
+
+        assert latest.timestamp == saved_prices["timestamp"] + 240000
+        assert len(in_range) == 2
+        assert missing is None
+
+    @pytest.mark.asyncio
+    async def test_available_tickers_and_stats(self, saved_prices):
+        """Тест списка тикеров и статистики через синхронную логику"""
+
+        async with TestingAsyncSessionLocal() as db:
+            tickers = await AsyncPriceService.get_available_tickers(db)
+            stats = await AsyncPriceService.get_stats(db, "btc_usd")
+
+        assert tickers == ["btc_usd", "eth_usd"]
+        assert stats["count"] == 5
+        assert stats["max_price"] == pytest.approx(saved_prices["price"] + 4)
+
+    @pytest.mark.asyncio
+    async def test_create_price(self, db_session):
+        """Тест создания цены в асинхронной сессии"""
+
+        price_data = PriceCreate(ticker="btc_usd", price=50000.0, timestamp=1)
+        async with TestingAsyncSessionLocal() as db:
+            price = await AsyncPriceService.create_price(db, price_data)
+
+        assert price.id is not None
+        assert db_session.query(Price).count() == 1
@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.workers.sharding import HashRing, ShardMembership, shard_queue_name
+
+TICKERS = [f"ticker_{i}" for i in range(300)]
+
+
+class TestHashRing:
+    """Тесты кольца согласованного хеширования"""
+
+    def test_empty_ring(self):
+        """Тест кольца без воркеров"""
+
+        ring = HashRing([])
+
+        assert ring.get_node("btc_usd") is None
+        assert ring.assign(["btc_usd"]) == {}
+
+    def test_assignment_is_deterministic(self):
+        """Тест одинакового распределения на разных экземплярах кольца"""
+
+        first = HashRing(["worker-a", "worker-b"]).assign(TICKERS)
+        second = HashRing(["worker-b", "worker-a"]).assign(TICKERS)
+
+        assert first == second
+        assert sum(len(keys) for keys in first.values()) == len(TICKERS)
+
+    def test_assignment_is_balanced(self):
+        """Тест равномерности распределения"""
+
+        assignment = HashRing(["worker-a", "worker-b", "worker-c"]).assign(TICKERS)
+
+        assert len(assignment) == 3
+        assert all(len(keys) > len(TICKERS) / 6 for keys in assignment.values())
+
+    def test_worker_join_moves_minimal_keys(self):
+        """Тест переезда только части инструментов при добавлении воркера"""
+
+        before = HashRing(["worker-a", "worker-b", "worker-c"])
+        after = HashRing(["worker-a", "worker-b", "worker-c", "worker-d"])
+
+        moved = [key for key in TICKERS if before.get_node(key) != after.get_node(key)]
+
+        assert all(after.get_node(key) == "worker-d" for key in moved)
+        assert len(moved) < len(TICKERS) / 2
+
+    def test_shard_queue_name(self):
+        """Тест имени личной очереди воркера"""
+
+        assert shard_queue_name("celery@host1") == "prices.shard.celery@host1"
+
+
+class TestShardMembership:
+    """Тесты членства воркеров в Redis"""
+
+    def test_heartbeat_and_leave(self):
+        """Тест регистрации и выхода воркера"""
+
+        client = MagicMock()
+        membership = ShardMembership(client)
+
+        membership.heartbeat("worker-a")
+        membership.leave("worker-a")
+
+        key, mapping = client.zadd.call_args[0]
+        assert key == "deribit_tracker:shards:members"
+        assert list(mapping) == ["worker-a"]
+        client.zrem.assert_called_once_with(key, "worker-a")
+
+    def test_members_prunes_expired(self):
+        """Тест удаления воркеров с просроченным heartbeat"""
+
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        pipe.execute.return_value = [1, [b"worker-b", b"worker-a"]]
+
+        with patch("app.workers.sharding.time.time", return_value=1000.0):
+            members = ShardMembership(client).members()
+
+        assert members == ["worker-a", "worker-b"]
+        pipe.zremrangebyscore.assert_called_once_with(
+            "deribit_tracker:shards:members",
+            "-inf",
+            1000.0 - settings.SHARD_MEMBER_TTL_SECONDS,
+        )
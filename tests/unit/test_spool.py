@@ -0,0 +1,163 @@
+import struct
+import threading
+import time
+
+import pytest
+
+from app.workers.spool import DATA_START, SegmentSpool
+
+
+def _records(count, start=0):
+    return [
+        {
+            "ticker": "btc_usd",
+            "price": 95000.0 + i,
+            "timestamp": 1705593600000 + i * 60000,
+            "source_timestamp": None,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return SegmentSpool(str(tmp_path), segment_bytes=4096, max_segments=8)
+
+
+class TestSegmentSpool:
+    """Тесты локального журнала цен"""
+
+    def test_append_and_replay(self, spool):
+        """Тест воспроизведения записей в порядке добавления"""
+
+        assert spool.append(_records(3)) == 3
+        assert spool.append(_records(2, start=3)) == 2
+        assert spool.pending()
+
+        batches = []
+        replayed = spool.replay(batches.append, batch_size=2)
+
+        assert replayed == 5
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert [r["timestamp"] for batch in batches for r in batch] == [
+            r["timestamp"] for r in _records(5)
+        ]
+        assert not spool.pending()
+
+    def test_segment_rotation(self, spool):
+        """Тест перехода на новый сегмент при заполнении"""
+
+        spool.append(_records(100))
+
+        assert len(spool.segments()) > 1
+        batches = []
+        assert spool.replay(batches.append, batch_size=1000) == 100
+        assert not spool.segments()
+
+    def test_full_spool_drops_overflow(self, tmp_path):
+        """Тест ограничения размера спула"""
+
+        spool = SegmentSpool(str(tmp_path), segment_bytes=512, max_segments=2)
+
+        written = spool.append(_records(100))
+
+        assert 0 < written < 100
+        assert len(spool.segments()) == 2
+
+    def test_failed_batch_is_retried(self, spool):
+        """Тест повтора пачки после ошибки записи в БД"""
+
+        spool.append(_records(4))
+        calls = []
+
+        def failing(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise ConnectionError("database is down")
+
+        with pytest.raises(ConnectionError):
+            spool.replay(failing, batch_size=2)
+
+        batches = []
+        assert spool.replay(batches.append, batch_size=2) == 2
+        assert batches[0] == _records(2, start=2)
+
+    def test_replay_batch_limit(self, spool):
+        """Тест ограничения числа пачек за один запуск"""
+
+        spool.append(_records(5))
+        batches = []
+
+        assert spool.replay(batches.append, batch_size=2, max_batches=2) == 4
+        assert spool.pending()
+        assert spool.replay(batches.append, batch_size=2, max_batches=2) == 1
+        assert not spool.pending()
+
+    def test_corrupted_record(self, spool, tmp_path):
+        """Тест остановки на записи с неверной контрольной суммой"""
+
+        spool.append(_records(3))
+        segment = spool.segments()[0]
+        data = bytearray(segment.read_bytes())
+        # Портим данные второй записи
+        (first_length,) = struct.unpack_from("<I", data, DATA_START)
+        second = DATA_START + 8 + first_length
+        data[second + 8 + 5] ^= 0xFF
+        segment.write_bytes(bytes(data))
+
+        batches = []
+        assert spool.replay(batches.append) == 1
+        assert not spool.pending()
+        assert list(tmp_path.glob("*.corrupt"))
+
+    def test_append_after_replay_starts_new_segment(self, spool):
+        """Тест записи после полного воспроизведения"""
+
+        spool.append(_records(2))
+        spool.replay(lambda batch: None)
+        spool.append(_records(1, start=2))
+
+        batches = []
+        assert spool.replay(batches.append) == 1
+        assert batches[0] == _records(1, start=2)
+
+    def test_concurrent_replays(self, tmp_path):
+        """Тест: два воркера с общим спулом воспроизводят каждую запись один раз"""
+
+        replayed = []
+        barrier = threading.Barrier(2)
+
+        def handler(batch):
+            time.sleep(0.01)
+            replayed.extend(batch)
+
+        def worker(blocking):
+            barrier.wait()
+            SegmentSpool(str(tmp_path), segment_bytes=512).replay(
+                handler, batch_size=5, blocking=blocking
+            )
+
+        for blocking in (True, False):
+            replayed.clear()
+            SegmentSpool(str(tmp_path), segment_bytes=512).append(_records(30))
+            threads = [threading.Thread(target=worker, args=(blocking,)) for _ in "ab"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert sorted(r["timestamp"] for r in replayed) == [
+                r["timestamp"] for r in _records(30)
+            ]
+            assert not SegmentSpool(str(tmp_path)).pending()
+
+    def test_replay_without_waiting_skips_locked_spool(self, spool):
+        """Тест пропуска спула, занятого другим процессом"""
+
+        spool.append(_records(2))
+
+        with spool._locked():
+            assert spool.replay(lambda batch: None, blocking=False) == 0
+
+        assert spool.pending()
+        assert spool.replay(lambda batch: None, blocking=False) == 2
@@ -0,0 +1,165 @@
+import statistics
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.models import Price, TickerStats
+from app.schemas.price import PriceUpdate
+from app.services.price_service import PriceService
+from app.services.stats_service import StatsService, summarize_ticks
+from tests.conftest import PRICES_START
+
+BASE_TIMESTAMP = PRICES_START
+VALUES = [100.0, 110.0, 90.0, 105.0, 95.0, 120.0]
+
+
+def _stats(db_session, ticker="btc_usd"):
+    return StatsService.get_stats(db_session, ticker)
+
+
+class TestSummarizeTicks:
+    """Тесты агрегатов пачки тиков"""
+
+    def test_welford_matches_two_pass(self):
+        """Тест среднего и m2 по Уэлфорду"""
+
+        batch = summarize_ticks(
+            {"ticker": "btc_usd", "price": value, "timestamp": i}
+            for i, value in enumerate(VALUES)
+        )["btc_usd"]
+
+        assert batch["count"] == len(VALUES)
+        assert batch["mean"] == pytest.approx(statistics.mean(VALUES))
+        assert batch["m2"] / (len(VALUES) - 1) == pytest.approx(
+            statistics.variance(VALUES)
+        )
+        assert float(batch["min_price"]) == 90.0
+        assert batch["last_timestamp"] == len(VALUES) - 1
+
+
+class TestStatsService:
+    """Тесты агрегатов тикеров"""
+
+    def test_aggregates_merged_across_batches(self, db_session, add_prices):
+        """Тест слияния агрегатов нескольких записей"""
+
+        add_prices(VALUES[:2])
+        add_prices(VALUES[2:], start=BASE_TIMESTAMP + 2)
+        add_prices([3000.0], ticker="eth_usd")
+
+        stats = _stats(db_session)
+
+        assert stats["count"] == len(VALUES)
+        assert stats["min_price"] == 90.0
+        assert stats["max_price"] == 120.0
+        assert stats["avg_price"] == pytest.approx(statistics.mean(VALUES))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(VALUES))
+        assert stats["first_timestamp"] == BASE_TIMESTAMP
+        assert stats["last_timestamp"] == BASE_TIMESTAMP + len(VALUES) - 1
+        assert _stats(db_session, "eth_usd")["stddev_price"] is None
+
+    def test_delete_recomputes_extremes(self, db_session, add_prices):
+        """Тест вычитания удаленной цены и пересчета минимума"""
+
+        prices = add_prices(VALUES)
+
+        PriceService.delete_price(db_session, prices[2].id)
+
+        remaining = VALUES[:2] + VALUES[3:]
+        stats = _stats(db_session)
+        assert stats["count"] == len(remaining)
+        assert stats["min_price"] == 95.0
+        assert stats["avg_price"] == pytest.approx(statistics.mean(remaining))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(remaining))
+
+    def test_update_replaces_value(self, db_session, add_prices):
+        """Тест изменения цены и метки времени"""
+
+        prices = add_prices(VALUES)
+
+        PriceService.update_price(
+            db_session,
+            prices[5].id,
+            PriceUpdate(price=80.0, timestamp=BASE_TIMESTAMP + 100),
+        )
+
+        values = VALUES[:5] + [80.0]
+        stats = _stats(db_session)
+        assert stats["count"] == len(values)
+        assert stats["min_price"] == 80.0
+        assert stats["max_price"] == 110.0
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(values))
+        assert stats["last_timestamp"] == BASE_TIMESTAMP + 100
+
+    def test_update_expired_row(self, db_session, add_prices):
+        """Тест изменения строки, истекшей после коммита, без ее загрузки"""
+
+        prices = add_prices(VALUES)
+        assert "stored_price" not in prices[0].__dict__
+
+        prices[0].price = 120.0
+        db_session.commit()
+
+        values = [120.0] + VALUES[1:]
+        stats = _stats(db_session)
+        assert stats["count"] == len(values)
+        assert stats["max_price"] == 120.0
+        assert stats["avg_price"] == pytest.approx(statistics.mean(values))
+
+    def test_bulk_delete(self, db_session, add_prices):
+        """Тест массового удаления (срок хранения)"""
+
+        add_prices(VALUES)
+        criteria = (Price.ticker == "btc_usd", Price.timestamp < BASE_TIMESTAMP + 3)
+
+        removed = StatsService.before_delete(db_session, *criteria)
+        db_session.execute(delete(Price).where(*criteria))
+        StatsService.remove(db_session, removed)
+        db_session.commit()
+
+        stats = _stats(db_session)
+        assert stats["count"] == 3
+        assert stats["first_timestamp"] == BASE_TIMESTAMP + 3
+        assert stats["min_price"] == 95.0
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(VALUES[3:]))
+
+    def test_last_price_deleted_removes_row(self, db_session, add_prices):
+        """Тест удаления агрегатов тикера без цен"""
+
+        prices = add_prices([100.0])
+
+        PriceService.delete_price(db_session, prices[0].id)
+
+        assert db_session.query(TickerStats).count() == 0
+        assert _stats(db_session) is None
+
+    def test_rebuild(self, db_session, add_prices):
+        """Тест пересчета агрегатов после записи без их учета"""
+
+        with patch.object(settings, "TICKER_STATS_ENABLED", False):
+            add_prices(VALUES[:3])
+        add_prices(VALUES[3:], start=BASE_TIMESTAMP + 3)
+        assert _stats(db_session)["count"] == 3
+
+        assert StatsService.rebuild(db_session) == 1
+        db_session.commit()
+
+        stats = _stats(db_session)
+        assert stats["count"] == len(VALUES)
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(VALUES))
+
+    def test_price_service_falls_back_without_aggregates(self, db_session, add_prices):
+        """Тест статистики по таблице prices без агрегатов"""
+
+        with patch.object(settings, "TICKER_STATS_ENABLED", False), patch.object(
+            settings, "ROLLUPS_ENABLED", False
+        ):
+            add_prices(VALUES)
+            stats = PriceService.get_stats(db_session, "btc_usd")
+
+        assert db_session.query(TickerStats).count() == 0
+        assert stats["count"] == len(VALUES)
+        assert stats["avg_price"] == pytest.approx(statistics.mean(VALUES))
+        assert stats["stddev_price"] == pytest.approx(statistics.stdev(VALUES))
@@ -0,0 +1,166 @@
+from unittest.mock import patch
+
+import pytest
+import redis
+
+from app.db.models import Price, Ticker
+from app.services.price_service import PriceService
+from app.services.stats_service import StatsService
+from app.services.ticker_service import (
+    TickerRegistry,
+    TickerService,
+    registry_channel,
+    ticker_ids,
+)
+from tests.conftest import PRICES_START, TestingAsyncSessionLocal
+
+BASE_TIMESTAMP = PRICES_START
+
+
+class TestTickerService:
+    """Тесты реестра тикеров"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_first_insert_registers_ticker(self, mock_redis, db_session, add_prices):
+        """Тест добавления тикера в реестр при первой записи цены"""
+
+        add_prices(3, ticker=["eth_usd", "btc_usd", "btc_usd"])
+        add_prices(1, ticker="btc_usd")
+
+        names = [ticker.name for ticker in db_session.query(Ticker).order_by("name")]
+        assert names == ["btc_usd", "eth_usd"]
+        mock_redis.return_value.publish.assert_called_once_with(
+            registry_channel(), "btc_usd,eth_usd"
+        )
+
+    def test_register_skips_known_tickers(self, db_session):
+        """Тест повторной регистрации известного тикера"""
+
+        assert list(TickerService.register(db_session, ["btc_usd"])) == ["btc_usd"]
+        assert list(TickerService.register(db_session, ["btc_usd", "eth_usd"])) == [
+            "eth_usd"
+        ]
+        assert TickerService.register(db_session, []) == {}
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_rollback_discards_registration(self, mock_redis, db_session):
+        """Тест отката: тикер не попадает в реестр и не объявляется"""
+
+        db_session.add(Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP))
+        db_session.flush()
+        db_session.rollback()
+        db_session.commit()
+
+        assert db_session.query(Ticker).count() == 0
+        mock_redis.return_value.publish.assert_not_called()
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_redis_error_does_not_fail_commit(self, mock_redis, db_session, add_prices):
+        """Тест записи цены при недоступном Redis"""
+
+        mock_redis.return_value.publish.side_effect = redis.ConnectionError("down")
+
+        add_prices(1, ticker="btc_usd")
+
+        assert db_session.query(Ticker).count() == 1
+
+    @pytest.mark.asyncio
+    @patch("app.services.ticker_service.get_redis")
+    async def test_get_tickers_with_metadata(self, mock_redis, add_prices):
+        """Тест метаданных тикеров из агрегатов"""
+
+        add_prices(3, ticker=["btc_usd", "btc_usd", "eth_usd"])
+
+        async with TestingAsyncSessionLocal() as db:
+            tickers = await TickerService.get_tickers(db)
+
+        assert [ticker["ticker"] for ticker in tickers] == ["btc_usd", "eth_usd"]
+        assert tickers[0]["count"] == 2
+        assert tickers[0]["first_timestamp"] == BASE_TIMESTAMP
+        assert tickers[0]["last_timestamp"] == BASE_TIMESTAMP + 1
+        assert tickers[1]["registered_at"] is not None
+
+
+class TestTickerRegistry:
+    """Тесты списка тикеров в памяти процесса"""
+
+    @pytest.mark.asyncio
+    @patch("app.services.ticker_service.get_redis")
+    async def test_cache_only_while_subscribed(self, mock_redis, add_prices):
+        """Тест памяти процесса: используется только при активной подписке"""
+
+        registry = TickerRegistry()
+        add_prices(1, ticker="btc_usd")
+
+        async with TestingAsyncSessionLocal() as db:
+            registry._set_subscribed(True)
+            assert await registry.get_names(db) == ["btc_usd"]
+
+            add_prices(1, ticker="eth_usd")
+            assert await registry.get_names(db) == ["btc_usd"]
+
+            registry.invalidate(b"eth_usd")
+            assert await registry.get_names(db) == ["btc_usd", "eth_usd"]
+
+            registry._set_subscribed(False)
+            add_prices(1, ticker="sol_usd")
+            assert await registry.get_names(db) == ["btc_usd", "eth_usd", "sol_usd"]
+
+
+class TestTickerIds:
+    """Тесты хранения тикера цены как ticker_id"""
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_price_stores_ticker_id(self, mock_redis, db_session, add_prices):
+        """Тест назначения ticker_id и имени тикера при загрузке"""
+
+        add_prices(2, ticker=["btc_usd", "eth_usd"])
+        ticker = db_session.query(Ticker).filter(Ticker.name == "eth_usd").one()
+        ticker_ids.clear()
+        db_session.expunge_all()
+
+        price = db_session.query(Price).filter(Price.ticker == "eth_usd").one()
+
+        assert price.ticker_id == ticker.id
+        assert price.ticker == "eth_usd"
+        assert (
+            db_session.query(Price).filter(Price.ticker.in_(["btc_usd"])).count() == 1
+        )
+        assert db_session.query(Price).filter(Price.ticker != "btc_usd").count() == 1
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_update_ticker_moves_stats(self, mock_redis, db_session, add_prices):
+        """Тест изменения тикера цены: новый ticker_id и агрегаты обоих тикеров"""
+
+        add_prices(2, ticker=["btc_usd", "btc_usd"])
+        price = db_session.query(Price).filter(Price.ticker == "btc_usd").first()
+
+        price.ticker = "eth_usd"
+        db_session.commit()
+
+        assert price.ticker_id == ticker_ids.cached_id("eth_usd")
+        assert StatsService.get_stats(db_session, "btc_usd")["count"] == 1
+        assert StatsService.get_stats(db_session, "eth_usd")["count"] == 1
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_rollback_forgets_registered_ids(self, mock_redis, db_session):
+        """Тест отката: id откаченного тикера не остается в памяти процесса"""
+
+        db_session.add(Price(ticker="btc_usd", price=100.0, timestamp=BASE_TIMESTAMP))
+        db_session.flush()
+        assert ticker_ids.cached_id("btc_usd") is not None
+
+        db_session.rollback()
+
+        assert ticker_ids.cached_id("btc_usd") is None
+
+    @patch("app.services.ticker_service.get_redis")
+    def test_price_service_unknown_ticker(self, mock_redis, db_session, add_prices):
+        """Тест запросов по тикеру, которого нет в реестре"""
+
+        add_prices(1, ticker="btc_usd")
+
+        assert PriceService.get_prices(db_session, "eth_usd") == []
+        assert PriceService.get_latest_price(db_session, "eth_usd") is None
+        assert PriceService.get_stats(db_session, "eth_usd")["count"] == 0
+        assert PriceService.get_latest_price(db_session, "btc_usd").ticker == "btc_usd"
@@ -1,14 +1,24 @@
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
+from sqlalchemy.exc import OperationalError
 
 from app.workers.tasks import (
+    _chart_range_for,
     _fetch_prices_async,
+    _replay_spool_on_start,
+    _save_prices_batch,
     _save_prices_to_db,
+    _save_spooled_prices,
+    backfill_gaps_task,
     cleanup_old_prices_task,
+    downsample_prices_task,
     fetch_prices_task,
+    fetch_shard_task,
     health_check_task,
+    rebuild_ticker_stats_task,
 )
+from app.workers.tasks import settings as task_settings
 
 
 class TestCeleryTasks:
@@ -36,6 +46,192 @@ class TestCeleryTasks:
         mock_run_async.assert_called_once()
         mock_save.assert_called_once_with(mock_run_async.return_value)
 
+    @patch("app.workers.tasks.SegmentSpool")
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_to_db")
+    def test_fetch_prices_task_spools_when_db_down(
+        self, mock_save, mock_run_async, mock_spool
+    ):
+        """Тест записи цен в спул при недоступной базе данных"""
+
+        mock_run_async.return_value = {
+            "btc_usd": {"index_price": 95194.62, "timestamp": 1705593600000},
+        }
+        mock_save.side_effect = OperationalError("INSERT", {}, Exception("down"))
+        mock_spool.return_value.append.return_value = 1
+
+        result = fetch_prices_task()
+
+        assert result["status"] == "spooled"
+        assert result["prices_spooled"] == 1
+        records = mock_spool.return_value.append.call_args.args[0]
+        assert records[0]["ticker"] == "btc_usd"
+        assert records[0]["price"] == 95194.62
+        assert records[0]["timestamp"] == 1705593600000
+
+    @patch("app.workers.tasks.SegmentSpool")
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_to_db")
+    def test_fetch_prices_task_replays_spool(
+        self, mock_save, mock_run_async, mock_spool
+    ):
+        """Тест воспроизведения спула после восстановления базы данных"""
+
+        mock_run_async.return_value = {
+            "btc_usd": {"index_price": 95194.62, "timestamp": 1705593600000},
+        }
+        mock_save.return_value = 1
+        mock_spool.return_value.pending.return_value = True
+        mock_spool.return_value.replay.return_value = 10
+
+        result = fetch_prices_task()
+
+        assert result["status"] == "success"
+        assert result["prices_replayed"] == 10
+        mock_spool.return_value.replay.assert_called_once_with(
+            _save_spooled_prices, blocking=True
+        )
+
+    @patch("app.workers.tasks.engine")
+    @patch("app.workers.tasks.SegmentSpool")
+    def test_worker_start_replays_spool(self, mock_spool, mock_engine):
+        """Тест воспроизведения спула при запуске воркера линии сбора цен"""
+
+        mock_spool.return_value.pending.return_value = True
+        mock_spool.return_value.replay.return_value = 10
+        worker = Mock(hostname="prices@host")
+        worker.task_consumer.queues = [Mock()]
+        worker.task_consumer.queues[0].name = "prices"
+
+        _replay_spool_on_start(sender=worker)
+
+        # Занятый другим воркером спул пропускается без ожидания
+        mock_spool.return_value.replay.assert_called_once_with(
+            _save_spooled_prices, blocking=False
+        )
+        mock_engine.dispose.assert_called_once()
+
+        # Пустой спул не воспроизводится, соединения не открываются
+        mock_spool.reset_mock()
+        mock_engine.reset_mock()
+        mock_spool.return_value.pending.return_value = False
+        _replay_spool_on_start(sender=worker)
+        mock_spool.return_value.replay.assert_not_called()
+        mock_engine.dispose.assert_not_called()
+
+        # Воркер массовых задач спул не пишет и не воспроизводит
+        mock_spool.reset_mock()
+        worker.task_consumer.queues[0].name = "maintenance"
+        _replay_spool_on_start(sender=worker)
+        mock_spool.assert_not_called()
+
+    @patch("app.workers.tasks.FreshnessService")
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_to_db")
+    def test_fetch_prices_task_records_freshness(
+        self, mock_save, mock_run_async, mock_freshness
+    ):
+        """Тест записи этапов тика для отчета о свежести"""
+
+        mock_run_async.return_value = {
+            "btc_usd": {
+                "index_price": 95194.62,
+                "timestamp": 1705593600000,
+                "exchange_timestamp": 1705593599900,
+            },
+        }
+        mock_save.return_value = 1
+
+        fetch_prices_task()
+
+        ticks = mock_freshness.return_value.record.call_args.args[0]
+        assert ticks["btc_usd"]["exchange"] == 1705593599900
+        assert ticks["btc_usd"]["fetched"] == 1705593600000
+        assert ticks["btc_usd"]["committed"] >= 1705593600000
+
+    @patch("app.workers.tasks.fetch_shard_task")
+    @patch("app.workers.tasks.ShardMembership")
+    def test_fetch_prices_task_dispatches_shards(self, mock_membership, mock_shard):
+        """Тест распределения инструментов по живым воркерам"""
+
+        mock_membership.return_value.members.return_value = ["w1", "w2"]
+
+        with patch.object(task_settings, "SHARDING_ENABLED", True):
+            result = fetch_prices_task()
+
+        assert result["status"] == "dispatched"
+        assignment = result["shards"]
+        assert sorted(sum(assignment.values(), [])) == ["btc_usd", "eth_usd"]
+        for call in mock_shard.apply_async.call_args_list:
+            worker = call.kwargs["queue"].rsplit(".", 1)[-1]
+            assert call.kwargs["args"] == [assignment[worker]]
+            assert call.kwargs["expires"] == task_settings.fetch_prices_period
+
+    def test_shard_expiry_matches_beat_schedule(self):
+        """Тест: шард истекает к следующему запуску fetch_prices_task"""
+
+        from app.workers.celery_app import celery_app
+
+        entry = celery_app.conf.beat_schedule["fetch-prices-every-minute"]
+
+        assert entry["schedule"].total_seconds() == task_settings.fetch_prices_period
+
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_to_db")
+    @patch("app.workers.tasks.ShardMembership")
+    def test_fetch_prices_task_without_members(
+        self, mock_membership, mock_save, mock_run_async
+    ):
+        """Тест локального сбора, если живых воркеров нет"""
+
+        mock_membership.return_value.members.return_value = []
+        mock_run_async.return_value = {
+            "btc_usd": {"index_price": 95194.62, "timestamp": 1705593600000},
+        }
+        mock_save.return_value = 1
+
+        with patch.object(task_settings, "SHARDING_ENABLED", True):
+            result = fetch_prices_task()
+
+        assert result["status"] == "success"
+        mock_save.assert_called_once()
+
+    @patch("app.workers.tasks.is_stale_token", return_value=True)
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_to_db")
+    def test_fetch_prices_task_fenced(self, mock_save, mock_run_async, mock_stale):
+        """Тест отбрасывания задачи, поставленной бывшим лидером Beat"""
+
+        mock_run_async.return_value = {
+            "btc_usd": {"index_price": 95194.62, "timestamp": 1705593600000},
+        }
+
+        fetch_prices_task.push_request(fencing_token=3)
+        try:
+            result = fetch_prices_task()
+        finally:
+            fetch_prices_task.pop_request()
+
+        assert result["status"] == "fenced"
+        mock_stale.assert_called_once_with(3)
+        mock_save.assert_not_called()
+
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks._save_prices_batch")
+    def test_fetch_shard_task(self, mock_save, mock_run_async):
+        """Тест получения цен части инструментов"""
+
+        mock_run_async.return_value = {
+            "eth_usd": {"index_price": 3342.62, "timestamp": 1705593600000},
+        }
+        mock_save.return_value = 1
+
+        result = fetch_shard_task(["eth_usd"])
+
+        assert result["status"] == "success"
+        assert result["prices_saved"] == 1
+        mock_save.assert_called_once_with(mock_run_async.return_value)
+
     @patch("app.workers.tasks.run_async")
     def test_fetch_prices_task_no_data(self, mock_run_async):
         """Тест задачи получения цен без данных"""
@@ -76,17 +272,15 @@ class TestCeleryTasks:
         assert len(result["errors"]) > 0
         assert "Ошибка соединения" in result["errors"][0]
 
-    @patch("app.workers.tasks._check_database_health")
-    @patch("app.workers.tasks._check_redis_health")
-    @patch("app.workers.tasks.run_async")
+    @patch("app.core.health.check_database", return_value=True)
+    @patch("app.core.health.check_redis", return_value=True)
+    @patch("app.core.health.check_deribit", new_callable=AsyncMock)
     def test_health_check_task_success(
-        self, mock_run_async, mock_redis_health, mock_db_health
+        self, mock_deribit_health, mock_redis_health, mock_db_health
     ):
         """Тест задачи проверки здоровья - успех"""
 
-        mock_run_async.return_value = True
-        mock_db_health.return_value = True
-        mock_redis_health.return_value = True
+        mock_deribit_health.return_value = True
 
         result = health_check_task()
 
@@ -95,17 +289,15 @@ class TestCeleryTasks:
         assert result["checks"]["database"]["available"] is True
         assert result["checks"]["redis"]["available"] is True
 
-    @patch("app.workers.tasks._check_database_health")
-    @patch("app.workers.tasks._check_redis_health")
-    @patch("app.workers.tasks.run_async")
+    @patch("app.core.health.check_database", return_value=True)
+    @patch("app.core.health.check_redis", return_value=True)
+    @patch("app.core.health.check_deribit", new_callable=AsyncMock)
     def test_health_check_task_partial_failure(
-        self, mock_run_async, mock_redis_health, mock_db_health
+        self, mock_deribit_health, mock_redis_health, mock_db_health
     ):
         """Тест задачи проверки здоровья - частичный сбой"""
 
-        mock_run_async.return_value = False
-        mock_db_health.return_value = True
-        mock_redis_health.return_value = True
+        mock_deribit_health.return_value = False
 
         result = health_check_task()
 
@@ -113,9 +305,12 @@ class TestCeleryTasks:
         assert result["checks"]["deribit_api"]["available"] is False
         assert result["checks"]["database"]["available"] is True
 
+    @patch("app.workers.tasks.CandleService")
     @patch("app.workers.tasks.run_async")
     @patch("app.workers.tasks._save_prices_to_db")
-    def test_cleanup_old_prices_task(self, mock_save, mock_run_async):
+    def test_cleanup_old_prices_task(
+        self, mock_save, mock_run_async, mock_candle_service
+    ):
         """Тест задачи очистки старых цен"""
 
         mock_session = Mock()
@@ -125,9 +320,8 @@ class TestCeleryTasks:
         mock_db.__exit__ = Mock(return_value=None)
 
         with patch("app.workers.tasks.get_db_context", return_value=mock_db):
-            mock_result = Mock()
-            mock_result.rowcount = 5
-            mock_session.execute.return_value = mock_result
+            mock_candle_service.get_tickers.return_value = ["btc_usd"]
+            mock_candle_service.apply_raw_retention.return_value = 5
 
             result = cleanup_old_prices_task(days_to_keep=30)
 
@@ -135,6 +329,85 @@ class TestCeleryTasks:
             assert result["days_to_keep"] == 30
             assert result["deleted_count"] == 5
 
+    @patch("app.workers.tasks.CandleService")
+    @patch("app.workers.tasks.get_db_context")
+    def test_downsample_prices_task(self, mock_db_context, mock_candle_service):
+        """Тест задачи прореживания цен"""
+
+        mock_db = Mock()
+        mock_db.__enter__ = Mock(return_value=Mock())
+        mock_db.__exit__ = Mock(return_value=None)
+        mock_db_context.return_value = mock_db
+
+        mock_candle_service.get_tickers.return_value = ["btc_usd"]
+        mock_candle_service.downsample_ticker.return_value = 3
+        mock_candle_service.apply_retention.return_value = 7
+
+        result = downsample_prices_task()
+
+        assert result["status"] == "success"
+        assert result["candles_built"]["btc_usd"] == {
+            "1m": 3,
+            "5m": 3,
+            "1h": 3,
+            "1d": 3,
+        }
+        assert result["deleted_count"] == 7
+
+    @patch("app.workers.tasks.StatsService")
+    @patch("app.workers.tasks.get_db_context")
+    def test_rebuild_ticker_stats_task(self, mock_db_context, mock_stats_service):
+        """Тест задачи пересчета агрегатов тикеров"""
+
+        mock_session = Mock()
+        mock_db = Mock()
+        mock_db.__enter__ = Mock(return_value=mock_session)
+        mock_db.__exit__ = Mock(return_value=None)
+        mock_db_context.return_value = mock_db
+        mock_stats_service.rebuild.return_value = 2
+
+        result = rebuild_ticker_stats_task()
+
+        assert result["status"] == "success"
+        assert result["tickers_rebuilt"] == 2
+        mock_stats_service.rebuild.assert_called_once_with(mock_session, None)
+
+    @patch("app.workers.tasks._save_backfill_to_db")
+    @patch("app.workers.tasks.run_async")
+    @patch("app.workers.tasks.GapService")
+    @patch("app.workers.tasks.get_db_context")
+    def test_backfill_gaps_task(
+        self, mock_db_context, mock_gap_service, mock_run_async, mock_save
+    ):
+        """Тест задачи заполнения пропусков"""
+
+        mock_db = Mock()
+        mock_db.__enter__ = Mock(return_value=Mock())
+        mock_db.__exit__ = Mock(return_value=None)
+        mock_db_context.return_value = mock_db
+
+        mock_gap_service.find_gaps.side_effect = [[(0, 120000)], []]
+        mock_gap_service.get_completeness.return_value = {"completeness": 1.0}
+        mock_run_async.return_value = {"btc_usd": [(0, 1.0), (60000, 2.0)]}
+        mock_save.return_value = 2
+
+        result = backfill_gaps_task()
+
+        assert result["status"] == "success"
+        assert result["gaps"] == {"btc_usd": [(0, 120000)]}
+        assert result["filled"] == {"btc_usd": 2}
+        assert set(result["completeness"]) == {"btc_usd", "eth_usd"}
+
+    def test_chart_range_for(self):
+        """Тест выбора глубины истории для бэкфилла"""
+
+        hour_ms = 60 * 60 * 1000
+
+        assert _chart_range_for(30 * 60 * 1000) == "1h"
+        assert _chart_range_for(20 * hour_ms) == "1d"
+        assert _chart_range_for(40 * hour_ms) == "2d"
+        assert _chart_range_for(10 * 24 * hour_ms) == "1m"
+
     @pytest.mark.asyncio
     @patch("app.workers.tasks.DeribitClient")
     async def test_fetch_prices_async_success(self, mock_client_class):
@@ -201,3 +474,24 @@ class TestCeleryTasks:
 
         assert price_create.ticker in ["btc_usd", "eth_usd"]
         assert price_create.price in [95194.62, 3342.62]
+
+    @patch("app.workers.tasks.PriceService")
+    @patch("app.workers.tasks.get_db_context")
+    def test_save_prices_batch(self, mock_db_context, mock_price_service):
+        """Тест сохранения цен шарда одной пачкой"""
+
+        mock_session = Mock()
+        mock_db_context.return_value.__enter__ = Mock(return_value=mock_session)
+        mock_db_context.return_value.__exit__ = Mock(return_value=None)
+
+        saved_count = _save_prices_batch(
+            {
+                "btc_usd": {"index_price": 95194.62, "timestamp": 1705593600000},
+                "eth_usd": {"index_price": 3342.62, "timestamp": 1705593600000},
+            }
+        )
+
+        assert saved_count == 2
+        db, prices = mock_price_service.create_prices.call_args[0]
+        assert db is mock_session
+        assert [price.ticker for price in prices] == ["btc_usd", "eth_usd"]
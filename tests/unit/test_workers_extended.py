@@ -4,9 +4,8 @@ from unittest.mock import AsyncMock, Mock, patch
 import pytest
 
 from app.clients.exceptions import DeribitConnectionError
+from app.core.health import check_database, check_redis
 from app.workers.tasks import (
-    _check_database_health,
-    _check_redis_health,
     _fetch_prices_async,
     _save_prices_to_db,
     cleanup_old_prices_task,
@@ -58,15 +57,15 @@ class TestCeleryTasksExtended:
         assert result["status"] == "error"
         assert "validation error" in result["errors"][0].lower()
 
-    @patch("app.workers.tasks._check_database_health")
-    @patch("app.workers.tasks._check_redis_health")
-    @patch("app.workers.tasks.run_async")
+    @patch("app.core.health.check_database")
+    @patch("app.core.health.check_redis")
+    @patch("app.core.health.check_deribit", new_callable=AsyncMock)
     def test_health_check_task_with_detailed_info(
-        self, mock_run_async, mock_redis_health, mock_db_health
+        self, mock_deribit_health, mock_redis_health, mock_db_health
     ):
         """Тест детальной проверки здоровья"""
 
-        mock_run_async.return_value = True
+        mock_deribit_health.return_value = True
         mock_db_health.return_value = {
             "connected": True,
             "tables": 5,
@@ -85,27 +84,33 @@ class TestCeleryTasksExtended:
         assert result["checks"]["database"]["connected"] is True
         assert result["checks"]["redis"]["connected"] is True
 
-    @patch("app.workers.tasks._check_database_health")
-    @patch("app.workers.tasks._check_redis_health")
-    @patch("app.workers.tasks.run_async")
-    @patch("app.workers.tasks._check_deribit_health_async")
+    @patch("app.core.health.check_database")
+    @patch("app.core.health.check_redis")
+    @patch("app.core.health.check_deribit")
     def test_health_check_task_timeout(
-        self, mock_deri_async, mock_run_async, mock_redis_health, mock_db_health
+        self, mock_deribit_health, mock_redis_health, mock_db_health
     ):
         """Тест проверки здоровья с таймаутом"""
 
-        mock_deri_async.return_value = None
-        mock_run_async.side_effect = asyncio.TimeoutError("API timeout")
+        async def slow_deribit():
+            await asyncio.sleep(1)
+            return True
+
+        mock_deribit_health.side_effect = slow_deribit
         mock_db_health.return_value = False
         mock_redis_health.return_value = True
 
-        result = health_check_task()
+        with patch("app.core.health.settings.HEALTH_PROBE_TIMEOUT_SECONDS", 0.05):
+            result = health_check_task()
 
         assert result["status"] == "unhealthy"
         assert "timeout" in result["checks"]["deribit_api"].get("error", "").lower()
 
+    @patch("app.workers.tasks.CandleService")
     @patch("app.workers.tasks.get_db_context")
-    def test_cleanup_old_prices_with_different_periods(self, mock_db_context):
+    def test_cleanup_old_prices_with_different_periods(
+        self, mock_db_context, mock_candle_service
+    ):
         """Тест очистки с разными периодами"""
 
         mock_session = Mock()
@@ -113,22 +118,21 @@ class TestCeleryTasksExtended:
         mock_db.__enter__ = Mock(return_value=mock_session)
         mock_db.__exit__ = Mock(return_value=None)
         mock_db_context.return_value = mock_db
+        mock_candle_service.get_tickers.return_value = ["btc_usd", "eth_usd"]
 
         test_periods = [1, 7, 30, 90, 365]
 
         for days in test_periods:
-            mock_result = Mock()
-            mock_result.rowcount = days * 10
+            mock_candle_service.apply_raw_retention.reset_mock()
+            mock_candle_service.apply_raw_retention.return_value = days * 10
 
-            with patch("app.workers.tasks.delete") as mock_delete:
-                mock_session.execute.return_value = mock_result
+            result = cleanup_old_prices_task(days_to_keep=days)
 
-                result = cleanup_old_prices_task(days_to_keep=days)
-
-                assert result["task"] == "cleanup_old_prices"
-                assert result["days_to_keep"] == days
-                assert result["deleted_count"] == days * 10
-                mock_delete.assert_called_once()
+            assert result["task"] == "cleanup_old_prices"
+            assert result["days_to_keep"] == days
+            assert result["deleted_count"] == days * 20
+            for call in mock_candle_service.apply_raw_retention.call_args_list:
+                assert call.kwargs["days"] == days
 
     @patch("app.workers.tasks.get_db_context")
     def test_cleanup_old_prices_error(self, mock_db_context):
@@ -233,7 +237,7 @@ class TestCeleryTasksExtended:
         assert saved_count == 1
         assert mock_price_service.create_price.call_count == 2
 
-    @patch("app.workers.tasks.get_db_context")
+    @patch("app.core.health.get_db_context")
     def test_check_database_health_detailed(self, mock_db_context):
         """Тест детальной проверки базы данных"""
 
@@ -242,29 +246,25 @@ class TestCeleryTasksExtended:
 
         mock_session.execute.return_value = None
 
-        result = _check_database_health()
+        result = check_database()
         assert result is True
         mock_session.execute.assert_called_once()
 
+        # Ошибка пробрасывается и попадает в поле error результата проверки
         mock_session.execute.side_effect = Exception("DB Error")
-        result_error = _check_database_health()
-        assert result_error is False
+        with pytest.raises(Exception, match="DB Error"):
+            check_database()
 
-    @patch("app.workers.tasks.redis.Redis")
-    @patch("app.workers.tasks.settings")
-    def test_check_redis_health_detailed(self, mock_settings, mock_redis_class):
+    @patch("app.core.health.get_redis")
+    def test_check_redis_health_detailed(self, mock_get_redis):
         """Тест детальной проверки Redis"""
 
-        mock_settings.redis_url = "redis://localhost:6379"
-
-        mock_redis = Mock()
-        mock_redis_class.from_url.return_value = mock_redis
-        mock_redis.ping.return_value = True
+        mock_get_redis.return_value.ping.return_value = True
 
-        result = _check_redis_health()
+        result = check_redis()
 
         assert result is True
-        mock_redis_class.from_url.assert_called_once()
+        mock_get_redis.return_value.ping.assert_called_once()
 
     @patch("app.workers.tasks.run_async")
     def test_fetch_prices_task_custom_tickers(self, mock_run_async):